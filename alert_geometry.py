@@ -0,0 +1,197 @@
+import time
+import logging
+import argparse
+import numpy as np
+from spatial_index import build_index
+
+# 경보 다각형(GeoJSON geometry)으로 경보가 걸린 도시를 찾는 모듈
+# 폭풍 경보처럼 다각형만 있고 구역 코드가 도시와 잘 맞지 않는 경보를, 도시마다 /points 를 부르지 않고 좌표로 바로 맞춘다.
+# 도시 좌표는 spatial_index.SpatialIndex (0.5도 격자 칸 번호로 정렬) 에 한 번 넣어 두고, 폴링한 경보 전체를 한 번에 처리한다.
+# 1) 모든 다각형의 고리를 변 배열 하나로 모으고 다각형마다 경계 사각형을 구한다
+# 2) 경계 사각형들이 걸치는 격자 칸의 도시를 SpatialIndex.query_bboxes 로 한 번에 골라 사각형 안의 (다각형, 도시) 쌍만 남긴다 (bbox 사전 필터)
+# 3) 쌍마다 그 다각형의 모든 변을 펼쳐 ray casting 을 한 번의 numpy 계산으로 하고, 쌍별로 가로지른 변 수의 홀짝을 센다
+# 구멍(안쪽 고리)과 MultiPolygon 은 모든 고리의 변을 함께 세는 짝홀 규칙으로 처리된다 (GeoJSON 의 고리는 서로 겹치지 않는다).
+# 다각형은 날짜변경선을 넘지 않는다고 본다 (미국 본토 / 하와이 / 알래스카 대부분).
+
+# 한 번에 계산하는 (쌍, 변) 조합의 최대 개수 (변이 아주 많은 다각형의 임시 배열 크기를 제한)
+max_pairs = 1 << 20
+
+
+# GeoJSON geometry 의 고리 목록 (다각형이 아니면 빈 목록, 점이 세 개보다 적은 고리는 뺀다)
+def geometry_rings(geometry):
+    if not geometry:
+        return []
+    kind = geometry.get('type')
+    if kind == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif kind == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    elif kind == 'GeometryCollection':
+        return [ring for part in geometry.get('geometries', []) for ring in geometry_rings(part)]
+    else:
+        return []
+    return [ring for polygon in polygons for ring in polygon if len(ring) >= 3]
+
+
+# geometry 목록의 모든 변을 한 배열로 모으는 함수
+# → (변 배열 (시작 경도, 시작 위도, 끝 경도, 끝 위도), geometry 별 변 시작 위치 (geometry 수 + 1))
+# 고리마다 마지막 점에서 첫 점으로 돌아가는 변까지 넣고 (닫힌 고리면 길이 0 인 변), 수평인 변은 가로지를 수 없으므로 뺀다
+def collect_edges(geometries):
+    rings, ring_geometry = [], []
+    for g, geometry in enumerate(geometries):
+        for ring in geometry_rings(geometry):
+            rings.append(ring)
+            ring_geometry.append(g)
+    if not rings:
+        return np.empty((4, 0)), np.zeros(len(geometries) + 1, dtype=np.int64)
+    lengths = np.array([len(ring) for ring in rings], dtype=np.int64)
+    points = np.array([point[:2] for ring in rings for point in ring], dtype=np.float64)
+    ring_starts = np.cumsum(lengths) - lengths
+    following = np.arange(len(points)) + 1
+    following[ring_starts + lengths - 1] = ring_starts
+    x1, y1 = points[:, 0], points[:, 1]
+    x2, y2 = x1[following], y1[following]
+    edge_geometry = np.repeat(np.array(ring_geometry, dtype=np.int64), lengths)
+    keep = y1 != y2
+    edges = np.stack([x1[keep], y1[keep], x2[keep], y2[keep]])
+    return edges, np.searchsorted(edge_geometry[keep], np.arange(len(geometries) + 1))
+
+
+# (점, 다각형) 쌍마다 점이 다각형 안에 있는지를 한 번에 계산하는 함수 → bool 배열
+# 점에서 동쪽으로 그은 반직선이 가로지르는 변의 수가 홀수면 안이다. 쌍마다 그 다각형의 변 수만큼 펼쳐 계산한다
+def pairs_in_polygons(latitudes, longitudes, pair_polygons, edges, offsets):
+    x1, y1, x2, y2 = edges
+    slope = (x2 - x1) / (y2 - y1)
+    counts = (offsets[1:] - offsets[:-1])[pair_polygons]
+    inside = np.zeros(len(pair_polygons), dtype=bool)
+    lo = 0
+    while lo < len(pair_polygons):
+        # 펼친 조합이 max_pairs 를 넘지 않도록 쌍을 나눈다
+        total = np.cumsum(counts[lo:])
+        hi = lo + max(int(np.searchsorted(total, max_pairs, side='right')), 1)
+        pair_counts = counts[lo:hi]
+        pair = np.repeat(np.arange(hi - lo), pair_counts)
+        first = offsets[pair_polygons[lo:hi]]
+        edge = np.repeat(first - (np.cumsum(pair_counts) - pair_counts), pair_counts) + np.arange(pair_counts.sum())
+        lat = np.asarray(latitudes[lo:hi], dtype=np.float64)[pair]
+        lon = np.asarray(longitudes[lo:hi], dtype=np.float64)[pair]
+        crossing = ((y1[edge] > lat) != (y2[edge] > lat)) & (lon < x1[edge] + (lat - y1[edge]) * slope[edge])
+        inside[lo:hi] = np.bincount(pair[crossing], minlength=hi - lo) % 2 == 1
+        lo = hi
+    return inside
+
+
+# GeoJSON geometry 하나의 변 배열 (다각형이 아니면 None)
+def polygon_edges(geometry):
+    edges, _ = collect_edges([geometry])
+    return edges if edges.shape[1] else None
+
+
+# 점들이 다각형 하나(polygon_edges 결과) 안에 있는지 → bool 배열 (점 × 변 을 브로드캐스트, max_pairs 단위로 나눈다)
+def points_in_polygon(latitudes, longitudes, edges):
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    x1, y1, x2, y2 = edges
+    slope = (x2 - x1) / (y2 - y1)
+    inside = np.zeros(len(latitudes), dtype=bool)
+    step = max(max_pairs // max(edges.shape[1], 1), 1)
+    for lo in range(0, len(latitudes), step):
+        lat = latitudes[lo:lo + step, None]
+        lon = longitudes[lo:lo + step, None]
+        crossing = ((y1 > lat) != (y2 > lat)) & (lon < x1 + (lat - y1) * slope)
+        inside[lo:lo + step] = np.count_nonzero(crossing, axis=1) % 2 == 1
+    return inside
+
+
+class AlertGeometryMatcher:
+    def __init__(self, city_coordinates, cell_size=0.5):
+        self.index = build_index(None, city_coordinates, cell_size)
+        self.alerts = 0
+        self.polygons = 0
+        self.candidates = 0
+        self.matched = 0
+        self.seconds = 0.0
+
+    # 색인 위치를 (도시, 주) 로 바꾸는 함수 (색인 이름은 "도시, 주")
+    def places(self, positions):
+        return [tuple(str(self.index.names[position]).rsplit(', ', 1)) for position in positions]
+
+    # geometry 목록마다 안에 있는 도시의 색인 위치 배열 목록을 돌려주는 함수 (다각형이 없으면 빈 배열)
+    def match_many(self, geometries):
+        edges, offsets = collect_edges(geometries)
+        counts = offsets[1:] - offsets[:-1]
+        polygons = np.flatnonzero(counts)
+        empty = np.empty(0, dtype=np.int64)
+        if not len(polygons):
+            return [empty] * len(geometries)
+        # 다각형별 경계 사각형 (변은 다각형 순으로 이어져 있으므로 reduceat 으로 구간별 최소 / 최대)
+        starts = offsets[polygons]
+        lons, lats = np.minimum(edges[0], edges[2]), np.minimum(edges[1], edges[3])
+        min_lons, min_lats = np.minimum.reduceat(lons, starts), np.minimum.reduceat(lats, starts)
+        lons, lats = np.maximum(edges[0], edges[2]), np.maximum(edges[1], edges[3])
+        max_lons, max_lats = np.maximum.reduceat(lons, starts), np.maximum.reduceat(lats, starts)
+        boxes, positions = self.index.query_bboxes(min_lats, min_lons, max_lats, max_lons, kind='city')
+        pair_polygons = polygons[boxes]
+        inside = pairs_in_polygons(self.index.latitudes[positions], self.index.longitudes[positions],
+                                   pair_polygons, edges, offsets)
+        self.polygons += len(polygons)
+        self.candidates += len(positions)
+        self.matched += int(np.count_nonzero(inside))
+        # 쌍은 다각형 순이므로 다각형별 구간으로 나눈다
+        pair_polygons, positions = pair_polygons[inside], positions[inside]
+        bounds = np.searchsorted(pair_polygons, np.arange(len(geometries) + 1))
+        return [positions[bounds[g]:bounds[g + 1]] if counts[g] else empty for g in range(len(geometries))]
+
+    # geometry 하나 안에 있는 도시의 색인 위치 배열
+    def match(self, geometry):
+        return self.match_many([geometry])[0]
+
+    # 경보 feature 목록에서 다각형이 있는 경보마다 걸린 도시를 찾는 함수 → {경보 ID: [(도시, 주), ...]}
+    def match_alerts(self, features):
+        start = time.perf_counter()
+        features = [feature for feature in features if feature.get('geometry')]
+        matches = {}
+        for feature, positions in zip(features, self.match_many([feature['geometry'] for feature in features])):
+            matches[feature['properties']['id']] = self.places(positions)
+        self.alerts += len(features)
+        self.seconds += time.perf_counter() - start
+        return matches
+
+    def report(self):
+        message = (f"Alert geometry: {self.alerts} alerts with geometry, {self.polygons} with polygons, "
+                   f"{self.candidates} candidate cities after the bounding box filter, {self.matched} matched "
+                   f"in {self.seconds * 1000:.1f} ms")
+        print(message)
+        logging.info(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match the polygons of active NWS alerts to cities")
+    parser.add_argument('--region', type=str, default=None,
+                        help="Only the cities of this census region: northeast, midwest, south or west (default: all)")
+    parser.add_argument('--area', type=str, default=None,
+                        help="Comma separated state or marine area codes to request, e.g. TX,OK (default: nationwide)")
+    args = parser.parse_args()
+
+    import city_registry
+    import nws_client
+    try:
+        city_coordinates = city_registry.city_coordinates(region=args.region)
+    except ValueError as e:
+        parser.error(str(e))
+    matcher = AlertGeometryMatcher(city_coordinates)
+    url = f"{nws_client.api_base_url}/alerts/active"
+    if args.area:
+        url += f"?area={args.area.upper()}"
+    features = nws_client.get_json(url).get('features', [])
+    properties = {feature['properties']['id']: feature['properties'] for feature in features}
+    for alert_id, places in matcher.match_alerts(features).items():
+        if not places:
+            continue
+        shown = ', '.join(f"{city.title()}, {state.upper()}" for city, state in places)
+        print(f"{properties[alert_id].get('event')}: {shown}")
+    matcher.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import os
+import json
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from nws_metadata_cache import MetadataCache, extract_point
+from weather_scheduler import IntervalScheduler, interval_seconds, overrun_policies
+import nws_client
+
+# 전국 기상 경보 감시기
+# get_weather_alerts.py 처럼 도시마다 /points 와 /alerts/active?zone= 을 부르면 도시 1,204개에 매번 2,400번 가까이 요청하게 된다.
+# 대신 /alerts/active 를 (전국, 또는 --area 의 주 / 해역 코드로) 한 번만 조건부 요청으로 가져오고,
+# 경보의 UGC 구역 코드(예보 구역 TXZ119, 카운티 TXC113)를 미리 만든 구역 → 도시 색인으로 도시에 연결한다.
+# 색인은 메타데이터 캐시에 저장된 /points 의 forecastZone / county 로 만들므로, 캐시가 살아 있으면 요청 없이 만들어진다.
+# 경보 ID 와 발표 시각을 기억해 두고 (weather_log/alert_state.json) 폴링마다 새 경보, 갱신된 경보, 끝난 경보만 내보낸다.
+# 다각형(geometry)이 있는 경보는 alert_geometry 로 다각형 안의 도시도 찾아 구역으로 찾은 도시에 더한다.
+# 갱신(Update)은 새 ID 로 오면서 references 에 이전 ID 를 적으므로, 이전 ID 를 아는 경보는 새 경보가 아니라 갱신으로 본다.
+
+log_folder = "weather_log"
+
+
+# 구역 URL 또는 코드에서 코드만 뽑는 함수 (예: .../zones/forecast/TXZ119 → TXZ119)
+def zone_code(zone):
+    return zone.rstrip('/').rsplit('/', 1)[-1]
+
+
+# 도시들의 /points (캐시를 거쳐) 로 {구역 코드: [(도시, 주), ...]} 색인을 만드는 함수 → (색인, 실패한 도시 수)
+def build_zone_index(city_coordinates, metadata_cache, workers=16):
+    cities = [(city, state, latitude, longitude) for state, state_cities in city_coordinates.items()
+              for city, (latitude, longitude) in state_cities.items()]
+
+    def resolve(city):
+        city_name, state, latitude, longitude = city
+        try:
+            return metadata_cache.get(f"{nws_client.api_base_url}/points/{latitude},{longitude}", extract_point)
+        except Exception as e:
+            logging.warning(f"Failed to resolve {city_name}, {state}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        points = list(executor.map(resolve, cities))
+    index = {}
+    failed = 0
+    for (city, state, _, _), point in zip(cities, points):
+        if point is None:
+            failed += 1
+            continue
+        for zone in (point.get('forecast_zone'), point.get('county')):
+            if zone:
+                index.setdefault(zone_code(zone), []).append((city, state))
+    return index, failed
+
+
+# 경보 feature 에서 필요한 값만 뽑는 함수
+def extract_alert(feature):
+    properties = feature['properties']
+    zones = (properties.get('geocode') or {}).get('UGC') or [zone_code(zone) for zone in properties.get('affectedZones', [])]
+    return {
+        'id': properties['id'],
+        'event': properties.get('event'),
+        'message_type': properties.get('messageType'),
+        'severity': properties.get('severity'),
+        'urgency': properties.get('urgency'),
+        'headline': properties.get('headline'),
+        'sent': properties.get('sent'),
+        'expires': properties.get('expires'),
+        'ends': properties.get('ends'),
+        'zones': zones,
+        'references': [reference['identifier'] for reference in properties.get('references', [])],
+    }
+
+
+# 경보가 바뀌었는지 비교할 값
+def alert_fingerprint(alert):
+    return alert['sent'], alert['expires'], alert['ends'], alert['severity'], sorted(alert['zones'])
+
+
+class AlertMonitor:
+    def __init__(self, zone_index, path=None, areas=None, geometry_matcher=None):
+        self.zone_index = zone_index
+        self.geometry_matcher = geometry_matcher
+        self.path = path
+        self.areas = sorted(areas) if areas else None
+        self.alerts = {}
+        self.validators = {}
+        self.polls = 0
+        self.not_modified = 0
+        self.new = 0
+        self.updated = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    state = json.load(f)
+                self.alerts = state.get('alerts', {})
+                self.validators = state.get('validators', {})
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable alert state {path}: {e}")
+
+    # 요청할 URL (전국이면 /alerts/active, 지역을 정했으면 ?area=TX,OK,...)
+    def url(self):
+        url = f"{nws_client.api_base_url}/alerts/active"
+        return f"{url}?area={','.join(self.areas)}" if self.areas else url
+
+    # 구역 코드 목록에 걸리는 도시와 다각형 안의 도시 places 를 합친 목록 ("City, STATE" 문자열, 중복 없이)
+    def affected_cities(self, zones, places=()):
+        cities = {(state, city) for zone in zones for city, state in self.zone_index.get(zone, [])}
+        cities.update((state, city) for city, state in places)
+        return [f"{city.title()}, {state.upper()}" for state, city in sorted(cities)]
+
+    # 지금 발효 중인 경보 목록과 기억하는 경보를 비교해 변화(이벤트) 목록을 돌려주고 상태를 바꾸는 함수
+    def diff(self, alerts):
+        current = {}
+        cancelled = set()
+        for alert in alerts:
+            # 취소 메시지는 경보가 아니라 참조한 경보를 끝내는 알림이다
+            if alert['message_type'] == 'Cancel':
+                cancelled.update(alert['references'])
+            else:
+                current[alert['id']] = alert
+        superseded = {reference for alert in current.values() for reference in alert['references']}
+
+        events = []
+        with self._lock:
+            for alert_id, alert in current.items():
+                previous = self.alerts.get(alert_id)
+                if previous is None:
+                    change = 'updated' if any(reference in self.alerts for reference in alert['references']) else 'new'
+                elif alert_fingerprint(previous) != alert_fingerprint(alert):
+                    change = 'updated'
+                else:
+                    continue
+                events.append(self._event(change, alert))
+            for alert_id, previous in self.alerts.items():
+                # 갱신으로 대체된 경보는 끝난 것이 아니다 (위에서 갱신으로 내보냄)
+                if alert_id not in current and (alert_id not in superseded or alert_id in cancelled):
+                    events.append(self._event('expired', previous))
+            self.alerts = current
+            for event in events:
+                setattr(self, event['change'], getattr(self, event['change']) + 1)
+        return events
+
+    def _event(self, change, alert):
+        return {'change': change, 'id': alert['id'], 'event': alert['event'], 'severity': alert['severity'],
+                'urgency': alert['urgency'], 'headline': alert['headline'], 'sent': alert['sent'],
+                'expires': alert['expires'], 'ends': alert['ends'], 'zones': alert['zones'],
+                'cities': self.affected_cities(alert['zones'], alert.get('geometry_cities', ()))}
+
+    # 경보 목록을 한 번 가져와 변화 목록을 돌려주는 함수 (304 면 빈 목록)
+    def poll(self):
+        url = self.url()
+        headers = {}
+        with self._lock:
+            validators = self.validators.get(url) or {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        response = nws_client.get(url, headers=headers)
+        self.polls += 1
+        if response.status_code == 304:
+            self.not_modified += 1
+            return []
+        response.raise_for_status()
+        features = response.json().get('features', [])
+        alerts = [extract_alert(feature) for feature in features]
+        if self.geometry_matcher is not None:
+            geometry_cities = self.geometry_matcher.match_alerts(features)
+            for alert in alerts:
+                alert['geometry_cities'] = geometry_cities.get(alert['id'], [])
+        events = self.diff(alerts)
+        with self._lock:
+            self.validators[url] = {'etag': response.headers.get('ETag'),
+                                    'last_modified': response.headers.get('Last-Modified')}
+        return events
+
+    # 상태를 파일로 저장하는 함수 (임시 파일에 쓴 뒤 교체)
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = json.dumps({'alerts': self.alerts, 'validators': self.validators})
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self.path)
+
+    def report(self):
+        with self._lock:
+            active = len(self.alerts)
+        message = (f"Alerts: {self.polls} polls, {self.not_modified} not modified, {active} active, "
+                   f"{self.new} new, {self.updated} updated, {self.expired} expired")
+        print(message)
+        logging.info(message)
+
+
+# 변화 목록을 JSON lines 파일에 덧붙이는 함수
+def append_events(events, path):
+    if not events:
+        return
+    with open(path, 'a', encoding='utf-8') as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+
+# 감시하는 도시에 걸린 변화만 출력하는 함수 (나머지는 파일에만 남는다)
+def print_events(events):
+    for event in events:
+        cities = event['cities']
+        if not cities:
+            continue
+        shown = ', '.join(cities[:5]) + (f" and {len(cities) - 5} more" if len(cities) > 5 else '')
+        print(f"[{event['change']}] {event['event']} ({event['severity']}): {shown}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor active NWS alerts for all cities with one request per poll")
+    parser.add_argument('--interval', type=int, default=1, help="Interval between polls (default: 1)")
+    parser.add_argument('--unit', type=str, default='minutes', choices=['seconds', 'minutes', 'hours'],
+                        help="Unit for interval (default: minutes)")
+    parser.add_argument('--duration', type=int, default=60, help="Duration in minutes to monitor (default: 60)")
+    parser.add_argument('--overrun', type=str, default='skip', choices=overrun_policies,
+                        help="When a poll runs past the next interval: skip missed runs or coalesce them into one immediate run (default: skip)")
+    parser.add_argument('--region', type=str, default=None,
+                        help="Only the cities of this census region: northeast, midwest, south or west (default: all)")
+    parser.add_argument('--bbox', type=str, default=None,
+                        help="Only the cities inside MIN_LAT,MIN_LON,MAX_LAT,MAX_LON (default: all)")
+    parser.add_argument('--area', type=str, default=None,
+                        help="Comma separated state or marine area codes to request, e.g. TX,OK (default: nationwide, or the areas of the cities of --region/--bbox)")
+    parser.add_argument('--workers', type=int, default=16, help="Concurrent /points requests while building the zone index (default: 16)")
+    parser.add_argument('--rate', type=float, default=nws_client.default_rate,
+                        help="Starting request rate in requests/second, adapted on 429/5xx (default: 5)")
+    parser.add_argument('--metadata-ttl', type=float, default=24,
+                        help="Hours to reuse cached /points metadata before revalidating (default: 24)")
+    args = parser.parse_args()
+
+    import city_registry
+    try:
+        city_coordinates = city_registry.city_coordinates(region=args.region, bbox=city_registry.parse_bbox(args.bbox))
+    except ValueError as e:
+        parser.error(str(e))
+    if not city_coordinates:
+        print("Error: No cities in the selected region or bounding box.")
+        return
+
+    os.makedirs(log_folder, exist_ok=True)
+    logging.basicConfig(filename=os.path.join(log_folder, "alert_monitor.log"), level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    nws_client.configure_rate_limit(rate=args.rate)
+    nws_client.configure_session(pool_size=max(args.workers, nws_client.default_pool_size))
+
+    metadata_cache = MetadataCache(os.path.join(log_folder, "nws_metadata_cache.json"), ttl=args.metadata_ttl * 3600)
+    zone_index, failed = build_zone_index(city_coordinates, metadata_cache, args.workers)
+    metadata_cache.save()
+    print(f"Zone index: {len(zone_index)} zones for {sum(len(c) for c in city_coordinates.values()) - failed} cities"
+          f" ({failed} failed)")
+    metadata_cache.report()
+
+    # UGC 코드의 앞 두 글자가 주 / 해역 코드이므로, 일부 도시만 볼 때는 그 지역만 요청한다
+    if args.area:
+        areas = [area.strip().upper() for area in args.area.split(',') if area.strip()]
+    elif args.region or args.bbox:
+        areas = sorted({zone[:2] for zone in zone_index})
+    else:
+        areas = None
+    from alert_geometry import AlertGeometryMatcher
+    geometry_matcher = AlertGeometryMatcher(city_coordinates)
+    monitor = AlertMonitor(zone_index, os.path.join(log_folder, "alert_state.json"), areas, geometry_matcher)
+    events_path = os.path.join(log_folder, "alert_events.jsonl")
+
+    def poll():
+        events = monitor.poll()
+        append_events(events, events_path)
+        monitor.save()
+        print_events(events)
+        monitor.report()
+        geometry_matcher.report()
+
+    end_time = datetime.now() + timedelta(minutes=args.duration) if args.duration else None
+    print(f"Polling {monitor.url()} every {args.interval} {args.unit}")
+    scheduler = IntervalScheduler(poll, interval_seconds(args.interval, args.unit), end_time=end_time,
+                                  overrun=args.overrun)
+    scheduler.start().join()
+    nws_client.report()
+
+
+if __name__ == "__main__":
+    main()
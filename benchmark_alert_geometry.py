@@ -0,0 +1,116 @@
+import time
+import argparse
+import numpy as np
+import city_registry
+from alert_geometry import AlertGeometryMatcher, polygon_edges, points_in_polygon
+
+# 경보 다각형 안의 도시 찾기 벤치마크
+# 도시 근처에 무작위 별 모양 다각형(일부는 구멍이 있거나 MultiPolygon)을 만들고,
+# 1) 도시 하나 × 다각형 하나씩 파이썬으로 ray casting 하는 방식
+# 2) 모든 도시 × 모든 변을 numpy 로 한 번에 계산하는 방식 (사전 필터 없음)
+# 3) alert_geometry.AlertGeometryMatcher (격자 색인 + bbox 사전 필터 + numpy)
+# 의 전체 경보 한 벌 처리 시간을 비교하고, 세 결과가 같은지 확인한다.
+# 구멍 / MultiPolygon / 닫지 않은 고리 / 날짜변경선 같은 경우는 test_alert_geometry.py 에서 확인한다.
+
+
+# 점 하나가 고리 목록 안에 있는지 (짝홀 규칙) 를 파이썬으로 계산하는 함수 (비교 기준)
+def point_in_rings(latitude, longitude, rings):
+    inside = False
+    for ring in rings:
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+            if (y1 > latitude) != (y2 > latitude) and longitude < x1 + (latitude - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+    return inside
+
+
+def geometry_rings(geometry):
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    return [[tuple(point[:2]) for point in ring] for polygon in polygons for ring in polygon]
+
+
+# 중심 (위도, 경도) 둘레의 별 모양 고리 ([경도, 위도] 닫힌 고리, reverse 면 시계 방향)
+def star_ring(rng, latitude, longitude, radius, vertices, reverse=False):
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    radii = radius * rng.uniform(0.5, 1.0, vertices)
+    ring = [[float(longitude + r * np.cos(a)), float(latitude + r * np.sin(a))] for a, r in zip(angles, radii)]
+    if reverse:
+        ring.reverse()
+    return ring + [ring[0]]
+
+
+# 무작위 경보 geometry 목록 (도시 근처에 만들어 안에 드는 도시가 생기게 한다)
+def synthetic_geometries(latitudes, longitudes, count, vertices, seed=0):
+    rng = np.random.default_rng(seed)
+    geometries = []
+    for i in range(count):
+        center = rng.integers(len(latitudes))
+        latitude = latitudes[center] + rng.uniform(-0.3, 0.3)
+        longitude = longitudes[center] + rng.uniform(-0.3, 0.3)
+        radius = rng.uniform(0.2, 1.5)
+        outer = star_ring(rng, latitude, longitude, radius, vertices)
+        if i % 5 == 1:
+            # 안쪽에 구멍이 있는 다각형
+            geometries.append({'type': 'Polygon', 'coordinates': [
+                outer, star_ring(rng, latitude, longitude, radius * 0.3, max(vertices // 4, 3), reverse=True)]})
+        elif i % 5 == 2:
+            # 떨어진 두 조각으로 된 MultiPolygon
+            second = star_ring(rng, latitude + 2 * radius, longitude + 2 * radius, radius * 0.7, vertices)
+            geometries.append({'type': 'MultiPolygon', 'coordinates': [[outer], [second]]})
+        else:
+            geometries.append({'type': 'Polygon', 'coordinates': [outer]})
+    return geometries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark matching alert polygons to cities")
+    parser.add_argument('--alerts', type=int, default=500, help="Synthetic alert polygons (default: 500)")
+    parser.add_argument('--vertices', type=int, default=40, help="Vertices per outer ring (default: 40)")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per method, the fastest is reported (default: 5)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    city_coordinates = city_registry.city_coordinates()
+    names = [(city, state) for state, cities in city_coordinates.items() for city in cities]
+    latitudes = np.array([lat for cities in city_coordinates.values() for lat, _ in cities.values()])
+    longitudes = np.array([lon for cities in city_coordinates.values() for _, lon in cities.values()])
+    geometries = synthetic_geometries(latitudes, longitudes, args.alerts, args.vertices, args.seed)
+    features = [{'geometry': geometry, 'properties': {'id': str(i)}} for i, geometry in enumerate(geometries)]
+
+    def scalar():
+        return {str(i): {names[c] for c in range(len(names))
+                         if point_in_rings(latitudes[c], longitudes[c], geometry_rings(geometry))}
+                for i, geometry in enumerate(geometries)}
+
+    def vectorized():
+        return {str(i): {names[c] for c in np.flatnonzero(points_in_polygon(latitudes, longitudes, polygon_edges(geometry)))}
+                for i, geometry in enumerate(geometries)}
+
+    matcher = AlertGeometryMatcher(city_coordinates)
+
+    def indexed():
+        return {alert_id: set(places) for alert_id, places in matcher.match_alerts(features).items()}
+
+    timings, results = {}, {}
+    for label, method, repeat in (('scalar, all cities', scalar, 1), ('numpy, all cities', vectorized, args.repeat),
+                                  ('grid + bbox + numpy', indexed, args.repeat)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[label] = method()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[label] = best
+
+    expected = results['scalar, all cities']
+    print(f"\n{len(names)} cities, {args.alerts} alert polygons, {args.vertices} vertices per ring, "
+          f"{sum(len(cities) for cities in expected.values())} city matches")
+    print(f"{'method':<22}{'ms per alert set':>18}{'speedup':>9}  same as scalar")
+    for label, seconds in timings.items():
+        print(f"{label:<22}{seconds * 1000:>18.1f}{timings['scalar, all cities'] / seconds:>8.0f}x  "
+              f"{results[label] == expected}")
+    candidates = matcher.candidates / max(matcher.polygons, 1)
+    print(f"Bounding box filter: {candidates:.1f} candidate cities per polygon instead of {len(names)}")
+
+
+if __name__ == "__main__":
+    main()
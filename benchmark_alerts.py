@@ -0,0 +1,100 @@
+import os
+import time
+import argparse
+import city_registry
+from benchmark_collectors import take_cities
+from nws_mock_server import start_mock_server
+
+# 로컬 NWS 모의 서버를 대상으로 get_weather_alerts.py 처럼 도시마다 /points 와 /alerts/active?zone= 을 부르는 방식과
+# alert_monitor.py 의 방식(구역 → 도시 색인 + 전국 경보 한 번)을 비교하는 벤치마크
+# 색인을 만드는 첫 실행, 메타데이터 캐시가 살아 있는 실행, 그리고 경보가 바뀌는 동안 여러 번 폴링할 때의
+# 요청 수 / 시간 / 새·갱신·만료 이벤트 수를 보고하고, 도시별로 찾은 경보가 도시별 요청 방식의 결과를 모두 포함하는지 확인한다.
+
+
+# 도시마다 /points → /alerts/active?zone= 을 차례로 요청하는 방식 → {(도시, 주, 경보 ID)}
+def run_naive(nws_client, city_coordinates):
+    found = set()
+    for state, cities in city_coordinates.items():
+        for city, (latitude, longitude) in cities.items():
+            point = nws_client.get_json(f"{nws_client.api_base_url}/points/{latitude},{longitude}")
+            zone = point['properties']['forecastZone'].split('/')[-1]
+            alerts = nws_client.get_json(f"{nws_client.api_base_url}/alerts/active?zone={zone}")
+            found.update((city, state, feature['properties']['id']) for feature in alerts['features'])
+    return found
+
+
+def server_requests(server):
+    with server.stats_lock:
+        count = server.request_count
+        server.request_count = 0
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-city alert requests against one bulk request and a zone index")
+    parser.add_argument('--cities', type=int, default=1204, help="Number of cities (default: 1204, all)")
+    parser.add_argument('--alerts', type=int, default=300, help="Alert slots on the mock server (default: 300)")
+    parser.add_argument('--polls', type=int, default=8, help="Monitor polls while the alerts change (default: 8)")
+    parser.add_argument('--alert-period', type=float, default=1.0,
+                        help="Seconds between changes of the mock alert list (default: 1)")
+    parser.add_argument('--latency', type=float, default=0.02, help="Mock server latency per request in seconds (default: 0.02)")
+    args = parser.parse_args()
+
+    # 두 방식을 비교하는 동안은 경보 목록이 바뀌지 않게 한다
+    server = start_mock_server(latency=args.latency, alert_period=3600, alert_count=args.alerts)
+    os.environ['NWS_API_BASE'] = server.base_url
+    import nws_client
+    from nws_metadata_cache import MetadataCache
+    from alert_monitor import AlertMonitor, build_zone_index
+    nws_client.configure_rate_limit(rate=10000)
+    nws_client.configure_session(pool_size=16)
+    cities = take_cities(city_registry.city_coordinates(), args.cities)
+
+    results = []
+    try:
+        start = time.perf_counter()
+        naive = run_naive(nws_client, cities)
+        results.append(('per-city sequential', time.perf_counter() - start, server_requests(server), len(naive), '-'))
+
+        metadata_cache = MetadataCache()
+        for label in ('index, cold cache', 'index, warm cache'):
+            start = time.perf_counter()
+            zone_index, failed = build_zone_index(cities, metadata_cache)
+            monitor = AlertMonitor(zone_index)
+            events = monitor.poll()
+            matched = {(city, state, event['id']) for event in events
+                       for zone in event['zones'] for city, state in zone_index.get(zone, [])}
+            results.append((label, time.perf_counter() - start, server_requests(server), len(matched),
+                            f"{len(events)} new"))
+
+        # 이제 경보가 --alert-period 마다 바뀌게 하고, 새 목록으로 한 번 맞춘 뒤 주기의 절반마다 폴링한다 (절반은 304)
+        server.alert_period = args.alert_period
+        time.sleep(args.alert_period - time.time() % args.alert_period)
+        monitor.poll()
+        server_requests(server)
+        changes = {'new': 0, 'updated': 0, 'expired': 0}
+        start = time.perf_counter()
+        for _ in range(args.polls):
+            time.sleep(args.alert_period / 2)
+            for event in monitor.poll():
+                changes[event['change']] += 1
+        polling = time.perf_counter() - start - args.polls * args.alert_period / 2
+        results.append((f"{args.polls} polls", polling, server_requests(server), '-',
+                        ', '.join(f"{count} {change}" for change, count in changes.items()) +
+                        f" ({len(monitor.alerts)} active)"))
+    finally:
+        server.shutdown()
+
+    print(f"\n{sum(len(c) for c in cities.values())} cities, {len(zone_index)} zones in the index, "
+          f"{args.latency * 1000:.0f} ms mock latency")
+    print(f"{'mode':<22}{'seconds':>9}{'requests':>10}{'matches':>9}  events")
+    for label, seconds, requests, matches, events in results:
+        print(f"{label:<22}{seconds:>9.2f}{requests:>10}{matches:>9}  {events}")
+    missing = naive - matched
+    print(f"City/alert pairs found per city but not by the index: {len(missing)} "
+          f"(the index also matches county-based alerts: {len(matched - naive)} more)")
+    monitor.report()
+
+
+if __name__ == "__main__":
+    main()
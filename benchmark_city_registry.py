@@ -0,0 +1,86 @@
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# 도시 좌표를 JSON 으로 읽는 방식과 컴파일된 레지스트리(city_registry.py)를 메모리 매핑으로 여는 방식의
+# 읽기 시간과 메모리를 비교하는 벤치마크. 매번 새 인터프리터에서 실행해 캐시의 영향을 없앤다.
+# 수집기는 numpy / pyarrow 를 이미 import 하므로, 그 상태("in collector")와 아무것도 없는 상태("standalone")를 따로 잰다.
+
+# 각 방식이 하는 일: 도시 목록을 읽고 "dallas,texas" 를 한 번 찾는다
+loaders = {
+    'json': """
+import json
+with open('city_coordinates.json', 'r') as f:
+    city_coordinates = json.load(f)
+found = city_coordinates['texas']['dallas']
+""",
+    'registry': """
+import city_registry
+found = city_registry.load().lookup('dallas', 'texas')
+""",
+    # 전체 도시 수집기처럼 {주: {도시: 좌표}} dict 까지 만드는 경우
+    'registry + dict': """
+import city_registry
+city_coordinates = city_registry.city_coordinates()
+found = city_coordinates['texas']['dallas']
+""",
+}
+
+# 방식을 실행하고 (걸린 ms, 늘어난 RSS KB, 끝난 뒤에도 남아 있는 Python 객체 KB) 를 출력하는 자식 프로세스 코드
+# tracemalloc 은 할당마다 비용이 들어 시간을 부풀리므로, 시간은 trace 없이 재고 객체 크기는 따로 한 번 잰다
+child_template = """
+import time, tracemalloc
+{preload}
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+rss_before = rss_kb()
+if {trace}:
+    tracemalloc.start()
+namespace = {{}}
+start = time.perf_counter()
+exec(compile({code!r}, 'loader', 'exec'), namespace)
+seconds = time.perf_counter() - start
+retained = tracemalloc.get_traced_memory()[0] if {trace} else 0
+# json 은 JSON 방식이 직접 import 해야 하므로 잰 뒤에 import 한다
+import json
+print(json.dumps([seconds * 1000, rss_kb() - rss_before, retained / 1024]))
+"""
+
+
+def run_child(code, preload, trace):
+    child = child_template.format(preload=preload, code=code, trace=trace)
+    output = subprocess.run([sys.executable, '-c', child], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# (중앙값 ms, 중앙값 RSS 증가 KB, 남은 객체 KB)
+def measure(code, preload, repeat):
+    results = [run_child(code, preload, False) for _ in range(repeat)]
+    milliseconds, rss_kb = (statistics.median(values) for values in list(zip(*results))[:2])
+    return milliseconds, rss_kb, run_child(code, preload, True)[2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading city coordinates from JSON and from the compiled registry")
+    parser.add_argument('--repeat', type=int, default=15, help="Fresh interpreter runs per case (default: 15)")
+    args = parser.parse_args()
+
+    # 컴파일된 파일이 없으면 먼저 만든다 (컴파일 비용은 처음 한 번만)
+    import city_registry
+    city_registry.load()
+
+    contexts = [('standalone', ''), ('in collector', 'import numpy, pyarrow')]
+    print(f"{'context':<14}{'loader':<18}{'ms':>8}{'RSS KB':>10}{'objects KB':>12}")
+    for label, preload in contexts:
+        for name, code in loaders.items():
+            milliseconds, rss_kb, retained_kb = measure(code, preload, args.repeat)
+            print(f"{label:<14}{name:<18}{milliseconds:>8.2f}{rss_kb:>10.0f}{retained_kb:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import time
+import argparse
+from itertools import islice
+import city_registry
+from nws_mock_server import start_mock_server
+
+# 로컬 NWS 모의 서버를 대상으로 순차 / 쓰레드 / 비동기 수집기의 수집 시간을 비교하는 벤치마크
+
+
+# 도시 목록에서 앞의 n개 도시만 골라내는 함수
+def take_cities(city_coordinates, limit):
+    selected = {}
+    remaining = limit
+    for state, cities in city_coordinates.items():
+        if remaining <= 0:
+            break
+        chosen = dict(islice(cities.items(), remaining))
+        selected[state] = chosen
+        remaining -= len(chosen)
+    return selected
+
+
+# weather_data_collector_all_city.py 의 순차 수집 방식
+def run_sequential(collector, cities):
+    collector.run_sweep(cities)
+
+
+# weather_data_collector_all_city_thread.py 의 주별 쓰레드 방식 (요청 간 지연 없음)
+def run_threaded(collector, cities):
+    # 모드마다 같은 양을 파싱하도록 이전 모드가 남긴 관측 상태를 비운다 (304 로 건너뛰지 않게)
+    collector.observation_tracker.entries.clear()
+    rows_before = collector.weather_buffer.rows_added
+    collector.run_thread_sweep(cities, 0)
+    collector.weather_buffer.flush()
+    return collector.weather_buffer.rows_added - rows_before
+
+
+# 주별 쓰레드가 응답 bytes 만 가져오고 파싱/파생은 프로세스 풀에서 하는 방식
+def run_pipeline(collector, cities, processes):
+    pipeline = collector.start_parse_pipeline(processes=processes)
+    try:
+        return run_threaded(collector, cities)
+    finally:
+        pipeline.close()
+        collector.parse_pipeline = None
+
+
+# asyncio 엔진 방식
+def run_async(cities, base_url, max_concurrency, per_host_limit):
+    from weather_async_engine import run_async_sweep
+    rows = run_async_sweep(cities, api_base_url=base_url, max_concurrency=max_concurrency,
+                           per_host_limit=per_host_limit)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark weather collectors against a local mock NWS server")
+    parser.add_argument('--cities', type=int, default=200, help="Number of cities to sweep (default: 200)")
+    parser.add_argument('--latency', type=float, default=0.02, help="Mock server latency per request in seconds (default: 0.02)")
+    parser.add_argument('--concurrency', type=int, default=32, help="Async engine global concurrency (default: 32)")
+    parser.add_argument('--per-host', type=int, default=16, help="Async engine per-host connection limit (default: 16)")
+    parser.add_argument('--rate', type=float, default=10000,
+                        help="Client request rate limit in requests/second (default: 10000, effectively unlimited)")
+    parser.add_argument('--parse-workers', type=int, default=None,
+                        help="Parse processes for the pipeline mode (default: CPU count)")
+    parser.add_argument('--modes', type=str, default='sequential,thread,pipeline,async',
+                        help="Comma separated modes to run (default: sequential,thread,pipeline,async)")
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency)
+    # 수집기 모듈은 import 시점에 API 주소를 읽으므로 먼저 환경 변수를 설정한다
+    os.environ['NWS_API_BASE'] = server.base_url
+
+    import nws_client
+    import weather_data_collector_all_city_thread as thread_collector
+    # 수집기는 import 만으로는 저장소 / 버퍼 / 캐시를 만들지 않으므로 먼저 준비한다
+    thread_collector.setup()
+    nws_client.configure_rate_limit(rate=args.rate)
+    cities = take_cities(city_registry.city_coordinates(), args.cities)
+
+    results = []
+    for mode in args.modes.split(','):
+        server.request_count = 0
+        start = time.perf_counter()
+        if mode == 'sequential':
+            import weather_data_collector_all_city as sequential_collector
+            sequential_collector.setup()
+            run_sequential(sequential_collector, cities)
+        elif mode == 'thread':
+            run_threaded(thread_collector, cities)
+        elif mode == 'pipeline':
+            run_pipeline(thread_collector, cities, args.parse_workers)
+        elif mode == 'async':
+            run_async(cities, server.base_url, args.concurrency, args.per_host)
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+        elapsed = time.perf_counter() - start
+        results.append((mode, elapsed, server.request_count))
+
+    print(f"\n{args.cities} cities, {args.latency * 1000:.0f} ms mock latency")
+    print(f"{'mode':<12}{'seconds':>10}{'requests':>10}{'req/s':>10}")
+    for mode, elapsed, requests_made in results:
+        print(f"{mode:<12}{elapsed:>10.2f}{requests_made:>10}{requests_made / elapsed:>10.1f}")
+
+    nws_client.report()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import time
+import argparse
+import numpy as np
+import pyarrow as pa
+import weather_derive
+from weather_observation import fahrenheit_to_celsius, calculate_heat_index, calculate_dew_point
+
+# 파생 지표 계산 마이크로벤치마크
+# 수백만 행에서 기존 스칼라 함수와 배열 계산의 속도를 비교한다 (값이 같은지는 test_weather_derive.py 에서 확인한다)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized derived weather metrics")
+    parser.add_argument('--rows', type=int, default=2_000_000, help="Rows for the vectorized run (default: 2000000)")
+    parser.add_argument('--scalar-rows', type=int, default=200_000,
+                        help="Rows for the scalar loop, extrapolated to --rows (default: 200000)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    t_f = rng.uniform(-20, 115, args.rows)
+    h = rng.uniform(0, 100, args.rows)
+    v_mph = rng.uniform(0, 40, args.rows)
+
+    n = min(args.scalar_rows, args.rows)
+    start = time.perf_counter()
+    for a, b in zip(t_f[:n].tolist(), h[:n].tolist()):
+        t_c = fahrenheit_to_celsius(a)
+        apparent = calculate_heat_index(a, b)
+        fahrenheit_to_celsius(apparent)
+        calculate_dew_point(t_c, b)
+    scalar_seconds = (time.perf_counter() - start) * args.rows / n
+
+    start = time.perf_counter()
+    t_c = weather_derive.fahrenheit_to_celsius(t_f)
+    apparent = weather_derive.apparent_temperature(t_f, h, v_mph)
+    weather_derive.fahrenheit_to_celsius(apparent)
+    weather_derive.dew_point(t_c, h)
+    vector_seconds = time.perf_counter() - start
+
+    # Arrow 배치 경로 (null 마스크 포함)
+    temperature = pa.array(weather_derive.fahrenheit_to_celsius(t_f).astype(np.float32))
+    humidity = pa.array(h.astype(np.float32), mask=rng.random(args.rows) < 0.05)
+    wind = pa.array((v_mph * weather_derive.kmh_per_mph).astype(np.float32))
+    batch = pa.RecordBatch.from_arrays([temperature, humidity, wind, pa.nulls(args.rows, pa.float32()),
+                                        pa.nulls(args.rows, pa.float32()), pa.nulls(args.rows, pa.float32()),
+                                        pa.nulls(args.rows, pa.float32())],
+                                       names=['temperature_celsius', 'humidity', 'wind_speed', 'temperature_fahrenheit',
+                                              'apparent_temperature_fahrenheit', 'apparent_temperature_celsius',
+                                              'dew_point'])
+    start = time.perf_counter()
+    weather_derive.derive_batch(batch)
+    batch_seconds = time.perf_counter() - start
+
+    print(f"{args.rows} rows")
+    print(f"scalar loop (extrapolated): {scalar_seconds:8.3f} s")
+    print(f"numpy arrays:               {vector_seconds:8.3f} s ({scalar_seconds / vector_seconds:.0f}x)")
+    print(f"arrow batch with nulls:     {batch_seconds:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import time
+import argparse
+import city_registry
+from benchmark_collectors import take_cities
+from nws_mock_server import start_mock_server
+
+# 로컬 NWS 모의 서버를 대상으로 도시마다 /points 와 forecast 를 차례로 요청하는 방식과
+# forecast_collector.py 의 방식(격자별로 한 번, 쓰레드 풀로 동시에, 캐시 사용)을 비교하는 벤치마크
+# 두 번째 실행(캐시가 살아 있는 상태)과 캐시가 만료되어 조건부 요청(304)으로 재검증하는 실행도 잰다.
+
+
+# 도시마다 /points → forecast 를 순서대로 요청하는 방식 → (행 수, 실패 수)
+def run_naive(nws_client, city_coordinates):
+    from forecast_collector import extract_forecast
+    rows = failed = 0
+    for state, cities in city_coordinates.items():
+        for city, (latitude, longitude) in cities.items():
+            try:
+                point = nws_client.get_json(f"{nws_client.api_base_url}/points/{latitude},{longitude}")
+                forecast = extract_forecast(nws_client.get_json(point['properties']['forecast']))
+                rows += len(forecast['periods']['period'])
+            except Exception:
+                failed += 1
+    return rows, failed
+
+
+def server_requests(server):
+    with server.stats_lock:
+        count = server.request_count
+        server.request_count = 0
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-city forecast requests against grid-cell grouping and caching")
+    parser.add_argument('--cities', type=int, default=400, help="Number of cities (default: 400)")
+    parser.add_argument('--workers', type=int, default=16, help="Concurrent requests of the grouped collector (default: 16)")
+    parser.add_argument('--latency', type=float, default=0.02, help="Mock server latency per request in seconds (default: 0.02)")
+    parser.add_argument('--recordings', type=str, default='nws_recordings_sample.json',
+                        help="Recorded responses to replay, empty for synthetic payloads (default: nws_recordings_sample.json)")
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, recordings=args.recordings or None)
+    os.environ['NWS_API_BASE'] = server.base_url
+    import nws_client
+    from nws_metadata_cache import MetadataCache
+    from forecast_collector import ForecastCollector
+    nws_client.configure_rate_limit(rate=10000)
+    nws_client.configure_session(pool_size=max(args.workers, nws_client.default_pool_size))
+    cities = take_cities(city_registry.city_coordinates(), args.cities)
+
+    results = []
+    try:
+        start = time.perf_counter()
+        rows, failed = run_naive(nws_client, cities)
+        results.append(('per-city sequential', time.perf_counter() - start, server_requests(server), rows, failed))
+
+        collector = ForecastCollector(MetadataCache(), MetadataCache(ttl=3600, honor_expires=True), workers=args.workers)
+        for label in ('grouped, cold cache', 'grouped, warm cache', 'grouped, revalidated'):
+            if label == 'grouped, revalidated':
+                # 예보가 모두 만료된 상태를 만든다 (다음 실행은 조건부 요청)
+                for entry in collector.forecast_cache.entries.values():
+                    entry['expires'] = 1
+            failed_before = collector.failed_cities + collector.failed_cells
+            start = time.perf_counter()
+            table = collector.collect(cities)
+            results.append((label, time.perf_counter() - start, server_requests(server), table.num_rows,
+                            collector.failed_cities + collector.failed_cells - failed_before))
+    finally:
+        server.shutdown()
+
+    print(f"\n{args.cities} cities, {collector.cells // 3} grid cells, {args.latency * 1000:.0f} ms mock latency")
+    print(f"{'mode':<24}{'seconds':>9}{'requests':>10}{'rows':>8}{'failed':>8}")
+    for label, seconds, requests, rows, failed in results:
+        print(f"{label:<24}{seconds:>9.2f}{requests:>10}{rows:>8}{failed:>8}")
+    collector.report()
+
+
+if __name__ == "__main__":
+    main()
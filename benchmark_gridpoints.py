@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from nws_mock_server import _gridpoint_payload
+from gridpoint_ingest import (default_layers, accumulated_layers, parse_duration, extract_layers, expand_hourly,
+                              gridpoint_table, write_gridpoints, read_gridpoints, column_name)
+
+# /gridpoints 응답 수천 개를 시간별 배열로 펼치는 비용을 재는 벤치마크
+# 모의 서버와 같은 응답 JSON 을 미리 만들어 두고 (HTTP 없이), validTime 을 값마다 datetime.fromisoformat 으로 해석해
+# 시간마다 채우는 방식과 gridpoint_ingest.expand_hourly 를 비교하고 두 결과가 같은지 확인한다.
+# 펼친 배열을 Parquet 으로 저장한 크기 / 다시 읽는 시간도 JSON 크기와 함께 보고한다.
+
+
+# 값마다 해석하고 한 시간씩 채우는 방식
+def expand_naive(cells, layers, first_hour, hours):
+    grid = np.full((len(layers), len(cells), hours), np.nan, dtype=np.float32)
+    for c, cell in enumerate(cells):
+        for k, name in enumerate(layers):
+            layer = cell['layers'].get(name)
+            if layer is None:
+                continue
+            for valid_time, value in zip(layer[1], layer[2]):
+                start, duration = valid_time.split('/')
+                start_seconds = datetime.fromisoformat(start).timestamp()
+                start_hour = int(start_seconds // 3600)
+                length = max(-int((start_seconds + parse_duration(duration)) // -3600) - start_hour, 1)
+                if value is not None and name in accumulated_layers:
+                    value = value / length
+                for hour in range(start_hour - first_hour, start_hour - first_hour + length):
+                    if 0 <= hour < hours:
+                        grid[k, c, hour] = np.nan if value is None else value
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark expanding NWS gridpoint validTime intervals into hourly arrays")
+    parser.add_argument('--cells', type=int, default=3000, help="Number of grid cells (default: 3000)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per method, the fastest is reported (default: 3)")
+    args = parser.parse_args()
+
+    # 발표 시각이 한두 시간씩 다른 격자를 섞어, 공통 축에 맞추는 경우도 확인한다
+    issued = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    bodies = [json.dumps(_gridpoint_payload('http://mock', 'MCK', c % 200, c // 200, issued - timedelta(hours=c % 3)))
+              for c in range(args.cells)]
+    json_bytes = sum(len(body) for body in bodies)
+
+    start = time.perf_counter()
+    cells = [extract_layers(json.loads(body)) for body in bodies]
+    decode_seconds = time.perf_counter() - start
+    values = sum(len(layer[1]) for cell in cells for layer in cell['layers'].values())
+
+    timings = {}
+    for name in ('naive', 'vectorized'):
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            if name == 'naive':
+                first_hour = int((issued - timedelta(hours=2)).timestamp() // 3600)
+                naive = expand_naive(cells, default_layers, first_hour, 182)
+            else:
+                times, arrays, units = expand_hourly(cells)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+
+    vectorized = np.stack([arrays[name] for name in default_layers])
+    same = vectorized.shape == naive.shape and np.array_equal(vectorized, naive, equal_nan=True)
+
+    folder = tempfile.mkdtemp(prefix='nws_gridpoints_')
+    try:
+        cell_keys = [('MCK', c % 200, c // 200) for c in range(args.cells)]
+        start = time.perf_counter()
+        path = write_gridpoints(gridpoint_table(cell_keys, times, arrays, units), folder, issued)
+        write_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        read_keys, read_times, read_arrays = read_gridpoints(path)
+        read_seconds = time.perf_counter() - start
+        stored_bytes = os.path.getsize(path)
+        round_trip = (read_keys == cell_keys and np.array_equal(read_times, times) and
+                      all(np.array_equal(read_arrays[column_name(name)], arrays[name], equal_nan=True)
+                          for name in default_layers))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    print(f"\n{args.cells} grid cells, {len(default_layers)} layers, {values} validTime values, "
+          f"{len(times)} hours ({args.cells * len(times)} rows)")
+    print(f"JSON decode + extract  {decode_seconds:8.2f}s")
+    print(f"expand, naive          {timings['naive']:8.2f}s")
+    print(f"expand, vectorized     {timings['vectorized']:8.2f}s  ({timings['naive'] / timings['vectorized']:.0f}x)")
+    print(f"results identical      {same}")
+    print(f"Parquet write / read   {write_seconds:8.2f}s / {read_seconds:.2f}s, round trip identical: {round_trip}")
+    print(f"size                   {json_bytes / 1e6:8.1f} MB JSON -> {stored_bytes / 1e6:.1f} MB Parquet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import compileall
+
+# 수집기 모듈의 import 비용을 재는 벤치마크
+# 모듈마다 새 인터프리터에서 `python -X importtime -c "import 모듈"` 을 실행해 누적 import 시간과
+# 가장 무거운 직접 import 들을 보고, `python 모듈.py --help` 의 전체 실행 시간도 잰다.
+# import 후에 무거운 패키지(pyarrow, pandas, numpy, requests, art, asyncio)가 올라왔는지,
+# 작업 폴더에 파일(weather_log 등)이 생겼는지도 확인한다.
+# --baseline 을 주면 그 git 리비전의 트리를 임시 폴더에 풀어 같은 측정을 하고 나란히 비교한다.
+
+default_modules = ('weather_data_collector_all_city_thread', 'weather_data_collector_all_city', 'weather_data_collector')
+
+heavy_modules = ('pyarrow', 'pandas', 'numpy', 'requests', 'art', 'asyncio')
+
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+# -X importtime 출력에서 (모듈의 누적 ms, [(직접 import 이름, 누적 ms), ...]) 를 뽑는 함수
+# 출력은 "import time: self [us] | cumulative | 이름" 형식이고, 이름 앞 들여쓰기 두 칸이 한 단계 깊이다
+def parse_importtime(stderr, module):
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == module:
+                return int(cumulative) / 1000, sorted(children, key=lambda child: -child[1])
+            children = []
+        elif depth == 1:
+            children.append((name, int(cumulative) / 1000))
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+
+def folder_entries(path):
+    return set(os.listdir(path))
+
+
+# 한 모듈을 repeat 번 재는 함수 → (import 중앙값 ms, --help 중앙값 ms, 무거운 직접 import, 올라온 무거운 패키지, 새로 생긴 파일)
+def measure(tree, module, repeat):
+    env = dict(os.environ, PYTHONPATH=tree)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    probe = (f"import {module}, sys; "
+             f"print(','.join(name for name in {heavy_modules!r} if name in sys.modules))")
+    import_ms, help_ms = [], []
+    children, loaded, created = [], '', set()
+    # 모듈이 import 시점에 만드는 파일을 볼 수 있도록 빈 임시 폴더에서 실행한다
+    workdir = tempfile.mkdtemp(prefix='nws_import_')
+    try:
+        for _ in range(repeat):
+            before = folder_entries(workdir)
+            result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], cwd=workdir, env=env,
+                                    capture_output=True, text=True, check=True)
+            created |= folder_entries(workdir) - before
+            milliseconds, children = parse_importtime(result.stderr, module)
+            import_ms.append(milliseconds)
+            # 예전 수집기는 import 만으로 종료 핸들러를 등록해 출력이 뒤따르므로 첫 줄만 읽는다
+            loaded = result.stdout.split('\n', 1)[0]
+
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(tree, f"{module}.py"), '--help'], cwd=workdir, env=env,
+                           capture_output=True, check=True)
+            help_ms.append((time.perf_counter() - start) * 1000)
+            created |= folder_entries(workdir) - before
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return statistics.median(import_ms), statistics.median(help_ms), children, loaded, sorted(created)
+
+
+# git 리비전의 트리를 임시 폴더에 푸는 함수
+def export_revision(revision):
+    tree = tempfile.mkdtemp(prefix='nws_import_baseline_')
+    archive = subprocess.run(['git', 'archive', revision], cwd=package_dir, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', tree], input=archive, check=True)
+    return tree
+
+
+def report(label, tree, modules, repeat, top):
+    # .pyc 가 없거나 오래되면 매번 소스를 컴파일하는 시간까지 재게 되므로 먼저 컴파일해 둔다
+    compileall.compile_dir(tree, maxlevels=0, quiet=1)
+    results = {}
+    print(f"\n{label}")
+    print(f"{'module':<42}{'import ms':>10}{'--help ms':>11}  heavy modules loaded / files created")
+    for module in modules:
+        import_ms, help_ms, children, loaded, created = measure(tree, module, repeat)
+        results[module] = (import_ms, help_ms)
+        print(f"{module:<42}{import_ms:>10.1f}{help_ms:>11.1f}  {loaded or '-'} / {', '.join(created) or '-'}")
+        for name, milliseconds in children[:top]:
+            print(f"    {name:<38}{milliseconds:>10.1f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time and side effects of the collector modules")
+    parser.add_argument('--modules', type=str, default=','.join(default_modules),
+                        help="Comma separated modules to measure (default: the three collectors)")
+    parser.add_argument('--repeat', type=int, default=7, help="Fresh interpreter runs per module (default: 7)")
+    parser.add_argument('--top', type=int, default=5, help="Heaviest direct imports to list per module (default: 5)")
+    parser.add_argument('--baseline', type=str, default=None,
+                        help="Git revision to measure as well, e.g. HEAD~1 (default: none)")
+    args = parser.parse_args()
+
+    modules = args.modules.split(',')
+    current = report('Working tree', package_dir, modules, args.repeat, args.top)
+    if not args.baseline:
+        return
+
+    tree = export_revision(args.baseline)
+    try:
+        baseline = report(f"Baseline {args.baseline}", tree, modules, args.repeat, args.top)
+    finally:
+        shutil.rmtree(tree, ignore_errors=True)
+    print(f"\n{'module':<42}{'import':>14}{'--help':>14}")
+    for module in modules:
+        (import_ms, help_ms), (old_import_ms, old_help_ms) = current[module], baseline[module]
+        print(f"{module:<42}{old_import_ms / import_ms:>13.1f}x{old_help_ms / help_ms:>13.1f}x")
+
+
+if __name__ == "__main__":
+    main()
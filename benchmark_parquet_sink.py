@@ -0,0 +1,84 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+from parquet_sink import PartitionedParquetSink
+
+# 기존 방식(전체 파일 읽기 → 합치기 → 다시 쓰기)과 추가 전용 저장소의 배치당 쓰기 비용을 비교하는 벤치마크
+# 누적 데이터가 늘어나도 PartitionedParquetSink 의 배치당 비용은 일정해야 한다
+
+states = ['TEXAS', 'CALIFORNIA', 'FLORIDA', 'NEW_YORK', 'ILLINOIS']
+
+
+# 수집기 행과 같은 형식의 가짜 행을 만드는 함수
+def make_rows(batch_index, batch_size):
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    for i in range(batch_size):
+        value = float((batch_index * batch_size + i) % 40)
+        rows.append({
+            'timestamp': timestamp,
+            'city': f"City {i % 200}",
+            'state': states[i % len(states)],
+            'station': f"Station {i % 500}",
+            'location': [-96.0 - i % 10, 32.0 + i % 10],
+            'temperature_celsius': value,
+            'temperature_fahrenheit': value * 9.0 / 5.0 + 32,
+            'apparent_temperature_celsius': value,
+            'apparent_temperature_fahrenheit': value * 9.0 / 5.0 + 32,
+            'humidity': 50.0,
+            'wind_speed': 10.0,
+            'wind_direction': 180.0,
+            'precipitation': float('nan'),
+            'dew_point': value - 10.0,
+            'weather': 'Clear',
+        })
+    return rows
+
+
+# 기존 수집기의 read-concat-rewrite 방식
+def rewrite_append(filename, rows):
+    table = pa.Table.from_pylist(rows)
+    if os.path.exists(filename):
+        old_data = pq.read_table(filename)
+        table = pa.concat_tables([old_data, table])
+    pq.write_table(table, filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-batch parquet write cost as history grows")
+    parser.add_argument('--batches', type=int, default=200, help="Number of batches to write (default: 200)")
+    parser.add_argument('--batch-size', type=int, default=2000, help="Rows per batch (default: 2000)")
+    parser.add_argument('--report-every', type=int, default=20, help="Print timings every N batches (default: 20)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='parquet_sink_bench_')
+    try:
+        sink = PartitionedParquetSink(os.path.join(workdir, 'dataset'), prefix='bench')
+        rewrite_filename = os.path.join(workdir, 'rewrite.parquet')
+
+        print(f"{'batch':>8}{'rows so far':>14}{'rewrite ms':>14}{'sink ms':>12}")
+        for batch_index in range(1, args.batches + 1):
+            rows = make_rows(batch_index, args.batch_size)
+
+            start = time.perf_counter()
+            rewrite_append(rewrite_filename, rows)
+            rewrite_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            sink.write_rows(rows)
+            sink_ms = (time.perf_counter() - start) * 1000
+
+            if batch_index % args.report_every == 0 or batch_index == 1:
+                print(f"{batch_index:>8}{batch_index * args.batch_size:>14}{rewrite_ms:>14.1f}{sink_ms:>12.1f}")
+        sink.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
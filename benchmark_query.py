@@ -0,0 +1,160 @@
+import os
+import glob
+import time
+import shutil
+import resource
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime, timedelta
+import numpy as np
+import pyarrow as pa
+import city_registry
+from parquet_sink import PartitionedParquetSink
+from weather_schema import observation_schema
+
+# 수집기 출력과 같은 스키마의 합성 데이터셋을 만들고, "주별 시간별 최고/최저/평균 기온" 같은 질의를
+# pandas 로 파일 전체를 읽는 방식과 weather_query.py (필터/열 pushdown + 스트리밍 집계) 로 비교하는 벤치마크
+# 각 방식은 별도 프로세스에서 실행해 최대 메모리(RSS)를 따로 잰다
+
+
+# 관측소 수 x 시간 수 만큼의 행을 시간 단위 배치로 데이터셋에 쓰는 함수
+# on_table 을 주면 저장한 배치마다 호출한다 (수집기의 저장 경로처럼 집계를 함께 갱신할 때 사용)
+def write_synthetic_dataset(root, stations, hours, seed, on_table=None):
+    rng = np.random.default_rng(seed)
+    cities = [(city.replace('_', ' ').title(), state.upper(), lat, lon)
+              for city, state, lat, lon in city_registry.load().rows()]
+    picks = [cities[i % len(cities)] for i in range(stations)]
+    city_names = pa.array([city for city, _, _, _ in picks]).dictionary_encode()
+    state_names = pa.array([state for _, state, _, _ in picks]).dictionary_encode()
+    station_names = pa.array([f"Station {i:06d}" for i in range(stations)]).dictionary_encode()
+    locations = pa.array([[lon, lat] for _, _, lat, lon in picks], pa.list_(pa.float64()))
+    weather = pa.array(rng.choice(['Clear', 'Cloudy', 'Rain', 'Fog', 'Snow'], stations)).dictionary_encode()
+    base_temperature = rng.normal(15, 10, stations)
+
+    sink = PartitionedParquetSink(root, prefix='benchmark', schema=observation_schema)
+    start = datetime(2024, 1, 1)
+    for hour in range(hours):
+        timestamp = start + timedelta(hours=hour)
+        temperature = (base_temperature + 8 * np.sin((hour % 24) / 24 * 2 * np.pi)
+                       + rng.normal(0, 1.5, stations)).astype(np.float32)
+        columns = {
+            'timestamp': pa.array(np.full(stations, np.datetime64(timestamp, 's'))),
+            'city': city_names,
+            'state': state_names,
+            'station': station_names,
+            'location': locations,
+            'temperature_celsius': temperature,
+            'temperature_fahrenheit': temperature * 9 / 5 + 32,
+            'apparent_temperature_celsius': temperature - 1,
+            'apparent_temperature_fahrenheit': (temperature - 1) * 9 / 5 + 32,
+            'humidity': rng.uniform(10, 100, stations).astype(np.float32),
+            'wind_speed': rng.uniform(0, 40, stations).astype(np.float32),
+            'wind_direction': rng.uniform(0, 360, stations).astype(np.float32),
+            'precipitation': rng.exponential(0.5, stations).astype(np.float32),
+            'dew_point': (temperature - rng.uniform(0, 10, stations)).astype(np.float32),
+            'weather': weather,
+            'observation_time': pa.array(np.full(stations, np.datetime64(timestamp, 's'))).cast(
+                pa.timestamp('s', tz='UTC')),
+        }
+        table = pa.table(columns, schema=observation_schema)
+        sink.write_table(table)
+        if on_table is not None:
+            on_table(table)
+    sink.close()
+
+
+def dataset_bytes(root):
+    return sum(os.path.getsize(path) for path in glob.glob(os.path.join(root, '**', '*.parquet'), recursive=True))
+
+
+# pandas 방식: 모든 파일을 통째로 읽어 합친 뒤 필터 / groupby
+def pandas_query(root, state, start, end):
+    import pandas as pd
+    frames = []
+    for path in sorted(glob.glob(os.path.join(root, '**', '*.parquet'), recursive=True)):
+        frame = pd.read_parquet(path)
+        # 파티션 열은 파일에 없으므로 경로에서 붙인다
+        frame['state'] = path.split('state=')[1].split(os.sep)[0]
+        frames.append(frame)
+    data = pd.concat(frames, ignore_index=True)
+    if state:
+        data = data[data['state'] == state]
+    if start:
+        data = data[(data['timestamp'] >= start) & (data['timestamp'] < end)]
+    data = data.assign(bucket=data['timestamp'].dt.floor('h'))
+    result = data.groupby(['state', 'bucket'])['temperature_celsius'].agg(['min', 'max', 'mean', 'count'])
+    return len(result), float(result['max'].max())
+
+
+# 질의 모듈 방식: 파티션 / row group 가지치기 + 필요한 열만 읽어 배치별 부분 집계
+def pushdown_query(root, state, start, end):
+    from weather_query import aggregate
+    result = aggregate(root, values=['temperature_celsius'], keys=['state'], bucket='1h',
+                       start=start, end=end, states=state)
+    return result.num_rows, float(max(result['temperature_celsius_max'].to_pylist()))
+
+
+# 이 프로세스의 최대 RSS (MB). ru_maxrss 는 부모 프로세스의 값을 물려받을 수 있어 리눅스에서는 VmHWM 을 쓴다
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(queue, name, root, state, start, end):
+    started = time.perf_counter()
+    groups, hottest = (pandas_query if name == 'pandas' else pushdown_query)(root, state, start, end)
+    seconds = time.perf_counter() - started
+    queue.put((seconds, groups, hottest, peak_rss_mb()))
+
+
+# 한 방식을 새 프로세스에서 실행해 (시간, 그룹 수, 최고 기온, 최대 RSS MB) 를 돌려주는 함수
+def measure(name, root, state, start, end):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(queue, name, root, state, start, end))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pushdown queries against loading whole parquet files with pandas")
+    parser.add_argument('--stations', type=int, default=2000, help="Synthetic stations (default: 2000)")
+    parser.add_argument('--hours', type=int, default=24 * 14, help="Hours of observations per station (default: 336)")
+    parser.add_argument('--dataset', type=str, default=None,
+                        help="Reuse or create the synthetic dataset here instead of a temporary folder (default: temporary)")
+    parser.add_argument('--modes', type=str, default='pandas,pushdown', help="Comma separated modes (default: pandas,pushdown)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    root = args.dataset or tempfile.mkdtemp(prefix='nws_query_')
+    try:
+        if not glob.glob(os.path.join(root, '**', '*.parquet'), recursive=True):
+            start = time.perf_counter()
+            write_synthetic_dataset(root, args.stations, args.hours, args.seed)
+            print(f"Wrote {args.stations * args.hours} rows in {time.perf_counter() - start:.1f}s")
+        print(f"Dataset: {dataset_bytes(root) / 1024 ** 3:.2f} GB in {root}")
+
+        # 전체 기간 모든 주 집계와, 한 주(state)의 하루 집계
+        queries = [('all states, all hours', None, None, None),
+                   ('TEXAS, one day', 'TEXAS', datetime(2024, 1, 3), datetime(2024, 1, 4))]
+        for label, state, start, end in queries:
+            print(f"Max/min/mean temperature per state per hour, {label}:")
+            for mode in args.modes.split(','):
+                seconds, groups, hottest, peak_mb = measure(mode, root, state, start, end)
+                print(f"  {mode:<10} {seconds:7.2f}s  peak RSS {peak_mb:8.0f} MB  {groups} groups, max {hottest:.2f}")
+    finally:
+        if not args.dataset:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+import argparse
+from nws_mock_server import start_mock_server
+
+# 429 를 돌려주는 로컬 NWS 모의 서버를 대상으로 속도 제한 없이 보낼 때와
+# 적응형 속도 제한(rate_limiter.py)을 쓸 때의 처리량, 429 횟수, 실패 수를 비교하는 벤치마크
+
+
+# 여러 쓰레드가 관측소 URL 을 나눠 요청하고 (성공 수, 실패 수) 를 돌려주는 함수
+def run_workers(nws_client, urls, workers):
+    results = {'ok': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def worker(chunk):
+        for url in chunk:
+            try:
+                ok = nws_client.get(url).status_code == 200
+            except Exception:
+                ok = False
+            with lock:
+                results['ok' if ok else 'failed'] += 1
+
+    threads = [threading.Thread(target=worker, args=(urls[i::workers],)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results['ok'], results['failed']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the adaptive rate limiter against a throttling mock NWS server")
+    parser.add_argument('--requests', type=int, default=600, help="Requests per mode (default: 600)")
+    parser.add_argument('--workers', type=int, default=16, help="Concurrent worker threads (default: 16)")
+    parser.add_argument('--server-rate', type=float, default=20, help="Requests/second the mock server allows (default: 20)")
+    parser.add_argument('--latency', type=float, default=0.02, help="Mock server latency per request in seconds (default: 0.02)")
+    parser.add_argument('--start-rate', type=float, default=5, help="Adaptive limiter starting rate (default: 5)")
+    parser.add_argument('--modes', type=str, default='unlimited,adaptive',
+                        help="Comma separated modes to run (default: unlimited,adaptive)")
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, rate_limit=args.server_rate)
+    os.environ['NWS_API_BASE'] = server.base_url
+    import nws_client
+    nws_client.configure_session(pool_size=args.workers)
+
+    # 관측소마다 한 번씩 돌아가며 요청한다
+    urls = [f"{server.base_url}/stations/M{230 + i % 40:03d}{200 + i // 40 % 40:03d}/observations/latest"
+            for i in range(args.requests)]
+
+    results = []
+    for mode in args.modes.split(','):
+        if mode == 'unlimited':
+            # 속도 제한 없이 보내고 429 는 재시도 없이 실패로 센다 (기존 동작)
+            nws_client.configure_rate_limit(rate=10000, retry_budget=0)
+        elif mode == 'adaptive':
+            # 상한을 서버 한도보다 높게 잡아, 429 를 받아 가며 한도를 스스로 찾는지 본다
+            nws_client.configure_rate_limit(rate=args.start_rate, retry_budget=args.requests,
+                                            max_rate=args.server_rate * 5)
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+        # 이전 모드가 써 버린 서버 쪽 토큰이 다시 가득 찰 때까지 기다린다
+        time.sleep(server.throttle.burst / args.server_rate)
+        with server.stats_lock:
+            server.request_count = 0
+            server.throttled_count = 0
+
+        start = time.perf_counter()
+        ok, failed = run_workers(nws_client, urls, args.workers)
+        elapsed = time.perf_counter() - start
+        results.append((mode, elapsed, ok, failed, server.throttled_count, nws_client.rate_limiter.rate))
+        nws_client.report()
+
+    print(f"\n{args.requests} requests, {args.workers} workers, server allows {args.server_rate:.0f} req/s")
+    print(f"{'mode':<12}{'seconds':>10}{'ok':>8}{'failed':>8}{'429s':>8}{'ok/s':>10}{'of limit':>10}{'end rate':>10}")
+    for mode, elapsed, ok, failed, throttled, rate in results:
+        ok_rate = ok / elapsed
+        print(f"{mode:<12}{elapsed:>10.2f}{ok:>8}{failed:>8}{throttled:>8}{ok_rate:>10.1f}"
+              f"{ok_rate / args.server_rate * 100:>9.0f}%{rate:>10.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
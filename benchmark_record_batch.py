@@ -0,0 +1,70 @@
+import time
+import argparse
+import tracemalloc
+import pandas as pd
+import pyarrow as pa
+from weather_observation import build_station_row
+from weather_schema import observation_rows, rows_to_record_batch
+
+# dict 행 → pandas → Arrow 로 가는 기존 경로와 tuple 행 → 열 빌더 → RecordBatch 경로의
+# CPU 시간과 최대 메모리 사용량을 비교하는 벤치마크
+
+
+# 관측 응답과 같은 구조의 가짜 데이터를 만드는 함수
+def make_observations(count):
+    observations = []
+    for i in range(count):
+        observations.append({
+            'temperature': {'unitCode': 'wmoUnit:degC', 'value': 10.0 + i % 30},
+            'relativeHumidity': {'unitCode': 'wmoUnit:percent', 'value': 30.0 + i % 60},
+            'windSpeed': {'unitCode': 'wmoUnit:km_h-1', 'value': float(i % 40)},
+            'windDirection': {'unitCode': 'wmoUnit:degree_(angle)', 'value': (i * 37) % 360},
+            'precipitationLastHour': {'unitCode': 'wmoUnit:mm', 'value': None},
+            'textDescription': 'Clear' if i % 2 else 'Cloudy',
+        })
+    return observations
+
+
+# 기존 수집기 경로
+def dict_path(observations):
+    rows = [build_station_row(f"city_{i % 1200}", f"state_{i % 50}", f"Station {i % 3000}", [-96.0, 32.0], observation)
+            for i, observation in enumerate(observations)]
+    df = pd.DataFrame(rows)
+    return pa.Table.from_pandas(df)
+
+
+# 고정 스키마 + 열 빌더 경로
+def columnar_path(observations):
+    rows = []
+    for i, observation in enumerate(observations):
+        rows.extend(observation_rows([(f"city_{i % 1200}", f"state_{i % 50}")], f"Station {i % 3000}",
+                                     [-96.0, 32.0], observation))
+    return rows_to_record_batch(rows)
+
+
+def measure(name, fn, observations):
+    tracemalloc.start()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    result = fn(observations)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<10}{cpu:>10.3f}{wall:>10.3f}{peak / 1024 / 1024:>14.1f}{result.nbytes / 1024 / 1024:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dict/pandas row building with the columnar batch builder")
+    parser.add_argument('--rows', type=int, default=200000, help="Number of rows to build (default: 200000)")
+    args = parser.parse_args()
+
+    observations = make_observations(args.rows)
+    print(f"{args.rows} rows")
+    print(f"{'path':<10}{'cpu s':>10}{'wall s':>10}{'peak py MB':>14}{'arrow MB':>14}")
+    measure('dict', dict_path, observations)
+    measure('columnar', columnar_path, observations)
+
+
+if __name__ == "__main__":
+    main()
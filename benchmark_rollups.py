@@ -0,0 +1,88 @@
+import os
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime
+from benchmark_query import write_synthetic_dataset, dataset_bytes
+from weather_query import aggregate
+from compact_weather_log import CompactionStats
+from weather_rollups import RollupStore, read_rollup, verify, compact_rollups
+
+# 수집기 출력과 같은 합성 데이터셋을 쓰면서 저장 경로처럼 배치마다 집계(weather_rollups.py)를 갱신하고,
+# 대시보드 질의를 원본 스캔(weather_query.aggregate)과 집계 읽기(read_rollup)로 비교하는 벤치마크
+# 마지막에 원본에서 다시 만든 집계와 저장된 집계가 같은지 검증한다
+
+
+def rollup_bytes(root):
+    return sum(os.path.getsize(path) for path in glob.glob(os.path.join(root, '**', '*.parquet'), recursive=True))
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard queries on rollups against scanning the raw history")
+    parser.add_argument('--stations', type=int, default=2000, help="Synthetic stations (default: 2000)")
+    parser.add_argument('--hours', type=int, default=24 * 7, help="Hours of observations per station (default: 168)")
+    parser.add_argument('--flush-every', type=int, default=1,
+                        help="Flush rollup deltas every N hourly batches, like one flush per sweep (default: 1)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='nws_rollups_')
+    raw_root = os.path.join(folder, 'weather_data')
+    rollup_root = os.path.join(folder, 'weather_rollups')
+    try:
+        store = RollupStore(rollup_root, prefix='benchmark')
+        batches = []
+
+        def on_table(table):
+            store.update(table)
+            batches.append(table.num_rows)
+            if len(batches) % args.flush_every == 0:
+                store.flush()
+
+        start = time.perf_counter()
+        write_synthetic_dataset(raw_root, args.stations, args.hours, args.seed, on_table=on_table)
+        store.flush()
+        seconds = time.perf_counter() - start
+        print(f"Wrote {sum(batches)} rows in {seconds:.1f}s; rollup updates took {store.update_seconds:.2f}s "
+              f"({store.update_seconds / len(batches) * 1000:.1f} ms per {batches[0]}-row batch)")
+        delta_bytes = rollup_bytes(rollup_root)
+        # 운영에서는 compact_weather_log.py 가 주기적으로 변화분 파일을 합친다
+        _, compact_seconds = timed(compact_rollups, rollup_root, CompactionStats('Rollup compaction'), 0)
+        print(f"Raw dataset {dataset_bytes(raw_root) / 1024 ** 2:.1f} MB; rollups {delta_bytes / 1024:.0f} KB in "
+              f"{store.files_written} delta files, {rollup_bytes(rollup_root) / 1024:.0f} KB after compaction "
+              f"({compact_seconds * 1000:.0f} ms)")
+
+        day = (datetime(2024, 1, 2), datetime(2024, 1, 3))
+        state = read_rollup(rollup_root, 'state', '1d').column('state')[0].as_py()
+        queries = [
+            ('per state per hour, all hours', dict(keys=['state'], bucket='1h'), dict(level='state', resolution='1h'), {}),
+            ('per state per day, all days', dict(keys=['state'], bucket='1d'), dict(level='state', resolution='1d'), {}),
+            (f"per city per hour, {state}, one day", dict(keys=['state', 'city'], bucket='1h'),
+             dict(level='city', resolution='1h'), dict(states=state, start=day[0], end=day[1])),
+        ]
+        for label, raw_options, rollup_options, filters in queries:
+            raw, raw_seconds = timed(aggregate, raw_root, values=['temperature_celsius'], **raw_options, **filters)
+            rollup, rollup_seconds = timed(read_rollup, rollup_root, values=['temperature_celsius'], **rollup_options,
+                                           **filters)
+            same = (raw.num_rows == rollup.num_rows
+                    and raw.column('temperature_celsius_max').to_pylist() == rollup.column('temperature_celsius_max').to_pylist()
+                    and raw.column('temperature_celsius_count').to_pylist() == rollup.column('temperature_celsius_count').to_pylist())
+            print(f"Temperature {label}: raw scan {raw_seconds * 1000:.0f} ms, rollups {rollup_seconds * 1000:.0f} ms "
+                  f"({raw_seconds / rollup_seconds:.0f}x), {rollup.num_rows} groups, results {'match' if same else 'DIFFER'}")
+
+        _, verify_seconds = timed(verify, raw_root, rollup_root)
+        print(f"Verified every rollup against the raw data in {verify_seconds:.1f}s")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+import pyarrow.parquet as pq
+import city_registry
+from nws_mock_server import start_mock_server
+
+# 여러 수집기 프로세스를 샤드 모드(shard_coordinator.py)로 로컬 모의 NWS 서버에 붙여 실행하고,
+# 중간에 워커 하나를 강제 종료해서 임대가 만료된 뒤 남은 워커들이 그 샤드를 넘겨받는지 확인하는 벤치마크
+# 모의 서버의 관측은 수집 간격마다 바뀌므로, 합쳐진 데이터셋에서 관측 시각별로 몇 개 도시가 수집됐는지 세어 본다
+
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+# 도시 목록 앞쪽 주들에서 limit 개 도시만 뽑는 함수
+def take_cities(city_coordinates, limit):
+    cities = {}
+    count = 0
+    for state, state_cities in city_coordinates.items():
+        if count >= limit:
+            break
+        cities[state] = dict(list(state_cities.items())[:limit - count])
+        count += len(cities[state])
+    return cities
+
+
+# 워커 하나를 별도 프로세스로 시작하는 함수
+def start_worker(args, index, work_dir, base_url, coordinator_db):
+    command = [sys.executable, os.path.join(package_dir, 'weather_data_collector_all_city_thread.py'),
+               '--interval', str(args.interval), '--unit', 'seconds', '--duration', str(args.duration),
+               '--rate', str(args.rate), '--worker-index', str(index), '--worker-count', str(args.workers),
+               '--coordinator-db', coordinator_db, '--lease-seconds', str(args.lease_seconds)]
+    env = dict(os.environ, NWS_API_BASE=base_url)
+    log = open(os.path.join(work_dir, f"worker_{index}.out"), 'w')
+    return subprocess.Popen(command, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+# 합쳐진 데이터셋을 읽어 관측 시각별로 수집된 도시 수와 그 도시를 쓴 워커들을 세는 함수
+def coverage_by_observation(dataset_root):
+    cities = defaultdict(set)
+    writers = defaultdict(set)
+    for path in glob.glob(os.path.join(dataset_root, '**', '*.parquet'), recursive=True):
+        state = re.search(r'state=([^/\\]+)', path).group(1)
+        worker = re.search(r'_w(\d+)-\d+\.parquet$', path).group(1)
+        table = pq.read_table(path, columns=['city', 'observation_time'])
+        for city, observed_at in zip(table['city'].to_pylist(), table['observation_time'].to_pylist()):
+            cities[observed_at].add((state, city))
+            writers[observed_at].add(int(worker))
+    return [(observed_at, len(cities[observed_at]), sorted(writers[observed_at])) for observed_at in sorted(cities)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run sharded collectors against a local mock NWS server and kill one of them")
+    parser.add_argument('--workers', type=int, default=3, help="Number of collector processes (default: 3)")
+    parser.add_argument('--cities', type=int, default=1204, help="Number of cities to sweep (default: 1204)")
+    parser.add_argument('--interval', type=int, default=10, help="Sweep interval in seconds (default: 10)")
+    parser.add_argument('--lease-seconds', type=float, default=15,
+                        help="Shard lease length; a dead worker's shards move after this (default: 15)")
+    parser.add_argument('--kill-after', type=float, default=20,
+                        help="Seconds before worker 0 is killed without releasing its leases (default: 20)")
+    parser.add_argument('--duration', type=int, default=1, help="Run time of each worker in minutes (default: 1)")
+    parser.add_argument('--rate', type=float, default=1000, help="Request rate of each worker (default: 1000)")
+    parser.add_argument('--latency', type=float, default=0.005, help="Mock server latency per request in seconds (default: 0.005)")
+    parser.add_argument('--keep', action='store_true', help="Keep the working directory for inspection")
+    args = parser.parse_args()
+
+    cities = take_cities(city_registry.city_coordinates(source=os.path.join(package_dir, 'city_coordinates.json')),
+                         args.cities)
+    total = sum(len(state_cities) for state_cities in cities.values())
+
+    server = start_mock_server(latency=args.latency, observation_period=args.interval)
+    work_dir = tempfile.mkdtemp(prefix='nws_shards_')
+    with open(os.path.join(work_dir, 'city_coordinates.json'), 'w') as f:
+        json.dump(cities, f)
+    coordinator_db = os.path.join(work_dir, 'shards.db')
+
+    print(f"Running {args.workers} workers on {total} cities in {work_dir}")
+    workers = [start_worker(args, i, work_dir, server.base_url, coordinator_db) for i in range(args.workers)]
+    start = time.monotonic()
+    time.sleep(args.kill_after)
+    # SIGKILL 이라 atexit 이 돌지 않으므로 임대가 풀리지 않고 만료될 때까지 남는다
+    workers[0].kill()
+    print(f"Killed worker 0 after {time.monotonic() - start:.0f}s")
+    for worker in workers[1:]:
+        worker.wait()
+    server.shutdown()
+
+    print(f"{'Observation time':<27} {'Cities':>12} Workers")
+    rows = coverage_by_observation(os.path.join(work_dir, 'weather_log', 'weather_data'))
+    for observed_at, covered, writers in rows:
+        print(f"{str(observed_at):<27} {covered:>5}/{total:<6} {','.join(map(str, writers))}")
+    # 마지막 관측 시각은 수집 도중 끝났을 수 있으므로 그 전 시각으로 판단한다
+    complete = [covered for _, covered, writers in rows[:-1] if 0 not in writers]
+    if complete and max(complete) == total:
+        print("Shards of the killed worker were taken over: a later sweep covered every city without it")
+    else:
+        print("No sweep after the kill covered every city")
+
+    if args.keep:
+        print(f"Kept {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import city_registry
+from parquet_sink import PartitionedParquetSink
+from spatial_index import SpatialIndex, build_index, station_history, haversine_km
+
+# 공간 색인(spatial_index.py)의 반경 / k-최근접 질의를 모든 점과 거리를 계산하는 brute-force 와 비교하고,
+# 저장된 기록에서 "반경 안 관측소의 관측" 을 읽을 때 전체 Parquet 스캔과 색인 + 파티션 가지치기를 비교하는 벤치마크
+
+
+def brute_force_radius(latitudes, longitudes, lat, lon, radius_km):
+    distances = haversine_km(lat, lon, latitudes, longitudes)
+    return np.sort(np.flatnonzero(distances <= radius_km))
+
+
+def brute_force_nearest(latitudes, longitudes, lat, lon, k):
+    distances = haversine_km(lat, lon, latitudes, longitudes)
+    nearest = np.argpartition(distances, k)[:k]
+    return nearest[np.argsort(distances[nearest], kind='stable')]
+
+
+# 미국 본토 범위에 무작위 관측소를 만들고, 가장 가까운 도시의 주를 붙이는 함수
+def synthetic_stations(count, cities_index, rng):
+    latitudes = rng.uniform(25, 49, count)
+    longitudes = rng.uniform(-124, -67, count)
+    nearest, _ = cities_index.query_nearest(latitudes, longitudes, k=1, kind='city')
+    # 수집기처럼 주 이름은 대문자로 저장한다
+    states = np.char.upper(cities_index.states[nearest[:, 0]])
+    names = np.array([f"Station {i:06d}" for i in range(count)])
+    return names, latitudes, longitudes, states
+
+
+# 관측소마다 observations 개의 관측을 (날짜, 주) 파티션 데이터셋으로 쓰는 함수
+def write_history(root, names, latitudes, longitudes, states, observations):
+    sink = PartitionedParquetSink(root, prefix='benchmark')
+    start = datetime(2024, 1, 1)
+    for step in range(observations):
+        timestamp = start + timedelta(hours=step)
+        sink.write_table(pa.table({
+            'timestamp': pa.array([timestamp] * len(names), pa.timestamp('s')),
+            'state': pa.array(states).dictionary_encode(),
+            'station': pa.array(names).dictionary_encode(),
+            'location': pa.array([[lon, lat] for lat, lon in zip(latitudes, longitudes)], pa.list_(pa.float64())),
+            'temperature_celsius': pa.array(np.random.default_rng(step).normal(15, 8, len(names)), pa.float32()),
+        }))
+    sink.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the spatial index against brute-force scans")
+    parser.add_argument('--stations', type=int, default=20000, help="Synthetic stations to index (default: 20000)")
+    parser.add_argument('--queries', type=int, default=1000, help="Query points (default: 1000)")
+    parser.add_argument('--radius', type=float, default=50, help="Radius query size in km (default: 50)")
+    parser.add_argument('--k', type=int, default=5, help="Nearest neighbours per query (default: 5)")
+    parser.add_argument('--history-stations', type=int, default=2000,
+                        help="Stations in the synthetic parquet history (default: 2000)")
+    parser.add_argument('--observations', type=int, default=48, help="Observations per history station (default: 48)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    cities_index = build_index(city_coordinates=city_registry.city_coordinates())
+    names, latitudes, longitudes, states = synthetic_stations(args.stations, cities_index, rng)
+
+    start = time.perf_counter()
+    index = SpatialIndex(names, latitudes, longitudes, states=states)
+    build_seconds = time.perf_counter() - start
+    print(f"Index of {len(index)} stations built in {build_seconds * 1000:.1f} ms")
+
+    query_lat = rng.uniform(25, 49, args.queries)
+    query_lon = rng.uniform(-124, -67, args.queries)
+
+    # 반경 질의: 결과가 같은지 확인하고 시간 비교
+    start = time.perf_counter()
+    indexed = index.query_radius(query_lat, query_lon, args.radius)
+    index_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    brute = [brute_force_radius(latitudes, longitudes, lat, lon, args.radius) for lat, lon in zip(query_lat, query_lon)]
+    brute_seconds = time.perf_counter() - start
+    # 색인은 정렬된 순서로 점을 저장하므로 이름으로 비교한다
+    same = all(sorted(index.names[found]) == sorted(names[expected]) for (found, _), expected in zip(indexed, brute))
+    matches = sum(len(found) for found, _ in indexed)
+    print(f"Radius {args.radius:g} km x {args.queries}: index {index_seconds * 1000:.1f} ms, "
+          f"brute force {brute_seconds * 1000:.1f} ms ({brute_seconds / index_seconds:.1f}x), "
+          f"{matches} matches, results {'match' if same else 'DIFFER'}")
+
+    # k-최근접 질의
+    start = time.perf_counter()
+    nearest, _ = index.query_nearest(query_lat, query_lon, k=args.k)
+    index_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    brute = [brute_force_nearest(latitudes, longitudes, lat, lon, args.k) for lat, lon in zip(query_lat, query_lon)]
+    brute_seconds = time.perf_counter() - start
+    same = all(list(index.names[found]) == list(names[expected]) for found, expected in zip(nearest, brute))
+    print(f"{args.k}-nearest x {args.queries}: index {index_seconds * 1000:.1f} ms, "
+          f"brute force {brute_seconds * 1000:.1f} ms ({brute_seconds / index_seconds:.1f}x), "
+          f"results {'match' if same else 'DIFFER'}")
+
+    # 저장된 기록에서 반경 안 관측소의 관측 읽기: 전체 스캔 vs 색인 + 주 파티션 가지치기
+    root = tempfile.mkdtemp(prefix='nws_spatial_')
+    try:
+        history = slice(0, args.history_stations)
+        write_history(root, names[history], latitudes[history], longitudes[history], states[history],
+                      args.observations)
+        center_lat, center_lon = 32.7767, -96.7970
+        radius = args.radius * 4
+
+        start = time.perf_counter()
+        table = ds.dataset(root, format='parquet', partitioning='hive').to_table(
+            columns=['station', 'location', 'timestamp', 'temperature_celsius'])
+        locations = np.array(table['location'].to_pylist(), dtype=np.float64)
+        inside = haversine_km(center_lat, center_lon, locations[:, 1], locations[:, 0]) <= radius
+        scan_rows = int(np.count_nonzero(inside))
+        scan_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        history_index = build_index(root)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        (positions, _), = history_index.query_radius(center_lat, center_lon, radius)
+        result = station_history(root, history_index, positions, columns=['station', 'timestamp', 'temperature_celsius'])
+        index_rows = 0 if result is None else result.num_rows
+        index_seconds = time.perf_counter() - start
+        print(f"History within {radius:g} km of Dallas ({table.num_rows} stored rows): full scan {scan_seconds * 1000:.1f} ms, "
+              f"index {index_seconds * 1000:.1f} ms ({scan_seconds / index_seconds:.1f}x, index build "
+              f"{build_seconds * 1000:.0f} ms once), {index_rows} rows, results "
+              f"{'match' if index_rows == scan_rows else 'DIFFER'}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import city_registry
+from spatial_index import build_index
+from benchmark_spatial_index import synthetic_stations, write_history
+from station_map import collect_map_data, marker_rows, build_map
+
+# 관측소 지도 생성 벤치마크
+# 무작위 관측소 --stations 개의 --observations 시간 분량 기록을 Parquet 데이터셋으로 쓰고,
+# 1) visualize_weather_stations.py 처럼 관측소마다 팝업 HTML 이 있는 folium.Marker 를 MarkerCluster 에 넣는 방식
+# 2) station_map.py 의 FastMarkerCluster (짧은 배열 + 브라우저에서 만드는 팝업)
+# 3) 2) 에 시간 구간별 격자 평균 층을 더하고 --max-html-mb 로 크기를 제한한 지도
+# 의 생성 시간과 HTML 크기를 비교한다. 1) 도 같은 최근 관측을 쓰므로 Parquet 를 읽는 시간은 따로 보고한다.
+
+
+# 관측소마다 folium.Marker 를 만드는 방식 (비교 기준)
+def marker_per_station(markers, value, path):
+    import folium
+    from folium.plugins import MarkerCluster
+    station_map = folium.Map(location=[39.0, -96.0], zoom_start=4)
+    cluster = MarkerCluster().add_to(station_map)
+    for latitude, longitude, reading, station, _, _ in markers:
+        folium.Marker(location=[latitude, longitude], popup=f"Station: {station}<br>{value}: {reading}",
+                      tooltip=station).add_to(cluster)
+    station_map.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark station map generation time and HTML size")
+    parser.add_argument('--stations', type=int, default=10000, help="Synthetic stations (default: 10000)")
+    parser.add_argument('--observations', type=int, default=24, help="Hourly observations per station (default: 24)")
+    parser.add_argument('--cell-size', type=float, default=0.5, help="Grid cell size of the grid layer in degrees (default: 0.5)")
+    parser.add_argument('--max-html-mb', type=float, default=10, help="HTML size limit of the grid layer map in MB (default: 10)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    cities_index = build_index(city_coordinates=city_registry.city_coordinates())
+    names, latitudes, longitudes, states = synthetic_stations(args.stations, cities_index, rng)
+    root = tempfile.mkdtemp(prefix='nws_station_map_')
+    output = tempfile.mkdtemp(prefix='nws_station_map_html_')
+    value = 'temperature_celsius'
+    try:
+        write_history(root, names, latitudes, longitudes, states, args.observations)
+
+        start = time.perf_counter()
+        latest, _ = collect_map_data(root, value, bucket=None)
+        markers = marker_rows(latest, value)
+        read_seconds = time.perf_counter() - start
+
+        results = []
+        path = os.path.join(output, 'marker_per_station.html')
+        start = time.perf_counter()
+        marker_per_station(markers, value, path)
+        results.append(('folium.Marker per station', time.perf_counter() - start, os.path.getsize(path), '-'))
+
+        for label, bucket in (('FastMarkerCluster', None), ('+ hourly grid layer', '1h')):
+            path = os.path.join(output, f"station_map_{bucket or 'markers'}.html")
+            start = time.perf_counter()
+            result = build_map(root, path, value, args.cell_size, bucket, int(args.max_html_mb * 1e6))
+            slices = f"{result['slices']} slices, {result['dropped']} dropped" if bucket else '-'
+            results.append((label, time.perf_counter() - start, result['size'], slices))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(output, ignore_errors=True)
+
+    print(f"\n{len(markers)} stations, {args.observations} observations each, "
+          f"latest observations read in {read_seconds:.2f} s")
+    print(f"{'map':<28}{'seconds':>9}{'HTML MB':>9}  grid layer")
+    for label, seconds, size, slices in results:
+        print(f"{label:<28}{seconds:>9.2f}{size / 1e6:>9.2f}  {slices}")
+    print("FastMarkerCluster times include reading the dataset; the per-station markers reuse the rows read above")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+import multiprocessing
+import resource
+import city_registry
+from benchmark_collectors import take_cities
+from nws_mock_server import start_mock_server
+
+# 세 수집기를 로컬 모의 서버(nws_mock_server.py)에 붙여 처음부터 끝까지 (관측소 조회 → 관측 수집 → 저장) 돌리는 벤치마크
+# 수집기마다 새 프로세스에서 setup() 부터 --sweeps 번의 수집과 파일 닫기까지 실행하고,
+# 수집 속도(sweeps/s), 요청 지연 p50/p99, CPU 시간, 최대 RSS 를 잰다. 모의 서버는 이 프로세스에서 돌므로 CPU 에 들어가지 않는다.
+# 첫 수집은 메타데이터 캐시가 비어 있고 모든 관측이 새것이므로 따로 보고하고, 이후 수집은 304 가 대부분인 평상시 상태다.
+# --output 으로 결과를 JSON 으로 남기고, --compare 로 이전 결과와 비교해 --tolerance 보다 나빠진 항목이 있으면 종료 코드 1 (CI 용).
+
+collectors = {
+    'single': 'weather_data_collector',
+    'all_city': 'weather_data_collector_all_city',
+    'thread': 'weather_data_collector_all_city_thread',
+}
+
+# 비교할 지표와 방향 (True 면 클수록 좋음)
+compared_metrics = {
+    'sweeps_per_second': True,
+    'first_sweep_seconds': False,
+    'latency_p99_ms': False,
+    'cpu_seconds': False,
+    'peak_rss_mb': False,
+}
+
+
+# 이 프로세스의 최대 RSS (MB). ru_maxrss 는 부모 프로세스의 값을 물려받을 수 있어 리눅스에서는 VmHWM 을 쓴다
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# 수집기별 한 번의 수집 (각 수집기의 set_schedule 안 sweep / job 과 같은 순서, 출력만 뺌)
+def sweep_single(collector, cities, number, sweeps):
+    import nws_client
+    (state, state_cities), = list(cities.items())[:1]
+    latitude, longitude = next(iter(state_cities.values()))
+    nws_client.start_sweep()
+    collector.observation_tracker.start_sweep()
+    collector.get_current_weather(latitude, longitude, sweeps, number)
+    collector.metadata_cache.save()
+    collector.observation_tracker.save()
+
+
+def sweep_all_city(collector, cities, number, sweeps):
+    collector.run_sweep(collector.shard_coordinator.assigned_cities())
+    collector.metadata_cache.save()
+    collector.observation_tracker.save()
+    collector.rollup_store.flush()
+
+
+def sweep_thread(collector, cities, number, sweeps):
+    collector.run_thread_sweep(collector.shard_coordinator.assigned_cities(), 0)
+    collector.metadata_cache.save()
+    collector.observation_tracker.save()
+    collector.rollup_store.flush()
+
+
+# 수집기를 준비하는 함수 (main() 이 인자를 읽은 뒤 하는 일)
+def prepare(name, collector, cities):
+    import nws_client
+    collector.setup()
+    if name == 'single':
+        return
+    if name == 'thread':
+        nws_client.configure_session(pool_size=max(len(cities), nws_client.default_pool_size))
+    collector.configure_sharding(0, 1, city_coordinates=cities)
+
+
+# 남은 행을 저장하고 파일을 닫는 함수 (종료 핸들러가 하는 일)
+def finish(name, collector):
+    if name == 'thread':
+        collector.save_to_parquet()
+    else:
+        collector.parquet_sink.close()
+        if name == 'all_city':
+            collector.rollup_store.flush()
+
+
+sweep_functions = {'single': sweep_single, 'all_city': sweep_all_city, 'thread': sweep_thread}
+
+
+def _child(queue, name, base_url, log_folder, cities, sweeps, rate):
+    # 수집기 모듈은 import 시점에 API 주소를 읽으므로 먼저 환경 변수를 설정한다
+    os.environ['NWS_API_BASE'] = base_url
+    import nws_client
+    collector = importlib.import_module(collectors[name])
+    collector.log_folder = log_folder
+
+    # 수집기는 진행 상황을 많이 출력하므로 (종료 핸들러의 출력까지) 표준 출력을 버린다
+    sys.stdout = open(os.devnull, 'w')
+    cpu_start = time.process_time()
+    durations = []
+    prepare(name, collector, cities)
+    nws_client.configure_rate_limit(rate=rate)
+    for number in range(1, sweeps + 1):
+        start = time.perf_counter()
+        sweep_functions[name](collector, cities, number, sweeps)
+        durations.append(time.perf_counter() - start)
+    finish(name, collector)
+    cpu_seconds = time.process_time() - cpu_start
+
+    connection_stats = nws_client.connection_stats.snapshot()
+    retry_stats = nws_client.retry_policy.stats()
+    warm = durations[1:] or durations
+    queue.put({
+        'sweeps': sweeps,
+        'first_sweep_seconds': durations[0],
+        'sweeps_per_second': len(warm) / sum(warm),
+        'requests': connection_stats['requests'],
+        'latency_p50_ms': connection_stats['latency_p50_ms'],
+        'latency_p99_ms': connection_stats['latency_p99_ms'],
+        'retries': retry_stats['retries'],
+        'cpu_seconds': cpu_seconds,
+        'peak_rss_mb': peak_rss_mb(),
+    })
+
+
+# 한 수집기를 새 프로세스에서 실행해 지표 dict 를 돌려주는 함수
+def measure(name, server, cities, sweeps, rate):
+    log_folder = tempfile.mkdtemp(prefix='nws_suite_')
+    with server.stats_lock:
+        server.request_count = server.throttled_count = server.error_count = 0
+    try:
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        process = context.Process(target=_child, args=(queue, name, server.base_url, log_folder, cities, sweeps, rate))
+        process.start()
+        result = queue.get()
+        process.join()
+    finally:
+        shutil.rmtree(log_folder, ignore_errors=True)
+    result['throttled'] = server.throttled_count
+    result['errors'] = server.error_count
+    return result
+
+
+def print_results(results):
+    print(f"{'collector':<10}{'sweeps/s':>10}{'first s':>9}{'requests':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'CPU s':>8}{'RSS MB':>8}{'429':>6}{'503':>6}{'retries':>9}")
+    for name, result in results.items():
+        print(f"{name:<10}{result['sweeps_per_second']:>10.2f}{result['first_sweep_seconds']:>9.2f}"
+              f"{result['requests']:>10}{result['latency_p50_ms'] or 0:>9.1f}{result['latency_p99_ms'] or 0:>9.1f}"
+              f"{result['cpu_seconds']:>8.2f}{result['peak_rss_mb']:>8.0f}{result['throttled']:>6}"
+              f"{result['errors']:>6}{result['retries']:>9}")
+
+
+# 이전 결과와 비교해 tolerance 보다 나빠진 (수집기, 지표, 이전 값, 지금 값) 목록을 돌려주는 함수
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in compared_metrics.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > tolerance:
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the collectors end to end against a recorded-response mock NWS server")
+    parser.add_argument('--collectors', type=str, default='single,all_city,thread',
+                        help="Comma separated collectors to run (default: single,all_city,thread)")
+    parser.add_argument('--cities', type=int, default=100,
+                        help="Cities per sweep for the all-city collectors; the single collector uses the first (default: 100)")
+    parser.add_argument('--sweeps', type=int, default=5, help="Sweeps per collector (default: 5)")
+    parser.add_argument('--recordings', type=str, default='nws_recordings_sample.json',
+                        help="Recorded responses to replay, empty for synthetic payloads (default: nws_recordings_sample.json)")
+    parser.add_argument('--latency', type=float, default=0.02, help="Mock server latency per request in seconds (default: 0.02)")
+    parser.add_argument('--latency-jitter', type=float, default=0.01,
+                        help="Random extra latency up to this many seconds per request (default: 0.01)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with 503 (default: 0)")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests answered with 429 (default: 0)")
+    parser.add_argument('--observation-period', type=float, default=3600,
+                        help="Seconds between new observations of each station (default: 3600)")
+    parser.add_argument('--rate', type=float, default=10000,
+                        help="Client request rate limit in requests/second (default: 10000, effectively unlimited)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the mock server (default: 0)")
+    parser.add_argument('--output', type=str, default=None, help="Write the results to this JSON file (default: none)")
+    parser.add_argument('--compare', type=str, default=None,
+                        help="Compare with a JSON file written by --output and exit with 1 on regressions (default: none)")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed relative slowdown or growth per metric before it counts as a regression (default: 0.25)")
+    args = parser.parse_args()
+
+    server = start_mock_server(latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate, observation_period=args.observation_period,
+                               recordings=args.recordings or None, seed=args.seed)
+    cities = take_cities(city_registry.city_coordinates(), args.cities)
+    try:
+        results = {}
+        for name in args.collectors.split(','):
+            if name not in collectors:
+                raise ValueError(f"Unknown collector: {name}")
+            results[name] = measure(name, server, cities, args.sweeps, args.rate)
+    finally:
+        server.shutdown()
+
+    print(f"\n{args.sweeps} sweeps, {args.cities} cities, {args.latency * 1000:.0f}+{args.latency_jitter * 1000:.0f} ms "
+          f"mock latency, {args.error_rate:.0%} errors, {args.throttle_rate:.0%} throttled")
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'arguments': vars(args), 'results': results}, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print(f"Regression: {name} {metric} {old:.3f} -> {new:.3f}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import os
+import numpy as np
+
+# 도시 좌표 목록 (city_coordinates.json → city_registry.npy)
+# JSON 은 읽을 때마다 파싱해서 1,200 여 개의 dict / tuple 을 만들지만, 미리 컴파일한 .npy 레코드 배열은
+# 메모리 매핑(mmap)으로 열기만 하므로 읽는 비용이 거의 없고, 실제로 건드린 페이지만 메모리에 올라온다.
+# 레코드는 (주, 도시, 위도, 경도) 이고 (주, 도시) 순으로 정렬해 두므로
+# 한 주의 도시들은 연속된 구간이며, "도시,주" 조회는 이진 탐색 두 번이다.
+# 이름은 JSON 과 같은 소문자 + 밑줄 형식 (예: new_york / new_york_city) 이다.
+# .npy 가 없거나 JSON 보다 오래됐으면 처음 사용할 때 다시 컴파일한다.
+# 수집기가 import 할 때의 비용을 줄이려고 json / argparse 는 컴파일 / CLI 에서만 import 한다.
+
+source_filename = 'city_coordinates.json'
+registry_filename = 'city_registry.npy'
+
+# 미국 인구조사국(Census Bureau) 지역 구분
+census_regions = {
+    'northeast': ['connecticut', 'maine', 'massachusetts', 'new_hampshire', 'new_jersey', 'new_york',
+                  'pennsylvania', 'rhode_island', 'vermont'],
+    'midwest': ['illinois', 'indiana', 'iowa', 'kansas', 'michigan', 'minnesota', 'missouri', 'nebraska',
+                'north_dakota', 'ohio', 'south_dakota', 'wisconsin'],
+    'south': ['alabama', 'arkansas', 'delaware', 'florida', 'georgia', 'kentucky', 'louisiana', 'maryland',
+              'mississippi', 'north_carolina', 'oklahoma', 'south_carolina', 'tennessee', 'texas', 'virginia',
+              'west_virginia'],
+    'west': ['alaska', 'arizona', 'california', 'colorado', 'hawaii', 'idaho', 'montana', 'nevada', 'new_mexico',
+             'oregon', 'utah', 'washington', 'wyoming'],
+}
+
+# 예전 단일 도시 수집기 목록의 이름 중 JSON 과 다른 것 ((도시, 주) → (도시, 주))
+aliases = {('new_york', 'new_york'): ('new_york_city', 'new_york')}
+
+_registries = {}
+
+
+# "New York", "new york", "new_york" 을 모두 new_york 으로 맞추는 함수
+def normalize_name(name):
+    return '_'.join(name.strip().lower().replace('_', ' ').split())
+
+
+class CityRegistry:
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def latitudes(self):
+        return self.records['latitude']
+
+    @property
+    def longitudes(self):
+        return self.records['longitude']
+
+    # 주 이름 목록 (정렬 순서)
+    def states(self):
+        return [state.decode() for state in np.unique(self.records['state'])]
+
+    # 한 주의 레코드 구간 (정렬되어 있으므로 이진 탐색)
+    def _state_range(self, state):
+        key = normalize_name(state).encode()
+        states = self.records['state']
+        return np.searchsorted(states, key, 'left'), np.searchsorted(states, key, 'right')
+
+    # "도시,주" 의 (위도, 경도). 없으면 None
+    def lookup(self, city, state):
+        city, state = aliases.get((normalize_name(city), normalize_name(state)),
+                                  (normalize_name(city), normalize_name(state)))
+        start, end = self._state_range(state)
+        cities = self.records['city'][start:end]
+        position = np.searchsorted(cities, city.encode())
+        if position == len(cities) or cities[position] != city.encode():
+            return None
+        record = self.records[start + position]
+        return float(record['latitude']), float(record['longitude'])
+
+    # 주 목록 / 지역(census_regions) / 범위 (최소 위도, 최소 경도, 최대 위도, 최대 경도) 로 고른 도시들
+    def select(self, states=None, region=None, bbox=None):
+        mask = np.ones(len(self.records), dtype=bool)
+        if region is not None:
+            if normalize_name(region) not in census_regions:
+                raise ValueError(f"Unknown region {region!r}, use one of {', '.join(census_regions)}")
+            states = list(states or []) + census_regions[normalize_name(region)]
+        if states is not None:
+            mask &= np.isin(self.records['state'], [normalize_name(state).encode() for state in states])
+        if bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            mask &= (self.latitudes >= min_lat) & (self.latitudes <= max_lat)
+            mask &= (self.longitudes >= min_lon) & (self.longitudes <= max_lon)
+        return CityRegistry(self.records[mask])
+
+    # (도시, 주, 위도, 경도) tuple 목록
+    def rows(self):
+        return [(city.decode(), state.decode(), lat, lon) for state, city, lat, lon in self.records.tolist()]
+
+    # 수집기가 쓰는 {주: {도시: (위도, 경도)}} 형식
+    # 주별로 연속된 구간이므로 구간마다 한 번에 dict 를 만든다
+    def to_dict(self):
+        states = self.records['state']
+        if len(states) == 0:
+            return {}
+        cities = [city.decode() for city in self.records['city'].tolist()]
+        coordinates = list(zip(self.latitudes.tolist(), self.longitudes.tolist()))
+        bounds = [0, *(np.flatnonzero(states[1:] != states[:-1]) + 1).tolist(), len(states)]
+        return {states[start].decode(): dict(zip(cities[start:end], coordinates[start:end]))
+                for start, end in zip(bounds[:-1], bounds[1:])}
+
+
+# JSON 을 정렬된 레코드 배열로 바꿔 저장하는 함수 (임시 파일에 쓴 뒤 바꿔치기)
+def compile_registry(source=source_filename, path=None):
+    import json
+    path = path or os.path.join(os.path.dirname(source), registry_filename)
+    with open(source, 'r', encoding='utf-8') as f:
+        city_coordinates = json.load(f)
+    entries = sorted((state.encode(), city.encode(), lat, lon)
+                     for state, cities in city_coordinates.items() for city, (lat, lon) in cities.items())
+    dtype = np.dtype([('state', f"S{max(len(entry[0]) for entry in entries)}"),
+                      ('city', f"S{max(len(entry[1]) for entry in entries)}"),
+                      ('latitude', np.float64), ('longitude', np.float64)])
+    records = np.array(entries, dtype=dtype)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, records)
+    os.replace(tmp_path, path)
+    return records
+
+
+# 레지스트리를 여는 함수 (프로세스마다 한 번만 열고, 필요하면 먼저 컴파일)
+def load(source=source_filename):
+    registry = _registries.get(source)
+    if registry is not None:
+        return registry
+    path = os.path.join(os.path.dirname(source), registry_filename)
+    stale = not os.path.exists(path) or (os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(path))
+    if stale:
+        compile_registry(source, path)
+    registry = CityRegistry(np.load(path, mmap_mode='r'))
+    _registries[source] = registry
+    return registry
+
+
+# 수집기용 {주: {도시: (위도, 경도)}} (주 / 지역 / 범위로 고를 수 있음)
+def city_coordinates(states=None, region=None, bbox=None, source=source_filename):
+    registry = load(source)
+    if states is not None or region is not None or bbox is not None:
+        registry = registry.select(states, region, bbox)
+    return registry.to_dict()
+
+
+# "MIN_LAT,MIN_LON,MAX_LAT,MAX_LON" 문자열을 범위 tuple 로 바꾸는 함수 (None 이면 None)
+def parse_bbox(value):
+    if not value:
+        return None
+    bbox = tuple(float(part) for part in value.split(','))
+    if len(bbox) != 4:
+        raise ValueError(f"Invalid bounding box {value!r}, use MIN_LAT,MIN_LON,MAX_LAT,MAX_LON")
+    return bbox
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Compile or query the city registry")
+    parser.add_argument('--source', type=str, default=source_filename, help="City coordinates JSON (default: city_coordinates.json)")
+    parser.add_argument('--compile', action='store_true', help="Recompile city_registry.npy even if it is up to date")
+    parser.add_argument('--city', type=str, default=None, help="Look up one city as city,state")
+    parser.add_argument('--region', type=str, default=None, choices=list(census_regions), help="List the cities of a region")
+    parser.add_argument('--bbox', type=str, default=None, help="List the cities inside MIN_LAT,MIN_LON,MAX_LAT,MAX_LON")
+    args = parser.parse_args()
+
+    if args.compile:
+        records = compile_registry(args.source)
+        print(f"Compiled {len(records)} cities into {os.path.join(os.path.dirname(args.source), registry_filename)}")
+    registry = load(args.source)
+    if args.city:
+        city, state = args.city.split(',')
+        print(registry.lookup(city, state))
+    elif args.region or args.bbox:
+        for city, state, lat, lon in registry.select(region=args.region, bbox=parse_bbox(args.bbox)).rows():
+            print(f"{city},{state} {lat:.4f},{lon:.4f}")
+    else:
+        print(f"{len(registry)} cities in {len(registry.states())} states")
+
+
+if __name__ == "__main__":
+    main()
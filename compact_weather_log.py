@@ -0,0 +1,331 @@
+import os
+import glob
+import time
+import logging
+import argparse
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from parquet_sink import PartitionedParquetSink
+from weather_rollups import compact_rollups
+
+# weather_log 정리(compaction) 작업
+# 수집기는 실행마다 / 10분마다 파티션 폴더에 작은 파일을 새로 만들고, 같은 관측이 여러 번 저장될 수 있다.
+# 파티션(date=/state=) 마다 새로 생긴 파일만 골라 기존 compacted.parquet 와 합치고
+# - (도시, 관측소, 관측 시각) 이 같은 행은 마지막에 수집한 한 행만 남기고
+# - 관측소 → 관측 시각 순으로 정렬해 큰 row group 으로 다시 쓴다 (zstd, dictionary 인코딩, 통계 포함).
+#   정렬해 두면 row group 의 station / 시각 min/max 범위가 좁아져 weather_query.py 의 필터가 더 많이 건너뛴다.
+# 새 파일이 없는 파티션은 건드리지 않으므로, 주기적으로 돌려도 새로 쌓인 만큼만 일한다.
+# 아직 쓰는 중인 파일은 footer 가 없어 읽히지 않거나 최근에 수정됐으므로 --min-age 가 지날 때까지 건너뛴다.
+
+compacted_filename = 'compacted.parquet'
+compacted_csv_folder = 'weather_data_compacted'
+# 예전 버전이 쓴 하나짜리 CSV 정리본 (다음 실행에서 날짜별 파일로 나뉜다)
+compacted_csv_filename = 'weather_data_compacted.csv.gz'
+
+
+class CompactionStats:
+    def __init__(self, label='Compaction'):
+        self.label = label
+        self.partitions = 0
+        self.files_merged = 0
+        self.files_skipped = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def add(self, files, rows_in, rows_out, bytes_in, bytes_out):
+        self.partitions += 1
+        self.files_merged += files
+        self.rows_in += rows_in
+        self.rows_out += rows_out
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    # 합친 파일 수, 제거한 중복 행 수, 크기 변화를 출력하고 로그에 남기는 함수
+    def report(self):
+        message = (f"{self.label}: {self.files_merged} files merged in {self.partitions} partitions "
+                   f"({self.files_skipped} skipped as too new or unreadable), "
+                   f"{self.rows_in} rows -> {self.rows_out} ({self.rows_in - self.rows_out} duplicates removed), "
+                   f"{self.bytes_in / 1024 / 1024:.1f} MB -> {self.bytes_out / 1024 / 1024:.1f} MB")
+        print(message)
+        logging.info(message)
+
+
+# 중복 판단 키와 정렬 순서를 만드는 함수
+# 관측 시각(observation_time)이 있으면 (관측소, 관측 시각, 도시) 로 비교하고,
+# 없는 예전 행은 수집 시각(timestamp)까지 같아야 중복으로 본다
+def dedupe_keys(table):
+    names = table.column_names
+    work = {}
+    for name in ('station', 'city'):
+        if name in names:
+            column = table.column(name)
+            work[name] = column.cast(pa.string()) if pa.types.is_dictionary(column.type) else column
+    collected = table.column('timestamp').cast(pa.string()) if 'timestamp' in names else None
+    if 'observation_time' in names:
+        observed = table.column('observation_time')
+        work['observation_time'] = observed
+        if collected is not None:
+            work['collected_fallback'] = pc.if_else(pc.is_null(observed), collected, pa.scalar(None, pa.string()))
+    elif collected is not None:
+        work['collected_fallback'] = collected
+    keys = list(work)
+    if collected is not None:
+        work['collected'] = collected
+    sort_order = [name for name in ('station', 'observation_time', 'collected_fallback', 'city', 'collected')
+                  if name in work]
+    return pa.table(work), keys, sort_order
+
+
+# 정렬하고 중복 행을 지우는 함수 (같은 키에서는 마지막에 수집한 행을 남긴다)
+def sort_and_dedupe(table):
+    work, keys, sort_order = dedupe_keys(table)
+    if not keys:
+        return table
+    order = pc.sort_indices(work, sort_keys=[(name, 'ascending') for name in sort_order])
+    table, work = table.take(order), work.take(order)
+    rows = work.select(keys).append_column('row', pa.array(range(work.num_rows), pa.int64()))
+    last = rows.group_by(keys, use_threads=False).aggregate([('row', 'max')]).column('row_max')
+    # 남길 행 번호를 다시 정렬해 정렬 순서를 유지한다
+    return table.take(last.take(pc.sort_indices(last)))
+
+
+# 파일을 읽는 함수 (쓰는 중이라 footer 가 없는 파일은 None)
+def read_parquet(path):
+    try:
+        return pq.read_table(path)
+    except (pa.ArrowInvalid, OSError) as e:
+        logging.warning(f"Skipping unreadable parquet file {path}: {e}")
+        return None
+
+
+# 여러 파일의 테이블을 하나로 합치는 함수 (예전 파일에 없는 열은 null 로 채운다)
+# 예전 파일은 timestamp 를 문자열로 저장했으므로, 한 파일이라도 timestamp 타입이면 모두 초 단위 timestamp 로 맞춘다
+def combine(tables):
+    typed = any('timestamp' in table.column_names and pa.types.is_timestamp(table.schema.field('timestamp').type)
+                for table in tables)
+    if typed:
+        for i, table in enumerate(tables):
+            if 'timestamp' in table.column_names:
+                index = table.schema.get_field_index('timestamp')
+                column = table.column(index)
+                if not pa.types.is_timestamp(column.type):
+                    column = column.cast(pa.timestamp('ns'))
+                tables[i] = table.set_column(index, 'timestamp', column.cast(pa.timestamp('s'), safe=False))
+    return pa.concat_tables(tables, promote_options='permissive')
+
+
+# 정렬된 테이블을 큰 row group 으로 쓰는 함수 (임시 파일에 쓴 뒤 바꿔치기)
+def write_compacted(table, path, row_group_rows, compression, compression_level):
+    sorting = [(name, 'ascending') for name in ('station', 'observation_time', 'timestamp') if name in table.column_names]
+    # 점(.)으로 시작하는 파일은 pyarrow.dataset 이 읽지 않는다
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path, row_group_size=row_group_rows, compression=compression,
+                   compression_level=compression_level, use_dictionary=True, write_statistics=True,
+                   sorting_columns=pq.SortingColumn.from_ordering(table.schema, sorting) if sorting else None)
+    os.replace(tmp_path, path)
+
+
+# 파티션 폴더 목록 (parquet 파일이 있는 가장 안쪽 폴더들)
+def partition_dirs(dataset_root):
+    directories = set()
+    for path in glob.glob(os.path.join(dataset_root, '**', '*.parquet'), recursive=True):
+        directories.add(os.path.dirname(path))
+    return sorted(directories)
+
+
+# 파티션 하나를 정리하는 함수
+def compact_partition(directory, stats, min_age, row_group_rows=131072, compression='zstd', compression_level=3,
+                      dry_run=False):
+    compacted_path = os.path.join(directory, compacted_filename)
+    now = time.time()
+    sources = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.parquet'))):
+        if path == compacted_path:
+            continue
+        if now - os.path.getmtime(path) < min_age:
+            stats.files_skipped += 1
+            continue
+        sources.append(path)
+    if not sources:
+        return
+
+    tables = []
+    merged = []
+    for path in sources:
+        table = read_parquet(path)
+        if table is None:
+            stats.files_skipped += 1
+            continue
+        tables.append(table)
+        merged.append(path)
+    if not tables:
+        return
+    bytes_in = sum(os.path.getsize(path) for path in merged)
+    rows_in = sum(table.num_rows for table in tables)
+    if os.path.exists(compacted_path):
+        existing = read_parquet(compacted_path)
+        if existing is not None:
+            # 기존 정리본도 함께 다시 정렬해야 새 파일과의 중복이 지워진다
+            bytes_in += os.path.getsize(compacted_path)
+            rows_in += existing.num_rows
+            tables.insert(0, existing)
+
+    result = sort_and_dedupe(combine(tables))
+    if dry_run:
+        stats.add(len(merged), rows_in, result.num_rows, bytes_in, bytes_in)
+        return
+    write_compacted(result, compacted_path, row_group_rows, compression, compression_level)
+    # 정리본을 바꿔치기한 뒤에 원본을 지운다 (그 사이에 멈추면 다음 실행에서 다시 합쳐지고 중복은 지워진다)
+    for path in merged:
+        os.remove(path)
+    stats.add(len(merged), rows_in, result.num_rows, bytes_in, os.path.getsize(compacted_path))
+    logging.info(f"Compacted {len(merged)} files into {compacted_path} ({result.num_rows} rows)")
+
+
+def compact_dataset(dataset_root, stats, min_age, **options):
+    for directory in partition_dirs(dataset_root):
+        compact_partition(directory, stats, min_age, **options)
+
+
+# 예전 버전이 weather_log 에 바로 쓴 weather_data_*.parquet 를 파티션 데이터셋으로 옮기는 함수
+# city 열이 있으면 전체 도시 데이터셋(date/state), 없으면 단일 도시 데이터셋(date) 으로 보낸다
+def import_legacy_files(log_folder, min_age, dry_run=False):
+    now = time.time()
+    moved = 0
+    for path in sorted(glob.glob(os.path.join(log_folder, 'weather_data_*.parquet'))):
+        if now - os.path.getmtime(path) < min_age:
+            continue
+        table = read_parquet(path)
+        if table is None or table.num_rows == 0:
+            continue
+        if 'city' in table.column_names and 'state' in table.column_names:
+            root, partition_cols = os.path.join(log_folder, 'weather_data'), ('date', 'state')
+        else:
+            root, partition_cols = os.path.join(log_folder, 'weather_data_single'), ('date',)
+        if not dry_run:
+            sink = PartitionedParquetSink(root, prefix=f"legacy_{os.path.splitext(os.path.basename(path))[0]}",
+                                          partition_cols=partition_cols)
+            sink.write_table(table)
+            sink.close()
+            os.remove(path)
+        moved += 1
+    if moved:
+        print(f"Imported {moved} legacy parquet files into the partitioned datasets")
+
+
+# 테이블의 행을 수집 날짜(timestamp 의 날짜)별로 나누는 함수 → {날짜 문자열: 테이블} (시각이 없으면 'unknown')
+def split_by_date(table):
+    if 'timestamp' not in table.column_names:
+        return {'unknown': table}
+    column = table.column('timestamp')
+    if pa.types.is_timestamp(column.type):
+        dates = pc.strftime(column, format='%Y-%m-%d')
+    else:
+        dates = pc.utf8_slice_codeunits(column.cast(pa.string()), 0, 10)
+    dates = pc.fill_null(dates, 'unknown')
+    return {date: table.filter(pc.equal(dates, date)) for date in sorted(pc.unique(dates).to_pylist())}
+
+
+# 끝난 실행의 CSV 로그들을 수집 날짜별 gzip CSV (weather_data_compacted/date=YYYY-MM-DD.csv.gz) 로 합치는 함수
+# 새 파일의 행이 든 날짜의 정리본만 다시 읽어 중복을 지우고 다시 쓰므로, 일은 전체 기록이 아니라 새 파일과 그 날짜들에 비례한다
+# (Parquet 파티션처럼 중복은 같은 수집 날짜 안에서만 지운다)
+# 예전 버전이 쓴 하나짜리 weather_data_compacted.csv.gz 가 있으면 처음 한 번 날짜별 파일로 나눈다
+def compact_csv(log_folder, stats, min_age, dry_run=False):
+    compacted_folder = os.path.join(log_folder, compacted_csv_folder)
+    legacy_path = os.path.join(log_folder, compacted_csv_filename)
+    now = time.time()
+    sources = [path for path in sorted(glob.glob(os.path.join(log_folder, 'weather_data_*.csv')))
+               if now - os.path.getmtime(path) >= min_age]
+    if os.path.exists(legacy_path):
+        sources.insert(0, legacy_path)
+    if not sources:
+        return
+    tables = []
+    merged = []
+    for path in sources:
+        try:
+            tables.append(pa_csv.read_csv(path))
+            merged.append(path)
+        except (pa.ArrowInvalid, OSError) as e:
+            stats.files_skipped += 1
+            logging.warning(f"Skipping unreadable CSV file {path}: {e}")
+    if not tables:
+        return
+    bytes_in = sum(os.path.getsize(path) for path in merged)
+    rows_in = sum(table.num_rows for table in tables)
+    rows_out = bytes_out = 0
+    if not dry_run:
+        os.makedirs(compacted_folder, exist_ok=True)
+    for date, rows in split_by_date(combine(tables)).items():
+        compacted_path = os.path.join(compacted_folder, f"date={date}.csv.gz")
+        parts = [rows]
+        if os.path.exists(compacted_path):
+            existing = pa_csv.read_csv(compacted_path)
+            bytes_in += os.path.getsize(compacted_path)
+            rows_in += existing.num_rows
+            parts.insert(0, existing)
+        result = sort_and_dedupe(combine(parts))
+        rows_out += result.num_rows
+        if dry_run:
+            continue
+        tmp_path = f"{compacted_path}.{os.getpid()}.tmp"
+        with pa.CompressedOutputStream(tmp_path, 'gzip') as stream:
+            pa_csv.write_csv(result, stream)
+        os.replace(tmp_path, compacted_path)
+        bytes_out += os.path.getsize(compacted_path)
+    if dry_run:
+        stats.add(len(merged), rows_in, rows_out, bytes_in, bytes_in)
+        return
+    # 날짜별 정리본을 모두 바꿔치기한 뒤에 원본을 지운다 (그 사이에 멈추면 다음 실행에서 다시 합쳐지고 중복은 지워진다)
+    for path in merged:
+        os.remove(path)
+    stats.add(len(merged), rows_in, rows_out, bytes_in, bytes_out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge small collector files into sorted, deduplicated files")
+    parser.add_argument('--log-folder', type=str, default='weather_log', help="Collector output folder (default: weather_log)")
+    parser.add_argument('--datasets', type=str, default='weather_data,weather_data_single',
+                        help="Comma separated parquet datasets inside the log folder (default: weather_data,weather_data_single)")
+    parser.add_argument('--min-age', type=float, default=15,
+                        help="Only merge files not modified for this many minutes, so files still being written are left alone (default: 15)")
+    parser.add_argument('--row-group-rows', type=int, default=131072, help="Rows per row group in compacted files (default: 131072)")
+    parser.add_argument('--compression', type=str, default='zstd', help="Parquet compression codec (default: zstd)")
+    parser.add_argument('--compression-level', type=int, default=3, help="Compression level (default: 3)")
+    parser.add_argument('--csv', action='store_true', help="Also merge finished CSV logs into per-date files in weather_data_compacted/")
+    parser.add_argument('--legacy', action='store_true',
+                        help="Move weather_data_*.parquet files written by older versions into the partitioned datasets first")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would be merged")
+    args = parser.parse_args()
+
+    logging.basicConfig(filename=os.path.join(args.log_folder, 'compaction.log'), level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    min_age = args.min_age * 60
+    if args.legacy:
+        import_legacy_files(args.log_folder, min_age, args.dry_run)
+
+    stats = CompactionStats()
+    for name in args.datasets.split(','):
+        dataset_root = os.path.join(args.log_folder, name)
+        if os.path.isdir(dataset_root):
+            compact_dataset(dataset_root, stats, min_age, row_group_rows=args.row_group_rows,
+                            compression=args.compression, compression_level=args.compression_level,
+                            dry_run=args.dry_run)
+    if args.csv:
+        compact_csv(args.log_folder, stats, min_age, args.dry_run)
+    stats.report()
+
+    # 수집기가 수집마다 쓴 집계 변화분 파일들도 파티션별로 하나로 합친다
+    rollup_root = os.path.join(args.log_folder, 'weather_rollups')
+    if os.path.isdir(rollup_root) and not args.dry_run:
+        rollup_stats = CompactionStats('Rollup compaction')
+        compact_rollups(rollup_root, rollup_stats, min_age)
+        rollup_stats.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import os
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from nws_metadata_cache import MetadataCache, extract_point
+import nws_client
+
+# 여러 도시의 7일 예보를 한 번에 모으는 수집기
+# 가까운 도시들은 같은 NWS 격자(office/gridX/gridY)에 속하고 예보는 격자 단위이므로,
+# 도시의 /points 를 (메타데이터 캐시를 거쳐) 격자로 바꾼 뒤 격자마다 forecast 를 한 번만 쓰레드 풀로 동시에 가져온다.
+# 예보는 격자 URL 을 키로 캐시하고, 응답의 Cache-Control / Expires 까지는 다시 요청하지 않으며
+# 만료 뒤에는 ETag / Last-Modified 로 조건부 요청을 보낸다 (304 면 그대로 연장).
+# 결과는 도시 × 예보 구간 한 행씩의 열 단위 표(forecast_schema)로 만들어 실행마다 Parquet 파일 하나로 저장한다.
+# 구간 값은 격자마다 한 번만 열로 모으고, 도시별 행은 격자 행 번호를 take 로 펼쳐 만든다.
+
+log_folder = "weather_log"
+
+# 응답에 만료 헤더가 없을 때 예보를 재사용하는 시간 (초)
+default_forecast_ttl = 3600
+
+# 예보 응답에서 뽑는 구간 열 (extract_forecast 가 채움)
+period_columns = ('period', 'name', 'start_time', 'end_time', 'is_daytime', 'temperature', 'temperature_unit',
+                  'precipitation_probability', 'wind_speed', 'wind_direction', 'short_forecast')
+
+
+def forecast_schema():
+    import pyarrow as pa
+    string_dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('fetched_at', pa.timestamp('s', tz='UTC')),
+        ('generated_at', pa.timestamp('s', tz='UTC')),
+        ('state', string_dictionary),
+        ('city', string_dictionary),
+        ('grid_id', string_dictionary),
+        ('grid_x', pa.int16()),
+        ('grid_y', pa.int16()),
+        ('period', pa.int8()),
+        ('name', string_dictionary),
+        ('start_time', pa.timestamp('s', tz='UTC')),
+        ('end_time', pa.timestamp('s', tz='UTC')),
+        ('is_daytime', pa.bool_()),
+        ('temperature_fahrenheit', pa.float32()),
+        ('temperature_celsius', pa.float32()),
+        ('precipitation_probability', pa.float32()),
+        ('wind_speed_low_mph', pa.float32()),
+        ('wind_speed_high_mph', pa.float32()),
+        ('wind_direction', string_dictionary),
+        ('short_forecast', string_dictionary),
+    ])
+
+
+# 예보 응답에서 구간 값을 열 단위로 뽑는 함수 (구간 목록을 한 번만 돈다)
+def extract_forecast(data):
+    properties = data['properties']
+    columns = {name: [] for name in period_columns}
+    for period in properties.get('periods', []):
+        columns['period'].append(period['number'])
+        columns['name'].append(period.get('name'))
+        columns['start_time'].append(period.get('startTime'))
+        columns['end_time'].append(period.get('endTime'))
+        columns['is_daytime'].append(period.get('isDaytime'))
+        columns['temperature'].append(period.get('temperature'))
+        columns['temperature_unit'].append(period.get('temperatureUnit'))
+        columns['precipitation_probability'].append((period.get('probabilityOfPrecipitation') or {}).get('value'))
+        columns['wind_speed'].append(period.get('windSpeed'))
+        columns['wind_direction'].append(period.get('windDirection'))
+        columns['short_forecast'].append(period.get('shortForecast'))
+    return {'generated_at': properties.get('generatedAt') or properties.get('updateTime'), 'periods': columns}
+
+
+# 격자 키 (office, gridX, gridY)
+def grid_cell(point):
+    return point['grid_id'], point['grid_x'], point['grid_y']
+
+
+class ForecastCollector:
+    def __init__(self, metadata_cache=None, forecast_cache=None, workers=16):
+        self.metadata_cache = metadata_cache if metadata_cache is not None else MetadataCache()
+        self.forecast_cache = (forecast_cache if forecast_cache is not None
+                               else MetadataCache(ttl=default_forecast_ttl, honor_expires=True))
+        self.workers = workers
+        self.cities = 0
+        self.located = 0
+        self.cells = 0
+        self.failed_cities = 0
+        self.failed_cells = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    # 도시 하나의 /points 를 (캐시를 거쳐) 가져오는 함수 (실패하면 None)
+    def _resolve(self, city, state, latitude, longitude):
+        try:
+            return self.metadata_cache.get(f"{nws_client.api_base_url}/points/{latitude},{longitude}", extract_point)
+        except Exception as e:
+            logging.warning(f"Failed to resolve {city}, {state}: {e}")
+            with self._lock:
+                self.failed_cities += 1
+            return None
+
+    # {주: {도시: (위도, 경도)}} 를 {격자: {'forecast': URL, 'cities': [(도시, 주), ...]}} 로 묶는 함수
+    def resolve_cells(self, city_coordinates):
+        cities = [(city, state, latitude, longitude) for state, state_cities in city_coordinates.items()
+                  for city, (latitude, longitude) in state_cities.items()]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            points = list(executor.map(lambda city: self._resolve(*city), cities))
+        cells = {}
+        for (city, state, _, _), point in zip(cities, points):
+            # 바다 / 국외 좌표처럼 예보 격자가 없는 지점은 건너뛴다
+            if point is None or not point.get('forecast'):
+                continue
+            cell = cells.setdefault(grid_cell(point), {'forecast': point['forecast'], 'cities': []})
+            cell['cities'].append((city, state))
+        self.cities += len(cities)
+        self.located += sum(len(cell['cities']) for cell in cells.values())
+        return cells
+
+    # 격자 하나의 예보를 (캐시를 거쳐) 가져오는 함수 (실패하면 None)
+    def _fetch(self, cell, forecast_url):
+        try:
+            return self.forecast_cache.get(forecast_url, extract_forecast)
+        except Exception as e:
+            logging.warning(f"Failed to get the forecast for grid {cell}: {e}")
+            with self._lock:
+                self.failed_cells += 1
+            return None
+
+    # 격자마다 예보를 한 번씩 동시에 가져오는 함수 → {격자: 예보 또는 None}
+    def fetch(self, cells):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            forecasts = executor.map(lambda item: self._fetch(item[0], item[1]['forecast']), cells.items())
+            self.cells += len(cells)
+            return dict(zip(cells, forecasts))
+
+    # 도시 목록의 예보를 모아 표로 돌려주는 함수
+    def collect(self, city_coordinates):
+        start = time.perf_counter()
+        fetched_at = datetime.now(timezone.utc).replace(microsecond=0)
+        cells = self.resolve_cells(city_coordinates)
+        table = forecast_table(cells, self.fetch(cells), fetched_at)
+        self.rows += table.num_rows
+        self.seconds += time.perf_counter() - start
+        return table
+
+    def report(self):
+        shared = self.located - self.cells
+        cache = self.forecast_cache.stats()
+        message = (f"Forecasts: {self.cities} cities in {self.cells} grid cells ({shared} cities shared a cell), "
+                   f"{cache['misses']} fetched, {cache['hits']} cached, {cache['revalidated']} revalidated, "
+                   f"{self.failed_cities} cities and {self.failed_cells} cells failed, {self.rows} rows "
+                   f"in {self.seconds:.1f}s")
+        print(message)
+        logging.info(message)
+
+
+# 격자별 예보를 도시 × 구간 행의 표로 만드는 함수
+# 격자의 구간 열을 한 표로 이어 붙여 단위 변환 / 문자열 해석을 격자 행에서 한 번만 하고,
+# 도시마다 자기 격자의 행 번호를 모아 take 로 펼친다 (행은 주, 도시, 구간 순)
+def forecast_table(cells, forecasts, fetched_at):
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    schema = forecast_schema()
+
+    columns = {name: [] for name in period_columns + ('generated_at',)}
+    grid_ids, grid_x, grid_y = [], [], []
+    offsets = {}
+    for cell, forecast in forecasts.items():
+        if forecast is None:
+            continue
+        start = len(columns['period'])
+        for name, values in forecast['periods'].items():
+            columns[name].extend(values)
+        count = len(columns['period']) - start
+        columns['generated_at'].extend([forecast['generated_at']] * count)
+        grid_ids.extend([cell[0]] * count)
+        grid_x.extend([cell[1]] * count)
+        grid_y.extend([cell[2]] * count)
+        offsets[cell] = (start, count)
+
+    # 격자 행 단위 열 (시각은 오프셋이 붙은 ISO 문자열이므로 UTC timestamp 로 바로 변환된다)
+    timestamp = schema.field('start_time').type
+    temperature = pa.array(columns['temperature'], pa.float32())
+    celsius_unit = pc.equal(pa.array(columns['temperature_unit'], pa.string()), 'C')
+    fahrenheit = pc.if_else(celsius_unit, pc.add(pc.multiply(temperature, 1.8), 32), temperature)
+    wind = pc.extract_regex(pa.array(columns['wind_speed'], pa.string()), r'(?P<low>\d+)(?: to (?P<high>\d+))? mph')
+    wind_low = pc.struct_field(wind, 'low')
+    wind_high = pc.struct_field(wind, 'high')
+    wind_high = pc.if_else(pc.equal(wind_high, ''), wind_low, wind_high)
+    cell_columns = {
+        'generated_at': pa.array(columns['generated_at'], pa.string()).cast(timestamp),
+        'grid_id': pa.array(grid_ids, pa.string()),
+        'grid_x': pa.array(grid_x, pa.int16()),
+        'grid_y': pa.array(grid_y, pa.int16()),
+        'period': pa.array(columns['period'], pa.int8()),
+        'name': pa.array(columns['name'], pa.string()),
+        'start_time': pa.array(columns['start_time'], pa.string()).cast(timestamp),
+        'end_time': pa.array(columns['end_time'], pa.string()).cast(timestamp),
+        'is_daytime': pa.array(columns['is_daytime'], pa.bool_()),
+        'temperature_fahrenheit': fahrenheit.cast(pa.float32()),
+        'temperature_celsius': pc.divide(pc.subtract(fahrenheit, 32), 1.8).cast(pa.float32()),
+        'precipitation_probability': pa.array(columns['precipitation_probability'], pa.float32()),
+        'wind_speed_low_mph': wind_low.cast(pa.float32()),
+        'wind_speed_high_mph': wind_high.cast(pa.float32()),
+        'wind_direction': pa.array(columns['wind_direction'], pa.string()),
+        'short_forecast': pa.array(columns['short_forecast'], pa.string()),
+    }
+
+    # 도시별 행 번호: 자기 격자의 구간 행 전체
+    places = sorted((state, city, cell) for cell, info in cells.items() if cell in offsets
+                    for city, state in info['cities'])
+    if not places:
+        return schema.empty_table()
+    counts = np.array([offsets[cell][1] for _, _, cell in places], dtype=np.int64)
+    starts = np.array([offsets[cell][0] for _, _, cell in places], dtype=np.int64)
+    # 도시 i 의 행은 starts[i] .. starts[i] + counts[i] - 1
+    row_starts = np.repeat(starts - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+    indices = pa.array(row_starts + np.arange(counts.sum()))
+
+    arrays = []
+    for field in schema:
+        if field.name == 'fetched_at':
+            column = pa.array(np.full(len(indices), int(fetched_at.timestamp())), pa.int64()).cast(field.type)
+        elif field.name in ('state', 'city'):
+            names = [state.upper() if field.name == 'state' else city.title() for state, city, _ in places]
+            column = pa.array(names, pa.string()).dictionary_encode().take(np.repeat(np.arange(len(places)), counts))
+        else:
+            column = cell_columns[field.name].take(indices)
+            if pa.types.is_dictionary(field.type):
+                column = column.dictionary_encode()
+        arrays.append(column)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+# 예보 표를 {folder}/date=YYYY-MM-DD/forecast_HHMMSS.parquet 으로 저장하는 함수 (임시 파일에 쓴 뒤 바꿔치기)
+def write_forecasts(table, folder, fetched_at):
+    import pyarrow.parquet as pq
+    directory = os.path.join(folder, f"date={fetched_at:%Y-%m-%d}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"forecast_{fetched_at:%H%M%S}.parquet")
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    return path
+
+
+# 가장 최근에 저장된 예보 표를 읽는 함수 (주 / 도시로 거를 수 있음, 없으면 None)
+def read_latest(folder=os.path.join(log_folder, "weather_forecasts"), states=None, cities=None):
+    import pyarrow.parquet as pq
+    import pyarrow.compute as pc
+    paths = sorted(os.path.join(root, name) for root, _, names in os.walk(folder)
+                   for name in names if name.startswith('forecast_') and name.endswith('.parquet'))
+    if not paths:
+        return None
+    table = pq.read_table(paths[-1])
+    if states:
+        table = table.filter(pc.is_in(table['state'].cast('string'), value_set=pc.cast([s.upper() for s in states], 'string')))
+    if cities:
+        table = table.filter(pc.is_in(table['city'].cast('string'), value_set=pc.cast([c.title() for c in cities], 'string')))
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect 7-day forecasts for many cities, one request per NWS grid cell")
+    parser.add_argument('--region', type=str, default=None,
+                        help="Only the cities of this census region: northeast, midwest, south or west (default: all)")
+    parser.add_argument('--bbox', type=str, default=None,
+                        help="Only the cities inside MIN_LAT,MIN_LON,MAX_LAT,MAX_LON (default: all)")
+    parser.add_argument('--workers', type=int, default=16, help="Concurrent requests (default: 16)")
+    parser.add_argument('--rate', type=float, default=nws_client.default_rate,
+                        help="Starting request rate in requests/second, adapted on 429/5xx (default: 5)")
+    parser.add_argument('--metadata-ttl', type=float, default=24,
+                        help="Hours to reuse cached /points metadata before revalidating (default: 24)")
+    parser.add_argument('--forecast-ttl', type=float, default=default_forecast_ttl,
+                        help="Seconds to reuse a forecast when the response has no Cache-Control or Expires (default: 3600)")
+    parser.add_argument('--output', type=str, default=os.path.join(log_folder, "weather_forecasts"),
+                        help="Folder of the forecast dataset (default: weather_log/weather_forecasts)")
+    args = parser.parse_args()
+
+    import city_registry
+    try:
+        city_coordinates = city_registry.city_coordinates(region=args.region, bbox=city_registry.parse_bbox(args.bbox))
+    except ValueError as e:
+        parser.error(str(e))
+    if not city_coordinates:
+        print("Error: No cities in the selected region or bounding box.")
+        return
+
+    os.makedirs(log_folder, exist_ok=True)
+    logging.basicConfig(filename=os.path.join(log_folder, "forecast_collector.log"), level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    nws_client.configure_rate_limit(rate=args.rate)
+    nws_client.configure_session(pool_size=max(args.workers, nws_client.default_pool_size))
+    metadata_cache = MetadataCache(os.path.join(log_folder, "nws_metadata_cache.json"), ttl=args.metadata_ttl * 3600)
+    forecast_cache = MetadataCache(os.path.join(log_folder, "forecast_cache.json"), ttl=args.forecast_ttl,
+                                   honor_expires=True)
+    collector = ForecastCollector(metadata_cache, forecast_cache, workers=args.workers)
+
+    fetched_at = datetime.now(timezone.utc)
+    table = collector.collect(city_coordinates)
+    metadata_cache.save()
+    forecast_cache.save()
+    path = write_forecasts(table, args.output, fetched_at)
+    collector.report()
+    nws_client.report()
+    print(f"Saved {table.num_rows} forecast rows to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,21 @@
-import requests
+import nws_client
+from nws_client import api_base_url
 
 # 댈러스의 위도와 경도
 latitude = 32.7767
 longitude = -96.7970
 
 # NWS API 엔드포인트
-points_url = f"https://api.weather.gov/points/{latitude},{longitude}"
+points_url = f"{api_base_url}/points/{latitude},{longitude}"
 
 # 위치 정보 가져오기
-response = requests.get(points_url)
-data = response.json()
+data = nws_client.get_json(points_url)
 
 # 관측소 URL 추출
 observation_stations_url = data['properties']['observationStations']
 
 # 관측소 데이터 가져오기
-stations_response = requests.get(observation_stations_url)
-stations_data = stations_response.json()
+stations_data = nws_client.get_json(observation_stations_url)
 stations = stations_data['observationStations']
 
 # 첫 번째 관측소 데이터 가져오기
@@ -24,8 +23,7 @@ station_url = stations[0]
 
 # 현재 날씨 데이터 가져오기
 current_weather_url = f"{station_url}/observations/latest"
-current_weather_response = requests.get(current_weather_url)
-current_weather_data = current_weather_response.json()
+current_weather_data = nws_client.get_json(current_weather_url)
 
 # 현재 날씨 정보 출력
 current_observation = current_weather_data['properties']
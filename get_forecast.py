@@ -1,4 +1,5 @@
-import requests
+import nws_client
+from nws_client import api_base_url
 import pandas as pd
 import matplotlib.pyplot as plt
 
@@ -7,16 +8,14 @@ latitude = 32.7767
 longitude = -96.7970
 
 # NWS API 엔드포인트
-points_url = f"https://api.weather.gov/points/{latitude},{longitude}"
-response = requests.get(points_url)
-data = response.json()
+points_url = f"{api_base_url}/points/{latitude},{longitude}"
+data = nws_client.get_json(points_url)
 
 # 예보 URL 추출
 forecast_url = data['properties']['forecast']
 
 # 예보 데이터 가져오기
-forecast_response = requests.get(forecast_url)
-forecast_data = forecast_response.json()
+forecast_data = nws_client.get_json(forecast_url)
 
 # 날짜별 최고/최저 온도 데이터 추출
 periods = forecast_data['properties']['periods']
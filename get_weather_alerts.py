@@ -1,23 +1,22 @@
-import requests
+import nws_client
+from nws_client import api_base_url
 
 # 댈러스의 위도와 경도
 latitude = 32.7767
 longitude = -96.7970
 
 # NWS API 엔드포인트
-points_url = f"https://api.weather.gov/points/{latitude},{longitude}"
+points_url = f"{api_base_url}/points/{latitude},{longitude}"
 
 # 위치 정보 가져오기
-response = requests.get(points_url)
-data = response.json()
+data = nws_client.get_json(points_url)
 
 # 경고 및 알림 URL 추출
 forecast_zone_url = data['properties']['forecastZone']
 
 # 경고 및 알림 데이터 가져오기
-alerts_url = f"https://api.weather.gov/alerts/active?zone={forecast_zone_url.split('/')[-1]}"
-alerts_response = requests.get(alerts_url)
-alerts_data = alerts_response.json()
+alerts_url = f"{api_base_url}/alerts/active?zone={forecast_zone_url.split('/')[-1]}"
+alerts_data = nws_client.get_json(alerts_url)
 
 # 경고 및 알림 정보 출력
 alerts = alerts_data['features']
@@ -0,0 +1,303 @@
+import os
+import re
+import time
+import json
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import nws_client
+
+# NWS /gridpoints/{office}/{x},{y} 의 시간별 격자 자료 층(기온, 이슬점, 운량, 강수량 등)을 모으는 수집기
+# 층마다 값이 "시작 시각/ISO 8601 기간" (validTime) 구간으로 오므로, 이를 해석해 모든 격자가 같은 시간 축을 쓰는
+# 촘촘한 시간별 numpy 배열 (격자 × 시간) 로 펼친다.
+# 해석과 펼치기는 값 하나씩 돌지 않는다: 여러 격자 / 층의 validTime 을 한 배열로 모아 pyarrow 로 시작 시각을 한 번에 변환하고,
+# 기간 문자열은 종류가 몇 개뿐이므로 서로 다른 것만 해석한 뒤, 구간마다 시간 수만큼 np.repeat 으로 늘려 한 번에 채워 넣는다.
+# 구간 전체의 합계인 층(강수량 등)은 시간별로 나눠 담는다.
+# 결과는 격자 × 시간 한 행씩, 층마다 float32 열 하나인 Parquet 파일로 저장한다 (격자, 시간 순이라 read_gridpoints 가 다시 배열로 바로 바꾼다).
+
+log_folder = "weather_log"
+
+# 기본으로 펼치는 층 (NWS 층 이름)
+default_layers = ('temperature', 'dewpoint', 'relativeHumidity', 'skyCover', 'windDirection', 'windSpeed', 'windGust',
+                  'probabilityOfPrecipitation', 'quantitativePrecipitation')
+
+# 구간 전체의 합계인 층 (시간별로 펼칠 때 구간의 시간 수로 나눈다)
+accumulated_layers = ('quantitativePrecipitation', 'snowfallAmount', 'iceAccumulation')
+
+duration_pattern = re.compile(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?')
+
+
+# ISO 8601 기간 문자열 (예: PT1H, P1DT6H) 을 초로 바꾸는 함수
+def parse_duration(text):
+    match = duration_pattern.fullmatch(text)
+    if match is None:
+        raise ValueError(f"Unsupported ISO 8601 duration: {text!r}")
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+# NWS 층 이름을 열 이름으로 바꾸는 함수 (예: relativeHumidity → relative_humidity)
+def column_name(layer):
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', layer).lower()
+
+
+# /gridpoints 응답에서 고른 층의 (단위, validTime 목록, 값 목록) 을 뽑는 함수
+def extract_layers(data, layers=default_layers):
+    properties = data['properties']
+    extracted = {}
+    for name in layers:
+        layer = properties.get(name)
+        if not layer:
+            continue
+        values = layer.get('values', [])
+        extracted[name] = (layer.get('uom'), [value['validTime'] for value in values],
+                           [value['value'] for value in values])
+    return {'update_time': properties.get('updateTime'), 'layers': extracted}
+
+
+# validTime 문자열 배열을 (시작 시각 epoch 초, 기간 초) numpy 배열로 바꾸는 함수
+def parse_valid_times(valid_times):
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    parts = pc.split_pattern(pa.array(valid_times, pa.string()), '/', max_splits=1)
+    # 시작 시각은 오프셋이 붙은 ISO 문자열이므로 UTC timestamp 로 바로 변환된다
+    starts = pc.list_element(parts, 0).cast(pa.timestamp('s', tz='UTC')).cast(pa.int64()).to_numpy()
+    durations = pc.list_element(parts, 1).dictionary_encode()
+    seconds = np.array([parse_duration(text) for text in durations.dictionary.to_pylist()], dtype=np.int64)
+    return starts, seconds[durations.indices.to_numpy()]
+
+
+# 여러 격자의 층을 같은 시간별 축으로 펼치는 함수
+# cells 는 extract_layers 결과의 목록, start 는 축의 첫 시각 (datetime, 없으면 가장 이른 구간의 정시),
+# hours 는 축 길이 (없으면 가장 늦게 끝나는 구간까지)
+# → (시각 numpy datetime64[s] 배열, {층: float32 배열 (격자 수, 시간 수), 값이 없으면 NaN}, {층: 단위})
+def expand_hourly(cells, layers=default_layers, start=None, hours=None):
+    import numpy as np
+    valid_times, values = [], []
+    segment_cells, segment_layers, segment_counts = [], [], []
+    units = {}
+    for c, cell in enumerate(cells):
+        for k, name in enumerate(layers):
+            layer = cell['layers'].get(name)
+            if layer is None:
+                continue
+            uom, layer_times, layer_values = layer
+            units.setdefault(name, uom)
+            valid_times.extend(layer_times)
+            values.extend(layer_values)
+            segment_cells.append(c)
+            segment_layers.append(k)
+            segment_counts.append(len(layer_times))
+
+    if not valid_times:
+        first_hour = int(start.timestamp() // 3600) if start is not None else 0
+        hours = hours or 0
+        times = (np.arange(hours, dtype=np.int64) + first_hour) * 3600
+        return times.astype('datetime64[s]'), {name: np.full((len(cells), hours), np.nan, np.float32) for name in layers}, units
+
+    starts, durations = parse_valid_times(valid_times)
+    # None 은 NaN 이 된다
+    values = np.array(values, dtype=np.float64)
+    cell_index = np.repeat(np.array(segment_cells, dtype=np.int64), segment_counts)
+    layer_index = np.repeat(np.array(segment_layers, dtype=np.int64), segment_counts)
+
+    # 구간을 정시 단위로: 시작은 내림, 끝은 올림 (최소 한 시간)
+    start_hours = starts // 3600
+    lengths = np.maximum(-((starts + durations) // -3600) - start_hours, 1)
+    first_hour = int(start.timestamp() // 3600) if start is not None else int(start_hours.min())
+    if hours is None:
+        hours = int((start_hours + lengths).max()) - first_hour
+    accumulated = np.isin(layer_index, [k for k, name in enumerate(layers) if name in accumulated_layers])
+    values = np.where(accumulated, values / lengths, values)
+
+    # 구간 i 가 차지하는 축 위치: start_hours[i] - first_hour 부터 lengths[i] 칸
+    # (구간마다 시간 수만큼 늘린 뒤 구간 안의 순번을 더한다)
+    total = int(lengths.sum())
+    segment_starts = np.cumsum(lengths) - lengths
+    columns = np.repeat(start_hours - first_hour - segment_starts, lengths) + np.arange(total)
+    inside = (columns >= 0) & (columns < hours)
+    grid = np.full((len(layers), len(cells), hours), np.nan, dtype=np.float32)
+    grid[np.repeat(layer_index, lengths)[inside], np.repeat(cell_index, lengths)[inside], columns[inside]] = \
+        np.repeat(values, lengths)[inside]
+
+    times = ((np.arange(hours, dtype=np.int64) + first_hour) * 3600).astype('datetime64[s]')
+    return times, {name: grid[k] for k, name in enumerate(layers)}, units
+
+
+# 펼친 배열을 격자 × 시간 한 행씩의 표로 만드는 함수 (격자, 시간 순)
+# cell_keys 는 격자 (office, gridX, gridY) 목록, 단위는 열 메타데이터로 남긴다
+def gridpoint_table(cell_keys, times, arrays, units):
+    import numpy as np
+    import pyarrow as pa
+    hours = len(times)
+    rows = np.repeat(np.arange(len(cell_keys)), hours)
+    fields = [
+        pa.field('grid_id', pa.dictionary(pa.int32(), pa.string())),
+        pa.field('grid_x', pa.int16()),
+        pa.field('grid_y', pa.int16()),
+        pa.field('valid_time', pa.timestamp('s', tz='UTC')),
+    ]
+    columns = [
+        pa.array([key[0] for key in cell_keys], pa.string()).dictionary_encode().take(rows),
+        pa.array(np.array([key[1] for key in cell_keys], dtype=np.int16)[rows]),
+        pa.array(np.array([key[2] for key in cell_keys], dtype=np.int16)[rows]),
+        pa.array(np.tile(times.astype(np.int64), len(cell_keys))).cast(pa.timestamp('s', tz='UTC')),
+    ]
+    for name, array in arrays.items():
+        values = array.ravel()
+        fields.append(pa.field(column_name(name), pa.float32(), metadata={'uom': units.get(name) or ''}))
+        columns.append(pa.array(values, pa.float32(), mask=np.isnan(values)))
+    schema = pa.schema(fields, metadata={'hours': str(hours)})
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+# 표를 {folder}/date=YYYY-MM-DD/gridpoints_HHMMSS.parquet 으로 저장하는 함수 (임시 파일에 쓴 뒤 바꿔치기)
+# 실수 열은 byte stream split 으로 바이트 자리별로 모아 zstd 로 압축한다 (이웃 시간 값이 비슷해 잘 줄어든다)
+def write_gridpoints(table, folder, fetched_at):
+    import pyarrow.parquet as pq
+    directory = os.path.join(folder, f"date={fetched_at:%Y-%m-%d}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"gridpoints_{fetched_at:%H%M%S}.parquet")
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    float_columns = [field.name for field in table.schema if str(field.type) == 'float']
+    pq.write_table(table, tmp_path, compression='zstd', use_byte_stream_split=float_columns,
+                   row_group_size=max(int(table.schema.metadata[b'hours']), 1) * 1024)
+    os.replace(tmp_path, path)
+    return path
+
+
+# 저장한 파일을 다시 배열로 읽는 함수 → (격자 목록, 시각 배열, {열 이름: float32 배열 (격자 수, 시간 수)})
+def read_gridpoints(path, columns=None):
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pq.read_schema(path)
+    hours = int(schema.metadata[b'hours'])
+    layer_columns = [name for name in schema.names if name not in ('grid_id', 'grid_x', 'grid_y', 'valid_time')]
+    if columns is not None:
+        layer_columns = [name for name in layer_columns if name in columns]
+    table = pq.read_table(path, columns=['grid_id', 'grid_x', 'grid_y', 'valid_time'] + layer_columns)
+    cells = table.num_rows // hours if hours else 0
+    grid_ids = table['grid_id'].cast('string').to_numpy(zero_copy_only=False)[::hours] if hours else []
+    grid_x = table['grid_x'].to_numpy()[::hours] if hours else []
+    grid_y = table['grid_y'].to_numpy()[::hours] if hours else []
+    cell_keys = [(grid_id, int(x), int(y)) for grid_id, x, y in zip(grid_ids, grid_x, grid_y)]
+    # Parquet 에는 초 단위 timestamp 가 없어 ms 로 저장되므로 초로 되돌린다
+    times = table['valid_time'].cast(pa.timestamp('s', tz='UTC')).cast(pa.int64()).to_numpy()[:hours].astype('datetime64[s]')
+    arrays = {name: table[name].to_numpy().astype(np.float32).reshape(cells, hours) for name in layer_columns}
+    return cell_keys, times, arrays
+
+
+class GridpointIngest:
+    def __init__(self, layers=default_layers, workers=16):
+        self.layers = layers
+        self.workers = workers
+        self.cells = 0
+        self.failed = 0
+        self.values = 0
+        self.rows = 0
+        self.fetch_seconds = 0.0
+        self.expand_seconds = 0.0
+        self._lock = threading.Lock()
+
+    # 격자 하나의 자료를 받아 층을 뽑는 함수 (실패하면 None)
+    def _fetch(self, cell):
+        office, x, y = cell
+        try:
+            response = nws_client.get(f"{nws_client.api_base_url}/gridpoints/{office}/{x},{y}")
+            response.raise_for_status()
+            return extract_layers(json.loads(response.content), self.layers)
+        except Exception as e:
+            logging.warning(f"Failed to get the grid data for {office}/{x},{y}: {e}")
+            with self._lock:
+                self.failed += 1
+            return None
+
+    # 격자 목록의 자료를 쓰레드 풀로 동시에 받아 펼치는 함수 → (받은 격자 목록, 시각, {층: 배열}, {층: 단위})
+    def ingest(self, cell_keys, start=None, hours=None):
+        fetch_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            extracted = list(executor.map(self._fetch, cell_keys))
+        self.fetch_seconds += time.perf_counter() - fetch_start
+
+        expand_start = time.perf_counter()
+        fetched = [(key, cell) for key, cell in zip(cell_keys, extracted) if cell is not None]
+        cells = [cell for _, cell in fetched]
+        times, arrays, units = expand_hourly(cells, self.layers, start, hours)
+        self.expand_seconds += time.perf_counter() - expand_start
+        self.cells += len(cell_keys)
+        self.values += sum(len(layer[1]) for cell in cells for layer in cell['layers'].values())
+        self.rows += len(cells) * len(times)
+        return [key for key, _ in fetched], times, arrays, units
+
+    def report(self):
+        message = (f"Gridpoints: {self.cells} grid cells, {self.failed} failed, {self.values} validTime values "
+                   f"expanded to {self.rows} hourly rows; fetch and parse {self.fetch_seconds:.1f}s, "
+                   f"expand {self.expand_seconds:.2f}s")
+        print(message)
+        logging.info(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest NWS gridpoint layers as dense hourly arrays")
+    parser.add_argument('--region', type=str, default=None,
+                        help="Only the grid cells of the cities in this census region: northeast, midwest, south or west (default: all)")
+    parser.add_argument('--bbox', type=str, default=None,
+                        help="Only the grid cells of the cities inside MIN_LAT,MIN_LON,MAX_LAT,MAX_LON (default: all)")
+    parser.add_argument('--layers', type=str, default=','.join(default_layers),
+                        help="Comma separated NWS layer names (default: temperature, dewpoint, ..., quantitativePrecipitation)")
+    parser.add_argument('--hours', type=int, default=None, help="Hours from the current hour to keep (default: all)")
+    parser.add_argument('--workers', type=int, default=16, help="Concurrent requests (default: 16)")
+    parser.add_argument('--rate', type=float, default=nws_client.default_rate,
+                        help="Starting request rate in requests/second, adapted on 429/5xx (default: 5)")
+    parser.add_argument('--metadata-ttl', type=float, default=24,
+                        help="Hours to reuse cached /points metadata before revalidating (default: 24)")
+    parser.add_argument('--output', type=str, default=os.path.join(log_folder, "weather_gridpoints"),
+                        help="Folder of the gridpoint dataset (default: weather_log/weather_gridpoints)")
+    args = parser.parse_args()
+
+    import city_registry
+    try:
+        city_coordinates = city_registry.city_coordinates(region=args.region, bbox=city_registry.parse_bbox(args.bbox))
+    except ValueError as e:
+        parser.error(str(e))
+    if not city_coordinates:
+        print("Error: No cities in the selected region or bounding box.")
+        return
+
+    os.makedirs(log_folder, exist_ok=True)
+    logging.basicConfig(filename=os.path.join(log_folder, "gridpoint_ingest.log"), level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    nws_client.configure_rate_limit(rate=args.rate)
+    nws_client.configure_session(pool_size=max(args.workers, nws_client.default_pool_size))
+
+    # 도시 → 격자 변환은 예보 수집기와 같은 /points 캐시를 쓴다
+    from nws_metadata_cache import MetadataCache
+    from forecast_collector import ForecastCollector
+    metadata_cache = MetadataCache(os.path.join(log_folder, "nws_metadata_cache.json"), ttl=args.metadata_ttl * 3600)
+    cells = ForecastCollector(metadata_cache, workers=args.workers).resolve_cells(city_coordinates)
+    metadata_cache.save()
+
+    fetched_at = datetime.now(timezone.utc)
+    start = fetched_at.replace(minute=0, second=0, microsecond=0) if args.hours else None
+    ingest = GridpointIngest(layers=tuple(args.layers.split(',')), workers=args.workers)
+    cell_keys, times, arrays, units = ingest.ingest(sorted(cells), start, args.hours)
+    if not cell_keys or not len(times):
+        # 모든 요청이 실패했거나 고른 층이 하나도 없으면 빈 파일을 쓰지 않는다
+        ingest.report()
+        nws_client.report()
+        message = "No grid data to save"
+        print(message)
+        logging.warning(message)
+        return
+    path = write_gridpoints(gridpoint_table(cell_keys, times, arrays, units), args.output, fetched_at)
+    ingest.report()
+    nws_client.report()
+    print(f"Saved {len(cell_keys)} grid cells × {len(times)} hours to {path} ({os.path.getsize(path) / 1e6:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
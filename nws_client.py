@@ -0,0 +1,270 @@
+import os
+import math
+import threading
+import logging
+import time
+import rate_limiter as rl
+
+# 모든 스크립트와 수집기가 함께 쓰는 NWS API 클라이언트
+# - keep-alive 연결을 재사용하는 requests.Session (연결 풀 크기는 수집기 동시성에 맞춤)
+# - gzip 압축 전송, NWS 가 요구하는 User-Agent, 일정한 timeout
+# - 새 연결 / 재사용 / TLS 핸드셰이크 횟수 집계
+# - 모든 쓰레드가 함께 쓰는 적응형 속도 제한과 429/5xx 재시도 (rate_limiter.py)
+# requests / urllib3 는 import 비용이 크므로 처음 세션을 만들 때 import 한다 (--help 나 라이브러리 import 는 가볍게)
+
+# NWS API 기본 주소 (벤치마크 시 로컬 모의 서버로 바꿀 수 있음)
+api_base_url = os.environ.get('NWS_API_BASE', 'https://api.weather.gov')
+
+# NWS API 는 User-Agent 가 없으면 요청을 거부하므로 항상 보낸다 (연락처를 NWS_USER_AGENT 로 지정 권장)
+user_agent = os.environ.get('NWS_USER_AGENT',
+                            'nws-weather-visualization/1.0 (https://github.com/Eucalyptuss/nws-weather-visualization)')
+
+# (연결 timeout, 읽기 timeout) 초
+default_timeout = (5, 15)
+
+default_pool_size = 10
+
+# 전체 요청 속도 (초당 요청 수). NWS 는 한도를 공개하지 않으므로 보수적으로 시작해 성공하면 천천히 올린다
+default_rate = float(os.environ.get('NWS_RATE_LIMIT', 5))
+
+rate_limiter = rl.AdaptiveRateLimiter(rate=default_rate)
+retry_policy = rl.RetryPolicy()
+
+
+def default_headers():
+    return {
+        'User-Agent': user_agent,
+        'Accept': 'application/geo+json',
+        'Accept-Encoding': 'gzip, deflate',
+    }
+
+
+# 요청 지연 시간 히스토그램 (p50 / p99 용)
+# 요청마다 값을 저장하지 않고 0.1ms 부터 10% 간격의 로그 구간에 세므로 오래 돌아도 메모리가 늘지 않는다 (오차 10% 이내)
+class LatencyHistogram:
+    base_ms = 0.1
+    growth = 1.1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.total = 0
+
+    def record(self, seconds):
+        milliseconds = max(seconds * 1000, self.base_ms)
+        bucket = int(math.log(milliseconds / self.base_ms, self.growth))
+        with self._lock:
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+            self.total += 1
+
+    # q 분위 (0~1) 지연 시간 ms (구간의 위쪽 경계). 기록이 없으면 None
+    def percentile(self, q):
+        with self._lock:
+            if not self.total:
+                return None
+            rank = max(1, math.ceil(q * self.total))
+            seen = 0
+            for bucket in sorted(self.counts):
+                seen += self.counts[bucket]
+                if seen >= rank:
+                    return self.base_ms * self.growth ** (bucket + 1)
+
+
+# 연결 재사용 통계
+class ConnectionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.latency = LatencyHistogram()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_new_connection(self, scheme):
+        with self._lock:
+            self.new_connections += 1
+            if scheme == 'https':
+                self.tls_handshakes += 1
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            snapshot = {'requests': self.requests, 'new_connections': self.new_connections,
+                        'reused_connections': reused, 'tls_handshakes': self.tls_handshakes}
+        snapshot['latency_p50_ms'] = self.latency.percentile(0.5)
+        snapshot['latency_p99_ms'] = self.latency.percentile(0.99)
+        return snapshot
+
+    # 연결 재사용률과 TLS 핸드셰이크 횟수를 출력하고 로그에 남기는 함수
+    def report(self):
+        stats = self.snapshot()
+        ratio = stats['reused_connections'] / stats['requests'] * 100 if stats['requests'] else 0.0
+        message = (f"HTTP: {stats['requests']} requests, {stats['new_connections']} new connections, "
+                   f"{stats['reused_connections']} reused ({ratio:.0f}%), {stats['tls_handshakes']} TLS handshakes")
+        if stats['latency_p50_ms'] is not None:
+            message += f", latency p50 {stats['latency_p50_ms']:.1f} ms / p99 {stats['latency_p99_ms']:.1f} ms"
+        print(message)
+        logging.info(message)
+
+
+connection_stats = ConnectionStats()
+
+
+_adapter_class = None
+
+
+# 새 연결이 만들어질 때마다 횟수를 세는 urllib3 연결 풀을 쓰는 requests 어댑터 클래스를 만드는 함수 (한 번만)
+def _counting_adapter():
+    global _adapter_class
+    if _adapter_class is not None:
+        return _adapter_class
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class _CountingHTTPConnectionPool(HTTPConnectionPool):
+        def _new_conn(self):
+            connection_stats.record_new_connection('http')
+            return super()._new_conn()
+
+    class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        def _new_conn(self):
+            connection_stats.record_new_connection('https')
+            return super()._new_conn()
+
+    class _CountingAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': _CountingHTTPConnectionPool,
+                'https': _CountingHTTPSConnectionPool,
+            }
+
+        def send(self, request, **kwargs):
+            connection_stats.record_request()
+            if kwargs.get('timeout') is None:
+                kwargs['timeout'] = default_timeout
+            return super().send(request, **kwargs)
+
+    _adapter_class = _CountingAdapter
+    return _adapter_class
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _new_session(pool_size):
+    import requests
+    session = requests.Session()
+    session.headers.update(default_headers())
+    adapter = _counting_adapter()(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# 연결 풀 크기를 정해 공유 세션을 (다시) 만드는 함수
+# 쓰레드 수집기는 동시에 요청하는 쓰레드 수만큼 풀 크기를 잡아야 연결을 버리지 않고 재사용한다
+def configure_session(pool_size=default_pool_size):
+    global _session
+    session = _new_session(pool_size)
+    with _session_lock:
+        old_session, _session = _session, session
+    if old_session is not None:
+        old_session.close()
+    return session
+
+
+# 공유 세션을 돌려주는 함수 (처음 호출 시 기본 풀 크기로 생성)
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _new_session(default_pool_size)
+        return _session
+
+
+# 속도 제한을 다시 설정하는 함수 (수집기 시작 시 CLI 값으로 호출)
+def configure_rate_limit(rate=default_rate, retry_budget=None, max_rate=None):
+    global rate_limiter
+    rate_limiter = rl.AdaptiveRateLimiter(rate=rate, max_rate=max_rate)
+    if retry_budget is not None:
+        retry_policy.budget = retry_budget
+        retry_policy.reset()
+
+
+# 새 수집(sweep)을 시작할 때 재시도 예산을 다시 채우는 함수
+def start_sweep():
+    retry_policy.reset()
+
+
+# GET 요청을 보내고 응답을 돌려주는 함수
+# 속도 제한 토큰을 받은 뒤 보내고, 429/5xx 나 연결 오류는 재시도 예산 안에서 백오프 후 다시 보낸다
+# 재시도를 다 쓰면 마지막 응답을 그대로 돌려주거나 (raise_for_status 는 호출한 쪽에서) 마지막 예외를 올린다
+def get(url, headers=None, timeout=None, **kwargs):
+    import requests
+    session = get_session()
+    attempt = 0
+    while True:
+        attempt += 1
+        rate_limiter.acquire()
+        # 지연 시간은 속도 제한 대기를 뺀 요청 한 번(재시도는 각각)의 시간 (본문을 다 받을 때까지)
+        start = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, timeout=timeout or default_timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            connection_stats.latency.record(time.perf_counter() - start)
+            if not retry_policy.allow(attempt):
+                raise
+            time.sleep(retry_policy.delay(attempt))
+            continue
+        connection_stats.latency.record(time.perf_counter() - start)
+
+        if response.status_code not in rl.retryable_status:
+            rate_limiter.on_success()
+            return response
+        retry_after = rl.parse_retry_after(response.headers.get('Retry-After'))
+        rate_limiter.on_throttle(retry_after)
+        if not retry_policy.allow(attempt):
+            return response
+        response.close()
+        time.sleep(retry_policy.delay(attempt, retry_after))
+
+
+# GET 요청을 보내 JSON 을 돌려주는 함수 (HTTP 에러는 예외로 올림)
+def get_json(url, headers=None, timeout=None):
+    response = get(url, headers=headers, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+# 연결 / 속도 제한 / 재시도 통계를 출력하는 함수
+def report():
+    connection_stats.report()
+    rl.report(rate_limiter, retry_policy)
+
+
+# aiohttp 세션에서 요청 수와 새 연결(및 TLS 핸드셰이크) 횟수를 세는 TraceConfig 를 만드는 함수
+def aiohttp_trace_config():
+    import aiohttp
+
+    async def on_request_start(session, context, params):
+        context.scheme = params.url.scheme
+        context.start = time.perf_counter()
+        connection_stats.record_request()
+
+    # aiohttp 는 응답 헤더를 받으면 끝난 것으로 보므로 본문 읽기 시간은 빠진다
+    async def on_request_end(session, context, params):
+        connection_stats.latency.record(time.perf_counter() - context.start)
+
+    async def on_connection_create_end(session, context, params):
+        connection_stats.record_new_connection(getattr(context, 'scheme', 'http'))
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config
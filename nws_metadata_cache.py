@@ -0,0 +1,152 @@
+import os
+import re
+import json
+import time
+import threading
+import logging
+import nws_client
+from rate_limiter import parse_retry_after
+
+# NWS 메타데이터 (points → grid/zone/stations, 관측소 이름/위치) 디스크 캐시
+# 이 데이터는 거의 바뀌지 않으므로 TTL 동안은 요청 없이 재사용하고,
+# TTL이 지나면 ETag / Last-Modified 로 조건부 요청을 보내 304면 그대로 연장한다.
+# 키는 요청 URL 전체이므로 API 주소가 바뀌면 (예: 모의 서버) 자연스럽게 따로 저장된다.
+# honor_expires 를 켜면 (예보처럼 자주 바뀌는 응답) 항목마다 응답의 Cache-Control max-age / Expires 까지만 쓰고,
+# 그 헤더가 없을 때만 TTL 을 쓴다.
+
+default_ttl = 24 * 3600
+
+
+# /points 응답에서 필요한 값만 추출하는 함수
+def extract_point(data):
+    properties = data['properties']
+    return {
+        'grid_id': properties.get('gridId'),
+        'grid_x': properties.get('gridX'),
+        'grid_y': properties.get('gridY'),
+        'forecast': properties.get('forecast'),
+        'forecast_zone': properties.get('forecastZone'),
+        'county': properties.get('county'),
+        'observation_stations': properties['observationStations'],
+    }
+
+
+# 관측소 목록 응답에서 관측소 URL 리스트를 추출하는 함수
+def extract_station_list(data):
+    return data['observationStations']
+
+
+# 관측소 응답에서 이름과 좌표를 추출하는 함수
+def extract_station(data):
+    return {
+        'name': data['properties']['name'],
+        'coordinates': data['geometry']['coordinates'],
+    }
+
+
+class MetadataCache:
+    def __init__(self, path=None, ttl=default_ttl, honor_expires=False):
+        self.path = path
+        self.ttl = ttl
+        self.honor_expires = honor_expires
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable metadata cache {path}: {e}")
+
+    # 응답 헤더가 정한 만료 시각 (honor_expires 가 꺼져 있거나 헤더가 없으면 None)
+    def _expires_at(self, response_headers):
+        if not self.honor_expires or response_headers is None:
+            return None
+        match = re.search(r'max-age=(\d+)', response_headers.get('Cache-Control') or '')
+        if match:
+            return time.time() + int(match.group(1))
+        seconds = parse_retry_after(response_headers.get('Expires'))
+        return None if seconds is None else time.time() + seconds
+
+    # 만료 전의 캐시 값이 있으면 돌려주는 함수 (없으면 None)
+    def lookup(self, url):
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry and time.time() < (entry.get('expires') or entry['fetched_at'] + self.ttl):
+                self.hits += 1
+                return entry['data']
+        return None
+
+    # 만료된 항목을 재검증하기 위한 조건부 요청 헤더를 만드는 함수
+    def request_headers(self, url, headers=None):
+        request_headers = dict(headers or {})
+        with self._lock:
+            entry = self.entries.get(url)
+        if entry:
+            if entry.get('etag'):
+                request_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request_headers['If-Modified-Since'] = entry['last_modified']
+        return request_headers
+
+    # 304 Not Modified 응답을 받았을 때 기존 값을 연장하는 함수
+    def mark_revalidated(self, url, response_headers=None):
+        with self._lock:
+            entry = self.entries[url]
+            entry['fetched_at'] = time.time()
+            entry['expires'] = self._expires_at(response_headers)
+            self.revalidated += 1
+            return entry['data']
+
+    # 새로 받은 값을 검증자(validator)와 함께 저장하는 함수
+    def store(self, url, data, response_headers):
+        with self._lock:
+            self.entries[url] = {
+                'data': data,
+                'fetched_at': time.time(),
+                'etag': response_headers.get('ETag'),
+                'last_modified': response_headers.get('Last-Modified'),
+                'expires': self._expires_at(response_headers),
+            }
+            self.misses += 1
+        return data
+
+    # 캐시를 거쳐 JSON 메타데이터를 가져오는 함수 (공유 NWS 세션 사용)
+    def get(self, url, extract, headers=None, timeout=None):
+        data = self.lookup(url)
+        if data is not None:
+            return data
+
+        response = nws_client.get(url, headers=self.request_headers(url, headers), timeout=timeout)
+        if response.status_code == 304 and url in self.entries:
+            return self.mark_revalidated(url, response.headers)
+        response.raise_for_status()
+        return self.store(url, extract(response.json()), response.headers)
+
+    # 캐시를 파일로 저장하는 함수 (임시 파일에 쓴 뒤 교체)
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = json.dumps(self.entries)
+        # 여러 수집기 프로세스가 같은 캐시 파일을 쓸 수 있으므로 임시 파일은 프로세스마다 따로 둔다
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated,
+                    'entries': len(self.entries)}
+
+    # 캐시 적중/미스 횟수를 출력하고 로그에 남기는 함수
+    def report(self):
+        stats = self.stats()
+        message = (f"Metadata cache: {stats['hits']} hits, {stats['misses']} misses, "
+                   f"{stats['revalidated']} revalidated, {stats['entries']} entries")
+        print(message)
+        logging.info(message)
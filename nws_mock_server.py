@@ -0,0 +1,587 @@
+import copy
+import json
+import math
+import zlib
+import re
+import random
+import threading
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rate_limiter import TokenBucket
+
+# 벤치마크용 로컬 NWS 모의 서버
+# /points → /gridpoints/.../stations → /stations/{id} → /stations/{id}/observations/latest 흐름과
+# /gridpoints/.../forecast (7일 예보), /gridpoints/{office}/{x},{y} (시간별 격자 자료 층), /alerts/active (기상 경보) 를 실제 API와 같은 JSON 구조로 흉내 낸다. 가까운 도시는 같은 관측소를 공유하도록 격자로 관측소를 배치한다.
+# rate_limit 을 주면 초당 그 이상 들어온 요청은 429 와 Retry-After 로 거절한다 (속도 제한 테스트용).
+# recordings 를 주면 녹화된 실제 응답(record_responses 로 저장)을 그대로 돌려주고, 녹화에 없는 경로는
+# 같은 종류의 녹화 응답을 틀로 써서 ID / 좌표 / 값만 바꿔 만든다 (응답 크기와 필드 구성이 실제와 같아진다).
+# throttle_rate / error_rate 비율만큼 무작위로 429 / 503 을 돌려주고, latency_jitter 만큼 지연을 흔든다 (seed 로 재현 가능).
+
+# 관측소 격자 간격 (도 단위)
+station_spacing = 0.5
+
+# 녹화 응답의 종류를 가리는 경로 패턴 (위에서부터 먼저 맞는 것)
+endpoints = [
+    ('points', re.compile(r'/points/(-?[\d.]+),(-?[\d.]+)')),
+    ('stations', re.compile(r'/gridpoints/(\w+)/(-?\d+),(-?\d+)/stations')),
+    ('forecast', re.compile(r'/gridpoints/(\w+)/(-?\d+),(-?\d+)/forecast')),
+    ('gridpoint', re.compile(r'/gridpoints/(\w+)/(-?\d+),(-?\d+)')),
+    ('observation', re.compile(r'/stations/(\w+)/observations/latest')),
+    ('station', re.compile(r'/stations/(\w+)')),
+    ('alerts', re.compile(r'/alerts/active')),
+]
+
+
+# 경로의 종류와 정규식 match 를 돌려주는 함수 (모르는 경로면 (None, None))
+def match_endpoint(path):
+    for kind, pattern in endpoints:
+        match = pattern.fullmatch(path)
+        if match:
+            return kind, match
+    return None, None
+
+
+# 위경도로부터 관측소 격자 좌표를 계산하는 함수
+def _station_cell(lat, lon):
+    return int(round(lat / station_spacing)), int(round(lon / station_spacing))
+
+
+# 격자 좌표로 관측소 ID를 만드는 함수
+def _station_id(i, j):
+    return f"M{i + 200:03d}{j + 400:03d}"
+
+
+# 관측소 ID로부터 관측소 좌표를 복원하는 함수
+def _station_coordinates(station_id):
+    i = int(station_id[1:4]) - 200
+    j = int(station_id[4:7]) - 400
+    return i * station_spacing, j * station_spacing
+
+
+# /points 응답 (template 이 있으면 녹화 응답의 나머지 필드를 그대로 둔다)
+def _points_payload(base, lat, lon, template=None):
+    i, j = _station_cell(lat, lon)
+    office = 'MCK'
+    properties = {
+        'gridId': office,
+        'gridX': i,
+        'gridY': j,
+        'forecast': f"{base}/gridpoints/{office}/{i},{j}/forecast",
+        'forecastHourly': f"{base}/gridpoints/{office}/{i},{j}/forecast/hourly",
+        'forecastGridData': f"{base}/gridpoints/{office}/{i},{j}",
+        'observationStations': f"{base}/gridpoints/{office}/{i},{j}/stations",
+        'forecastZone': f"{base}/zones/forecast/MCZ{(i * 7 + j) % 1000:03d}",
+        'county': f"{base}/zones/county/MCC{(i * 3 + j) % 1000:03d}",
+    }
+    if template is None:
+        return {'properties': properties}
+    payload = copy.deepcopy(template)
+    payload['id'] = payload['properties']['@id'] = f"{base}/points/{lat},{lon}"
+    payload['geometry'] = {'type': 'Point', 'coordinates': [lon, lat]}
+    payload['properties'].update(properties)
+    return payload
+
+
+# /stations/{id} 응답
+def _station_payload(base, station_id, template=None):
+    lat, lon = _station_coordinates(station_id)
+    if template is None:
+        return {
+            'id': f"{base}/stations/{station_id}",
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': {'stationIdentifier': station_id, 'name': f"Mock Station {station_id}"}
+        }
+    payload = copy.deepcopy(template)
+    payload['id'] = payload['properties']['@id'] = f"{base}/stations/{station_id}"
+    payload['geometry'] = {'type': 'Point', 'coordinates': [lon, lat]}
+    payload['properties'].update({'stationIdentifier': station_id, 'name': f"Mock Station {station_id}"})
+    return payload
+
+
+# 격자 (i, j) 의 관측소 목록 응답
+# 주변 격자의 관측소를 돌려줘서 이웃 도시끼리 관측소 목록이 겹치도록 한다
+def _stations_payload(base, i, j, count, template=None):
+    neighbours = [(i, j), (i + 1, j), (i, j + 1), (i - 1, j), (i, j - 1)]
+    station_ids = [_station_id(a, b) for a, b in neighbours[:count]]
+    stations = [f"{base}/stations/{station_id}" for station_id in station_ids]
+    if template is None:
+        return {'observationStations': stations}
+    payload = copy.deepcopy(template)
+    feature = (template.get('features') or [None])[0]
+    payload['features'] = [_station_payload(base, station_id, feature) for station_id in station_ids]
+    payload['observationStations'] = stations
+    payload.pop('pagination', None)
+    return payload
+
+
+# /stations/{id}/observations/latest 응답 (seed 로 값을 정함)
+def _observation_payload(base, station_id, observed, seed, template=None):
+    lat, lon = _station_coordinates(station_id)
+    values = {
+        'timestamp': observed.isoformat(),
+        'textDescription': 'Clear' if seed % 2 else 'Cloudy',
+        'temperature': {'unitCode': 'wmoUnit:degC', 'value': 10.0 + seed / 5.0},
+        'relativeHumidity': {'unitCode': 'wmoUnit:percent', 'value': 30.0 + seed / 2.0},
+        'windSpeed': {'unitCode': 'wmoUnit:km_h-1', 'value': float(seed % 30)},
+        'windDirection': {'unitCode': 'wmoUnit:degree_(angle)', 'value': (seed * 37) % 360},
+        'precipitationLastHour': {'unitCode': 'wmoUnit:mm', 'value': None},
+    }
+    observation_id = f"{base}/stations/{station_id}/observations/{observed.isoformat()}"
+    if template is None:
+        return {'id': observation_id, 'geometry': {'type': 'Point', 'coordinates': [lon, lat]}, 'properties': values}
+    payload = copy.deepcopy(template)
+    payload['id'] = payload['properties']['@id'] = observation_id
+    payload['geometry'] = {'type': 'Point', 'coordinates': [lon, lat]}
+    payload['properties']['station'] = f"{base}/stations/{station_id}"
+    # 녹화 응답의 품질 코드 등은 남기고 값만 바꾼다
+    for name, value in values.items():
+        if isinstance(value, dict) and isinstance(payload['properties'].get(name), dict):
+            payload['properties'][name] = dict(payload['properties'][name], **value)
+        else:
+            payload['properties'][name] = value
+    return payload
+
+
+# /gridpoints/{office}/{x},{y}/forecast 응답: issued 부터 12시간씩 14개 구간 (낮 06~18시, 밤 18~06시 UTC)
+# template 이 있으면 녹화 응답의 구간 필드(icon, detailedForecast 등)를 틀로 쓴다
+def _forecast_payload(office, i, j, issued, template=None):
+    seed = zlib.crc32(f"{office}/{i},{j}".encode()) % 20
+    start = issued.replace(minute=0, second=0, microsecond=0)
+    template_periods = (template or {}).get('properties', {}).get('periods') or [{}]
+    periods = []
+    for number in range(1, 15):
+        daytime = 6 <= start.hour < 18
+        end = start.replace(hour=18) if daytime else (start + timedelta(days=1 if start.hour >= 18 else 0)).replace(hour=6)
+        weekday = start.strftime('%A')
+        temperature = 60 + seed + (15 if daytime else 0) + (number * 7 + int(issued.timestamp() // 3600)) % 5
+        precipitation = (seed * 13 + number * 17) % 60
+        period = dict(template_periods[(number - 1) % len(template_periods)])
+        period.update({
+            'number': number,
+            'name': weekday if daytime else f"{weekday} Night",
+            'startTime': start.isoformat(),
+            'endTime': end.isoformat(),
+            'isDaytime': daytime,
+            'temperature': temperature,
+            'temperatureUnit': 'F',
+            'probabilityOfPrecipitation': {'unitCode': 'wmoUnit:percent', 'value': precipitation or None},
+            'windSpeed': f"{5 + seed % 10} to {10 + seed % 10} mph",
+            'windDirection': ('N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW')[(seed + number) % 8],
+            'shortForecast': 'Chance Showers And Thunderstorms' if precipitation >= 30 else 'Mostly Sunny',
+        })
+        periods.append(period)
+        start = end
+    payload = copy.deepcopy(template) if template is not None else {'type': 'Feature'}
+    payload.setdefault('properties', {})
+    payload['properties'].update({'generatedAt': issued.isoformat(), 'updateTime': issued.isoformat(),
+                                  'periods': periods})
+    return payload
+
+
+# 시간 수를 ISO 8601 기간 문자열로 바꾸는 함수 (예: 1 → PT1H, 30 → P1DT6H)
+def _iso_duration(hours):
+    days, hours = divmod(hours, 24)
+    return (f"P{days}D" if days else "P") + (f"T{hours}H" if hours or not days else "")
+
+
+# 격자 자료 층: (이름, 단위, 구간 길이들(시간, 차례로 반복), 시각 h 와 seed 로 값을 정하는 함수)
+# 실제 API 처럼 값이 그대로인 시간들은 한 구간으로 묶여 있어 층마다 구간 길이가 다르다
+gridpoint_layers = [
+    ('temperature', 'wmoUnit:degC', (1, 1, 2, 1, 3), lambda h, seed: round(18 + seed / 2 + 8 * math.sin((h - 9) * math.pi / 12), 1)),
+    ('dewpoint', 'wmoUnit:degC', (1, 2, 3), lambda h, seed: round(10 + seed / 3 + 2 * math.sin(h * math.pi / 12), 1)),
+    ('relativeHumidity', 'wmoUnit:percent', (1, 2), lambda h, seed: 55 + (seed + h * 7) % 40),
+    ('skyCover', 'wmoUnit:percent', (1, 1, 2, 3), lambda h, seed: (seed * 11 + h * 13) % 101),
+    ('windDirection', 'wmoUnit:degree_(angle)', (2, 3), lambda h, seed: (seed * 37 + h * 5) % 360),
+    ('windSpeed', 'wmoUnit:km_h-1', (1, 2, 3), lambda h, seed: round(5 + (seed + h) % 25 * 0.9, 3)),
+    ('windGust', 'wmoUnit:km_h-1', (3, 6), lambda h, seed: round(20 + (seed + h) % 30 * 0.9, 3) if (seed + h) % 4 else None),
+    ('probabilityOfPrecipitation', 'wmoUnit:percent', (6, 12), lambda h, seed: (seed * 13 + h * 17) % 60),
+    ('quantitativePrecipitation', 'wmoUnit:mm', (6,), lambda h, seed: round((seed + h) % 7 * 0.5, 2) if (seed + h) % 3 == 0 else 0),
+]
+
+
+# /gridpoints/{office}/{x},{y} 응답: issued 부터 7일 반 동안의 층별 validTime 구간 값
+# template 이 있으면 녹화 응답의 나머지 필드(elevation, weather, hazards 등)를 그대로 둔다
+def _gridpoint_payload(base, office, i, j, issued, template=None):
+    seed = zlib.crc32(f"{office}/{i},{j}".encode()) % 20
+    start = issued.replace(minute=0, second=0, microsecond=0)
+    first_hour = int(start.timestamp() // 3600)
+    hours = 180
+    properties = {
+        '@id': f"{base}/gridpoints/{office}/{i},{j}",
+        'updateTime': issued.isoformat(),
+        'validTimes': f"{start.isoformat()}/{_iso_duration(hours)}",
+        'gridId': office,
+        'gridX': i,
+        'gridY': j,
+    }
+    for name, uom, lengths, value in gridpoint_layers:
+        values = []
+        offset = 0
+        while offset < hours:
+            length = min(lengths[len(values) % len(lengths)], hours - offset)
+            valid_time = f"{(start + timedelta(hours=offset)).isoformat()}/{_iso_duration(length)}"
+            values.append({'validTime': valid_time, 'value': value(first_hour + offset, seed)})
+            offset += length
+        properties[name] = {'uom': uom, 'values': values}
+    payload = copy.deepcopy(template) if template is not None else {'type': 'Feature'}
+    payload['id'] = properties['@id']
+    payload.setdefault('properties', {})
+    payload['properties'].update(properties)
+    return payload
+
+
+# 모의 경보 종류: (event, severity, urgency)
+alert_kinds = [
+    ('Heat Advisory', 'Moderate', 'Expected'),
+    ('Severe Thunderstorm Warning', 'Severe', 'Immediate'),
+    ('Flood Watch', 'Moderate', 'Future'),
+    ('Wind Advisory', 'Minor', 'Expected'),
+    ('Tornado Warning', 'Extreme', 'Immediate'),
+    ('Winter Storm Warning', 'Severe', 'Expected'),
+]
+
+# 경보 자리(slot) 하나의 수명 (alert_period 단위): 5 주기 동안 발효되고 1 주기 쉰다. 2 주기마다 갱신(Update)을 낸다
+alert_lifetime = 6
+
+
+# 폭풍 경보처럼 다각형(geometry)이 붙는 경보 종류
+polygon_alert_events = ('Severe Thunderstorm Warning', 'Tornado Warning')
+
+
+# 경보 자리 / 세대로 정한 미국 본토 안의 별 모양 다각형 (GeoJSON Polygon, [경도, 위도] 닫힌 고리)
+def _alert_polygon(slot, generation):
+    seed = zlib.crc32(f"{slot}.{generation}".encode())
+    latitude = 25 + seed % 2400 / 100
+    longitude = -124 + seed // 2400 % 5700 / 100
+    vertices = 6 + slot % 10
+    ring = []
+    for k in range(vertices):
+        angle = 2 * math.pi * k / vertices
+        radius = 0.3 + 0.5 * ((slot * 7 + k * 13 + generation) % 10) / 10
+        ring.append([round(longitude + radius * math.cos(angle), 4), round(latitude + radius * math.sin(angle), 4)])
+    ring.append(ring[0])
+    return {'type': 'Polygon', 'coordinates': [ring]}
+
+
+# 경보 ID (자리, 세대, 판)
+def _alert_id(slot, generation, version):
+    return f"urn:oid:2.49.0.1.840.0.mock.{slot}.{generation}.{version}"
+
+
+# /alerts/active 응답: count 개의 자리가 alert_period 마다 돌아가며 새 경보 → 갱신 → 만료를 거친다
+# 경보는 모의 /points 의 예보 구역(MCZ...) 과 카운티(MCC...) 에 걸리고, areas (UGC 앞 두 글자) 나 zone 으로 거를 수 있다
+def _alerts_payload(base, period, alert_period, count, areas=None, zone=None):
+    features = []
+    for slot in range(count):
+        phase = (period + slot) % alert_lifetime
+        if phase == alert_lifetime - 1:
+            continue
+        generation = (period + slot) // alert_lifetime
+        version = phase // 2
+        zones = [f"MCZ{(slot * 37 + generation * 11 + m * 7) % 1000:03d}" for m in range(1 + slot % 4)]
+        ugc = zones + [f"MCC{(slot * 53 + generation * 3) % 1000:03d}"]
+        if areas and not any(code[:2] in areas for code in ugc):
+            continue
+        if zone and zone not in ugc:
+            continue
+        event, severity, urgency = alert_kinds[(slot + generation) % len(alert_kinds)]
+        first_period = generation * alert_lifetime - slot
+        sent = datetime.fromtimestamp((first_period + version * 2) * alert_period, timezone.utc)
+        ends = datetime.fromtimestamp((first_period + alert_lifetime - 1) * alert_period, timezone.utc)
+        alert_id = _alert_id(slot, generation, version)
+        references = [{'@id': f"{base}/alerts/{_alert_id(slot, generation, version - 1)}",
+                       'identifier': _alert_id(slot, generation, version - 1), 'sender': 'w-nws.webmaster@noaa.gov',
+                       'sent': datetime.fromtimestamp((first_period + version * 2 - 2) * alert_period, timezone.utc).isoformat()}
+                      ] if version else []
+        features.append({
+            'id': f"{base}/alerts/{alert_id}",
+            'type': 'Feature',
+            'geometry': _alert_polygon(slot, generation) if event in polygon_alert_events else None,
+            'properties': {
+                '@id': f"{base}/alerts/{alert_id}",
+                '@type': 'wx:Alert',
+                'id': alert_id,
+                'areaDesc': '; '.join(ugc),
+                'geocode': {'SAME': [f"0{code[3:]}" for code in ugc], 'UGC': ugc},
+                'affectedZones': [f"{base}/zones/{'county' if code[2] == 'C' else 'forecast'}/{code}" for code in ugc],
+                'references': references,
+                'sent': sent.isoformat(),
+                'effective': sent.isoformat(),
+                'onset': sent.isoformat(),
+                'expires': min(sent + timedelta(seconds=2 * alert_period), ends).isoformat(),
+                'ends': ends.isoformat(),
+                'status': 'Actual',
+                'messageType': 'Update' if version else 'Alert',
+                'category': 'Met',
+                'severity': severity,
+                'certainty': 'Likely',
+                'urgency': urgency,
+                'event': event,
+                'sender': 'w-nws.webmaster@noaa.gov',
+                'senderName': 'NWS Mock',
+                'headline': f"{event} issued {sent:%B %d at %H:%M}UTC until {ends:%B %d at %H:%M}UTC by NWS Mock",
+                'description': f"* WHAT...{event} conditions expected.\n\n* WHERE...{', '.join(ugc)}.",
+                'instruction': 'Monitor later forecasts.',
+                'response': 'Prepare' if version == 0 else 'Monitor',
+                'parameters': {'NWSheadline': [event.upper()]},
+            },
+        })
+    return {'type': 'FeatureCollection', 'features': features, 'title': 'Current watches, warnings, and advisories',
+            'updated': datetime.fromtimestamp(period * alert_period, timezone.utc).isoformat()}
+
+
+class MockNWSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 헤더와 본문을 따로 보내므로 Nagle 알고리즘을 끄지 않으면 keep-alive 요청마다 ~40ms 지연이 생긴다
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_body(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/geo+json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload, headers=None):
+        self._send_body(status, json.dumps(payload).encode('utf-8'), headers)
+
+    # 관측이 바뀌지 않았으면 실제 API 처럼 조건부 요청에 304 로 답하는 함수 (보냈으면 True)
+    def _send_not_modified(self, validators):
+        if self.headers.get('If-None-Match') != validators['ETag']:
+            return False
+        self.send_response(304)
+        for name, value in validators.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return True
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.request_count += 1
+            draw = server.random.random()
+            jitter = server.random.uniform(0, server.latency_jitter) if server.latency_jitter else 0.0
+        if (server.throttle is not None and not server.throttle.try_acquire()) or draw < server.throttle_rate:
+            with server.stats_lock:
+                server.throttled_count += 1
+            self._send_json(429, {'title': 'Too Many Requests', 'status': 429},
+                            {'Retry-After': str(server.retry_after)})
+            return
+        if server.latency or jitter:
+            time.sleep(server.latency + jitter)
+        if draw < server.throttle_rate + server.error_rate:
+            with server.stats_lock:
+                server.error_count += 1
+            self._send_json(503, {'title': 'Service Unavailable', 'status': 503})
+            return
+
+        base = server.base_url
+        path = self.path.split('?')[0]
+        kind, match = match_endpoint(path)
+        template = server.templates.get(kind)
+
+        recorded = server.recorded.get(path)
+        if recorded is not None:
+            # 녹화된 관측은 본문이 바뀌지 않으므로 본문 해시를 ETag 로 쓴다
+            if kind == 'observation':
+                validators = {'ETag': f'"{zlib.crc32(recorded):08x}"'}
+                if self._send_not_modified(validators):
+                    return
+                self._send_body(200, recorded, validators)
+            else:
+                self._send_body(200, recorded)
+            return
+
+        if kind == 'points':
+            self._send_json(200, _points_payload(base, float(match.group(1)), float(match.group(2)), template))
+            return
+
+        if kind == 'stations':
+            i, j = int(match.group(2)), int(match.group(3))
+            self._send_json(200, _stations_payload(base, i, j, server.stations_per_point, template))
+            return
+
+        if kind in ('forecast', 'gridpoint'):
+            office, i, j = match.group(1), int(match.group(2)), int(match.group(3))
+            # 예보와 격자 자료는 forecast_period 마다 새로 발표되고, 다음 발표 때까지 캐시해도 된다고 알린다
+            period = int(time.time() // server.forecast_period)
+            issued = datetime.fromtimestamp(period * server.forecast_period, timezone.utc)
+            next_issue = (period + 1) * server.forecast_period
+            validators = {'ETag': f'"{kind}-{office}-{i}-{j}-{int(issued.timestamp())}"',
+                          'Last-Modified': formatdate(issued.timestamp(), usegmt=True),
+                          'Cache-Control': f"public, max-age={max(int(next_issue - time.time()), 0)}",
+                          'Expires': formatdate(next_issue, usegmt=True)}
+            if self._send_not_modified(validators):
+                return
+            if kind == 'forecast':
+                payload = _forecast_payload(office, i, j, issued, template)
+            else:
+                payload = _gridpoint_payload(base, office, i, j, issued, template)
+            self._send_json(200, payload, validators)
+            return
+
+        if kind == 'observation':
+            station_id = match.group(1)
+            # 관측 시각은 observation_period 단위로 바뀐다 (기본은 실제 NWS 관측소처럼 한 시간마다 갱신)
+            period = int(time.time() // server.observation_period)
+            observed = datetime.fromtimestamp(period * server.observation_period, timezone.utc)
+            etag = f'"{station_id}-{int(observed.timestamp())}"'
+            validators = {'ETag': etag, 'Last-Modified': formatdate(observed.timestamp(), usegmt=True)}
+            if self._send_not_modified(validators):
+                return
+            seed = (zlib.crc32(station_id.encode()) + period) % 100
+            self._send_json(200, _observation_payload(base, station_id, observed, seed, template), validators)
+            return
+
+        if kind == 'station':
+            self._send_json(200, _station_payload(base, match.group(1), template))
+            return
+
+        if kind == 'alerts':
+            query = parse_qs(self.path.partition('?')[2])
+            areas = set(','.join(query.get('area', [])).split(',')) - {''}
+            zone = query.get('zone', [None])[0]
+            # 경보 목록은 alert_period 마다 바뀐다
+            period = int(time.time() // server.alert_period)
+            validators = {'ETag': f'"alerts-{period}-{zlib.crc32(self.path.encode()):08x}"',
+                          'Last-Modified': formatdate(period * server.alert_period, usegmt=True)}
+            if self._send_not_modified(validators):
+                return
+            self._send_json(200, _alerts_payload(base, period, server.alert_period, server.alert_count, areas, zone),
+                            validators)
+            return
+
+        self._send_json(404, {'title': 'Not Found', 'status': 404, 'detail': path})
+
+
+# 녹화 파일을 읽는 함수 → (녹화한 API 주소, {경로: 응답 JSON})
+def load_recordings(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        recording = json.load(f)
+    return recording['base_url'], recording['responses']
+
+
+# 도시들의 /points, 예보, 격자 자료, 관측소 목록, 관측소, 최신 관측 응답을 받아 녹화 파일로 저장하는 함수
+# nws_client 를 쓰므로 NWS_API_BASE / NWS_USER_AGENT / 속도 제한이 그대로 적용된다.
+# 관측소 목록은 stations_per_city 개로 줄여 저장해, 재생할 때 녹화하지 않은 관측소를 요청하지 않게 한다.
+def record_responses(path, cities, stations_per_city=3):
+    import nws_client
+    base = nws_client.api_base_url
+    responses = {}
+
+    def fetch(url):
+        payload = nws_client.get_json(url)
+        responses[url[len(base):]] = payload
+        return payload
+
+    for city, state, lat, lon in cities:
+        point = fetch(f"{base}/points/{lat},{lon}")
+        fetch(point['properties']['forecast'])
+        fetch(point['properties']['forecastGridData'])
+        stations_url = point['properties']['observationStations']
+        station_list = fetch(stations_url)
+        station_urls = station_list['observationStations'][:stations_per_city]
+        station_list['observationStations'] = station_urls
+        station_list['features'] = station_list.get('features', [])[:stations_per_city]
+        station_list.pop('pagination', None)
+        for station_url in station_urls:
+            fetch(station_url)
+            fetch(f"{station_url}/observations/latest")
+        print(f"Recorded {city}, {state}: {len(station_urls)} stations")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'base_url': base, 'responses': responses}, f, indent=1)
+    return len(responses)
+
+
+# 모의 서버를 백그라운드 쓰레드로 시작하는 함수
+def start_mock_server(host='127.0.0.1', port=0, latency=0.0, stations_per_point=3, rate_limit=None, retry_after=1,
+                      observation_period=3600, recordings=None, latency_jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                      seed=0, forecast_period=3600, alert_period=300, alert_count=200):
+    server = ThreadingHTTPServer((host, port), MockNWSHandler)
+    server.daemon_threads = True
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    server.latency = latency
+    server.latency_jitter = latency_jitter
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+    server.random = random.Random(seed)
+    server.stations_per_point = stations_per_point
+    server.throttle = TokenBucket(rate_limit) if rate_limit else None
+    server.retry_after = retry_after
+    server.observation_period = observation_period
+    server.forecast_period = forecast_period
+    server.alert_period = alert_period
+    server.alert_count = alert_count
+    # 녹화 응답은 URL 을 이 서버 주소로 바꿔 미리 bytes 로 만들어 두고, 종류마다 첫 응답을 틀로 쓴다
+    server.recorded = {}
+    server.templates = {}
+    if recordings:
+        recorded_base, responses = load_recordings(recordings)
+        for path, payload in responses.items():
+            text = json.dumps(payload).replace(recorded_base, server.base_url)
+            server.recorded[path] = text.encode('utf-8')
+            kind, _ = match_endpoint(path)
+            if kind is not None and kind not in server.templates:
+                server.templates[kind] = json.loads(text)
+    server.request_count = 0
+    server.throttled_count = 0
+    server.error_count = 0
+    server.stats_lock = threading.Lock()
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock NWS API server")
+    parser.add_argument('--port', type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Added latency per request in seconds (default: 0)")
+    parser.add_argument('--latency-jitter', type=float, default=0.0,
+                        help="Random extra latency up to this many seconds per request (default: 0)")
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help="Answer 429 above this many requests per second (default: no limit)")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="Share of requests answered with 429 at random (default: 0)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Share of requests answered with 503 at random (default: 0)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for jitter and injected errors (default: 0)")
+    parser.add_argument('--observation-period', type=float, default=3600,
+                        help="Seconds between new observations of each station (default: 3600)")
+    parser.add_argument('--recordings', type=str, default=None,
+                        help="Replay recorded responses from this file, e.g. nws_recordings_sample.json (default: synthetic)")
+    parser.add_argument('--record', type=str, default=None,
+                        help="Record responses for --record-cities cities from NWS_API_BASE into this file and exit")
+    parser.add_argument('--record-cities', type=int, default=5, help="Cities to record (default: 5)")
+    args = parser.parse_args()
+
+    if args.record:
+        import city_registry
+        count = record_responses(args.record, city_registry.load().rows()[:args.record_cities])
+        print(f"Recorded {count} responses into {args.record}")
+        return
+
+    server = start_mock_server(port=args.port, latency=args.latency, rate_limit=args.rate_limit,
+                               observation_period=args.observation_period, recordings=args.recordings,
+                               latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate, seed=args.seed)
+    print(f"Mock NWS server listening on {server.base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
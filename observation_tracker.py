@@ -0,0 +1,133 @@
+import os
+import json
+import zlib
+import threading
+import logging
+
+# 관측소별 최신 관측 상태 추적
+# NWS 관측소는 대부분 한 시간에 한 번 관측하지만 수집은 몇 분마다 하므로, 대부분의 응답은 직전과 같다.
+# 관측소마다 ETag / Last-Modified 와 마지막 관측 시각(timestamp)을 기억해 두고
+# - 조건부 요청을 보내 304 Not Modified 를 받으면 본문 없이 끝내고
+# - 200 이라도 본문이 직전과 같거나 (crc32 비교, JSON 파싱 전) 관측 시각이 같으면
+# 파싱 / 파생 지표 계산 / 저장을 모두 건너뛴다.
+# 새 관측은 그 행이 저장된 뒤에야 기록하므로 (버퍼를 쓰는 수집기는 flush 가 끝난 뒤), 그 사이에 실패한 관측소는 다음 수집에서 다시 가져온다.
+
+
+class ObservationTracker:
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.new = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable observation state {path}: {e}")
+
+    # 새 수집을 시작할 때 수집별 통계를 초기화하는 함수
+    def start_sweep(self):
+        with self._lock:
+            self.new = 0
+            self.not_modified = 0
+            self.unchanged = 0
+
+    # 관측소의 마지막 응답 검증자로 조건부 요청 헤더를 만드는 함수
+    def request_headers(self, station_url):
+        with self._lock:
+            entry = self.entries.get(station_url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    # 응답을 확인해 새 관측이면 (관측값(properties), pending) 을, 바뀌지 않았으면 None 을 돌려주는 함수
+    # body 는 응답 본문 bytes (304 면 None)
+    # 상태는 아직 바꾸지 않는다. 관측으로 만든 행을 저장 단계에 넘긴 뒤 commit(*pending) 또는 commit_all 로 기록한다
+    # (그 전에 실패하면 다음 수집에서 같은 관측을 다시 가져온다)
+    def observe(self, station_url, status, response_headers, body):
+        digest = self.check_body(station_url, status, response_headers, body)
+        if digest is None:
+            return None
+        current_observation = json.loads(body)['properties']
+        observed_at = current_observation.get('timestamp')
+        if not self.check_timestamp(station_url, observed_at, digest, response_headers):
+            return None
+        return current_observation, (station_url, observed_at, digest, response_headers)
+
+    # JSON 을 파싱하기 전에 304 / 같은 본문인지 확인하는 함수
+    # 바뀌었을 수 있으면 본문의 crc32 를, 확실히 같으면 None 을 돌려준다
+    def check_body(self, station_url, status, response_headers, body):
+        if status == 304:
+            with self._lock:
+                self.not_modified += 1
+            return None
+
+        digest = zlib.crc32(body)
+        with self._lock:
+            entry = self.entries.get(station_url)
+            if entry and entry.get('digest') == digest:
+                self._update_validators(entry, response_headers)
+                self.unchanged += 1
+                return None
+        return digest
+
+    # 파싱한 관측 시각이 직전 관측과 다르면 True 를 돌려주는 함수 (새 관측은 아직 기록하지 않는다)
+    def check_timestamp(self, station_url, observed_at, digest, response_headers):
+        with self._lock:
+            entry = self.entries.get(station_url)
+            if entry and observed_at and entry.get('timestamp') == observed_at:
+                # 본문은 달라도 (예: 품질 플래그 갱신) 같은 관측이면 다시 저장하지 않는다
+                entry['digest'] = digest
+                self._update_validators(entry, response_headers)
+                self.unchanged += 1
+                return False
+        return True
+
+    # 새 관측을 상태에 기록하는 함수 (관측으로 만든 행을 저장 단계에 넘긴 뒤에 부른다)
+    def commit(self, station_url, observed_at, digest, response_headers):
+        with self._lock:
+            entry = {'timestamp': observed_at, 'digest': digest}
+            self._update_validators(entry, response_headers)
+            self.entries[station_url] = entry
+            self.new += 1
+
+    # observe 가 돌려준 pending 목록을 한꺼번에 기록하는 함수
+    def commit_all(self, pending):
+        for station_url, observed_at, digest, response_headers in pending:
+            self.commit(station_url, observed_at, digest, response_headers)
+
+    def _update_validators(self, entry, response_headers):
+        entry['etag'] = response_headers.get('ETag')
+        entry['last_modified'] = response_headers.get('Last-Modified')
+
+    # 상태를 파일로 저장하는 함수 (재시작 후에도 같은 관측을 다시 저장하지 않도록)
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = json.dumps(self.entries)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(snapshot)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        with self._lock:
+            return {'new': self.new, 'not_modified': self.not_modified, 'unchanged': self.unchanged,
+                    'stations': len(self.entries)}
+
+    # 이번 수집에서 새 관측과 바뀌지 않은 관측 수를 출력하고 로그에 남기는 함수
+    def report(self):
+        stats = self.stats()
+        skipped = stats['not_modified'] + stats['unchanged']
+        message = (f"Observations: {stats['new']} new, {skipped} unchanged "
+                   f"({stats['not_modified']} not modified, {stats['unchanged']} same body or timestamp)")
+        print(message)
+        logging.info(message)
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+import logging
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# 추가 전용(append-only) Parquet 저장소
+# 기존 파일을 다시 읽어 합친 뒤 새로 쓰는 대신, 파티션별로 열어 둔 ParquetWriter 에 row group 을 이어 붙인다.
+# 출력은 hive 형식으로 나뉜다: {root}/date=YYYY-MM-DD/state=XX/{prefix}-0000.parquet
+# 파일이 max_file_bytes 를 넘거나 max_file_seconds 보다 오래 열려 있으면 닫고 다음 번호의 파일로 넘어간다.
+# (Parquet 파일은 닫혀야 읽을 수 있으므로, 시간 기준으로 닫아 두면 비정상 종료 시 잃는 데이터가 줄어든다)
+
+default_max_file_bytes = 128 * 1024 * 1024
+
+
+class PartitionedParquetSink:
+    def __init__(self, root, prefix, partition_cols=('date', 'state'), schema=None,
+                 max_file_bytes=default_max_file_bytes, max_file_seconds=None, compression='snappy'):
+        self.root = root
+        self.prefix = prefix
+        self.partition_cols = tuple(partition_cols)
+        # 파티션 열은 디렉터리 이름에 들어가므로 파일 스키마에서는 뺀다
+        self.schema = self._file_schema(schema) if schema is not None else None
+        self.max_file_bytes = max_file_bytes
+        self.max_file_seconds = max_file_seconds
+        self.compression = compression
+        self.rows_written = 0
+        self.files_written = []
+        self._writers = {}
+        self._sequence = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    # 파일 스키마를 정하는 함수 (값이 모두 None 인 열은 double 로 고정, 문자열 열이 비어 올 수 있으면 schema 를 넘긴다)
+    def _file_schema(self, schema):
+        fields = []
+        for field in schema:
+            if field.name in self.partition_cols:
+                continue
+            if pa.types.is_null(field.type):
+                field = field.with_type(pa.float64())
+            fields.append(field)
+        return pa.schema(fields)
+
+    # 행의 파티션 값을 계산하는 함수 (date 는 timestamp 열에서 만든다)
+    def _partition_keys(self, table):
+        columns = []
+        for name in self.partition_cols:
+            if name == 'date' and 'date' not in table.column_names:
+                timestamps = table.column('timestamp')
+                if pa.types.is_timestamp(timestamps.type):
+                    columns.append(pc.strftime(timestamps, format='%Y-%m-%d').to_pylist())
+                else:
+                    columns.append([str(value)[:10] for value in timestamps.to_pylist()])
+            else:
+                columns.append([str(value) for value in table.column(name).to_pylist()])
+        return list(zip(*columns))
+
+    def _partition_path(self, key, sequence):
+        parts = [f"{name}={value}" for name, value in zip(self.partition_cols, key)]
+        return os.path.join(self.root, *parts, f"{self.prefix}-{sequence:04d}.parquet")
+
+    # 파티션의 writer 를 가져오거나 새로 여는 함수
+    def _writer_for(self, key):
+        entry = self._writers.get(key)
+        if entry is not None:
+            return entry
+        sequence = self._sequence.get(key, 0)
+        path = self._partition_path(key, sequence)
+        while os.path.exists(path):
+            sequence += 1
+            path = self._partition_path(key, sequence)
+        self._sequence[key] = sequence + 1
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        writer = pq.ParquetWriter(path, self.schema, compression=self.compression)
+        entry = (writer, path, time.monotonic())
+        self._writers[key] = entry
+        self.files_written.append(path)
+        return entry
+
+    # 크기 또는 시간 한도를 넘은 writer 를 닫는 함수 (다음 쓰기 때 새 파일이 열린다)
+    def _roll_if_needed(self):
+        now = time.monotonic()
+        for key, (writer, path, opened_at) in list(self._writers.items()):
+            too_big = os.path.getsize(path) >= self.max_file_bytes
+            too_old = self.max_file_seconds is not None and now - opened_at >= self.max_file_seconds
+            if too_big or too_old:
+                del self._writers[key]
+                writer.close()
+                logging.info(f"Rolled parquet file {path}")
+
+    # 테이블을 파티션별로 나눠 row group 으로 추가하는 함수
+    def write_table(self, table):
+        if table.num_rows == 0:
+            return
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Parquet sink is closed")
+            keys = self._partition_keys(table)
+            if self.schema is None:
+                self.schema = self._file_schema(table.schema)
+            data = table.select(self.schema.names).cast(self.schema)
+
+            groups = {}
+            for index, key in enumerate(keys):
+                groups.setdefault(key, []).append(index)
+            for key, indices in groups.items():
+                part = data.take(pa.array(indices)) if len(groups) > 1 else data
+                writer, _, _ = self._writer_for(key)
+                writer.write_table(part)
+            self._roll_if_needed()
+            self.rows_written += table.num_rows
+
+    # RecordBatch 하나를 저장하는 함수
+    def write_batch(self, batch):
+        self.write_table(pa.Table.from_batches([batch]))
+
+    # dict 행 리스트를 바로 Arrow 테이블로 바꿔 저장하는 함수 (pandas 를 거치지 않음)
+    def write_rows(self, rows):
+        if rows:
+            self.write_table(pa.Table.from_pylist(rows))
+
+    # 열려 있는 모든 파일을 닫는 함수 (종료 시 반드시 호출)
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            for writer, _, _ in self._writers.values():
+                writer.close()
+            self._writers.clear()
+            self._closed = True
+        if self.rows_written:
+            print(f"Data saved to {self.root} ({self.rows_written} rows, {len(self.files_written)} files)")
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from weather_schema import observation_values, value_columns
+from weather_derive import derive_values
+
+# 네트워크 단계와 파싱 단계를 나눈 파이프라인
+# 네트워크 쓰레드는 응답 본문(bytes)만 bounded queue 에 넣고, 디스패처 쓰레드가 배치로 묶어 프로세스 풀에 보낸다.
+# 프로세스 풀은 JSON 파싱(orjson 이 있으면 사용), 관측값 추출, 파생 지표 계산을 배치 단위로 하고,
+# 결과 쓰레드가 완료된 배치를 순서대로 받아 handle_result 로 넘긴다 (도시 행 펼치기 / 버퍼 저장).
+# GIL 을 잡는 파싱 작업이 다른 프로세스에서 돌기 때문에 네트워크 쓰레드가 파싱에 막히지 않는다.
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+# 프로세스 풀에서 실행되는 함수: 응답 본문 배치를 (관측 시각, 관측소 단위 값) 리스트로 바꾼다
+# 실패한 본문은 None 으로 두고 오류 메시지를 따로 돌려준다
+def parse_observation_batch(bodies):
+    start = time.process_time()
+    results = [None] * len(bodies)
+    errors = []
+    parsed_index = []
+    parsed_values = []
+    for index, body in enumerate(bodies):
+        try:
+            current_observation = _loads(body)['properties']
+            parsed_values.append(observation_values(current_observation))
+            parsed_index.append((index, current_observation.get('timestamp')))
+        except (ValueError, KeyError, TypeError) as e:
+            errors.append(f"{type(e).__name__}: {e}")
+    for (index, observed_at), values in zip(parsed_index, derive_values(parsed_values, value_columns)):
+        results[index] = (observed_at, values)
+    return results, errors, time.process_time() - start
+
+
+class ParsePipeline:
+    def __init__(self, handle_result, processes=None, batch_size=50, max_queue=1000, max_pending_batches=None,
+                 batch_wait=0.2):
+        self.handle_result = handle_result
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.executor = ProcessPoolExecutor(max_workers=self.processes)
+        self._queue = queue.Queue(maxsize=max_queue)
+        # 처리 중인 배치 수를 제한해 풀이 밀리면 디스패처가, 그다음엔 네트워크 쓰레드가 기다리게 한다
+        self._results = queue.Queue(maxsize=max_pending_batches or self.processes * 2)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.start_sweep()
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='parse-dispatcher', daemon=True)
+        self._collector = threading.Thread(target=self._result_loop, name='parse-results', daemon=True)
+        self._dispatcher.start()
+        self._collector.start()
+
+    # 수집(sweep)마다 단계별 카운터를 초기화하는 함수
+    # network_workers 는 응답을 가져오는 쓰레드 수 (단계별 처리 용량 계산에 사용)
+    def start_sweep(self, network_workers=1):
+        with self._lock:
+            self.network_workers = network_workers
+            self.started = time.monotonic()
+            self.fetched = 0
+            self.fetched_bytes = 0
+            self.fetch_seconds = 0.0
+            self.queue_wait_seconds = 0.0
+            self.max_queue_depth = 0
+            self.parsed = 0
+            self.parse_batches = 0
+            self.parse_seconds = 0.0
+            self.parse_errors = 0
+            self.handled = 0
+            self.handle_seconds = 0.0
+
+    # 네트워크 단계: 응답 본문을 대기열에 넣는 함수 (대기열이 가득 차면 기다림)
+    # context 는 프로세스로 보내지 않고 결과와 함께 handle_result 로 그대로 넘어간다
+    def submit(self, body, context, fetch_seconds=0.0):
+        if self._closed:
+            raise RuntimeError("Parse pipeline is closed")
+        start = time.monotonic()
+        self._queue.put((body, context))
+        waited = time.monotonic() - start
+        with self._lock:
+            self.fetched += 1
+            self.fetched_bytes += len(body)
+            self.fetch_seconds += fetch_seconds
+            self.queue_wait_seconds += waited
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    # 대기열에서 batch_size 개 (또는 batch_wait 초 동안 모인 만큼) 를 꺼내는 함수
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is None:
+            return None, True
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    # 배치를 프로세스 풀에 보내는 루프
+    def _dispatch_loop(self):
+        while True:
+            batch, done = self._next_batch()
+            if batch:
+                future = self.executor.submit(parse_observation_batch, [body for body, _ in batch])
+                self._results.put((future, [context for _, context in batch]))
+            if done:
+                self._results.put(None)
+                return
+
+    # 완료된 배치를 보낸 순서대로 받아 처리하는 루프
+    def _result_loop(self):
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            future, contexts = item
+            try:
+                results, errors, worker_seconds = future.result()
+            except Exception as e:
+                logging.error(f"Parse batch of {len(contexts)} responses failed: {e}")
+                with self._lock:
+                    self.parse_errors += len(contexts)
+                self._done(len(contexts))
+                continue
+
+            for error in errors:
+                logging.error(f"Failed to parse observation: {error}")
+            start = time.monotonic()
+            handled = 0
+            for context, result in zip(contexts, results):
+                if result is None:
+                    continue
+                try:
+                    self.handle_result(context, *result)
+                    handled += 1
+                except Exception as e:
+                    logging.error(f"Failed to handle parsed observation: {e}")
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.parsed += len(contexts) - len(errors)
+                self.parse_batches += 1
+                self.parse_seconds += worker_seconds
+                self.parse_errors += len(errors)
+                self.handled += handled
+                self.handle_seconds += elapsed
+            self._done(len(contexts))
+
+    def _done(self, count):
+        for _ in range(count):
+            self._queue.task_done()
+
+    # 지금까지 넣은 응답이 모두 처리될 때까지 기다리는 함수 (수집이 끝날 때 호출)
+    def drain(self):
+        self._queue.join()
+
+    # 남은 응답을 처리하고 프로세스 풀을 닫는 함수
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._dispatcher.join()
+        self._collector.join()
+        self.executor.shutdown(wait=True)
+
+    def metrics(self):
+        with self._lock:
+            wall = max(time.monotonic() - self.started, 1e-9)
+
+            # 단계별 처리 용량 (초당 항목 수) = 항목 수 / (바쁜 시간 / 병렬도)
+            def capacity(items, busy, parallelism):
+                return items / (busy / parallelism) if busy > 0 else float('inf')
+
+            return {
+                'wall_seconds': wall,
+                'fetched': self.fetched,
+                'fetched_mb': self.fetched_bytes / 1024 / 1024,
+                'network_capacity': capacity(self.fetched, self.fetch_seconds, self.network_workers),
+                'queue_wait_seconds': self.queue_wait_seconds,
+                'max_queue_depth': self.max_queue_depth,
+                'parsed': self.parsed,
+                'parse_batches': self.parse_batches,
+                'parse_errors': self.parse_errors,
+                'parse_capacity': capacity(self.parsed, self.parse_seconds, self.processes),
+                'handled': self.handled,
+                'handle_capacity': capacity(self.handled, self.handle_seconds, 1),
+            }
+
+    # 단계별 처리량과 병목 단계를 출력하고 로그에 남기는 함수
+    def report(self):
+        m = self.metrics()
+        capacities = {'network': m['network_capacity'], 'parse': m['parse_capacity'], 'write': m['handle_capacity']}
+        bottleneck = min(capacities, key=capacities.get)
+        message = (f"Pipeline: network {m['fetched']} responses ({m['fetched_mb']:.1f} MB, "
+                   f"{m['network_capacity']:.0f}/s capacity, queue max {m['max_queue_depth']}, "
+                   f"waited {m['queue_wait_seconds']:.1f}s); "
+                   f"parse {m['parsed']} in {m['parse_batches']} batches ({m['parse_capacity']:.0f}/s capacity, "
+                   f"{m['parse_errors']} errors); "
+                   f"write {m['handled']} ({m['handle_capacity']:.0f}/s capacity); "
+                   f"{m['fetched'] / m['wall_seconds']:.1f} responses/s overall, bottleneck: {bottleneck}")
+        print(message)
+        logging.info(message)
@@ -0,0 +1,197 @@
+import time
+import random
+import threading
+import logging
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+# 모든 쓰레드 / 코루틴이 함께 쓰는 요청 속도 제한과 재시도 정책
+# - 토큰 버킷: 초당 rate 개의 토큰이 쌓이고 (최대 burst 개), 요청 하나에 토큰 하나를 쓴다
+# - AIMD: 처음 429/5xx 를 받기 전까지는 빠르게 (초당 약 두 배) 올리고, 그 뒤로는 성공할 때마다 조금씩 올리며,
+#   429/5xx 를 받으면 절반으로 줄인다
+# - Retry-After 를 받으면 그 시간 동안 모든 요청을 멈춘다
+# - 재시도는 지터를 넣은 지수 백오프로 하고, 수집(sweep) 한 번에 쓸 수 있는 재시도 횟수(budget)를 제한한다
+
+# 재시도할 HTTP 상태 코드 (429 와 일시적인 서버 오류)
+retryable_status = {429, 500, 502, 503, 504}
+
+
+# Retry-After 헤더 값을 초 단위로 바꾸는 함수 (초 또는 HTTP 날짜 형식, 없거나 잘못되면 None)
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    # 토큰이 있으면 바로 쓰고 True, 없으면 기다리지 않고 False 를 돌려주는 함수
+    def try_acquire(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    # 토큰 하나를 예약하고 기다려야 할 시간(초)을 돌려주는 함수
+    # 토큰이 모자라면 음수로 빌려 써서, 동시에 기다리는 요청들이 1/rate 간격으로 줄을 서게 한다
+    def reserve(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    # 속도를 바꾸는 함수 (쌓인 토큰은 새 속도 기준으로 다시 채워진다)
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate=5.0, burst=None, min_rate=0.5, max_rate=None, increase=0.05,
+                 decrease=0.5, cooldown=1.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate * 4
+        self.increase = increase
+        self.decrease = decrease
+        # 동시에 도착한 429 여러 개로 속도가 연달아 줄지 않도록, 한 번 줄인 뒤 이 시간 동안은 더 줄이지 않는다
+        self.cooldown = cooldown
+        self.acquired = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self._slow_start = True
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    # 다음 요청까지 기다릴 시간을 계산하는 함수 (Retry-After 로 멈춘 시간 포함)
+    def _reserve(self):
+        delay = self.bucket.reserve()
+        with self._lock:
+            delay = max(delay, self._paused_until - time.monotonic())
+            self.acquired += 1
+            self.waited += delay
+        return delay
+
+    # 요청을 보내도 될 때까지 기다리는 함수 (쓰레드용)
+    def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    # 요청을 보내도 될 때까지 기다리는 함수 (asyncio 용, 쓰레드 수집기는 asyncio 를 import 하지 않도록 여기서 import)
+    async def acquire_async(self):
+        import asyncio
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # 성공한 요청마다 속도를 올리는 함수
+    # slow start 동안은 요청마다 1씩 (1초에 rate 번 성공하므로 초당 약 두 배), 그 뒤에는 increase 씩 올린다 (additive increase)
+    def on_success(self):
+        rate = self.bucket.rate
+        if rate < self.max_rate:
+            step = 1.0 if self._slow_start else self.increase
+            self.bucket.set_rate(min(self.max_rate, rate + step))
+
+    # 429/5xx 를 받았을 때 속도를 줄이고 Retry-After 동안 모든 요청을 멈추는 함수 (multiplicative decrease)
+    def on_throttle(self, retry_after=None):
+        now = time.monotonic()
+        with self._lock:
+            self.throttled += 1
+            self._slow_start = False
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+        new_rate = max(self.min_rate, self.bucket.rate * self.decrease)
+        self.bucket.set_rate(new_rate)
+        logging.warning(f"Throttled by server, request rate lowered to {new_rate:.2f}/s"
+                        + (f", pausing {retry_after:.1f}s" if retry_after else ""))
+
+    def stats(self):
+        with self._lock:
+            return {'acquired': self.acquired, 'throttled': self.throttled, 'waited': self.waited,
+                    'rate': self.bucket.rate}
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=30.0, budget=200):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.retries = 0
+        self.exhausted = 0
+        self._remaining = budget
+        self._lock = threading.Lock()
+
+    # 새 수집을 시작할 때 재시도 예산을 다시 채우는 함수
+    def reset(self):
+        with self._lock:
+            self._remaining = self.budget
+
+    # 한 번 더 시도해도 되는지 확인하고, 된다면 예산을 하나 쓰는 함수
+    # attempt 는 지금까지 보낸 횟수 (1부터)
+    def allow(self, attempt):
+        if attempt >= self.max_attempts:
+            return False
+        with self._lock:
+            if self._remaining <= 0:
+                self.exhausted += 1
+                return False
+            self._remaining -= 1
+            self.retries += 1
+            return True
+
+    # 재시도 전에 기다릴 시간을 계산하는 함수 (full jitter 지수 백오프, Retry-After 가 더 길면 그 값)
+    def delay(self, attempt, retry_after=None):
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            return max(backoff, min(retry_after, self.max_delay))
+        return backoff
+
+    def stats(self):
+        with self._lock:
+            return {'retries': self.retries, 'exhausted': self.exhausted, 'remaining': self._remaining}
+
+
+# 속도 제한과 재시도 통계를 출력하고 로그에 남기는 함수
+def report(rate_limiter, retry_policy):
+    limiter_stats = rate_limiter.stats()
+    retry_stats = retry_policy.stats()
+    message = (f"Rate limit: {limiter_stats['rate']:.2f} req/s now, {limiter_stats['throttled']} throttled, "
+               f"{limiter_stats['waited']:.1f}s waited; {retry_stats['retries']} retries, "
+               f"{retry_stats['exhausted']} dropped after budget ran out")
+    print(message)
+    logging.info(message)
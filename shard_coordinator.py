@@ -0,0 +1,156 @@
+import os
+import math
+import time
+import socket
+import sqlite3
+import threading
+import logging
+
+# 여러 수집기 프로세스(노드)가 도시 목록을 나눠 수집하기 위한 샤드 분배와 임대(lease) 관리
+# - 주(state) 단위로 샤드를 만든다. 같은 주의 도시들은 관측소를 많이 공유하므로 한 워커가 함께 가져가야 중복 요청이 적다.
+#   도시 수가 많은 주부터 가장 가벼운 샤드에 넣어 (LPT) 샤드 크기를 고르게 맞추고, 같은 도시 목록이면 항상 같은 결과가 나온다.
+# - 샤드 i 의 원래 주인은 i % worker_count 번 워커다. coordinator DB 가 없으면 이 고정 분배만 쓴다.
+# - coordinator DB (SQLite) 가 있으면 워커는 수집마다 샤드 임대를 갱신한다. 임대가 만료된 (죽은 워커의) 샤드는
+#   살아 있는 워커들이 공평한 몫만큼 나눠 가져가고, 원래 주인이 다시 살아나면 돌려준다.
+
+
+# 도시 목록을 shard_count 개의 샤드 ({state: {city: (lat, lon)}}) 로 나누는 함수
+def build_shards(city_coordinates, shard_count):
+    shard_count = max(1, min(shard_count, len(city_coordinates)))
+    shards = [{} for _ in range(shard_count)]
+    sizes = [0] * shard_count
+    for state, cities in sorted(city_coordinates.items(), key=lambda item: (-len(item[1]), item[0])):
+        lightest = min(range(shard_count), key=lambda i: (sizes[i], i))
+        shards[lightest][state] = cities
+        sizes[lightest] += len(cities)
+    return shards
+
+
+# 여러 샤드를 하나의 도시 목록으로 합치는 함수
+def merge_shards(shards, shard_ids):
+    merged = {}
+    for shard_id in sorted(shard_ids):
+        merged.update(shards[shard_id])
+    return merged
+
+
+def default_shard_count(city_coordinates, worker_count):
+    # 워커보다 샤드가 많아야 죽은 워커의 몫을 여러 워커가 나눠 받을 수 있다
+    return min(len(city_coordinates), worker_count * 4)
+
+
+class ShardCoordinator:
+    def __init__(self, db_path, city_coordinates, worker_index, worker_count, shard_count=None, lease_seconds=60):
+        if not 0 <= worker_index < worker_count:
+            raise ValueError(f"Worker index {worker_index} is out of range for {worker_count} workers")
+        self.db_path = db_path
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self.lease_seconds = lease_seconds
+        self.shards = build_shards(city_coordinates, shard_count or default_shard_count(city_coordinates, worker_count))
+        self.owned = []
+        self.takeovers = 0
+        self.handbacks = 0
+        self.started = time.time()
+        self._connection = None
+        self._lock = threading.Lock()
+        if db_path is None:
+            # coordinator 없이 워커 번호로만 나누는 고정 분배
+            return
+        # 스케줄러 쓰레드와 종료 핸들러가 같은 연결을 쓰므로 lock 으로 직렬화한다
+        self._connection = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS shard_leases "
+                                 "(shard INTEGER PRIMARY KEY, owner INTEGER NOT NULL, expires_at REAL NOT NULL)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS workers "
+                                 "(worker_index INTEGER PRIMARY KEY, host TEXT, pid INTEGER, seen_at REAL NOT NULL)")
+
+    def _home(self, shard_id):
+        return shard_id % self.worker_count
+
+    # 샤드 임대를 갱신하고 이번 수집에서 맡을 샤드 번호 목록을 돌려주는 함수
+    def acquire(self):
+        if self._connection is None:
+            self.owned = [i for i in range(len(self.shards)) if self._home(i) == self.worker_index]
+            return self.owned
+
+        with self._lock:
+            return self._acquire_leases()
+
+    def _acquire_leases(self):
+        now = time.time()
+        expires_at = now + self.lease_seconds
+        connection = self._connection
+        # BEGIN IMMEDIATE 로 다른 워커의 분배와 겹치지 않게 한다
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?, ?)",
+                               (self.worker_index, socket.gethostname(), os.getpid(), now))
+            live = {row[0] for row in connection.execute("SELECT worker_index FROM workers WHERE seen_at > ?",
+                                                         (now - self.lease_seconds,))}
+            leases = {row[0]: (row[1], row[2]) for row in connection.execute("SELECT * FROM shard_leases")}
+
+            owned = []
+            orphans = []
+            for shard_id in range(len(self.shards)):
+                owner, lease_expires = leases.get(shard_id, (None, 0.0))
+                free = owner is None or lease_expires <= now or owner == self.worker_index
+                home = self._home(shard_id)
+                if home == self.worker_index:
+                    # 내 샤드: 비어 있거나 만료됐으면 가져온다 (빌려 간 워커는 내가 살아 있는 것을 보고 돌려준다)
+                    if free:
+                        owned.append(shard_id)
+                elif owner == self.worker_index and lease_expires > now:
+                    if home in live:
+                        # 원래 주인이 살아났으므로 임대를 그쪽으로 넘긴다
+                        connection.execute("UPDATE shard_leases SET owner = ? WHERE shard = ?", (home, shard_id))
+                        self.handbacks += 1
+                        logging.info(f"Handing shard {shard_id} back to worker {home}")
+                    else:
+                        owned.append(shard_id)
+                elif free and home not in live and (owner is not None or now - self.started >= self.lease_seconds):
+                    # 아무도 가져간 적 없는 샤드는 원래 주인이 늦게 뜨는 중일 수 있으므로 임대 시간만큼 기다린다
+                    orphans.append(shard_id)
+
+            # 주인이 죽은 샤드는 살아 있는 워커 수로 나눈 공평한 몫까지만 가져간다
+            fair_share = math.ceil(len(self.shards) / max(len(live), 1))
+            for shard_id in orphans:
+                if len(owned) >= fair_share:
+                    break
+                owned.append(shard_id)
+                self.takeovers += 1
+                logging.warning(f"Taking over shard {shard_id} from worker {self._home(shard_id)}")
+
+            connection.executemany("INSERT OR REPLACE INTO shard_leases VALUES (?, ?, ?)",
+                                   [(shard_id, self.worker_index, expires_at) for shard_id in owned])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        self.owned = sorted(owned)
+        return self.owned
+
+    # 임대를 갱신하고 이번 수집에서 맡을 도시 목록을 돌려주는 함수
+    def assigned_cities(self):
+        return merge_shards(self.shards, self.acquire())
+
+    # 종료할 때 임대를 바로 풀어, 다른 워커가 만료를 기다리지 않고 가져가게 하는 함수
+    def release(self):
+        if self._connection is None:
+            return
+        with self._lock:
+            try:
+                self._connection.execute("DELETE FROM shard_leases WHERE owner = ?", (self.worker_index,))
+                self._connection.execute("DELETE FROM workers WHERE worker_index = ?", (self.worker_index,))
+            except sqlite3.Error as e:
+                logging.warning(f"Failed to release shard leases: {e}")
+            self._connection.close()
+            self._connection = None
+
+    # 맡은 샤드와 도시 수, 넘겨받은/돌려준 횟수를 출력하고 로그에 남기는 함수
+    def report(self):
+        cities = sum(len(cities) for shard_id in self.owned for cities in self.shards[shard_id].values())
+        message = (f"Shards: worker {self.worker_index}/{self.worker_count} owns {len(self.owned)}/{len(self.shards)} "
+                   f"shards ({cities} cities), {self.takeovers} taken over, {self.handbacks} handed back")
+        print(message)
+        logging.info(message)
@@ -0,0 +1,316 @@
+import os
+import glob
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import city_registry
+from weather_query import open_dataset, read
+
+# 관측소 / 도시 위치의 공간 색인
+# 위도/경도를 cell_size 도 격자 칸으로 나눈 칸 번호(geohash 와 같은 역할)로 점들을 정렬해 두면,
+# 한 위도 줄의 연속된 칸들은 정렬된 배열에서 연속된 구간이 된다. 반경 / 사각형 질의는 질의 범위가 걸치는
+# 위도 줄마다 searchsorted 로 구간 하나만 잘라 후보를 모으고, 후보에만 haversine 거리를 계산한다.
+# 여러 지점의 질의는 모든 지점의 구간을 한 배열로 펼쳐 searchsorted / haversine 을 한 번씩만 부른다.
+# 색인은 데이터셋 폴더 안의 _spatial_index.npz 로 저장한다 ('_' 로 시작하는 파일은 pyarrow.dataset 이 무시한다).
+
+earth_radius_km = 6371.0088
+km_per_degree = np.pi * earth_radius_km / 180
+index_filename = '_spatial_index.npz'
+
+
+# 한 점(또는 점 배열)에서 여러 점까지의 대원 거리(km)를 계산하는 함수
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * earth_radius_km * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class SpatialIndex:
+    # names: 점 이름 (관측소 이름 / "City, ST"), kinds: 'station' / 'city', states: 그 점이 나온 주 ("TX,OK")
+    def __init__(self, names, latitudes, longitudes, kinds=None, states=None, cell_size=0.5):
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.cell_size = float(cell_size)
+        self.lon_cells = int(np.ceil(360 / self.cell_size))
+        cells = self._cells(latitudes, longitudes)
+        order = np.argsort(cells, kind='stable')
+        self.cells = cells[order]
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+        self.names = np.asarray(names, dtype=str)[order]
+        self.kinds = np.asarray(kinds if kinds is not None else ['station'] * len(order), dtype=str)[order]
+        self.states = np.asarray(states if states is not None else [''] * len(order), dtype=str)[order]
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _rows(self, latitudes):
+        return np.clip(np.floor((np.asarray(latitudes) + 90) / self.cell_size), 0,
+                       np.ceil(180 / self.cell_size) - 1).astype(np.int64)
+
+    def _columns(self, longitudes):
+        return (np.floor((np.mod(np.asarray(longitudes) + 180, 360)) / self.cell_size).astype(np.int64)
+                % self.lon_cells)
+
+    def _cells(self, latitudes, longitudes):
+        return self._rows(latitudes) * self.lon_cells + self._columns(longitudes)
+
+    # 질의마다 위도 줄 범위 [row_lo, row_hi] × 경도 칸 범위 [col_lo, col_hi] 에 든 점들을 한 번에 모으는 함수
+    # → (질의 번호 배열, 색인 위치 배열). 모든 질의의 (위도 줄, 칸 구간) 을 펼쳐 searchsorted 를 한 번만 부르고,
+    # 구간들을 np.repeat 으로 위치 배열로 펼친다. 경도 칸 범위가 [0, lon_cells) 를 벗어나면 날짜변경선을 넘는
+    # 범위로 보고 두 구간으로 나누며, 한 바퀴 이상이면 경도 전체로 본다
+    def _batch_candidates(self, row_lo, row_hi, col_lo, col_hi):
+        row_lo, row_hi, col_lo, col_hi = (np.asarray(value, dtype=np.int64) for value in (row_lo, row_hi, col_lo, col_hi))
+        full = col_hi - col_lo + 1 >= self.lon_cells
+        col_lo = np.where(full, 0, col_lo)
+        col_hi = np.where(full, self.lon_cells - 1, col_hi)
+        wrap = (col_lo < 0) | (col_hi >= self.lon_cells)
+        queries = np.arange(len(row_lo))
+        span_query = np.concatenate([queries, queries[wrap]])
+        span_row_lo = np.concatenate([row_lo, row_lo[wrap]])
+        span_row_hi = np.concatenate([row_hi, row_hi[wrap]])
+        span_lo = np.concatenate([np.where(wrap, col_lo % self.lon_cells, col_lo),
+                                  np.zeros(np.count_nonzero(wrap), dtype=np.int64)])
+        span_hi = np.concatenate([np.where(wrap, self.lon_cells - 1, col_hi), col_hi[wrap] % self.lon_cells])
+        rows = np.maximum(span_row_hi - span_row_lo + 1, 0)
+        line = np.repeat(np.arange(len(span_query)), rows)
+        row = np.repeat(span_row_lo - (np.cumsum(rows) - rows), rows) + np.arange(rows.sum())
+        starts = np.searchsorted(self.cells, row * self.lon_cells + span_lo[line], side='left')
+        ends = np.searchsorted(self.cells, row * self.lon_cells + span_hi[line], side='right')
+        counts = np.maximum(ends - starts, 0)
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        return np.repeat(span_query[line], counts), positions
+
+    # 지점마다 radius_km 를 덮는 (위도 줄, 경도 칸) 범위 (극에 가까우면 경도 전체)
+    def _radius_ranges(self, latitudes, longitudes, radii):
+        dlat = radii / km_per_degree
+        row_lo, row_hi = self._rows(latitudes - dlat), self._rows(latitudes + dlat)
+        # 극에 가까울수록 같은 거리가 더 넓은 경도 범위가 된다
+        max_lat = np.minimum(np.abs(latitudes) + dlat, 90.0)
+        polar = max_lat >= 89.9
+        dlon = np.minimum(dlat / np.cos(np.radians(np.where(polar, 0.0, max_lat))), 180.0)
+        col_lo = np.floor((longitudes - dlon + 180) / self.cell_size).astype(np.int64)
+        col_hi = np.floor((longitudes + dlon + 180) / self.cell_size).astype(np.int64)
+        return row_lo, row_hi, np.where(polar, 0, col_lo), np.where(polar, self.lon_cells - 1, col_hi)
+
+    # 지점마다 radius_km 안의 점을 모두 찾는 함수 → (지점 번호, 색인 위치, 거리) 배열을 (지점, 거리) 순으로
+    # 후보는 _batch_candidates 로 한 번에 모으고, (지점, 후보) 쌍 전체에 haversine 을 한 번 계산한다
+    def _within(self, latitudes, longitudes, radii, kind=None):
+        queries, positions = self._batch_candidates(*self._radius_ranges(latitudes, longitudes, radii))
+        if kind is not None:
+            keep = self.kinds[positions] == kind
+            queries, positions = queries[keep], positions[keep]
+        distances = haversine_km(latitudes[queries], longitudes[queries],
+                                 self.latitudes[positions], self.longitudes[positions])
+        inside = distances <= radii[queries]
+        queries, positions, distances = queries[inside], positions[inside], distances[inside]
+        order = np.lexsort((positions, distances, queries))
+        return queries[order], positions[order], distances[order]
+
+    def _query_points(self, latitudes, longitudes):
+        return (np.atleast_1d(np.asarray(latitudes, dtype=np.float64)),
+                np.atleast_1d(np.asarray(longitudes, dtype=np.float64)))
+
+    # 여러 지점의 반경 질의: 지점마다 radius_km 안의 점들의 (위치 배열, 거리 배열) 리스트를 가까운 순으로 돌려준다
+    # 지점은 query_chunk 개씩 묶어 한 번에 계산한다 (묶음마다 (지점, 후보) 쌍 배열만큼 메모리를 쓴다)
+    def query_radius(self, latitudes, longitudes, radius_km, kind=None, query_chunk=4096):
+        latitudes, longitudes = self._query_points(latitudes, longitudes)
+        radii = np.broadcast_to(np.asarray(radius_km, dtype=np.float64), latitudes.shape)
+        results = []
+        for lo in range(0, len(latitudes), query_chunk):
+            chunk = slice(lo, lo + query_chunk)
+            queries, positions, distances = self._within(latitudes[chunk], longitudes[chunk], radii[chunk], kind)
+            bounds = np.searchsorted(queries, np.arange(len(latitudes[chunk]) + 1))
+            results += [(positions[start:end], distances[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+        return results
+
+    # 여러 지점의 k-최근접 질의: (위치 배열 (n, k), 거리 배열 (n, k)) 을 돌려준다 (점이 k 개보다 적으면 -1 / inf)
+    # 반경 안의 점은 빠짐없이 찾으므로, 반경을 두 배씩 넓혀 k 개 이상 나온 반경의 앞쪽 k 개가 정확한 답이다
+    # 아직 k 개를 못 찾은 지점들만 모아 반경을 함께 넓히며 한 번에 다시 질의한다
+    def query_nearest(self, latitudes, longitudes, k=1, kind=None, query_chunk=4096):
+        latitudes, longitudes = self._query_points(latitudes, longitudes)
+        positions = np.full((len(latitudes), k), -1, dtype=np.int64)
+        distances = np.full((len(latitudes), k), np.inf)
+        population = len(self) if kind is None else int(np.count_nonzero(self.kinds == kind))
+        needed = min(k, population)
+        radii = np.full(len(latitudes), self.cell_size * km_per_degree)
+        for lo in range(0, len(latitudes), query_chunk):
+            pending = np.arange(lo, min(lo + query_chunk, len(latitudes)))
+            while len(pending):
+                queries, found, found_distances = self._within(latitudes[pending], longitudes[pending],
+                                                               radii[pending], kind)
+                counts = np.bincount(queries, minlength=len(pending))
+                done = (counts >= needed) | (radii[pending] >= np.pi * earth_radius_km)
+                # 끝난 지점은 가까운 순 앞쪽 k 개를 담는다
+                rank = np.arange(len(queries)) - (np.cumsum(counts) - counts)[queries]
+                take = done[queries] & (rank < k)
+                positions[pending[queries[take]], rank[take]] = found[take]
+                distances[pending[queries[take]], rank[take]] = found_distances[take]
+                pending = pending[~done]
+                radii[pending] *= 2
+        return positions, distances
+
+    # 사각형 안의 점 위치 배열을 돌려주는 함수 (min_lon > max_lon 이면 날짜변경선을 넘는 사각형)
+    def query_bbox(self, min_lat, min_lon, max_lat, max_lon, kind=None):
+        _, positions = self.query_bboxes([min_lat], [min_lon], [max_lat], [max_lon], kind)
+        return positions
+
+    # 여러 사각형을 한 번에 질의하는 함수 → (사각형 번호 배열, 색인 위치 배열) 쌍 (사각형, 위치 순)
+    # (max_lon < min_lon 이면 날짜변경선을 넘는 사각형)
+    def query_bboxes(self, min_lats, min_lons, max_lats, max_lons, kind=None):
+        min_lats, min_lons, max_lats, max_lons = (np.asarray(value, dtype=np.float64).ravel()
+                                                  for value in (min_lats, min_lons, max_lats, max_lons))
+        wrap = max_lons < min_lons
+        col_lo = np.floor((min_lons + 180) / self.cell_size).astype(np.int64)
+        col_hi = np.floor((max_lons + 180) / self.cell_size).astype(np.int64) + np.where(wrap, self.lon_cells, 0)
+        boxes, positions = self._batch_candidates(self._rows(min_lats), self._rows(max_lats), col_lo, col_hi)
+        lat, lon = self.latitudes[positions], self.longitudes[positions]
+        inside = (lat >= min_lats[boxes]) & (lat <= max_lats[boxes])
+        above, below = lon >= min_lons[boxes], lon <= max_lons[boxes]
+        inside &= np.where(wrap[boxes], above | below, above & below)
+        if kind is not None:
+            inside &= self.kinds[positions] == kind
+        boxes, positions = boxes[inside], positions[inside]
+        order = np.lexsort((positions, boxes))
+        return boxes[order], positions[order]
+
+    # 색인 위치 배열을 사람이 읽을 수 있는 dict 리스트로 바꾸는 함수
+    def describe(self, positions, distances=None):
+        result = []
+        for i, position in enumerate(positions):
+            if position < 0:
+                continue
+            item = {'name': str(self.names[position]), 'kind': str(self.kinds[position]),
+                    'states': str(self.states[position]), 'latitude': float(self.latitudes[position]),
+                    'longitude': float(self.longitudes[position])}
+            if distances is not None:
+                item['distance_km'] = float(distances[i])
+            result.append(item)
+        return result
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, names=self.names, kinds=self.kinds, states=self.states, latitudes=self.latitudes,
+                 longitudes=self.longitudes, cell_size=self.cell_size)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['names'], data['latitudes'], data['longitudes'], kinds=data['kinds'],
+                       states=data['states'], cell_size=float(data['cell_size']))
+
+
+# 수집된 데이터셋의 관측소 위치와 도시 좌표로 색인을 만드는 함수
+# 데이터셋은 station / location / state 열만 읽는다
+def build_index(dataset_root=None, city_coordinates=None, cell_size=0.5):
+    names, latitudes, longitudes, kinds, states = [], [], [], [], []
+    if dataset_root and os.path.isdir(dataset_root):
+        dataset = open_dataset(dataset_root)
+        stations = {}
+        for batch in dataset.to_batches(columns=['station', 'location', 'state']):
+            # GeoJSON 좌표는 [경도, 위도] 순서
+            location = batch.column('location')
+            table = pa.table({'station': pc.cast(batch.column('station'), pa.string()),
+                              'state': pc.cast(batch.column('state'), pa.string()),
+                              'longitude': pc.list_element(location, 0),
+                              'latitude': pc.list_element(location, 1)})
+            table = table.filter(pc.and_(pc.is_valid(table['station']), pc.is_valid(table['latitude'])))
+            # 같은 관측소가 배치 안에서 여러 번 나오므로 (관측소, 주) 쌍으로 먼저 줄인다
+            table = table.group_by(['station', 'state']).aggregate([('latitude', 'max'), ('longitude', 'max')])
+            for station, state, lat, lon in zip(table['station'].to_pylist(), table['state'].to_pylist(),
+                                                table['latitude_max'].to_pylist(), table['longitude_max'].to_pylist()):
+                entry = stations.setdefault(station, {'location': (lat, lon), 'states': set()})
+                entry['states'].add(state)
+        for station, entry in stations.items():
+            names.append(station)
+            latitudes.append(entry['location'][0])
+            longitudes.append(entry['location'][1])
+            kinds.append('station')
+            states.append(','.join(sorted(entry['states'])))
+    for state, cities in (city_coordinates or {}).items():
+        for city, (lat, lon) in cities.items():
+            names.append(f"{city}, {state}")
+            latitudes.append(lat)
+            longitudes.append(lon)
+            kinds.append('city')
+            states.append(state)
+    return SpatialIndex(names, latitudes, longitudes, kinds=kinds, states=states, cell_size=cell_size)
+
+
+# 데이터셋 안의 Parquet 파일 중 가장 최근 수정 시각
+def _latest_mtime(dataset_root):
+    paths = glob.glob(os.path.join(dataset_root, '**', '*.parquet'), recursive=True)
+    return max((os.path.getmtime(path) for path in paths), default=0.0)
+
+
+# 저장된 색인이 데이터셋보다 새것이면 불러오고, 아니면 다시 만들어 저장하는 함수
+def load_or_build(dataset_root, city_coordinates=None, cell_size=0.5, rebuild=False):
+    path = os.path.join(dataset_root, index_filename)
+    if not rebuild and os.path.exists(path) and os.path.getmtime(path) >= _latest_mtime(dataset_root):
+        return SpatialIndex.load(path)
+    index = build_index(dataset_root, city_coordinates, cell_size)
+    os.makedirs(dataset_root, exist_ok=True)
+    index.save(path)
+    return index
+
+
+# 색인으로 고른 관측소들의 저장된 관측 기록만 읽는 함수
+# 관측소가 나온 주(state) 파티션만 열고, 그 안에서 station 열로 거른다
+def station_history(dataset_root, index, positions, columns=None):
+    positions = [position for position in positions if position >= 0 and index.kinds[position] == 'station']
+    if not positions:
+        return None
+    stations = sorted({str(index.names[position]) for position in positions})
+    states = sorted({state for position in positions for state in str(index.states[position]).split(',') if state})
+    return read(dataset_root, columns=columns, states=states, stations=stations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find stored stations and cities near a point or inside a box")
+    parser.add_argument('--dataset', type=str, default=os.path.join('weather_log', 'weather_data'),
+                        help="Hive-partitioned parquet dataset written by the all-city collectors (default: weather_log/weather_data)")
+    parser.add_argument('--cities', type=str, default='city_coordinates.json',
+                        help="City coordinates to index with the stations (default: city_coordinates.json)")
+    parser.add_argument('--near', type=str, default=None, help="Query point as LAT,LON")
+    parser.add_argument('--radius', type=float, default=None, help="Radius in km around --near")
+    parser.add_argument('--k', type=int, default=5, help="Nearest points to --near when no radius is given (default: 5)")
+    parser.add_argument('--bbox', type=str, default=None, help="Bounding box as MIN_LAT,MIN_LON,MAX_LAT,MAX_LON")
+    parser.add_argument('--kind', type=str, default=None, choices=['station', 'city'],
+                        help="Only return stations or cities (default: both)")
+    parser.add_argument('--history', action='store_true', help="Also read the stored observations of the matched stations")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild the index even if it is up to date")
+    args = parser.parse_args()
+
+    city_coordinates = None
+    if args.cities and os.path.exists(args.cities):
+        city_coordinates = city_registry.city_coordinates(source=args.cities)
+    index = load_or_build(args.dataset, city_coordinates, rebuild=args.rebuild)
+    print(f"Index: {len(index)} points ({np.count_nonzero(index.kinds == 'station')} stations)")
+
+    positions, distances = [], None
+    if args.near:
+        lat, lon = (float(value) for value in args.near.split(','))
+        if args.radius is not None:
+            (positions, distances), = index.query_radius(lat, lon, args.radius, kind=args.kind)
+        else:
+            positions, distances = index.query_nearest(lat, lon, k=args.k, kind=args.kind)
+            positions, distances = positions[0], distances[0]
+    elif args.bbox:
+        positions = index.query_bbox(*(float(value) for value in args.bbox.split(',')), kind=args.kind)
+    else:
+        parser.error("Give --near or --bbox")
+
+    for item in index.describe(positions, distances):
+        distance = f"{item['distance_km']:8.1f} km  " if 'distance_km' in item else ''
+        print(f"{distance}{item['kind']:<8} {item['name']} ({item['latitude']:.4f}, {item['longitude']:.4f}) "
+              f"{item['states']}")
+
+    if args.history:
+        table = station_history(args.dataset, index, positions)
+        print(f"History: {0 if table is None else table.num_rows} stored observations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from weather_query import open_dataset, scan, parse_bucket, partial_aggregate, merge_partials, finish_aggregate
+
+# 수집기가 쓴 Parquet 데이터셋으로 전국 관측소 지도(HTML)를 만드는 모듈
+# visualize_weather_stations.py 처럼 관측소마다 folium.Marker 와 팝업 HTML 을 만들면, 관측소가 수천 개일 때
+# HTML 이 수십 MB 가 되고 브라우저가 마커 DOM 을 만드느라 멈춘다.
+# - 관측소마다 가장 최근 관측 한 줄만 남겨 [위도, 경도, 값, 관측소, 시각(분), 관측 시각 여부] 짧은 배열로 만들고 FastMarkerCluster 에 넘긴다.
+#   마커는 브라우저가 이 배열에서 만들고, 팝업 내용은 팝업을 열 때 만든다.
+#   "가장 최근" 과 팝업 시각은 관측소의 관측 시각(observation_time, UTC)이다. 관측 시각이 없는 행(이전 데이터셋)은
+#   수집 시각(timestamp, 수집기의 현지 시각)을 쓰고, 팝업에도 UTC 가 아닌 수집 시각으로 표시한다.
+# - 시간 구간(--slice)마다 격자 칸(--cell-size 도)별 평균을 weather_query 의 부분 집계로 미리 계산해 HeatMapWithTime 층으로 넣는다.
+#   관측 행이 아니라 (구간, 칸) 수만큼만 HTML 에 들어간다.
+# - 데이터(JSON) 크기가 --max-html-mb 를 넘으면 오래된 시간 구간부터 뺀다.
+# 데이터셋은 chunk 단위로 한 번만 읽고, folium 은 지도를 그릴 때만 불러온다.
+
+# 마커 좌표의 소수 자릿수 (넷째 자리 ≈ 11 m) 와 값의 소수 자릿수
+marker_precision = 4
+value_precision = 1
+# 데이터 밖의 HTML (folium 템플릿, 스크립트 태그) 크기 추정치
+page_overhead = 64 * 1024
+
+# FastMarkerCluster 가 배열 한 줄마다 부르는 JavaScript (팝업은 열 때 만든다)
+marker_callback = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindTooltip(row[3]);
+    marker.bindPopup(function () {
+        var value = row[2] === null ? 'n/a' : row[2];
+        var time = new Date(row[4] * 60000).toISOString().slice(0, 16).replace('T', ' ');
+        return '<b>' + row[3] + '</b><br>' + %s + ': ' + value + '<br>' +
+               (row[5] ? 'observed ' + time + ' UTC' : 'collected ' + time);
+    });
+    return marker;
+}
+"""
+
+
+# 읽은 테이블을 (관측소, 위도, 경도, 수집 시각, 관측 시각, 값) 테이블로 바꾸는 함수 (관측소나 위치가 없는 행은 뺀다)
+# observation_time 열이 없으면 관측 시각은 모두 null 이다
+def points_table(table, value):
+    # GeoJSON 좌표는 [경도, 위도] 순서
+    location = table['location']
+    if 'observation_time' in table.column_names:
+        observed = pc.cast(table['observation_time'], pa.timestamp('s', tz='UTC'))
+    else:
+        observed = pa.nulls(table.num_rows, pa.timestamp('s', tz='UTC'))
+    points = pa.table({'station': pc.cast(table['station'], pa.string()),
+                       'latitude': pc.list_element(location, 1),
+                       'longitude': pc.list_element(location, 0),
+                       # Parquet 에는 timestamp[s] 가 ms 로 저장되므로 초 단위로 되돌린다
+                       'timestamp': pc.cast(table['timestamp'], pa.timestamp('s')),
+                       'observation_time': observed,
+                       value: pc.cast(table[value], pa.float64())})
+    return points.filter(pc.and_(pc.is_valid(points['station']), pc.is_valid(points['latitude'])))
+
+
+# 데이터셋을 chunk_size 행 묶음으로 읽어 points_table 로 내보내는 제너레이터
+def scan_points(root, value, start=None, end=None, states=None, chunk_size=262144):
+    columns = ['timestamp', 'station', 'location', value]
+    # observation_time 이 생기기 전에 쓴 데이터셋에는 열이 없다
+    if 'observation_time' in open_dataset(root).schema.names:
+        columns.append('observation_time')
+    chunk, rows = [], 0
+    for batch in scan(root, columns, start, end, states):
+        if batch.num_rows == 0:
+            continue
+        chunk.append(batch)
+        rows += batch.num_rows
+        if rows >= chunk_size:
+            yield points_table(pa.Table.from_batches(chunk), value)
+            chunk, rows = [], 0
+    if chunk:
+        yield points_table(pa.Table.from_batches(chunk), value)
+
+
+# 마커에 쓸 시각 (관측 시각, 없으면 수집 시각) 을 epoch 초 배열로 돌려주는 함수
+def marker_times(points):
+    collected = pc.cast(points['timestamp'], pa.int64())
+    return pc.coalesce(pc.cast(points['observation_time'], pa.int64()), collected).to_numpy()
+
+
+# 관측소마다 가장 최근 행만 남기는 함수 ((관측소, 관측 시각, 수집 시각) 으로 정렬해 관측소마다 마지막 행)
+def latest_rows(points):
+    codes = points['station'].combine_chunks().dictionary_encode().indices.to_numpy()
+    collected = pc.cast(points['timestamp'], pa.int64()).to_numpy()
+    order = np.lexsort((collected, marker_times(points), codes))
+    last = np.append(codes[order][1:] != codes[order][:-1], True)
+    return points.take(order[last])
+
+
+# 데이터셋을 한 번 읽어 관측소별 최근 관측과 (격자 칸, 시간 구간) 별 평균을 함께 계산하는 함수
+# → (최근 관측 테이블, 격자 평균 테이블 또는 None), 데이터가 없으면 (None, None)
+# 격자 평균은 weather_query.aggregate 처럼 chunk 마다 부분 집계만 남기므로 메모리는 (칸, 구간) 수에 비례한다
+def collect_map_data(root, value='temperature_celsius', cell_size=0.5, bucket='1h', start=None, end=None,
+                     states=None, chunk_size=262144, merge_rows=200000):
+    keys = ['cell_row', 'cell_col']
+    bucket = parse_bucket(bucket) if bucket else None
+    group_keys = keys + ['bucket']
+    latest, partials = None, []
+    for points in scan_points(root, value, start, end, states, chunk_size):
+        latest = latest_rows(points if latest is None else pa.concat_tables([latest, points]))
+        if bucket is None:
+            continue
+        grid = points.append_column('cell_row', pc.cast(pc.floor(pc.divide(points['latitude'], cell_size)), pa.int32()))
+        grid = grid.append_column('cell_col', pc.cast(pc.floor(pc.divide(points['longitude'], cell_size)), pa.int32()))
+        partials.append(partial_aggregate(grid, [value], keys, bucket))
+        if sum(partial.num_rows for partial in partials) >= merge_rows:
+            partials = [merge_partials(partials, [value], group_keys)]
+    if latest is None:
+        return None, None
+    if not partials:
+        return latest, None
+    return latest, finish_aggregate(merge_partials(partials, [value], group_keys), [value], group_keys, stats=('mean',))
+
+
+# 최근 관측 테이블을 FastMarkerCluster 용 짧은 배열 목록으로 바꾸는 함수
+def marker_rows(latest, value):
+    latitudes = np.round(latest['latitude'].to_numpy(), marker_precision).tolist()
+    longitudes = np.round(latest['longitude'].to_numpy(), marker_precision).tolist()
+    values = pc.round(latest[value], value_precision).to_pylist()
+    minutes = (marker_times(latest) // 60).tolist()
+    observed = pc.is_valid(latest['observation_time']).to_numpy(zero_copy_only=False).astype(int).tolist()
+    return [list(row) for row in zip(latitudes, longitudes, values, latest['station'].to_pylist(), minutes, observed)]
+
+
+# 격자 평균 테이블을 HeatMapWithTime 용 구간별 [위도, 경도, 세기] 목록으로 바꾸는 함수
+# 세기는 모든 구간의 평균값 범위를 0 ~ 1 로 맞춘 값이다 → {'index': 구간 이름, 'data': 구간별 목록, 'range': (최소, 최대)}
+def grid_slices(grid, value, cell_size):
+    means = grid[f"{value}_mean"].to_numpy(zero_copy_only=False).astype(np.float64)
+    keep = np.isfinite(means)
+    means = means[keep]
+    buckets = pc.cast(grid['bucket'], pa.int64()).to_numpy()[keep]
+    latitudes = np.round((grid['cell_row'].to_numpy()[keep] + 0.5) * cell_size, marker_precision)
+    longitudes = np.round((grid['cell_col'].to_numpy()[keep] + 0.5) * cell_size, marker_precision)
+    if not len(means):
+        return {'index': [], 'data': [], 'range': (None, None)}
+    low, high = float(means.min()), float(means.max())
+    weights = np.round((means - low) / ((high - low) or 1.0), 3)
+    order = np.argsort(buckets, kind='stable')
+    names, starts = np.unique(buckets[order], return_index=True)
+    rows = np.stack([latitudes[order], longitudes[order], weights[order]], axis=1).tolist()
+    bounds = list(starts) + [len(rows)]
+    return {'index': [str(label) for label in np.datetime_as_string(names.astype('datetime64[s]'), unit='m')],
+            'data': [rows[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])],
+            'range': (low, high)}
+
+
+# 데이터가 HTML 에 들어갈 때의 크기 (folium 도 json.dumps 로 넣는다)
+def json_size(data):
+    return len(json.dumps(data))
+
+
+# 마커와 시간 구간이 max_bytes 안에 들도록 오래된 구간부터 빼는 함수 → (남긴 slices, 뺀 구간 수, 예상 크기)
+# 마커만으로 넘치면 ValueError
+def fit_slices(markers, slices, max_bytes):
+    used = page_overhead + json_size(markers)
+    if used > max_bytes:
+        raise ValueError(f"The station markers alone take {used / 1e6:.1f} MB, above the {max_bytes / 1e6:.1f} MB limit")
+    sizes = [json_size(data) for data in slices['data']]
+    keep = 0
+    # 가장 최근 구간부터 채운다
+    for size in reversed(sizes):
+        if used + size > max_bytes:
+            break
+        used += size
+        keep += 1
+    dropped = len(sizes) - keep
+    kept = dict(slices, index=slices['index'][dropped:], data=slices['data'][dropped:])
+    return kept, dropped, used
+
+
+# folium 지도를 만들어 path 에 저장하는 함수 (slices 가 비어 있으면 마커 층만)
+def render_map(markers, slices, value, path):
+    import folium
+    from folium.plugins import FastMarkerCluster, HeatMapWithTime
+    center = [float(np.mean([row[0] for row in markers])), float(np.mean([row[1] for row in markers]))]
+    station_map = folium.Map(location=center, zoom_start=4, prefer_canvas=True)
+    FastMarkerCluster(markers, callback=marker_callback % json.dumps(value), name='Latest observations').add_to(station_map)
+    if slices and slices['data']:
+        low, high = slices['range']
+        HeatMapWithTime(slices['data'], index=slices['index'], name=f"{value} ({low:.1f} to {high:.1f})",
+                        auto_play=False, radius=20, min_opacity=0.2, max_opacity=0.8).add_to(station_map)
+    folium.LayerControl().add_to(station_map)
+    station_map.save(path)
+
+
+# 데이터셋에서 지도를 만드는 함수 → 결과 요약 dict (데이터가 없으면 None)
+def build_map(root, path, value='temperature_celsius', cell_size=0.5, bucket='1h', max_bytes=10000000,
+              start=None, end=None, states=None):
+    started = time.perf_counter()
+    latest, grid = collect_map_data(root, value, cell_size, bucket, start, end, states)
+    if latest is None:
+        return None
+    markers = marker_rows(latest, value)
+    slices = grid_slices(grid, value, cell_size) if grid is not None else {'index': [], 'data': [], 'range': (None, None)}
+    kept, dropped, estimate = fit_slices(markers, slices, max_bytes)
+    prepared = time.perf_counter()
+    render_map(markers, kept, value, path)
+    size = os.path.getsize(path)
+    return {'stations': len(markers), 'slices': len(kept['data']), 'dropped': dropped,
+            'cells': sum(len(data) for data in kept['data']), 'estimate': estimate, 'size': size,
+            'prepare_seconds': prepared - started, 'render_seconds': time.perf_counter() - prepared}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a clustered station map from the collected parquet dataset")
+    parser.add_argument('--dataset', type=str, default='weather_log/weather_data',
+                        help="Hive-partitioned parquet dataset written by the all-city collectors (default: weather_log/weather_data)")
+    parser.add_argument('--output', type=str, default='weather_map.html', help="HTML file to write (default: weather_map.html)")
+    parser.add_argument('--value', type=str, default='temperature_celsius',
+                        help="Observation column shown in the popups and the grid layer (default: temperature_celsius)")
+    parser.add_argument('--start', type=str, default=None, help="Start time, inclusive, e.g. 2024-05-01T06:00 (default: no limit)")
+    parser.add_argument('--end', type=str, default=None, help="End time, exclusive (default: no limit)")
+    parser.add_argument('--hours', type=float, default=None, help="Only the last N hours, instead of --start (default: no limit)")
+    parser.add_argument('--state', type=str, default=None, help="Comma separated states (default: all)")
+    parser.add_argument('--slice', type=str, default='1h',
+                        help="Time slice of the grid layer, e.g. 15m, 1h, 1d; 'none' for markers only (default: 1h)")
+    parser.add_argument('--cell-size', type=float, default=0.5, help="Grid cell size of the grid layer in degrees (default: 0.5)")
+    parser.add_argument('--max-html-mb', type=float, default=10,
+                        help="Drop the oldest time slices to keep the HTML under this size in MB (default: 10)")
+    parser.add_argument('--open', action='store_true', help="Open the map in the web browser")
+    args = parser.parse_args()
+
+    start = args.start
+    if args.hours:
+        start = datetime.now() - timedelta(hours=args.hours)
+    try:
+        result = build_map(args.dataset, args.output, args.value, args.cell_size,
+                           None if args.slice == 'none' else args.slice, int(args.max_html_mb * 1e6),
+                           start=start, end=args.end, states=args.state)
+    except ValueError as e:
+        parser.error(str(e))
+    if result is None:
+        print("No matching rows")
+        return
+    print(f"{result['stations']} stations, {result['slices']} time slices with {result['cells']} grid cells "
+          f"({result['dropped']} older slices dropped for the size limit)")
+    print(f"Wrote {args.output}: {result['size'] / 1e6:.2f} MB (estimated {result['estimate'] / 1e6:.2f} MB), "
+          f"data {result['prepare_seconds']:.2f} s, rendering {result['render_seconds']:.2f} s")
+    if args.open:
+        import webbrowser
+        webbrowser.open(f"file://{os.path.realpath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import logging
+import threading
+from collections import OrderedDict
+
+# 한 번의 수집(sweep)을 위한 관측소 계획
+# 가까운 도시들은 observationStations 목록이 크게 겹치므로, 먼저 관측소 → 도시 목록을 만든 뒤
+# 관측소마다 /observations/latest 를 한 번만 가져오고 결과를 각 도시 행으로 펼친다.
+class SweepPlan:
+    def __init__(self):
+        self.station_cities = OrderedDict()
+        self.total_fetches = 0
+        self.failed_cities = []
+        self._lock = threading.Lock()
+
+    # 도시 하나의 관측소 목록을 계획에 추가하는 함수 (주별 쓰레드에서 동시에 호출 가능)
+    def add_city(self, city, state, stations):
+        with self._lock:
+            for station_url in stations:
+                self.station_cities.setdefault(station_url, []).append((city, state))
+            self.total_fetches += len(stations)
+
+    def add_failed_city(self, city, state):
+        with self._lock:
+            self.failed_cities.append((city, state))
+
+    @property
+    def stations(self):
+        return list(self.station_cities)
+
+    @property
+    def unique_fetches(self):
+        return len(self.station_cities)
+
+    # 관측소 한 곳의 관측값을 그 관측소를 쓰는 모든 도시의 행(tuple)으로 펼치는 함수
+    # weather_schema 는 pyarrow 를 import 하므로 계획만 세우는 쪽(수집기 import, --help)에서는 읽지 않도록 여기서 import 한다
+    def fan_out(self, station_url, station_name, station_location, current_observation):
+        from weather_schema import observation_rows
+        return observation_rows(self.station_cities.get(station_url, []), station_name, station_location,
+                                current_observation)
+
+    # 이미 뽑아 둔 관측소 단위 값을 도시 행들로 펼치는 함수 (parse_pool 경로)
+    def fan_out_values(self, station_url, station_name, station_location, values):
+        from weather_schema import value_rows
+        return value_rows(self.station_cities.get(station_url, []), station_name, station_location, values)
+
+    # 계획된 관측소 요청 수(중복 제거 전/후)를 출력하는 함수
+    def report(self):
+        saved = self.total_fetches - self.unique_fetches
+        message = (f"Sweep plan: {self.unique_fetches} unique station fetches "
+                   f"for {self.total_fetches} city-station pairs ({saved} duplicates skipped)")
+        if self.failed_cities:
+            message += f", {len(self.failed_cities)} cities failed discovery"
+        print(message)
+        logging.info(message)
+
+
+# 모든 도시의 관측소 목록을 조회해 계획을 만드는 함수
+# resolve_stations(latitude, longitude) 는 관측소 URL 리스트를 돌려줘야 한다
+def plan_sweep(city_coordinates, resolve_stations, plan=None):
+    plan = plan if plan is not None else SweepPlan()
+    for state, cities in city_coordinates.items():
+        for city, (lat, lon) in cities.items():
+            try:
+                stations = resolve_stations(lat, lon)
+            except Exception as e:
+                logging.error(f"Failed to get stations for {city}, {state}: {e}")
+                plan.add_failed_city(city, state)
+                continue
+            plan.add_city(city, state, stations)
+    return plan
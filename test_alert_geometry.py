@@ -0,0 +1,121 @@
+import numpy as np
+import nws_client
+from alert_geometry import AlertGeometryMatcher, polygon_edges, points_in_polygon
+from alert_monitor import AlertMonitor, extract_alert
+from spatial_index import SpatialIndex
+
+# alert_geometry.py (경보 다각형 → 도시) 와 alert_monitor.py 의 다각형 도시 합치기 테스트
+# python -m pytest test_alert_geometry.py
+
+square = [[-100.0, 30.0], [-98.0, 30.0], [-98.0, 32.0], [-100.0, 32.0], [-100.0, 30.0]]
+hole = [[-99.5, 30.5], [-99.5, 31.5], [-98.5, 31.5], [-98.5, 30.5], [-99.5, 30.5]]
+triangle = [[-90.0, 40.0], [-89.0, 40.0], [-89.5, 41.0], [-90.0, 40.0]]
+
+
+# (위도, 경도) 목록이 geometry 안에 있는지 → bool 리스트
+def inside(geometry, points):
+    latitudes = np.array([lat for lat, _ in points])
+    longitudes = np.array([lon for _, lon in points])
+    return points_in_polygon(latitudes, longitudes, polygon_edges(geometry)).tolist()
+
+
+def feature(alert_id, geometry, zones=(), **properties):
+    return {'geometry': geometry,
+            'properties': dict({'id': alert_id, 'event': 'Tornado Warning', 'messageType': 'Alert',
+                                'geocode': {'UGC': list(zones)}, 'sent': '2024-05-01T00:00:00+00:00',
+                                'expires': '2024-05-01T01:00:00+00:00'}, **properties)}
+
+
+def test_square():
+    assert inside({'type': 'Polygon', 'coordinates': [square]},
+                  [(31.0, -99.0), (33.0, -99.0), (31.0, -97.0), (30.2, -99.9)]) == [True, False, False, True]
+
+
+def test_hole_is_outside():
+    assert inside({'type': 'Polygon', 'coordinates': [square, hole]},
+                  [(31.0, -99.0), (30.2, -99.9), (31.9, -98.1)]) == [False, True, True]
+
+
+def test_multipolygon():
+    geometry = {'type': 'MultiPolygon', 'coordinates': [[square], [triangle]]}
+    assert inside(geometry, [(31.0, -99.0), (40.3, -89.5), (35.0, -95.0)]) == [True, True, False]
+
+
+def test_geometry_collection():
+    geometry = {'type': 'GeometryCollection', 'geometries': [{'type': 'Point', 'coordinates': [-95.0, 35.0]},
+                                                             {'type': 'Polygon', 'coordinates': [triangle]}]}
+    assert inside(geometry, [(40.3, -89.5), (31.0, -99.0)]) == [True, False]
+
+
+# 닫지 않은 고리는 마지막 점에서 첫 점으로 돌아가는 변을 스스로 더한다
+def test_unclosed_ring():
+    assert inside({'type': 'Polygon', 'coordinates': [square[:-1]]}, [(31.0, -99.0), (29.0, -99.0)]) == [True, False]
+
+
+def test_non_polygon_has_no_edges():
+    assert polygon_edges({'type': 'Point', 'coordinates': [-99.0, 31.0]}) is None
+    assert polygon_edges(None) is None
+
+
+def test_match_alerts_skips_alerts_without_polygons():
+    matcher = AlertGeometryMatcher({'texas': {'inside': (30.2, -99.9), 'in_hole': (31.0, -99.0),
+                                              'outside': (33.0, -99.0)},
+                                    'illinois': {'corner': (40.3, -89.5)}})
+    matches = matcher.match_alerts([
+        feature('a', {'type': 'Polygon', 'coordinates': [square, hole]}),
+        feature('b', None),
+        feature('c', {'type': 'MultiPolygon', 'coordinates': [[square], [triangle]]}),
+        feature('d', {'type': 'Point', 'coordinates': [-99.0, 31.0]}),
+    ])
+    assert sorted(matches) == ['a', 'c', 'd']
+    assert matches['a'] == [('inside', 'texas')]
+    assert matches['d'] == []
+    assert sorted(matches['c']) == [('corner', 'illinois'), ('in_hole', 'texas'), ('inside', 'texas')]
+
+
+# 날짜변경선을 넘는 사각형 (max_lon < min_lon) 은 두 구간으로 나눠 찾는다
+def test_query_bboxes_date_line():
+    names = ['east', 'west', 'middle', 'north']
+    latitudes = [10.0, 10.0, 10.0, 40.0]
+    longitudes = [179.5, -179.5, 0.0, 179.5]
+    index = SpatialIndex(names, latitudes, longitudes)
+    boxes, positions = index.query_bboxes([5.0, 5.0], [179.0, -1.0], [15.0, 15.0], [-179.0, 1.0])
+    found = {box: sorted(index.names[positions[boxes == box]]) for box in (0, 1)}
+    assert found == {0: ['east', 'west'], 1: ['middle']}
+    assert sorted(index.names[index.query_bbox(5.0, 179.0, 15.0, -179.0)]) == ['east', 'west']
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {'ETag': '"1"'}
+
+    def __init__(self, features):
+        self.features = features
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'features': self.features}
+
+
+# poll 은 다각형 안의 도시를 구역으로 찾은 도시에 중복 없이 더한다 (구멍 안의 도시는 빠진다)
+def test_poll_merges_geometry_cities_with_zone_cities(monkeypatch):
+    zone_index = {'TXZ001': [('inside', 'texas'), ('zoned', 'texas')]}
+    matcher = AlertGeometryMatcher({'texas': {'inside': (30.2, -99.9), 'in_hole': (31.0, -99.0)},
+                                    'oklahoma': {'polygon only': (31.5, -98.2)}})
+    monitor = AlertMonitor(zone_index, geometry_matcher=matcher)
+    features = [feature('a', {'type': 'Polygon', 'coordinates': [square, hole]}, zones=['TXZ001']),
+                feature('b', None, zones=['TXZ001'])]
+    monkeypatch.setattr(nws_client, 'get', lambda url, headers=None: FakeResponse(features))
+    events = {event['id']: event for event in monitor.poll()}
+    assert events['a']['cities'] == ['Polygon Only, OKLAHOMA', 'Inside, TEXAS', 'Zoned, TEXAS']
+    assert events['b']['cities'] == ['Inside, TEXAS', 'Zoned, TEXAS']
+
+
+def test_diff_uses_geometry_cities():
+    monitor = AlertMonitor({'TXZ001': [('zoned', 'texas')]})
+    alert = extract_alert(feature('a', None, zones=['TXZ001']))
+    alert['geometry_cities'] = [('zoned', 'texas'), ('dallas', 'texas')]
+    events = monitor.diff([alert])
+    assert [event['cities'] for event in events] == [['Dallas, TEXAS', 'Zoned, TEXAS']]
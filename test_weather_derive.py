@@ -0,0 +1,108 @@
+import numpy as np
+import weather_derive
+from weather_observation import fahrenheit_to_celsius, celsius_to_fahrenheit, calculate_heat_index, calculate_dew_point
+from weather_schema import observation_schema, RecordBatchBuilder
+
+# weather_derive.py (배열 파생 지표) 테스트
+# python -m pytest test_weather_derive.py
+
+rng = np.random.default_rng(0)
+t_f = rng.uniform(-20, 115, 20000)
+h = rng.uniform(0, 100, 20000)
+
+
+def steadman(t, humidity):
+    return 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + humidity * 0.094)
+
+
+# 배열 함수는 기존 스칼라 함수와 같은 값을 낸다
+def test_matches_scalar_functions():
+    t_c = fahrenheit_to_celsius(t_f)
+    np.testing.assert_allclose(weather_derive.fahrenheit_to_celsius(t_f),
+                               [fahrenheit_to_celsius(x) for x in t_f], rtol=1e-12)
+    np.testing.assert_allclose(weather_derive.celsius_to_fahrenheit(t_c),
+                               [celsius_to_fahrenheit(x) for x in t_c], rtol=1e-12)
+    np.testing.assert_allclose(weather_derive.heat_index_rothfusz(t_f, h),
+                               [calculate_heat_index(a, b) for a, b in zip(t_f, h)], rtol=1e-9)
+    np.testing.assert_allclose(weather_derive.dew_point(t_c, h),
+                               [calculate_dew_point(a, b) for a, b in zip(t_c, h)], rtol=1e-12)
+
+
+# 고온 구간에서는 보정이 없는 한 전체 알고리즘이 Rothfusz 회귀식과 같다
+def test_hot_range_is_rothfusz():
+    hot = (t_f >= 90) & (h >= 13) & (h <= 85)
+    np.testing.assert_allclose(weather_derive.heat_index(t_f[hot], h[hot]),
+                               [calculate_heat_index(a, b) for a, b in zip(t_f[hot], h[hot])], rtol=1e-9)
+
+
+# NWS 표 값과 비교 (표는 정수로 반올림되어 있음)
+def test_heat_index_table():
+    table = [((90, 70), 106), ((100, 40), 109), ((96, 65), 121), ((84, 90), 98), ((82, 40), 81),
+             ((80, 50), 81), ((80, 60), 82), ((80, 70), 83), ((80, 80), 84), ((80, 90), 86)]
+    for (temperature, humidity), expected in table:
+        assert abs(float(weather_derive.heat_index(temperature, humidity)) - expected) <= 1.0, (temperature, humidity)
+
+
+# 표의 80°F / 40~45% 는 Steadman 단순식 구간이다 (회귀식을 쓰면 80 을 넘는다)
+def test_steadman_low_range():
+    for humidity, expected in ((40, 80), (45, 80)):
+        value = float(weather_derive.heat_index(80, humidity))
+        assert value == steadman(80, humidity)
+        assert round(value) == expected
+    # 표 아래 온도는 모두 단순식 값이다
+    cool = rng.uniform(0, 75, 1000)
+    humidity = rng.uniform(0, 100, 1000)
+    np.testing.assert_allclose(weather_derive.heat_index(cool, humidity), steadman(cool, humidity), rtol=1e-12)
+
+
+# (단순식 + 기온)/2 가 80°F 를 넘는 순간 회귀식으로 바뀌고, 바뀌는 자리에서 값이 크게 튀지 않는다
+def test_switch_at_80f():
+    # 80°F 에서 경계 습도는 (160 - 155.4) / 0.094 ≈ 48.9%
+    below, above = 48.9, 49.0
+    assert (steadman(80, below) + 80) / 2 < 80 <= (steadman(80, above) + 80) / 2
+    assert float(weather_derive.heat_index(80, below)) == steadman(80, below)
+    assert float(weather_derive.heat_index(80, above)) == float(weather_derive.heat_index_rothfusz(80, above))
+    assert abs(float(weather_derive.heat_index(80, above)) - float(weather_derive.heat_index(80, below))) < 1.0
+
+
+# 80°F 이상에서만 습도 보정을 더하고, 80°F 미만은 단순식 구간이라 보정이 없다
+def test_humidity_adjustments_start_at_80f():
+    humid = float(weather_derive.heat_index(80, 90))
+    assert humid > float(weather_derive.heat_index_rothfusz(80, 90))
+    dry = float(weather_derive.heat_index(95, 5))
+    assert dry < float(weather_derive.heat_index_rothfusz(95, 5))
+    assert float(weather_derive.heat_index(79, 90)) == steadman(79, 90)
+
+
+def test_wind_chill_table():
+    table = [((0, 15), -19), ((30, 10), 21), ((-10, 30), -39), ((40, 5), 36)]
+    for (temperature, speed), expected in table:
+        assert abs(float(weather_derive.wind_chill(temperature, speed)) - expected) <= 1.0, (temperature, speed)
+
+
+# 50°F 이하에서는 wind chill, 그보다 따뜻하면 heat index 를 쓴다
+def test_apparent_temperature_switch():
+    apparent = weather_derive.apparent_temperature
+    assert float(apparent(50, 50, 10)) == float(weather_derive.wind_chill(50, 10))
+    assert float(apparent(50, 50, 10)) < 50
+    assert float(apparent(51, 50, 10)) == steadman(51, 50)
+    assert float(apparent(95, 50, 10)) == float(weather_derive.heat_index(95, 50))
+    # 바람이 3 mph 미만이면 wind chill 이 정의되지 않아 기온을 그대로 쓴다
+    assert float(apparent(40, 50, 2)) == 40
+    # 풍속이 없으면 (NaN 이나 None) heat index 만 쓴다
+    assert float(apparent(30, 50, float('nan'))) == steadman(30, 50)
+    assert float(apparent(30, 50)) == steadman(30, 50)
+    # 배열에서는 행마다 따로 고른다
+    np.testing.assert_allclose(apparent([20, 60, 100], [50, 50, 50], [20, 20, 20]),
+                               [float(weather_derive.wind_chill(20, 20)), steadman(60, 50),
+                                float(weather_derive.heat_index(100, 50))])
+
+
+# null 은 null 로 남아야 한다
+def test_nulls_stay_null():
+    builder = RecordBatchBuilder(observation_schema)
+    builder.append((None, 'a', 'b', 'c', [0.0, 0.0], 20.0, None, None, None, None, 10.0, 0.0, None, None, 'Clear', None))
+    builder.append((None, 'a', 'b', 'c', [0.0, 0.0], None, None, None, None, 50.0, 10.0, 0.0, None, None, 'Clear', None))
+    batch = weather_derive.derive_batch(builder.build())
+    assert batch.column(batch.schema.get_field_index('dew_point')).null_count == 2
+    assert batch.column(batch.schema.get_field_index('temperature_fahrenheit')).null_count == 1
@@ -1,4 +1,5 @@
-import requests
+import nws_client
+from nws_client import api_base_url
 import folium
 import webbrowser
 import os
@@ -8,18 +9,16 @@ latitude = 32.7767
 longitude = -96.7970
 
 # NWS API 엔드포인트
-points_url = f"https://api.weather.gov/points/{latitude},{longitude}"
+points_url = f"{api_base_url}/points/{latitude},{longitude}"
 
 # 위치 정보 가져오기
-response = requests.get(points_url)
-data = response.json()
+data = nws_client.get_json(points_url)
 
 # 관측소 URL 추출
 observation_stations_url = data['properties']['observationStations']
 
 # 관측소 데이터 가져오기
-stations_response = requests.get(observation_stations_url)
-stations_data = stations_response.json()
+stations_data = nws_client.get_json(observation_stations_url)
 stations = stations_data['observationStations']
 
 # 지도 생성
@@ -28,7 +27,7 @@ dallas_map = folium.Map(location=[latitude, longitude], zoom_start=10)
 # 각 관측소의 현재 날씨 데이터 가져오기 및 지도에 추가
 for station_url in stations:
     current_weather_url = f"{station_url}/observations/latest"
-    current_weather_response = requests.get(current_weather_url)
+    current_weather_response = nws_client.get(current_weather_url)
     if current_weather_response.status_code == 200:
         current_weather_data = current_weather_response.json()
         current_observation = current_weather_data['properties']
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import aiohttp
+import nws_client
+from nws_metadata_cache import MetadataCache, extract_point, extract_station_list, extract_station
+from sweep_planner import SweepPlan
+from observation_tracker import ObservationTracker
+from rate_limiter import retryable_status, parse_retry_after
+
+# asyncio 기반 수집 엔진
+# points → stations → observations 호출을 전역 동시성 제한(세마포어)과
+# 호스트별 연결 제한(TCPConnector) 아래에서 한꺼번에 펼쳐서 실행한다
+class AsyncWeatherEngine:
+    def __init__(self, headers=None, api_base_url=nws_client.api_base_url, max_concurrency=32,
+                 per_host_limit=16, timeout=10, metadata_cache=None, rate_limiter=None, retry_policy=None,
+                 observation_tracker=None):
+        self.headers = headers if headers is not None else nws_client.default_headers()
+        self.metadata_cache = metadata_cache if metadata_cache is not None else MetadataCache()
+        self.observation_tracker = observation_tracker if observation_tracker is not None else ObservationTracker()
+        self.api_base_url = api_base_url
+        # 쓰레드 수집기와 같은 전역 속도 제한 / 재시도 예산을 기본으로 쓴다
+        self.rate_limiter = rate_limiter if rate_limiter is not None else nws_client.rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else nws_client.retry_policy
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.request_count = 0
+        self.plan = None
+        # 행을 만든 관측의 observe pending (행을 저장 단계에 넘긴 뒤 commit_observations 로 기록)
+        self.pending = []
+        self._semaphore = None
+
+    # 속도 제한과 전역 동시성 제한 안에서 요청을 보내고 (상태 코드, 응답 헤더, JSON) 을 돌려주는 함수
+    # 429/5xx 와 연결 오류는 nws_client 와 같은 재시도 정책으로 백오프 후 다시 보낸다 (304 는 본문 없이 돌려준다)
+    # raw=True 면 JSON 대신 본문 bytes 를 돌려준다
+    async def _fetch(self, session, url, headers=None, raw=False):
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.rate_limiter.acquire_async()
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    self.request_count += 1
+                    async with session.get(url, headers=headers) as response:
+                        if response.status not in retryable_status:
+                            self.rate_limiter.on_success()
+                            if response.status == 304:
+                                return response.status, response.headers, None
+                            response.raise_for_status()
+                            if raw:
+                                return response.status, response.headers, await response.read()
+                            return response.status, response.headers, await response.json(content_type=None)
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        self.rate_limiter.on_throttle(retry_after)
+                        if not self.retry_policy.allow(attempt):
+                            response.raise_for_status()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not self.retry_policy.allow(attempt):
+                    raise
+            await asyncio.sleep(self.retry_policy.delay(attempt, retry_after))
+
+    # 관측소의 최신 관측을 조건부 요청으로 가져오는 함수 → (관측값, pending), 바뀌지 않았으면 None
+    async def _get_observation(self, session, station_url):
+        status, response_headers, body = await self._fetch(session, f"{station_url}/observations/latest",
+                                                           self.observation_tracker.request_headers(station_url),
+                                                           raw=True)
+        return self.observation_tracker.observe(station_url, status, response_headers, body)
+
+    # 메타데이터 캐시를 거쳐 points/관측소 정보를 가져오는 함수 (만료 시 조건부 요청)
+    async def _get_cached_json(self, session, url, extract):
+        cache = self.metadata_cache
+        data = cache.lookup(url)
+        if data is not None:
+            return data
+        status, response_headers, payload = await self._fetch(session, url, cache.request_headers(url))
+        if status == 304:
+            # 캐시에 없는 URL 의 304 는 쓸 본문이 없으므로 실패로 본다
+            if url not in cache.entries:
+                raise ValueError(f"304 Not Modified for {url} without a cached response")
+            return cache.mark_revalidated(url, response_headers)
+        return cache.store(url, extract(payload), response_headers)
+
+    # 한 관측소의 최신 관측값과 관측소 정보를 가져와 그 관측소를 쓰는 도시 행들을 만드는 함수
+    async def _collect_station(self, session, plan, station_url):
+        try:
+            observed = await self._get_observation(session, station_url)
+            # 직전 관측과 같으면 관측소 정보도 필요 없다
+            if observed is None:
+                return []
+            current_observation, pending = observed
+            station_info = await self._get_cached_json(session, station_url, extract_station)
+            rows = plan.fan_out(station_url, station_info['name'], station_info['coordinates'], current_observation)
+        except Exception as e:
+            print(f"Failed to get data for station: {station_url}, error: {e}")
+            return []
+        self.pending.append(pending)
+        return rows
+
+    # 저장 단계에 넘긴 관측을 관측 상태에 기록하는 함수
+    def commit_observations(self):
+        pending, self.pending = self.pending, []
+        self.observation_tracker.commit_all(pending)
+
+    # 한 도시의 관측소 목록을 조회해 계획에 추가하는 함수
+    # 어떤 오류든 (JSON 이 아닌 본문 등) 그 도시만 실패로 두고, 전체 수집은 계속한다
+    async def _discover_city(self, session, plan, latitude, longitude, city, state):
+        try:
+            point = await self._get_cached_json(session, f"{self.api_base_url}/points/{latitude},{longitude}",
+                                                extract_point)
+            stations = await self._get_cached_json(session, point['observation_stations'], extract_station_list)
+        except Exception as e:
+            logging.error(f"Failed to get data for {city}, {state}: {e}")
+            plan.add_failed_city(city, state)
+            return
+        plan.add_city(city, state, stations)
+
+    # 전체 도시 목록을 한 번 수집(sweep)하는 함수
+    # 1단계에서 모든 도시의 관측소 목록을 모으고, 2단계에서 중복 없는 관측소만 가져온다
+    async def collect(self, city_coordinates):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.retry_policy.reset()
+        self.observation_tracker.start_sweep()
+        self.pending = []
+        self.plan = SweepPlan()
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_limit)
+        async with aiohttp.ClientSession(headers=self.headers, timeout=self.timeout, connector=connector,
+                                         trace_configs=[nws_client.aiohttp_trace_config()]) as session:
+            await asyncio.gather(*(self._discover_city(session, self.plan, lat, lon, city, state)
+                                   for state, cities in city_coordinates.items()
+                                   for city, (lat, lon) in cities.items()))
+            self.plan.report()
+            results = await asyncio.gather(*(self._collect_station(session, self.plan, station_url)
+                                             for station_url in self.plan.stations))
+
+        all_station_data = []
+        for rows in results:
+            all_station_data.extend(rows)
+        return all_station_data
+
+
+# 동기 코드에서 한 번의 수집을 실행하는 함수
+# sink 가 있으면 sink(행, pending) 으로 넘기고 기록은 sink 가 저장을 마친 뒤에 맡는다 (예: FlushingBuffer.extend)
+# sink 가 없으면 행을 돌려주기 전에 새 관측을 관측 상태에 기록한다
+def run_async_sweep(city_coordinates, headers=None, api_base_url=nws_client.api_base_url,
+                    max_concurrency=32, per_host_limit=16, metadata_cache=None, observation_tracker=None, sink=None):
+    engine = AsyncWeatherEngine(headers, api_base_url=api_base_url, max_concurrency=max_concurrency,
+                                per_host_limit=per_host_limit, metadata_cache=metadata_cache,
+                                observation_tracker=observation_tracker)
+    all_station_data = asyncio.run(engine.collect(city_coordinates))
+    if sink is not None:
+        pending, engine.pending = engine.pending, []
+        sink(all_station_data, pending)
+    else:
+        engine.commit_observations()
+    print(f"Async sweep collected {len(all_station_data)} rows with {engine.request_count} requests.")
+    return all_station_data
@@ -0,0 +1,169 @@
+import time
+import queue
+import threading
+import logging
+
+# 크기와 시간으로 제한되는 쓰레드 안전 메모리 버퍼
+# 수집 쓰레드는 extend() 로 행을 넣고, 백그라운드 쓰레드가 배치 단위로 flush_fn 을 호출해 저장한다.
+# 저장이 밀려서 대기 중인 배치가 max_pending_batches 개를 넘으면 extend() 가 기다리게 되어(backpressure)
+# 메모리 사용량이 무한히 늘어나지 않는다.
+# extend() 에 행과 함께 넘긴 receipts 는 그 행들이 flush_fn 으로 저장된 뒤에만 on_flushed 로 넘어간다
+# (저장이 실패하면 버려진다). 수집기는 이것으로 저장이 끝난 관측만 관측 상태에 기록한다.
+class FlushingBuffer:
+    def __init__(self, flush_fn, max_rows=5000, max_age=30.0, max_pending_batches=4, on_flushed=None):
+        self.flush_fn = flush_fn
+        self.on_flushed = on_flushed
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self._rows = []
+        self._receipts = []
+        self._first_row_time = None
+        self._lock = threading.Lock()
+        self._pending = queue.Queue(maxsize=max_pending_batches)
+        self._pending_rows = 0
+        self._closed = False
+
+        # 지표(metrics)
+        self.rows_added = 0
+        self.rows_flushed = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.total_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.backpressure_seconds = 0.0
+
+        self._flusher = threading.Thread(target=self._flush_loop, name='weather-buffer-flusher', daemon=True)
+        self._flusher.start()
+
+    # 행을 버퍼에 추가하는 함수 (가득 차면 배치를 저장 대기열로 넘김)
+    # receipts 는 행이 저장된 뒤 on_flushed 에 넘길 값 목록 (저장할 행이 없으면 바로 넘긴다)
+    def extend(self, rows, receipts=()):
+        if not rows:
+            if receipts and self.on_flushed is not None:
+                self.on_flushed(list(receipts))
+            return
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Buffer is closed")
+            if not self._rows:
+                self._first_row_time = time.monotonic()
+            self._rows.extend(rows)
+            self._receipts.extend(receipts)
+            self.rows_added += len(rows)
+            batch = self._take_batch() if len(self._rows) >= self.max_rows else None
+        if batch:
+            self._enqueue(batch)
+
+    def append(self, row):
+        self.extend([row])
+
+    # 현재 버퍼의 행과 receipts 를 (행 목록, receipts) 배치로 꺼내는 함수 (lock 을 잡은 상태에서 호출)
+    def _take_batch(self):
+        batch = (self._rows, self._receipts)
+        self._rows = []
+        self._receipts = []
+        self._first_row_time = None
+        return batch
+
+    # 배치를 저장 대기열에 넣는 함수 (대기열이 가득 차면 기다림)
+    def _enqueue(self, batch):
+        with self._lock:
+            self._pending_rows += len(batch[0])
+        start = time.monotonic()
+        self._pending.put(batch)
+        waited = time.monotonic() - start
+        with self._lock:
+            self.backpressure_seconds += waited
+        if waited > 1.0:
+            logging.warning(f"Buffer backpressure: waited {waited:.1f}s for the writer to catch up")
+
+    # 오래된 행이 있으면 시간 기준으로 바로 저장하는 함수 (flush 쓰레드에서 호출)
+    def _flush_if_stale(self):
+        with self._lock:
+            stale = self._rows and time.monotonic() - self._first_row_time >= self.max_age
+            batch = self._take_batch() if stale else None
+            if batch:
+                self._pending_rows += len(batch[0])
+        if batch:
+            self._write(batch)
+
+    # 백그라운드에서 배치를 저장하는 루프
+    def _flush_loop(self):
+        while True:
+            try:
+                batch = self._pending.get(timeout=min(self.max_age, 1.0))
+            except queue.Empty:
+                self._flush_if_stale()
+                continue
+            if batch is None:
+                self._pending.task_done()
+                return
+            self._write(batch)
+            self._pending.task_done()
+
+    def _write(self, batch):
+        rows, receipts = batch
+        start = time.monotonic()
+        try:
+            self.flush_fn(rows)
+        except Exception as e:
+            logging.error(f"Failed to flush {len(rows)} rows: {e}")
+            with self._lock:
+                self.flush_errors += 1
+                self._pending_rows -= len(rows)
+            return
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._pending_rows -= len(rows)
+            self.rows_flushed += len(rows)
+            self.flush_count += 1
+            self.total_flush_seconds += elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        if receipts and self.on_flushed is not None:
+            try:
+                self.on_flushed(receipts)
+            except Exception as e:
+                logging.error(f"Failed to confirm {len(receipts)} flushed receipts: {e}")
+
+    # 남은 행을 모두 저장할 때까지 기다리는 함수
+    def flush(self):
+        with self._lock:
+            batch = self._take_batch() if self._rows else None
+        if batch:
+            self._enqueue(batch)
+        self._pending.join()
+
+    # 남은 행을 저장하고 백그라운드 쓰레드를 멈추는 함수
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        with self._lock:
+            self._closed = True
+        self._pending.put(None)
+        self._flusher.join()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'buffered_rows': len(self._rows),
+                'pending_rows': self._pending_rows,
+                'pending_batches': self._pending.qsize(),
+                'rows_added': self.rows_added,
+                'rows_flushed': self.rows_flushed,
+                'flush_count': self.flush_count,
+                'flush_errors': self.flush_errors,
+                'avg_flush_ms': self.total_flush_seconds / self.flush_count * 1000 if self.flush_count else 0.0,
+                'max_flush_ms': self.max_flush_seconds * 1000,
+                'backpressure_seconds': self.backpressure_seconds,
+            }
+
+    # 버퍼 깊이와 저장 지연 시간을 출력하고 로그에 남기는 함수
+    def report(self):
+        m = self.metrics()
+        message = (f"Buffer: {m['buffered_rows']} buffered, {m['pending_rows']} pending, "
+                   f"{m['rows_flushed']}/{m['rows_added']} rows flushed in {m['flush_count']} batches, "
+                   f"flush avg {m['avg_flush_ms']:.1f} ms / max {m['max_flush_ms']:.1f} ms, "
+                   f"backpressure {m['backpressure_seconds']:.1f}s, {m['flush_errors']} errors")
+        print(message)
+        logging.info(message)
@@ -1,95 +1,59 @@
-import requests
-import threading
-import time
 from datetime import datetime, timedelta
-import pandas as pd
-import pyarrow as pa
-import pyarrow.parquet as pq
 import os
 import json
 import logging
+import atexit  # 프로그램 종료 핸들러
 import argparse
-from art import text2art
+from nws_metadata_cache import MetadataCache, extract_point, extract_station_list, extract_station
+from observation_tracker import ObservationTracker
+from weather_scheduler import IntervalScheduler, interval_seconds, overrun_policies
+import nws_client
+from nws_client import api_base_url
 
-# 로그 폴더 설정
+# import 할 때는 파일을 만들거나 무거운 모듈(pyarrow, numpy, requests, art)을 읽지 않는다.
+# 로그 폴더 / 로그 파일 / 저장소 / 캐시는 setup() 이 만든다 (main 은 인자와 도시를 확인한 뒤 호출).
+
+# 로그 폴더
 log_folder = "weather_log"
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-
-# 파케이 파일 설정
-unique_id = str(datetime.now()).split('.')[0].replace(':', '-')
-parquet_filename = os.path.join(log_folder, f"weather_data_{unique_id}.parquet")
-
-# 로그 파일 설정
-log_filename = os.path.join(log_folder, f"weather_data_{unique_id}.log")
-logging.basicConfig(filename=log_filename, level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-# 주요 도시 위도 경도 정보
-city_coordinates = {
-    "alabama": {"birmingham": (33.5186, -86.8104), "montgomery": (32.3668, -86.3000)},
-    "alaska": {"anchorage": (61.2181, -149.9003)},
-    "arizona": {"phoenix": (33.4484, -112.0740)},
-    "arkansas": {"little_rock": (34.7465, -92.2896)},
-    "california": {"los_angeles": (34.0522, -118.2437), "san_francisco": (37.7749, -122.4194)},
-    "colorado": {"denver": (39.7392, -104.9903)},
-    "connecticut": {"hartford": (41.7637, -72.6851)},
-    "delaware": {"wilmington": (39.7391, -75.5398)},
-    "florida": {"miami": (25.7617, -80.1918), "orlando": (28.5383, -81.3792)},
-    "georgia": {"atlanta": (33.7490, -84.3880)},
-    "hawaii": {"honolulu": (21.3069, -157.8583)},
-    "idaho": {"boise": (43.6150, -116.2023)},
-    "illinois": {"chicago": (41.8781, -87.6298)},
-    "indiana": {"indianapolis": (39.7684, -86.1581)},
-    "iowa": {"des_moines": (41.5868, -93.6250)},
-    "kansas": {"wichita": (37.6872, -97.3301)},
-    "kentucky": {"louisville": (38.2527, -85.7585)},
-    "louisiana": {"new_orleans": (29.9511, -90.0715)},
-    "maine": {"portland": (43.6615, -70.2553)},
-    "maryland": {"baltimore": (39.2904, -76.6122)},
-    "massachusetts": {"boston": (42.3601, -71.0589)},
-    "michigan": {"detroit": (42.3314, -83.0458)},
-    "minnesota": {"minneapolis": (44.9778, -93.2650)},
-    "mississippi": {"jackson": (32.2988, -90.1848)},
-    "missouri": {"kansas_city": (39.0997, -94.5786)},
-    "montana": {"billings": (45.7833, -108.5007)},
-    "nebraska": {"omaha": (41.2565, -95.9345)},
-    "nevada": {"las_vegas": (36.1699, -115.1398)},
-    "new_hampshire": {"manchester": (42.9956, -71.4548)},
-    "new_jersey": {"newark": (40.7357, -74.1724)},
-    "new_mexico": {"albuquerque": (35.0844, -106.6504)},
-    "new_york": {"new_york": (40.7128, -74.0060)},
-    "north_carolina": {"charlotte": (35.2271, -80.8431)},
-    "north_dakota": {"fargo": (46.8772, -96.7898)},
-    "ohio": {"columbus": (39.9612, -82.9988)},
-    "oklahoma": {"oklahoma_city": (35.4676, -97.5164)},
-    "oregon": {"portland": (45.5051, -122.6750)},
-    "pennsylvania": {"philadelphia": (39.9526, -75.1652)},
-    "rhode_island": {"providence": (41.8239, -71.4128)},
-    "south_carolina": {"charleston": (32.7765, -79.9311)},
-    "south_dakota": {"sioux_falls": (43.5446, -96.7311)},
-    "tennessee": {"nashville": (36.1627, -86.7816)},
-    "texas": {"houston": (29.7604, -95.3698), "dallas": (32.7767, -96.7970)},
-    "utah": {"salt_lake_city": (40.7608, -111.8910)},
-    "vermont": {"burlington": (44.4759, -73.2121)},
-    "virginia": {"virginia_beach": (36.8529, -75.9780)},
-    "washington": {"seattle": (47.6062, -122.3321)},
-    "west_virginia": {"charleston": (38.3498, -81.6326)},
-    "wisconsin": {"milwaukee": (43.0389, -87.9065)},
-    "wyoming": {"cheyenne": (41.1400, -104.8202)}
-}
-
-# # JSON 파일을 읽어서 딕셔너리로 변환하는 함수
-# def load_dict_from_json(filename):
-#     with open(filename, 'r') as f:
-#         dictionary = json.load(f)
-#     print(f"Dictionary loaded from {filename}")
-#     return dictionary
-#
-# # 파일에서 딕셔너리 불러오기
-# city_coordinates = load_dict_from_json('city_coordinates.json')
-#
-# # print(city_coordinates)
+
+# setup() 이 정하는 실행 식별자 (파일 이름에 사용)
+unique_id = None
+
+# 날짜별로 나뉜 Parquet 데이터셋 저장소
+parquet_sink = None
+
+# points/관측소 메타데이터 캐시 (실행 간 재사용)
+metadata_cache = None
+
+# 관측소별 마지막 관측 상태 (바뀌지 않은 관측은 다시 저장하지 않음, 전체 도시 수집기와 따로 보관)
+observation_tracker = None
+
+# 로그 폴더, 로그 파일, 저장소, 캐시를 만들고 종료 시 닫기를 등록하는 함수 (한 번만)
+def setup():
+    global unique_id, parquet_sink, metadata_cache, observation_tracker
+    if parquet_sink is not None:
+        return
+    from parquet_sink import PartitionedParquetSink
+    from weather_schema import station_row_schema
+
+    if not os.path.exists(log_folder):
+        os.makedirs(log_folder)
+
+    # 파케이 파일 설정
+    unique_id = str(datetime.now()).split('.')[0].replace(':', '-')
+    parquet_sink = PartitionedParquetSink(os.path.join(log_folder, "weather_data_single"),
+                                          prefix=f"weather_data_{unique_id.replace(' ', '_')}",
+                                          partition_cols=('date',), schema=station_row_schema)
+    # 프로그램 종료 시 열린 Parquet 파일을 닫음
+    atexit.register(parquet_sink.close)
+
+    # 로그 파일 설정
+    log_filename = os.path.join(log_folder, f"weather_data_{unique_id}.log")
+    logging.basicConfig(filename=log_filename, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    metadata_cache = MetadataCache(os.path.join(log_folder, "nws_metadata_cache.json"))
+    observation_tracker = ObservationTracker(os.path.join(log_folder, "observation_state_single.json"))
 
 # 화씨를 섭씨로 변환하는 함수
 def fahrenheit_to_celsius(f):
@@ -121,46 +85,45 @@ def calculate_dew_point(t_c, h):
 
 # NWS API로부터 실측 데이터를 가져오는 함수
 def get_current_weather(latitude, longitude, total_collections, current_collection):
+    import requests
     try:
         # NWS API 엔드포인트
-        points_url = f"https://api.weather.gov/points/{latitude},{longitude}"
-
-        # 위치 정보 가져오기
-        response = requests.get(points_url, timeout=10)
-        response.raise_for_status()  # HTTP 에러 확인
-        data = response.json()
+        points_url = f"{api_base_url}/points/{latitude},{longitude}"
 
-        # 관측소 URL 추출
-        observation_stations_url = data['properties']['observationStations']
+        # 위치 정보 가져오기 (메타데이터 캐시 사용)
+        point = metadata_cache.get(points_url, extract_point)
 
         first_station_printed = False
 
-        # 관측소 데이터 가져오기
-        stations_response = requests.get(observation_stations_url, timeout=10)
-        stations_response.raise_for_status()  # HTTP 에러 확인
-        stations_data = stations_response.json()
-        stations = stations_data['observationStations']
+        # 관측소 목록 가져오기 (메타데이터 캐시 사용)
+        stations = metadata_cache.get(point['observation_stations'], extract_station_list)
 
-        all_station_data = []
+        all_station_data, pending = [], []
 
         # 각 관측소 데이터 가져오기
         for station_url in stations:
             try:
                 # 현재 날씨 데이터 가져오기
                 current_weather_url = f"{station_url}/observations/latest"
-                current_weather_response = requests.get(current_weather_url, timeout=10)
-                current_weather_response.raise_for_status()  # HTTP 에러 확인
-                current_weather_data = current_weather_response.json()
-
-                # 관측소 위치 정보 가져오기
-                station_info_response = requests.get(station_url, timeout=10)
-                station_info_response.raise_for_status()  # HTTP 에러 확인
-                station_info_data = station_info_response.json()
-                station_name = station_info_data['properties']['name']
-                station_location = station_info_data['geometry']['coordinates']
+                current_weather_response = nws_client.get(current_weather_url,
+                                                          headers=observation_tracker.request_headers(station_url))
+                if current_weather_response.status_code != 304:
+                    current_weather_response.raise_for_status()  # HTTP 에러 확인
+
+                # 직전 관측과 같으면 (304 / 같은 본문 / 같은 관측 시각) 파싱과 저장을 건너뛴다
+                observed = observation_tracker.observe(station_url, current_weather_response.status_code,
+                                                       current_weather_response.headers,
+                                                       current_weather_response.content)
+                if observed is None:
+                    continue
+                current_observation, observation = observed
+
+                # 관측소 위치 정보 가져오기 (메타데이터 캐시 사용)
+                station_info = metadata_cache.get(station_url, extract_station)
+                station_name = station_info['name']
+                station_location = station_info['coordinates']
 
                 # 현재 날씨 정보
-                current_observation = current_weather_data['properties']
                 temperature_value = current_observation['temperature']['value']
                 temperature_unit = current_observation['temperature']['unitCode']
 
@@ -196,6 +159,7 @@ def get_current_weather(latitude, longitude, total_collections, current_collecti
                 }
 
                 all_station_data.append(station_data)
+                pending.append(observation)
 
                 if not first_station_printed:
                     print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -206,15 +170,10 @@ def get_current_weather(latitude, longitude, total_collections, current_collecti
                 print(f"Failed to get data for station: {station_url}, error: {e}")
                 # print(json.dumps(station_data, indent=4))
 
-        # Parquet 파일에 데이터 저장
-        df = pd.DataFrame(all_station_data)
-        table = pa.Table.from_pandas(df)
-
-        if os.path.exists(parquet_filename):
-            old_data = pq.read_table(parquet_filename)
-            table = pa.concat_tables([old_data, table])
-
-        pq.write_table(table, parquet_filename)
+        # Parquet 데이터셋에 이번 수집분만 추가
+        parquet_sink.write_rows(all_station_data)
+        # 저장이 끝난 관측만 기록한다 (그 전에 실패한 관측소는 다음 수집에서 다시 가져온다)
+        observation_tracker.commit_all(pending)
 
         print(f"Collected {current_collection}/{total_collections} data points.")
     except requests.exceptions.RequestException as e:
@@ -222,7 +181,8 @@ def get_current_weather(latitude, longitude, total_collections, current_collecti
 
 
 # 스케줄 설정 함수
-def set_schedule(interval, unit, latitude, longitude, start_now=True, on_the_hour=False, duration_minutes=None):
+# 예정 시각은 interval 의 벽시계 경계 (예: 5분이면 :00, :05 ...) 로 정해지므로 수집 시간만큼 밀리지 않는다
+def set_schedule(interval, unit, latitude, longitude, start_now=True, duration_minutes=None, overrun='skip'):
     end_time = None
     if duration_minutes:
         end_time = datetime.now() + timedelta(minutes=duration_minutes)
@@ -232,42 +192,19 @@ def set_schedule(interval, unit, latitude, longitude, start_now=True, on_the_hou
 
     def job():
         nonlocal current_collection
+        nws_client.start_sweep()
+        observation_tracker.start_sweep()
         get_current_weather(latitude, longitude, total_collections, current_collection)
         current_collection += 1
+        metadata_cache.save()
+        observation_tracker.save()
+        observation_tracker.report()
 
-    def schedule_thread():
-        if unit == "hours":
-            interval_seconds = interval * 3600
-        elif unit == "minutes":
-            interval_seconds = interval * 60
-        elif unit == "seconds":
-            interval_seconds = interval
-        else:
-            raise ValueError("Invalid unit. Use 'seconds', 'minutes', or 'hours'.")
-
-        if on_the_hour:
-            now = datetime.now()
-            next_run = (now + timedelta(minutes=1)).replace(second=0, microsecond=0)
-            delay = (next_run - now).seconds
-            print(f"Starting at the next minute: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
-            time.sleep(delay)
-        elif start_now:
-            next_run = datetime.now()
-        else:
-            next_run = datetime.now() + timedelta(seconds=interval_seconds)
-
-        while not end_time or datetime.now() < end_time:
-            now = datetime.now()
-            if now >= next_run:
-                job()
-                next_run = now + timedelta(seconds=interval_seconds)
-            time.sleep(1)
-
-        print("Scheduled job has ended.")
-
-    t = threading.Thread(target=schedule_thread)
-    t.start()
-    return t
+    if not start_now:
+        print("Starting at the next interval boundary")
+    scheduler = IntervalScheduler(job, interval_seconds(interval, unit), end_time=end_time,
+                                  start_now=start_now, overrun=overrun)
+    return scheduler.start()
 
 
 def main():
@@ -279,6 +216,8 @@ def main():
     parser.add_argument('--duration', type=int, default=60,
                         help="Duration in minutes for data collection (default: 60)")
     parser.add_argument('--start_now', type=bool, default=True, help="Start the collection immediately")
+    parser.add_argument('--overrun', type=str, default='skip', choices=overrun_policies,
+                        help="When a collection runs past the next interval: skip missed runs or coalesce them into one immediate run (default: skip)")
 
     args = parser.parse_args()
 
@@ -288,12 +227,17 @@ def main():
         return
 
     city, state = city_state
-    if state not in city_coordinates or city not in city_coordinates[state]:
+    import city_registry
+    # 전체 도시 수집기와 같은 도시 목록(city_registry.npy)에서 찾는다
+    coordinates = city_registry.load().lookup(city, state)
+    if coordinates is None:
         print(f"Error: City '{city}' in state '{state}' not found in the city list.")
         return
 
-    latitude, longitude = city_coordinates[state][city]
+    latitude, longitude = coordinates
+    setup()
 
+    from art import text2art
     print(text2art("Weather Data Collector"))
     print(f"Starting data collection for {city.title()}, {state.upper()} with the following parameters:")
     print(f"Interval: {args.interval} {args.unit}")
@@ -302,9 +246,12 @@ def main():
     print(f"Duration: {args.duration} minutes")
     print(f"Start Now: {args.start_now}")
 
-    scheduler_thread = set_schedule(interval=args.interval, unit=args.unit, latitude=latitude, longitude=longitude, start_now=args.start_now, duration_minutes=args.duration)
+    scheduler = set_schedule(interval=args.interval, unit=args.unit, latitude=latitude, longitude=longitude, start_now=args.start_now,
+                             duration_minutes=args.duration, overrun=args.overrun)
 
-    scheduler_thread.join()
+    scheduler.join()
+    metadata_cache.report()
+    nws_client.report()
     print("Main thread has ended.")
 
 
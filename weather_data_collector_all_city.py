@@ -1,202 +1,215 @@
-import requests
-import threading
-import time
 from datetime import datetime, timedelta
-import pandas as pd
-import pyarrow as pa
-import pyarrow.parquet as pq
 import os
-import json
 import logging
+import atexit  # 프로그램 종료 핸들러
 import argparse
-from art import text2art
-import math
-
-# 로그 폴더 설정
+from nws_metadata_cache import MetadataCache, extract_point, extract_station_list, extract_station
+from observation_tracker import ObservationTracker
+from sweep_planner import SweepPlan, plan_sweep
+from weather_scheduler import IntervalScheduler, interval_seconds, overrun_policies
+import nws_client
+from nws_client import api_base_url
+
+# import 할 때는 파일을 만들거나 무거운 모듈(pyarrow, pandas, numpy, requests, art)을 읽지 않는다.
+# 로그 폴더 / 로그 파일 / 저장소 / 캐시는 setup() 이 만들고 (main 은 인자를 확인한 뒤 호출),
+# pyarrow 를 쓰는 저장 경로와 도시 레지스트리는 처음 쓰는 함수 안에서 import 한다.
+
+# 로그 폴더
 log_folder = "weather_log"
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-
-# 파케이 파일 설정
-unique_id = str(datetime.now()).split('.')[0].replace(':', '-')
-parquet_filename = os.path.join(log_folder, f"weather_data_{unique_id}.parquet")
-csv_filename = os.path.join(log_folder, f"weather_data_{unique_id}.csv")
-
-# 로그 파일 설정
-log_filename = os.path.join(log_folder, f"weather_data_{unique_id}.log")
-logging.basicConfig(filename=log_filename, level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-# JSON 파일을 읽어서 딕셔너리로 변환하는 함수
-def load_dict_from_json(filename):
-    with open(filename, 'r') as f:
-        dictionary = json.load(f)
-    print(f"Dictionary loaded from {filename}")
-    return dictionary
-
-# 파일에서 딕셔너리 불러오기
-city_coordinates = load_dict_from_json('city_coordinates.json')
-
-
-# 화씨를 섭씨로 변환하는 함수
-def fahrenheit_to_celsius(f):
-    return (f - 32) * 5.0 / 9.0
-
-# 섭씨를 화씨로 변환하는 함수
-def celsius_to_fahrenheit(c):
-    return (c * 9.0 / 5.0) + 32
-
-# 체감 온도 계산 함수 (화씨 단위)
-def calculate_heat_index(t_f, h):
-    # h (humidity) 또는 t_f (temperature)가 None인 경우 NaN 반환
-    if t_f is None or h is None:
-        return float('nan')
-
-    c1 = -42.379
-    c2 = 2.04901523
-    c3 = 10.14333127
-    c4 = -0.22475541
-    c5 = -0.00683783
-    c6 = -0.05481717
-    c7 = 0.00122874
-    c8 = 0.00085282
-    c9 = -0.00000199
-
-    hi = (c1 + (c2 * t_f) + (c3 * h) + (c4 * t_f * h) + (c5 * t_f ** 2) +
-          (c6 * h ** 2) + (c7 * t_f ** 2 * h) + (c8 * t_f * h ** 2) + (c9 * t_f ** 2 * h ** 2))
-    return hi
-
-# 이슬점 계산 함수
-def calculate_dew_point(t_c, h):
-    # h (humidity) 또는 t_c (temperature)가 None인 경우 NaN 반환
-    if t_c is None or h is None:
-        return float('nan')
-    return t_c - ((100 - h) / 5.0)
-
-# NWS API로부터 실측 데이터를 가져오는 함수
+
+# setup() 이 정하는 실행 식별자와 CSV 파일 이름
+unique_id = None
+csv_filename = None
+
+# 날짜/주별로 나뉜 Parquet 데이터셋에 row group 을 이어 붙이는 저장소
+parquet_sink = None
+
+# 저장하는 배치마다 함께 갱신하는 도시/주/관측소별 시간/일 집계 (수집마다 변화분을 작은 파일로 씀)
+rollup_store = None
+
+# points/관측소 메타데이터 캐시 (실행 간 재사용)
+metadata_cache = None
+
+# 관측소별 마지막 관측 상태 (바뀌지 않은 관측은 다시 저장하지 않음)
+observation_tracker = None
+
+# 로그 폴더, 로그 파일, 저장소, 캐시를 만들고 종료 시 닫기를 등록하는 함수 (한 번만)
+# 수집기를 라이브러리로 쓰는 쪽(벤치마크 등)도 수집 전에 호출한다
+def setup():
+    global unique_id, csv_filename, parquet_sink, rollup_store, metadata_cache, observation_tracker
+    if parquet_sink is not None:
+        return
+    from parquet_sink import PartitionedParquetSink
+    from weather_schema import observation_schema
+    from weather_rollups import RollupStore
+
+    if not os.path.exists(log_folder):
+        os.makedirs(log_folder)
+
+    # 파케이 파일 설정
+    unique_id = str(datetime.now()).split('.')[0].replace(':', '-')
+    csv_filename = os.path.join(log_folder, f"weather_data_{unique_id}.csv")
+    parquet_sink = PartitionedParquetSink(os.path.join(log_folder, "weather_data"),
+                                          prefix=f"weather_data_{unique_id.replace(' ', '_')}",
+                                          schema=observation_schema)
+    # 프로그램 종료 시 열린 Parquet 파일을 닫음
+    atexit.register(parquet_sink.close)
+    rollup_store = RollupStore(os.path.join(log_folder, "weather_rollups"), prefix=parquet_sink.prefix)
+    atexit.register(rollup_store.flush)
+
+    # 로그 파일 설정
+    log_filename = os.path.join(log_folder, f"weather_data_{unique_id}.log")
+    logging.basicConfig(filename=log_filename, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    metadata_cache = MetadataCache(os.path.join(log_folder, "nws_metadata_cache.json"))
+    observation_tracker = ObservationTracker(os.path.join(log_folder, "observation_state.json"))
+
+# 이 프로세스가 맡은 샤드 (main 에서 configure_sharding 으로 정함)
+shard_coordinator = None
+
+# 여러 워커로 나눠 수집할 때 샤드 분배를 설정하는 함수
+# 워커들은 같은 weather_log 폴더를 공유할 수 있으므로 파일 이름에 워커 번호를 붙여 하나의 데이터셋으로 합쳐지게 하고,
+# 관측 상태는 워커마다 따로 둔다 (샤드를 넘겨받으면 그 관측소는 처음 보는 것으로 취급)
+def configure_sharding(worker_index, worker_count, coordinator_db=None, lease_seconds=60, city_coordinates=None):
+    global shard_coordinator, observation_tracker, csv_filename
+    from shard_coordinator import ShardCoordinator
+    setup()
+    # 도시 목록을 주지 않으면 레지스트리의 모든 도시를 나눈다
+    if not city_coordinates:
+        import city_registry
+        city_coordinates = city_registry.city_coordinates()
+    shard_coordinator = ShardCoordinator(coordinator_db, city_coordinates, worker_index, worker_count,
+                                         lease_seconds=lease_seconds)
+    if worker_count == 1:
+        return
+    atexit.register(shard_coordinator.release)
+    suffix = f"_w{worker_index}"
+    parquet_sink.prefix += suffix
+    rollup_store.prefix += suffix
+    csv_filename = os.path.join(log_folder, f"weather_data_{unique_id}{suffix}.csv")
+    observation_tracker = ObservationTracker(os.path.join(log_folder, f"observation_state{suffix}.json"))
+
+
+# 도시 좌표의 관측소 목록을 메타데이터 캐시를 거쳐 조회하는 함수
+def resolve_stations(latitude, longitude):
+    points_url = f"{api_base_url}/points/{latitude},{longitude}"
+    point = metadata_cache.get(points_url, extract_point)
+    return metadata_cache.get(point['observation_stations'], extract_station_list)
+
+# 관측소 한 곳의 최신 관측값을 가져와 그 관측소를 쓰는 모든 도시의 행을 만드는 함수
+# 행을 만든 관측은 pending 에 넣는다 (행을 저장한 뒤 observation_tracker.commit_all 로 기록)
+def get_station_weather(plan, station_url, pending):
+    try:
+        current_weather_url = f"{station_url}/observations/latest"
+        current_weather_response = nws_client.get(current_weather_url,
+                                                  headers=observation_tracker.request_headers(station_url))
+        if current_weather_response.status_code != 304:
+            current_weather_response.raise_for_status()
+        # 직전 관측과 같으면 (304 / 같은 본문 / 같은 관측 시각) 파싱과 저장을 건너뛴다
+        observed = observation_tracker.observe(station_url, current_weather_response.status_code,
+                                               current_weather_response.headers, current_weather_response.content)
+        if observed is None:
+            return []
+        current_observation, observation = observed
+
+        station_info = metadata_cache.get(station_url, extract_station)
+        rows = plan.fan_out(station_url, station_info['name'], station_info['coordinates'], current_observation)
+    except Exception as e:
+        print(f"Failed to get data for station: {station_url}, error: {e}")
+        return []
+    pending.append(observation)
+    return rows
+
+# 수집한 행들을 Parquet / CSV 파일에 저장하는 함수
+# 기존 파일을 다시 읽지 않고 이번 배치만 추가하므로 저장 비용이 누적 데이터 크기와 무관하다
+def save_rows(all_station_data):
+    if not all_station_data:
+        return
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    from weather_schema import rows_to_record_batch, to_csv_table
+    batch = rows_to_record_batch(all_station_data)
+    parquet_sink.write_batch(batch)
+    rollup_store.update(batch)
+
+    # CSV 파일 끝에 추가 (처음 쓸 때만 헤더 기록)
+    write_header = not os.path.exists(csv_filename)
+    with open(csv_filename, 'ab') as f:
+        pa_csv.write_csv(to_csv_table(pa.Table.from_batches([batch])), f,
+                         write_options=pa_csv.WriteOptions(include_header=write_header))
+
+# NWS API로부터 실측 데이터를 가져오는 함수 (도시 하나)
 def get_current_weather(latitude, longitude, city, state, current_collection):
+    import requests
     try:
-        points_url = f"https://api.weather.gov/points/{latitude},{longitude}"
-        response = requests.get(points_url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        observation_stations_url = data['properties']['observationStations']
-        stations_response = requests.get(observation_stations_url, timeout=10)
-        stations_response.raise_for_status()
-        stations_data = stations_response.json()
-        stations = stations_data['observationStations']
-
-        all_station_data = []
-        for station_url in stations:
-            try:
-                current_weather_url = f"{station_url}/observations/latest"
-                current_weather_response = requests.get(current_weather_url, timeout=10)
-                current_weather_response.raise_for_status()
-                current_weather_data = current_weather_response.json()
-                current_observation = current_weather_data['properties']
-
-                station_info_response = requests.get(station_url, timeout=10)
-                station_info_response.raise_for_status()
-                station_info_data = station_info_response.json()
-                station_name = station_info_data['properties']['name']
-                station_location = station_info_data['geometry']['coordinates']
-
-                temperature_value = current_observation['temperature']['value']
-                temperature_unit = current_observation['temperature']['unitCode']
-
-                # 섭씨와 화씨 온도를 둘 다 저장
-                if temperature_unit == 'wmoUnit:degF':
-                    temperature_fahrenheit = temperature_value
-                    temperature_celsius = fahrenheit_to_celsius(temperature_value)
-                else:
-                    temperature_celsius = temperature_value
-                    temperature_fahrenheit = celsius_to_fahrenheit(temperature_value)
-
-                humidity = current_observation['relativeHumidity']['value'] if 'relativeHumidity' in current_observation else float('nan')
-                apparent_temperature_fahrenheit = calculate_heat_index(temperature_fahrenheit, humidity)
-                apparent_temperature_celsius = fahrenheit_to_celsius(apparent_temperature_fahrenheit)
-                dew_point = calculate_dew_point(temperature_celsius, humidity)
-                wind_direction = current_observation['windDirection']['value'] if 'windDirection' in current_observation else float('nan')
-                precipitation_value = current_observation.get('precipitationLastHour', {}).get('value', float('nan'))
-
-                if isinstance(station_location, list):
-                    station_location = [float(coord) for coord in station_location]  # 각 좌표를 double로 변환
-
-                if precipitation_value is None:
-                    precipitation_value = float('nan')  # None을 NaN으로 변환하여 항상 double로 처리
-
-                if isinstance(wind_direction, int):
-                    wind_direction = float(wind_direction) # wind_direction을 항상 double로 변환
-
-                station_data = {
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'city': city.title(),
-                    'state': state.upper(),
-                    'station': station_name,
-                    'location': station_location,
-                    'temperature_celsius': temperature_celsius,
-                    'temperature_fahrenheit': temperature_fahrenheit,
-                    'apparent_temperature_celsius': apparent_temperature_celsius,
-                    'apparent_temperature_fahrenheit': apparent_temperature_fahrenheit,
-                    'humidity': humidity,
-                    'wind_speed': current_observation['windSpeed']['value'] if 'windSpeed' in current_observation else float('nan'),
-                    'wind_direction': wind_direction,
-                    'precipitation': precipitation_value,
-                    'dew_point': dew_point,
-                    'weather': current_observation['textDescription']
-                }
-
-                all_station_data.append(station_data)
-
-            except Exception as e:
-                print(f"Failed to get data for station: {station_url}, error: {e}")
-
-        # Parquet 파일에 데이터 저장
-        df = pd.DataFrame(all_station_data)
-        table = pa.Table.from_pandas(df)
-
-        if os.path.exists(parquet_filename):
-            old_data = pq.read_table(parquet_filename)
-            table = pa.concat_tables([old_data, table])
-
-        pq.write_table(table, parquet_filename)
-
-        # CSV 파일로 저장
-        if os.path.exists(csv_filename):
-            df_old = pd.read_csv(csv_filename)
-            df_combined = pd.concat([df_old, df], ignore_index=True)
-            df_combined.to_csv(csv_filename, index=False)
-        else:
-            df.to_csv(csv_filename, index=False)
+        plan = SweepPlan()
+        plan.add_city(city, state, resolve_stations(latitude, longitude))
+
+        all_station_data, pending = [], []
+        for station_url in plan.stations:
+            all_station_data.extend(get_station_weather(plan, station_url, pending))
+
+        # Parquet / CSV 파일에 데이터 저장
+        save_rows(all_station_data)
+        observation_tracker.commit_all(pending)
 
         print(f"Collected {current_collection} data points for {city}, {state}.")
     except requests.exceptions.RequestException as e:
         logging.error(f"Failed to get data for {city}, {state}: {e}")
 
+# 한 번의 수집을 실행하는 함수
+# 모든 도시의 관측소 목록을 먼저 조회한 뒤, 겹치는 관측소는 한 번만 가져와 각 도시 행으로 펼친다
+def run_sweep(cities_by_state, end_time=None):
+    nws_client.start_sweep()
+    observation_tracker.start_sweep()
+    plan = plan_sweep(cities_by_state, resolve_stations)
+    plan.report()
+
+    all_station_data, pending = [], []
+    for current_collection, station_url in enumerate(plan.stations, start=1):
+        all_station_data.extend(get_station_weather(plan, station_url, pending))
+        if current_collection % 100 == 0:
+            print(f"Collected {current_collection}/{plan.unique_fetches} stations.")
+        if end_time and datetime.now() >= end_time:
+            break
+
+    save_rows(all_station_data)
+    # 저장이 끝난 관측만 기록한다 (저장에 실패하면 다음 수집에서 다시 가져온다)
+    observation_tracker.commit_all(pending)
+    return plan
+
 
 # 스케줄 설정 함수
-def set_schedule(interval, unit, duration_minutes=None):
+# interval 마다 (벽시계 경계에 맞춰) 맡은 도시를 한 번씩 수집하고, duration 이 지나면 멈춘다
+def set_schedule(interval, unit, duration_minutes=None, overrun='skip'):
     end_time = None
     if duration_minutes:
         end_time = datetime.now() + timedelta(minutes=duration_minutes)
 
-    current_collection = 1
-
-    def schedule_thread():
-        nonlocal current_collection
-        for state, cities in city_coordinates.items():
-            for city, (lat, lon) in cities.items():
-                get_current_weather(lat, lon, city, state, current_collection)
-                current_collection += 1
-                if end_time and datetime.now() >= end_time:
-                    break
-            if end_time and datetime.now() >= end_time:
-                break
-        print("Scheduled job has ended.")
-
-    t = threading.Thread(target=schedule_thread)
-    t.start()
-    return t
+    def sweep():
+        # 수집마다 샤드 임대를 갱신하고, 죽은 워커의 샤드가 있으면 넘겨받는다
+        run_sweep(shard_coordinator.assigned_cities(), end_time)
+        metadata_cache.save()
+        observation_tracker.save()
+        rollup_store.flush()
+        shard_coordinator.report()
+        metadata_cache.report()
+        observation_tracker.report()
+        nws_client.report()
+        rollup_store.report()
+
+    scheduler = IntervalScheduler(sweep, interval_seconds(interval, unit), end_time=end_time, overrun=overrun)
+    return scheduler.start()
+
+
+# --region / --bbox 로 고른 {주: {도시: (위도, 경도)}} (잘못된 값은 argparse 오류로 알림)
+def select_cities(parser, args):
+    import city_registry
+    try:
+        return city_registry.city_coordinates(region=args.region, bbox=city_registry.parse_bbox(args.bbox))
+    except ValueError as e:
+        parser.error(str(e))
 
 
 def main():
@@ -206,15 +219,48 @@ def main():
                         help="Unit for interval (default: minutes)")
     parser.add_argument('--duration', type=int, default=60,
                         help="Duration in minutes for data collection (default: 60)")
+    parser.add_argument('--overrun', type=str, default='skip', choices=overrun_policies,
+                        help="When a sweep runs past the next interval: skip missed runs or coalesce them into one immediate run (default: skip)")
+    parser.add_argument('--metadata-ttl', type=float, default=24,
+                        help="Hours to reuse cached points/station metadata before revalidating (default: 24)")
+    parser.add_argument('--rate', type=float, default=nws_client.default_rate,
+                        help="Starting request rate shared by all workers in requests/second; lowered on 429/5xx and raised slowly on success (default: 5)")
+    parser.add_argument('--retry-budget', type=int, default=nws_client.retry_policy.budget,
+                        help="Maximum retries per sweep for throttled or failed requests (default: 200)")
+    parser.add_argument('--worker-index', type=int, default=0,
+                        help="Index of this worker when the city list is split across workers (default: 0)")
+    parser.add_argument('--worker-count', type=int, default=1,
+                        help="Number of workers sharing the city list, split by state (default: 1)")
+    parser.add_argument('--coordinator-db', type=str, default=None,
+                        help="SQLite lease file shared by the workers; shards of dead workers are reassigned (default: fixed split)")
+    parser.add_argument('--lease-seconds', type=float, default=None,
+                        help="Seconds a worker keeps its shards without renewing them (default: 3 intervals, at least 60)")
+    parser.add_argument('--region', type=str, default=None,
+                        help="Only collect the cities of this census region: northeast, midwest, south or west (default: all)")
+    parser.add_argument('--bbox', type=str, default=None,
+                        help="Only collect the cities inside MIN_LAT,MIN_LON,MAX_LAT,MAX_LON (default: all)")
     args = parser.parse_args()
-
+    cities = select_cities(parser, args)
+    if not cities:
+        print("Error: No cities in the selected region or bounding box.")
+        return
+    setup()
+    metadata_cache.ttl = args.metadata_ttl * 3600
+    nws_client.configure_rate_limit(rate=args.rate, retry_budget=args.retry_budget)
+    # 임대는 수집을 시작할 때마다 갱신하므로 한 번의 수집보다 충분히 길어야 한다
+    lease_seconds = args.lease_seconds or max(3 * interval_seconds(args.interval, args.unit), 60)
+    configure_sharding(args.worker_index, args.worker_count, args.coordinator_db, lease_seconds, cities)
+
+    from art import text2art
     print(text2art("Weather Data Collector"))
     print(f"Starting data collection with the following parameters:")
     print(f"Interval: {args.interval} {args.unit}")
     print(f"Duration: {args.duration} minutes")
+    print(f"Worker: {args.worker_index + 1} of {args.worker_count}")
 
-    scheduler_thread = set_schedule(interval=args.interval, unit=args.unit, duration_minutes=args.duration)
-    scheduler_thread.join()
+    scheduler = set_schedule(interval=args.interval, unit=args.unit, duration_minutes=args.duration,
+                             overrun=args.overrun)
+    scheduler.join()
     print("Main thread has ended.")
 
 
@@ -1,217 +1,307 @@
-import requests
 import threading
 import time
 from datetime import datetime, timedelta
-import pandas as pd
-import pyarrow as pa
-import pyarrow.parquet as pq
 import os
-import json
 import logging
 import atexit  # 프로그램 종료 핸들러
 import argparse
-from art import text2art
-import math
-
-# 로그 폴더 설정
+from nws_metadata_cache import MetadataCache, extract_point, extract_station_list, extract_station
+from observation_tracker import ObservationTracker
+from sweep_planner import SweepPlan, plan_sweep
+from weather_buffer import FlushingBuffer
+from weather_scheduler import IntervalScheduler, interval_seconds, overrun_policies
+import nws_client
+from nws_client import api_base_url
+
+# import 할 때는 파일을 만들거나 무거운 모듈(pyarrow, pandas, numpy, requests, art)을 읽지 않는다.
+# 로그 폴더 / 로그 파일 / 저장소 / 캐시는 setup() 이 만들고 (main 은 인자를 확인한 뒤 호출),
+# pyarrow 를 쓰는 저장 경로와 도시 레지스트리는 처음 쓰는 함수 안에서 import 한다.
+
+# 로그 폴더
 log_folder = "weather_log"
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-
-# 파케이 파일 설정
-unique_id = str(datetime.now()).split('.')[0].replace(':', '-')
-parquet_filename = os.path.join(log_folder, f"weather_data_{unique_id}.parquet")
-csv_filename = os.path.join(log_folder, f"weather_data_{unique_id}.csv")
-
-# 메모리에 데이터를 저장할 리스트
-weather_data_memory = []
-
-# 로그 파일 설정
-log_filename = os.path.join(log_folder, f"weather_data_{unique_id}.log")
-logging.basicConfig(filename=log_filename, level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-# JSON 파일을 읽어서 딕셔너리로 변환하는 함수
-def load_dict_from_json(filename):
-    with open(filename, 'r') as f:
-        dictionary = json.load(f)
-    print(f"Dictionary loaded from {filename}")
-    return dictionary
-
-# 파일에서 딕셔너리 불러오기
-city_coordinates = load_dict_from_json('city_coordinates.json')
-
-# 화씨를 섭씨로 변환하는 함수
-def fahrenheit_to_celsius(f):
-    return (f - 32) * 5.0 / 9.0
-
-# 섭씨를 화씨로 변환하는 함수
-def celsius_to_fahrenheit(c):
-    return (c * 9.0 / 5.0) + 32
-
-# 체감 온도 계산 함수 (화씨 단위)
-def calculate_heat_index(t_f, h):
-    if t_f is None or h is None:
-        return float('nan')
-
-    c1 = -42.379
-    c2 = 2.04901523
-    c3 = 10.14333127
-    c4 = -0.22475541
-    c5 = -0.00683783
-    c6 = -0.05481717
-    c7 = 0.00122874
-    c8 = 0.00085282
-    c9 = -0.00000199
-
-    hi = (c1 + (c2 * t_f) + (c3 * h) + (c4 * t_f * h) + (c5 * t_f ** 2) +
-          (c6 * h ** 2) + (c7 * t_f ** 2 * h) + (c8 * t_f * h ** 2) + (c9 * t_f ** 2 * h ** 2))
-    return hi
-
-# 이슬점 계산 함수
-def calculate_dew_point(t_c, h):
-    if t_c is None or h is None:
-        return float('nan')
-    return t_c - ((100 - h) / 5.0)
-
-# NWS API로부터 실측 데이터를 가져오는 함수
-def get_current_weather(latitude, longitude, city, state, current_collection, headers):
+
+# setup() 이 정하는 실행 식별자 (파일 이름에 사용)
+unique_id = None
+
+# 날짜/주별로 나뉜 Parquet 데이터셋 저장소
+parquet_sink = None
+
+# 저장하는 배치마다 함께 갱신하는 도시/주/관측소별 시간/일 집계 (수집마다 변화분을 작은 파일로 씀)
+rollup_store = None
+
+# 파싱/추출/파생 계산을 맡는 프로세스 풀 파이프라인 (--mode pipeline 일 때만 생성)
+parse_pipeline = None
+
+# 버퍼에서 넘어온 행 tuple 들을 RecordBatch 로 만들어 저장하는 함수
+# 파이프라인 모드에서는 프로세스 풀이 파생 지표를 이미 채워 두었으므로 다시 계산하지 않는다
+def write_buffered_rows(rows):
+    from weather_schema import rows_to_record_batch
+    batch = rows_to_record_batch(rows, derive=parse_pipeline is None)
+    parquet_sink.write_batch(batch)
+    rollup_store.update(batch)
+
+# 버퍼가 Parquet 에 저장을 마친 행의 관측을 관측 상태에 기록하는 함수 (flush 쓰레드에서 호출)
+# 저장이 실패하거나 저장 전에 프로세스가 죽으면 기록되지 않으므로 다음 수집에서 같은 관측을 다시 가져온다
+def commit_observations(pending):
+    observation_tracker.commit_all(pending)
+
+# 수집한 행을 모아 두었다가 크기/시간 기준으로 백그라운드에서 Parquet 에 저장하는 버퍼
+# 행과 함께 그 행을 만든 관측(pending)을 넘기면 저장이 끝난 뒤 commit_observations 로 기록한다
+weather_buffer = None
+
+# points/관측소 메타데이터 캐시 (실행 간 재사용)
+metadata_cache = None
+
+# 관측소별 마지막 관측 상태 (바뀌지 않은 관측은 다시 저장하지 않음)
+observation_tracker = None
+
+# 로그 폴더, 로그 파일, 저장소, 버퍼, 캐시를 만들고 종료 시 저장을 등록하는 함수 (한 번만)
+# 수집기를 라이브러리로 쓰는 쪽(벤치마크 등)도 수집 전에 호출한다
+def setup():
+    global unique_id, parquet_sink, rollup_store, weather_buffer, metadata_cache, observation_tracker
+    if parquet_sink is not None:
+        return
+    from parquet_sink import PartitionedParquetSink
+    from weather_schema import observation_schema
+    from weather_rollups import RollupStore
+
+    if not os.path.exists(log_folder):
+        os.makedirs(log_folder)
+
+    # 파케이 파일 설정
+    unique_id = str(datetime.now()).split('.')[0].replace(':', '-')
+    # 파일은 10분마다 닫고 새로 열어, 비정상 종료 시에도 그 전까지의 데이터는 읽을 수 있게 한다
+    parquet_sink = PartitionedParquetSink(os.path.join(log_folder, "weather_data"),
+                                          prefix=f"weather_data_{unique_id.replace(' ', '_')}",
+                                          schema=observation_schema, max_file_seconds=600)
+    rollup_store = RollupStore(os.path.join(log_folder, "weather_rollups"), prefix=parquet_sink.prefix)
+    weather_buffer = FlushingBuffer(write_buffered_rows, max_rows=5000, max_age=30.0, on_flushed=commit_observations)
+
+    # 로그 파일 설정
+    log_filename = os.path.join(log_folder, f"weather_data_{unique_id}.log")
+    logging.basicConfig(filename=log_filename, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    metadata_cache = MetadataCache(os.path.join(log_folder, "nws_metadata_cache.json"))
+    observation_tracker = ObservationTracker(os.path.join(log_folder, "observation_state.json"))
+
+    # 프로그램 종료 시 Parquet 파일로 저장
+    atexit.register(save_to_parquet)
+
+# 이 프로세스가 맡은 샤드 (main 에서 configure_sharding 으로 정함)
+shard_coordinator = None
+
+# 여러 워커로 나눠 수집할 때 샤드 분배를 설정하는 함수
+# 워커들은 같은 weather_log 폴더를 공유할 수 있으므로 파일 이름에 워커 번호를 붙여 하나의 데이터셋으로 합쳐지게 하고,
+# 관측 상태는 워커마다 따로 둔다 (샤드를 넘겨받으면 그 관측소는 처음 보는 것으로 취급)
+def configure_sharding(worker_index, worker_count, coordinator_db=None, lease_seconds=60, city_coordinates=None):
+    global shard_coordinator, observation_tracker
+    from shard_coordinator import ShardCoordinator
+    setup()
+    # 도시 목록을 주지 않으면 레지스트리의 모든 도시를 나눈다
+    if not city_coordinates:
+        import city_registry
+        city_coordinates = city_registry.city_coordinates()
+    shard_coordinator = ShardCoordinator(coordinator_db, city_coordinates, worker_index, worker_count,
+                                         lease_seconds=lease_seconds)
+    if worker_count == 1:
+        return
+    atexit.register(shard_coordinator.release)
+    suffix = f"_w{worker_index}"
+    parquet_sink.prefix += suffix
+    rollup_store.prefix += suffix
+    observation_tracker = ObservationTracker(os.path.join(log_folder, f"observation_state{suffix}.json"))
+
+# 도시 좌표의 관측소 목록을 메타데이터 캐시를 거쳐 조회하는 함수
+def resolve_stations(latitude, longitude):
+    points_url = f"{api_base_url}/points/{latitude},{longitude}"
+    point = metadata_cache.get(points_url, extract_point)
+    return metadata_cache.get(point['observation_stations'], extract_station_list)
+
+# 관측소 한 곳의 최신 관측값을 가져와 그 관측소를 쓰는 모든 도시의 행을 만드는 함수
+# 행을 만든 관측은 pending 에 넣는다 (행과 함께 버퍼에 넘겨 저장이 끝난 뒤 기록)
+def get_station_weather(plan, station_url, pending):
+    try:
+        current_weather_url = f"{station_url}/observations/latest"
+        current_weather_response = nws_client.get(current_weather_url,
+                                                  headers=observation_tracker.request_headers(station_url))
+        if current_weather_response.status_code != 304:
+            current_weather_response.raise_for_status()
+        # 직전 관측과 같으면 (304 / 같은 본문 / 같은 관측 시각) 파싱과 저장을 건너뛴다
+        observed = observation_tracker.observe(station_url, current_weather_response.status_code,
+                                               current_weather_response.headers, current_weather_response.content)
+        if observed is None:
+            return []
+        current_observation, observation = observed
+
+        station_info = metadata_cache.get(station_url, extract_station)
+        rows = plan.fan_out(station_url, station_info['name'], station_info['coordinates'], current_observation)
+    except Exception as e:
+        print(f"Failed to get data for station: {station_url}, error: {e}")
+        return []
+    pending.append(observation)
+    return rows
+
+# 파이프라인 모드: 관측소 한 곳의 응답 본문만 가져와 파싱 대기열에 넣는 함수 (파싱은 프로세스 풀에서)
+def fetch_station_weather(plan, station_url):
+    try:
+        start = time.monotonic()
+        current_weather_url = f"{station_url}/observations/latest"
+        current_weather_response = nws_client.get(current_weather_url,
+                                                  headers=observation_tracker.request_headers(station_url))
+        if current_weather_response.status_code != 304:
+            current_weather_response.raise_for_status()
+        # 304 / 같은 본문이면 파싱 단계로 보내지 않는다
+        digest = observation_tracker.check_body(station_url, current_weather_response.status_code,
+                                                current_weather_response.headers, current_weather_response.content)
+        if digest is None:
+            return
+
+        station_info = metadata_cache.get(station_url, extract_station)
+        context = (plan, station_url, station_info, digest, current_weather_response.headers)
+        parse_pipeline.submit(current_weather_response.content, context, time.monotonic() - start)
+    except Exception as e:
+        print(f"Failed to get data for station: {station_url}, error: {e}")
+
+# 파이프라인 모드: 프로세스 풀에서 파싱된 관측값을 도시 행으로 펼쳐 버퍼에 넣는 함수
+def handle_parsed_weather(context, observed_at, values):
+    plan, station_url, station_info, digest, response_headers = context
+    if observation_tracker.check_timestamp(station_url, observed_at, digest, response_headers):
+        weather_buffer.extend(plan.fan_out_values(station_url, station_info['name'], station_info['coordinates'],
+                                                  values),
+                              [(station_url, observed_at, digest, response_headers)])
+
+# 파싱 프로세스 풀 파이프라인을 시작하는 함수 (종료 시 자동으로 닫힘)
+def start_parse_pipeline(processes=None, batch_size=50):
+    global parse_pipeline
+    from parse_pool import ParsePipeline
+    parse_pipeline = ParsePipeline(handle_parsed_weather, processes=processes, batch_size=batch_size)
+    # atexit 은 나중에 등록한 것부터 실행되므로 버퍼/파일보다 먼저 닫힌다
+    atexit.register(parse_pipeline.close)
+    return parse_pipeline
+
+# NWS API로부터 실측 데이터를 가져오는 함수 (도시 하나)
+def get_current_weather(latitude, longitude, city, state, current_collection):
+    import requests
     try:
-        points_url = f"https://api.weather.gov/points/{latitude},{longitude}"
-        response = requests.get(points_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        observation_stations_url = data['properties']['observationStations']
-        stations_response = requests.get(observation_stations_url, headers=headers, timeout=10)
-        stations_response.raise_for_status()
-        stations_data = stations_response.json()
-        stations = stations_data['observationStations']
-
-        all_station_data = []
-        for station_url in stations:
-            try:
-                current_weather_url = f"{station_url}/observations/latest"
-                current_weather_response = requests.get(current_weather_url, headers=headers, timeout=10)
-                current_weather_response.raise_for_status()
-                current_weather_data = current_weather_response.json()
-                current_observation = current_weather_data['properties']
-
-                station_info_response = requests.get(station_url, headers=headers, timeout=10)
-                station_info_response.raise_for_status()
-                station_info_data = station_info_response.json()
-                station_name = station_info_data['properties']['name']
-                station_location = station_info_data['geometry']['coordinates']
-
-                temperature_value = current_observation['temperature']['value']
-                temperature_unit = current_observation['temperature']['unitCode']
-
-                # 섭씨와 화씨 온도를 둘 다 저장
-                if temperature_unit == 'wmoUnit:degF':
-                    temperature_fahrenheit = temperature_value
-                    temperature_celsius = fahrenheit_to_celsius(temperature_value)
-                else:
-                    temperature_celsius = temperature_value
-                    temperature_fahrenheit = celsius_to_fahrenheit(temperature_value)
-
-                humidity = current_observation['relativeHumidity']['value'] if 'relativeHumidity' in current_observation else float('nan')
-                apparent_temperature_fahrenheit = calculate_heat_index(temperature_fahrenheit, humidity)
-                apparent_temperature_celsius = fahrenheit_to_celsius(apparent_temperature_fahrenheit)
-                dew_point = calculate_dew_point(temperature_celsius, humidity)
-                wind_direction = current_observation['windDirection']['value'] if 'windDirection' in current_observation else float('nan')
-                precipitation_value = current_observation.get('precipitationLastHour', {}).get('value', float('nan'))
-
-                if isinstance(station_location, list):
-                    station_location = [float(coord) for coord in station_location]
-
-                if precipitation_value is None:
-                    precipitation_value = float('nan')
-
-                if isinstance(wind_direction, int):
-                    wind_direction = float(wind_direction)
-
-                station_data = {
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'city': city.title(),
-                    'state': state.upper(),
-                    'station': station_name,
-                    'location': station_location,
-                    'temperature_celsius': temperature_celsius,
-                    'temperature_fahrenheit': temperature_fahrenheit,
-                    'apparent_temperature_celsius': apparent_temperature_celsius,
-                    'apparent_temperature_fahrenheit': apparent_temperature_fahrenheit,
-                    'humidity': humidity,
-                    'wind_speed': current_observation['windSpeed']['value'] if 'windSpeed' in current_observation else float('nan'),
-                    'wind_direction': wind_direction,
-                    'precipitation': precipitation_value,
-                    'dew_point': dew_point,
-                    'weather': current_observation['textDescription']
-                }
-
-                all_station_data.append(station_data)
-
-            except Exception as e:
-                print(f"Failed to get data for station: {station_url}, error: {e}")
-
-        # 수집된 데이터를 메모리에 저장
-        weather_data_memory.extend(all_station_data)
+        plan = SweepPlan()
+        plan.add_city(city, state, resolve_stations(latitude, longitude))
+
+        all_station_data, pending = [], []
+        for station_url in plan.stations:
+            all_station_data.extend(get_station_weather(plan, station_url, pending))
+
+        # 수집된 데이터를 버퍼에 저장 (관측 상태는 Parquet 에 저장된 뒤 기록된다)
+        weather_buffer.extend(all_station_data, pending)
 
         print(f"Collected {current_collection} data points for {city}, {state}.")
     except requests.exceptions.RequestException as e:
         logging.error(f"Failed to get data for {city}, {state}: {e}")
 
-# Parquet 파일로 데이터를 저장하는 함수
+# 버퍼에 남은 데이터를 저장하고 파일을 닫는 함수
 def save_to_parquet():
-    if weather_data_memory:
-        df = pd.DataFrame(weather_data_memory)
-        table = pa.Table.from_pandas(df)
-
-        if os.path.exists(parquet_filename):
-            old_data = pq.read_table(parquet_filename)
-            table = pa.concat_tables([old_data, table])
-
-        pq.write_table(table, parquet_filename)
-        print(f"Data saved to {parquet_filename}")
-
-# 프로그램 종료 시 Parquet 파일로 저장
-atexit.register(save_to_parquet)
+    weather_buffer.close()
+    weather_buffer.report()
+    # 마지막 flush 에서 기록된 관측까지 남긴다
+    observation_tracker.save()
+    parquet_sink.close()
+    rollup_store.flush()
+    rollup_store.report()
 
 # 스케줄 설정 함수
-def set_schedule(interval, unit, duration_minutes=None, request_delay=1):
+# interval 마다 (벽시계 경계에 맞춰) 맡은 도시를 한 번씩 수집하고, duration 이 지나면 멈춘다
+def set_schedule(interval, unit, duration_minutes=None, request_delay=0, mode='thread',
+                 max_concurrency=32, per_host_limit=16, overrun='skip'):
     end_time = None
     if duration_minutes:
         end_time = datetime.now() + timedelta(minutes=duration_minutes)
 
-    current_collection = 1
-    headers = {
-        'User-Agent': 'YourAppName/1.0 (your_email@example.com)'  # User-Agent 추가
-    }
-
-    def schedule_thread():
-        nonlocal current_collection
-        state_threads = []
-        for state, cities in city_coordinates.items():
-            # 주별로 별도의 쓰레드 생성하여 데이터 수집
-            t = threading.Thread(target=collect_weather_by_state, args=(state, cities, current_collection, headers, request_delay))
-            state_threads.append(t)
-            t.start()  # 쓰레드 시작
-
-        # 모든 주별 쓰레드가 끝날 때까지 기다림
-        for t in state_threads:
-            t.join()
-
-        print("Scheduled job has ended.")
-
-    t = threading.Thread(target=schedule_thread)
-    t.start()
-    return t
-
-# 주별로 데이터를 수집하는 함수
-def collect_weather_by_state(state, cities, current_collection, headers, request_delay):
-    for city, (lat, lon) in cities.items():
-        get_current_weather(lat, lon, city, state, current_collection, headers)
-        current_collection += 1
+    def sweep():
+        # 수집마다 샤드 임대를 갱신하고, 죽은 워커의 샤드가 있으면 넘겨받는다
+        cities = shard_coordinator.assigned_cities()
+        if mode == 'async':
+            # asyncio 엔진으로 맡은 도시를 한 번에 수집
+            from weather_async_engine import run_async_sweep
+            run_async_sweep(cities, api_base_url=api_base_url,
+                            max_concurrency=max_concurrency, per_host_limit=per_host_limit,
+                            metadata_cache=metadata_cache, observation_tracker=observation_tracker,
+                            sink=weather_buffer.extend)
+        else:
+            run_thread_sweep(cities, request_delay)
+
+        metadata_cache.save()
+        observation_tracker.save()
+        # 버퍼에 남아 아직 저장되지 않은 행은 다음 수집이나 종료 때 집계에 더해진다
+        rollup_store.flush()
+        shard_coordinator.report()
+        metadata_cache.report()
+        observation_tracker.report()
+        nws_client.report()
+        weather_buffer.report()
+        rollup_store.report()
+
+    scheduler = IntervalScheduler(sweep, interval_seconds(interval, unit), end_time=end_time, overrun=overrun)
+    return scheduler.start()
+
+# 주별로 도시들의 관측소 목록을 조회해 계획에 추가하는 함수
+def discover_stations_by_state(plan, state, cities):
+    plan_sweep({state: cities}, resolve_stations, plan)
+    print(f"Resolved stations for {len(cities)} cities in {state}.")
+
+# 배정된 관측소들의 데이터를 수집하는 함수
+def collect_weather_by_stations(plan, station_urls, request_delay):
+    for station_url in station_urls:
+        if parse_pipeline is not None:
+            fetch_station_weather(plan, station_url)
+        else:
+            pending = []
+            weather_buffer.extend(get_station_weather(plan, station_url, pending), pending)
         time.sleep(request_delay)
 
+# 쓰레드로 한 번의 수집을 실행하는 함수
+# 1단계: 주별 쓰레드로 관측소 목록 조회, 2단계: 중복 제거된 관측소를 같은 수의 쓰레드에 나눠 수집
+def run_thread_sweep(cities_by_state, request_delay):
+    nws_client.start_sweep()
+    observation_tracker.start_sweep()
+    plan = SweepPlan()
+    state_threads = []
+    for state, cities in cities_by_state.items():
+        # 주별로 별도의 쓰레드 생성하여 관측소 목록 조회
+        t = threading.Thread(target=discover_stations_by_state, args=(plan, state, cities))
+        state_threads.append(t)
+        t.start()  # 쓰레드 시작
+
+    # 모든 주별 쓰레드가 끝날 때까지 기다림
+    for t in state_threads:
+        t.join()
+    plan.report()
+
+    stations = plan.stations
+    worker_count = max(1, min(len(cities_by_state), len(stations)))
+    if parse_pipeline is not None:
+        parse_pipeline.start_sweep(network_workers=worker_count)
+    station_threads = []
+    for i in range(worker_count):
+        t = threading.Thread(target=collect_weather_by_stations, args=(plan, stations[i::worker_count], request_delay))
+        station_threads.append(t)
+        t.start()
+
+    for t in station_threads:
+        t.join()
+    if parse_pipeline is not None:
+        # 대기열에 남은 응답이 모두 파싱되어 버퍼에 들어갈 때까지 기다린다
+        parse_pipeline.drain()
+        parse_pipeline.report()
+    return plan
+
+# --region / --bbox 로 고른 {주: {도시: (위도, 경도)}} (잘못된 값은 argparse 오류로 알림)
+def select_cities(parser, args):
+    import city_registry
+    try:
+        return city_registry.city_coordinates(region=args.region, bbox=city_registry.parse_bbox(args.bbox))
+    except ValueError as e:
+        parser.error(str(e))
+
 def main():
     parser = argparse.ArgumentParser(description="Weather Data Collector")
     parser.add_argument('--interval', type=int, default=5, help="Interval for data collection (default: 5)")
@@ -219,17 +309,75 @@ def main():
                         help="Unit for interval (default: minutes)")
     parser.add_argument('--duration', type=int, default=60,
                         help="Duration in minutes for data collection (default: 60)")
-    parser.add_argument('--delay', type=float, default=1, help="Delay between requests in seconds (default: 1 second)")
+    parser.add_argument('--overrun', type=str, default='skip', choices=overrun_policies,
+                        help="When a sweep runs past the next interval: skip missed runs or coalesce them into one immediate run (default: skip)")
+    parser.add_argument('--metadata-ttl', type=float, default=24,
+                        help="Hours to reuse cached points/station metadata before revalidating (default: 24)")
+    parser.add_argument('--delay', type=float, default=0,
+                        help="Extra delay between requests of one worker in seconds, on top of the shared rate limit (default: 0)")
+    parser.add_argument('--rate', type=float, default=nws_client.default_rate,
+                        help="Starting request rate shared by all workers in requests/second; lowered on 429/5xx and raised slowly on success (default: 5)")
+    parser.add_argument('--retry-budget', type=int, default=nws_client.retry_policy.budget,
+                        help="Maximum retries per sweep for throttled or failed requests (default: 200)")
+    parser.add_argument('--buffer-rows', type=int, default=5000,
+                        help="Rows to buffer in memory before flushing to parquet (default: 5000)")
+    parser.add_argument('--flush-interval', type=float, default=30,
+                        help="Maximum seconds a row stays in the buffer before being flushed (default: 30)")
+    parser.add_argument('--mode', type=str, default='thread', choices=['thread', 'async', 'pipeline'],
+                        help="Collection engine: one thread per state, asyncio, or threads feeding a parse process pool (default: thread)")
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help="Maximum concurrent requests in async mode (default: 32)")
+    parser.add_argument('--per-host', type=int, default=16,
+                        help="Maximum concurrent connections per host in async mode (default: 16)")
+    parser.add_argument('--parse-workers', type=int, default=None,
+                        help="Parse processes in pipeline mode (default: CPU count)")
+    parser.add_argument('--parse-batch', type=int, default=50,
+                        help="Responses per parse batch in pipeline mode (default: 50)")
+    parser.add_argument('--worker-index', type=int, default=0,
+                        help="Index of this worker when the city list is split across workers (default: 0)")
+    parser.add_argument('--worker-count', type=int, default=1,
+                        help="Number of workers sharing the city list, split by state (default: 1)")
+    parser.add_argument('--coordinator-db', type=str, default=None,
+                        help="SQLite lease file shared by the workers; shards of dead workers are reassigned (default: fixed split)")
+    parser.add_argument('--lease-seconds', type=float, default=None,
+                        help="Seconds a worker keeps its shards without renewing them (default: 3 intervals, at least 60)")
+    parser.add_argument('--region', type=str, default=None,
+                        help="Only collect the cities of this census region: northeast, midwest, south or west (default: all)")
+    parser.add_argument('--bbox', type=str, default=None,
+                        help="Only collect the cities inside MIN_LAT,MIN_LON,MAX_LAT,MAX_LON (default: all)")
     args = parser.parse_args()
-
+    cities = select_cities(parser, args)
+    if not cities:
+        print("Error: No cities in the selected region or bounding box.")
+        return
+    setup()
+    metadata_cache.ttl = args.metadata_ttl * 3600
+    weather_buffer.max_rows = args.buffer_rows
+    weather_buffer.max_age = args.flush_interval
+    nws_client.configure_rate_limit(rate=args.rate, retry_budget=args.retry_budget)
+    # 주별 쓰레드가 동시에 요청하므로 연결 풀을 주 수만큼 잡아 연결을 재사용한다
+    nws_client.configure_session(pool_size=max(len(cities), nws_client.default_pool_size))
+    # 임대는 수집을 시작할 때마다 갱신하므로 한 번의 수집보다 충분히 길어야 한다
+    lease_seconds = args.lease_seconds or max(3 * interval_seconds(args.interval, args.unit), 60)
+    configure_sharding(args.worker_index, args.worker_count, args.coordinator_db, lease_seconds, cities)
+
+    from art import text2art
     print(text2art("Weather Data Collector"))
     print(f"Starting data collection with the following parameters:")
     print(f"Interval: {args.interval} {args.unit}")
     print(f"Duration: {args.duration} minutes")
-    print(f"Request delay: {args.delay} seconds")
-
-    scheduler_thread = set_schedule(interval=args.interval, unit=args.unit, duration_minutes=args.duration, request_delay=args.delay)
-    scheduler_thread.join()
+    print(f"Request rate: {args.rate}/s (extra delay {args.delay} seconds)")
+    print(f"Mode: {args.mode}")
+    print(f"Overrun: {args.overrun}")
+    print(f"Worker: {args.worker_index + 1} of {args.worker_count}")
+
+    if args.mode == 'pipeline':
+        start_parse_pipeline(processes=args.parse_workers, batch_size=args.parse_batch)
+
+    scheduler = set_schedule(interval=args.interval, unit=args.unit, duration_minutes=args.duration, request_delay=args.delay,
+                             mode=args.mode, max_concurrency=args.concurrency, per_host_limit=args.per_host,
+                             overrun=args.overrun)
+    scheduler.join()
     print("Main thread has ended.")
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+import math
+import numpy as np
+import pyarrow as pa
+
+# 배치 단위 파생 지표 계산
+# 행마다 스칼라 함수를 부르는 대신 NumPy 배열 전체에 한 번에 계산한다.
+# Arrow 의 null 은 NaN 으로 바꿔 계산한 뒤, 입력이 비어 있던 자리는 다시 null 로 돌려놓는다.
+
+kmh_per_mph = 1.609344
+
+
+# 화씨를 섭씨로 변환하는 함수 (배열)
+def fahrenheit_to_celsius(f):
+    return (np.asarray(f, dtype=np.float64) - 32) * 5.0 / 9.0
+
+
+# 섭씨를 화씨로 변환하는 함수 (배열)
+def celsius_to_fahrenheit(c):
+    return (np.asarray(c, dtype=np.float64) * 9.0 / 5.0) + 32
+
+
+# Rothfusz 회귀식 (weather_observation.calculate_heat_index 와 같은 식)
+def heat_index_rothfusz(t_f, h):
+    t_f = np.asarray(t_f, dtype=np.float64)
+    h = np.asarray(h, dtype=np.float64)
+    return (-42.379 + 2.04901523 * t_f + 10.14333127 * h - 0.22475541 * t_f * h
+            - 0.00683783 * t_f ** 2 - 0.05481717 * h ** 2 + 0.00122874 * t_f ** 2 * h
+            + 0.00085282 * t_f * h ** 2 - 0.00000199 * t_f ** 2 * h ** 2)
+
+
+# NWS 체감 온도(heat index) 전체 알고리즘 (화씨)
+# 1) Steadman 단순식으로 먼저 계산해 (단순식 + 기온)/2 가 80°F 미만이면 그 값을 쓴다
+# 2) 그 이상이면 Rothfusz 회귀식을 쓰고, 습도가 매우 낮거나 높은 구간은 NWS 보정값을 더한다
+def heat_index(t_f, h):
+    t_f = np.asarray(t_f, dtype=np.float64)
+    h = np.asarray(h, dtype=np.float64)
+
+    simple = 0.5 * (t_f + 61.0 + (t_f - 68.0) * 1.2 + h * 0.094)
+    regression = heat_index_rothfusz(t_f, h)
+
+    with np.errstate(invalid='ignore'):
+        dry = (h < 13) & (t_f >= 80) & (t_f <= 112)
+        dry_adjustment = ((13 - h) / 4) * np.sqrt(np.clip(17 - np.abs(t_f - 95.0), 0, None) / 17)
+        regression = np.where(dry, regression - dry_adjustment, regression)
+
+        humid = (h > 85) & (t_f >= 80) & (t_f <= 87)
+        humid_adjustment = ((h - 85) / 10) * ((87 - t_f) / 5)
+        regression = np.where(humid, regression + humid_adjustment, regression)
+
+        use_simple = (simple + t_f) / 2 < 80
+    return np.where(use_simple, simple, regression)
+
+
+# NWS 풍속 냉각(wind chill) 공식 (화씨, 풍속 mph)
+# 기온 50°F 이하, 풍속 3 mph 이상에서만 정의되고 그 밖에서는 기온을 그대로 돌려준다
+def wind_chill(t_f, v_mph):
+    t_f = np.asarray(t_f, dtype=np.float64)
+    v_mph = np.asarray(v_mph, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        v16 = np.power(np.clip(v_mph, 0, None), 0.16)
+        chill = 35.74 + 0.6215 * t_f - 35.75 * v16 + 0.4275 * t_f * v16
+        applies = (t_f <= 50) & (v_mph >= 3)
+    return np.where(applies, chill, t_f)
+
+
+# 체감 온도 (화씨): 추울 때는 wind chill, 더울 때는 heat index, 그 사이는 기온
+# 풍속이 없으면 heat index 만 적용한다
+def apparent_temperature(t_f, h, v_mph=None):
+    t_f = np.asarray(t_f, dtype=np.float64)
+    result = heat_index(t_f, h)
+    if v_mph is not None:
+        v_mph = np.asarray(v_mph, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            cold = (t_f <= 50) & ~np.isnan(v_mph)
+        result = np.where(cold, wind_chill(t_f, v_mph), result)
+    return result
+
+
+# 이슬점 계산 함수 (weather_observation.calculate_dew_point 와 같은 근사식, 배열)
+def dew_point(t_c, h):
+    return np.asarray(t_c, dtype=np.float64) - ((100 - np.asarray(h, dtype=np.float64)) / 5.0)
+
+
+# Arrow 열을 NaN 이 들어간 float64 NumPy 배열로 바꾸는 함수
+def _to_numpy(column):
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    return column.cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+
+# 계산 결과를 null 마스크와 함께 Arrow 배열로 바꾸는 함수
+def _to_arrow(values, dtype):
+    return pa.array(values.astype(dtype.to_pandas_dtype()), type=dtype, mask=np.isnan(values))
+
+
+# RecordBatch 의 파생 열(화씨 온도, 체감 온도, 이슬점)을 한 번에 채우는 함수
+# 입력 열: temperature_celsius, humidity, wind_speed (km/h)
+def derive_batch(batch):
+    t_c = _to_numpy(batch.column(batch.schema.get_field_index('temperature_celsius')))
+    h = _to_numpy(batch.column(batch.schema.get_field_index('humidity')))
+    v_mph = _to_numpy(batch.column(batch.schema.get_field_index('wind_speed'))) / kmh_per_mph
+
+    t_f = celsius_to_fahrenheit(t_c)
+    apparent_f = apparent_temperature(t_f, h, v_mph)
+    derived = {
+        'temperature_fahrenheit': t_f,
+        'apparent_temperature_fahrenheit': apparent_f,
+        'apparent_temperature_celsius': fahrenheit_to_celsius(apparent_f),
+        'dew_point': dew_point(t_c, h),
+    }
+
+    columns = []
+    for index, field in enumerate(batch.schema):
+        if field.name in derived:
+            columns.append(_to_arrow(derived[field.name], field.type))
+        else:
+            columns.append(batch.column(index))
+    return pa.RecordBatch.from_arrays(columns, schema=batch.schema)
+
+
+# observation_values 형식의 tuple 리스트에서 파생 값(화씨 온도, 체감 온도, 이슬점)을 한 번에 채우는 함수
+# columns 는 tuple 각 자리의 열 이름 (weather_schema.observation_columns 의 temperature_celsius 이후)
+def derive_values(values, columns):
+    if not values:
+        return []
+    index = {name: i for i, name in enumerate(columns)}
+    # None 은 float 배열에서 NaN 이 된다
+    t_c = np.array([row[index['temperature_celsius']] for row in values], dtype=np.float64)
+    h = np.array([row[index['humidity']] for row in values], dtype=np.float64)
+    v_mph = np.array([row[index['wind_speed']] for row in values], dtype=np.float64) / kmh_per_mph
+
+    t_f = celsius_to_fahrenheit(t_c)
+    apparent_f = apparent_temperature(t_f, h, v_mph)
+    derived = {
+        'temperature_fahrenheit': t_f,
+        'apparent_temperature_fahrenheit': apparent_f,
+        'apparent_temperature_celsius': fahrenheit_to_celsius(apparent_f),
+        'dew_point': dew_point(t_c, h),
+    }
+
+    rows = [list(row) for row in values]
+    for name, array in derived.items():
+        position = index[name]
+        for row, value in zip(rows, array.tolist()):
+            row[position] = None if math.isnan(value) else value
+    return [tuple(row) for row in rows]
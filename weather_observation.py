@@ -0,0 +1,84 @@
+from datetime import datetime
+
+# 화씨를 섭씨로 변환하는 함수
+def fahrenheit_to_celsius(f):
+    return (f - 32) * 5.0 / 9.0
+
+# 섭씨를 화씨로 변환하는 함수
+def celsius_to_fahrenheit(c):
+    return (c * 9.0 / 5.0) + 32
+
+# 체감 온도 계산 함수 (화씨 단위)
+def calculate_heat_index(t_f, h):
+    # h (humidity) 또는 t_f (temperature)가 None인 경우 NaN 반환
+    if t_f is None or h is None:
+        return float('nan')
+
+    c1 = -42.379
+    c2 = 2.04901523
+    c3 = 10.14333127
+    c4 = -0.22475541
+    c5 = -0.00683783
+    c6 = -0.05481717
+    c7 = 0.00122874
+    c8 = 0.00085282
+    c9 = -0.00000199
+
+    hi = (c1 + (c2 * t_f) + (c3 * h) + (c4 * t_f * h) + (c5 * t_f ** 2) +
+          (c6 * h ** 2) + (c7 * t_f ** 2 * h) + (c8 * t_f * h ** 2) + (c9 * t_f ** 2 * h ** 2))
+    return hi
+
+# 이슬점 계산 함수
+def calculate_dew_point(t_c, h):
+    # h (humidity) 또는 t_c (temperature)가 None인 경우 NaN 반환
+    if t_c is None or h is None:
+        return float('nan')
+    return t_c - ((100 - h) / 5.0)
+
+# 관측 데이터와 관측소 정보로 한 행(row)을 만드는 함수
+# 모든 수집기(순차/쓰레드/비동기)가 같은 형식의 행을 만들도록 이 함수를 공유한다
+def build_station_row(city, state, station_name, station_location, current_observation):
+    temperature_value = current_observation['temperature']['value']
+    temperature_unit = current_observation['temperature']['unitCode']
+
+    # 섭씨와 화씨 온도를 둘 다 저장
+    if temperature_unit == 'wmoUnit:degF':
+        temperature_fahrenheit = temperature_value
+        temperature_celsius = fahrenheit_to_celsius(temperature_value)
+    else:
+        temperature_celsius = temperature_value
+        temperature_fahrenheit = celsius_to_fahrenheit(temperature_value)
+
+    humidity = current_observation['relativeHumidity']['value'] if 'relativeHumidity' in current_observation else float('nan')
+    apparent_temperature_fahrenheit = calculate_heat_index(temperature_fahrenheit, humidity)
+    apparent_temperature_celsius = fahrenheit_to_celsius(apparent_temperature_fahrenheit)
+    dew_point = calculate_dew_point(temperature_celsius, humidity)
+    wind_direction = current_observation['windDirection']['value'] if 'windDirection' in current_observation else float('nan')
+    precipitation_value = current_observation.get('precipitationLastHour', {}).get('value', float('nan'))
+
+    if isinstance(station_location, list):
+        station_location = [float(coord) for coord in station_location]  # 각 좌표를 double로 변환
+
+    if precipitation_value is None:
+        precipitation_value = float('nan')  # None을 NaN으로 변환하여 항상 double로 처리
+
+    if isinstance(wind_direction, int):
+        wind_direction = float(wind_direction)  # wind_direction을 항상 double로 변환
+
+    return {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'city': city.title(),
+        'state': state.upper(),
+        'station': station_name,
+        'location': station_location,
+        'temperature_celsius': temperature_celsius,
+        'temperature_fahrenheit': temperature_fahrenheit,
+        'apparent_temperature_celsius': apparent_temperature_celsius,
+        'apparent_temperature_fahrenheit': apparent_temperature_fahrenheit,
+        'humidity': humidity,
+        'wind_speed': current_observation['windSpeed']['value'] if 'windSpeed' in current_observation else float('nan'),
+        'wind_direction': wind_direction,
+        'precipitation': precipitation_value,
+        'dew_point': dew_point,
+        'weather': current_observation['textDescription']
+    }
@@ -0,0 +1,206 @@
+import argparse
+from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# 수집기가 쓴 hive 파티션 Parquet 데이터셋 ({root}/date=YYYY-MM-DD/state=XX/*.parquet) 질의
+# 시간 범위 / 주 / 도시 / 관측소 조건은 pyarrow.dataset 필터로 넘긴다.
+# - date / state 조건은 파티션 디렉터리 이름으로 걸러져 해당 파일을 아예 열지 않고 (partition pruning)
+# - timestamp / city / station 조건은 row group 통계(min/max)로 필요 없는 row group 을 건너뛴다.
+# 필요한 열만 읽고 (column pushdown), 집계는 배치 묶음 단위로 부분 집계한 뒤 합쳐서 전체 테이블을 만들지 않는다.
+
+partitioning = ds.partitioning(pa.schema([('date', pa.string()), ('state', pa.string())]), flavor='hive')
+aggregate_stats = ('min', 'max', 'mean', 'count')
+bucket_units = {'s': 'second', 'm': 'minute', 'h': 'hour', 'd': 'day'}
+
+
+def open_dataset(root):
+    return ds.dataset(root, format='parquet', partitioning=partitioning)
+
+
+# 문자열/datetime 을 datetime 으로 바꾸는 함수 ("2024-05-01", "2024-05-01T06:00" 모두 허용)
+def parse_time(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def split_names(values, normalize):
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = values.split(',')
+    return [normalize(value.strip()) for value in values if value.strip()]
+
+
+# 조건들을 dataset 필터 식으로 만드는 함수 (조건이 없으면 None)
+# 주 / 도시 이름은 수집기처럼 대문자 / title case 로 맞춘다. end 는 포함하지 않는다.
+def build_filter(start=None, end=None, states=None, cities=None, stations=None):
+    start, end = parse_time(start), parse_time(end)
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field('date') >= start.strftime('%Y-%m-%d'))
+        conditions.append(ds.field('timestamp') >= pa.scalar(start, pa.timestamp('s')))
+    if end is not None:
+        conditions.append(ds.field('date') <= end.strftime('%Y-%m-%d'))
+        conditions.append(ds.field('timestamp') < pa.scalar(end, pa.timestamp('s')))
+    for name, values in (('state', split_names(states, str.upper)), ('city', split_names(cities, str.title)),
+                         ('station', split_names(stations, str))):
+        if values:
+            conditions.append(ds.field(name).isin(values))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+# 조건에 맞는 행을 RecordBatch 단위로 읽는 제너레이터
+def scan(root, columns=None, start=None, end=None, states=None, cities=None, stations=None, batch_size=131072):
+    dataset = open_dataset(root)
+    yield from dataset.to_batches(columns=columns, filter=build_filter(start, end, states, cities, stations),
+                                  batch_size=batch_size)
+
+
+# 조건에 맞는 행을 하나의 테이블로 읽는 함수 (결과가 작을 때만 사용)
+def read(root, columns=None, start=None, end=None, states=None, cities=None, stations=None):
+    dataset = open_dataset(root)
+    return dataset.to_table(columns=columns, filter=build_filter(start, end, states, cities, stations))
+
+
+# "1h", "15m", "1d" 같은 시간 단위를 (배수, 단위) 로 바꾸는 함수
+def parse_bucket(bucket):
+    unit = bucket_units.get(bucket[-1:])
+    if unit is None:
+        raise ValueError(f"Unknown time bucket {bucket!r}, use e.g. 15m, 1h or 1d")
+    return int(bucket[:-1] or 1), unit
+
+
+# 배치 묶음을 그룹별 부분 집계 (min, max, sum, count) 테이블로 만드는 함수
+def partial_aggregate(batch, values, keys, bucket):
+    columns = {key: batch.column(key) for key in keys}
+    for key, column in columns.items():
+        if pa.types.is_dictionary(column.type):
+            columns[key] = column.cast(pa.string())
+    group_keys = list(keys)
+    if bucket:
+        multiple, unit = bucket
+        columns['bucket'] = pc.floor_temporal(batch.column('timestamp'), multiple=multiple, unit=unit)
+        group_keys.append('bucket')
+    for value in values:
+        columns[value] = batch.column(value).cast(pa.float64())
+    table = pa.table(columns)
+    return table.group_by(group_keys).aggregate(
+        [(value, stat) for value in values for stat in ('min', 'max', 'sum', 'count')])
+
+
+# 부분 집계들을 다시 합치는 함수 (min 의 min, max 의 max, sum 의 sum, count 의 sum)
+def merge_partials(partials, values, group_keys):
+    table = pa.concat_tables(partials)
+    aggregations = []
+    for value in values:
+        aggregations += [(f"{value}_min", 'min'), (f"{value}_max", 'max'), (f"{value}_sum", 'sum'),
+                         (f"{value}_count", 'sum')]
+    merged = table.group_by(group_keys).aggregate(aggregations)
+    # 다시 합칠 때 붙은 접미사를 떼어 부분 집계와 같은 열 이름으로 맞춘다
+    return merged.rename_columns([name.rsplit('_', 1)[0] if name not in group_keys else name
+                                  for name in merged.column_names])
+
+
+# 부분 집계를 쌓다가 merge_rows 행을 넘으면 하나로 합치는 함수 (그룹 수만큼의 메모리만 쓴다)
+def _fold(partials, partial, values, group_keys, merge_rows):
+    partials.append(partial)
+    if sum(table.num_rows for table in partials) >= merge_rows:
+        return [merge_partials(partials, values, group_keys)]
+    return partials
+
+
+# 그룹(keys)과 시간 단위(bucket)별로 values 열의 min / max / mean / count 를 스트리밍으로 계산하는 함수
+# 배치 묶음마다 부분 집계만 남기므로 메모리는 읽은 행 수가 아니라 그룹 수에 비례한다
+def aggregate(root, values=('temperature_celsius',), keys=('state',), bucket='1h', stats=aggregate_stats,
+              start=None, end=None, states=None, cities=None, stations=None, chunk_size=262144, merge_rows=200000):
+    values, keys = list(values), list(keys)
+    bucket = parse_bucket(bucket) if bucket else None
+    group_keys = keys + (['bucket'] if bucket else [])
+    columns = sorted(set(keys + values + (['timestamp'] if bucket else [])))
+    partials = []
+    chunk = []
+    chunk_rows = 0
+    for batch in scan(root, columns, start, end, states, cities, stations):
+        if batch.num_rows == 0:
+            continue
+        # row group 이 작으면 배치도 작으므로, chunk_size 행까지 모아 한 번에 부분 집계한다
+        chunk.append(batch)
+        chunk_rows += batch.num_rows
+        if chunk_rows >= chunk_size:
+            partials = _fold(partials, partial_aggregate(pa.Table.from_batches(chunk), values, keys, bucket), values,
+                             group_keys, merge_rows)
+            chunk, chunk_rows = [], 0
+    if chunk:
+        partials.append(partial_aggregate(pa.Table.from_batches(chunk), values, keys, bucket))
+    if not partials:
+        return None
+    return finish_aggregate(merge_partials(partials, values, group_keys), values, group_keys, stats)
+
+
+# 합친 부분 집계 (min, max, sum, count) 에서 요청한 통계 열만 남기고 mean 을 계산하는 함수
+def finish_aggregate(merged, values, group_keys, stats=aggregate_stats):
+    result = {key: merged.column(key) for key in group_keys}
+    for value in values:
+        count = merged.column(f"{value}_count")
+        if 'min' in stats:
+            result[f"{value}_min"] = merged.column(f"{value}_min")
+        if 'max' in stats:
+            result[f"{value}_max"] = merged.column(f"{value}_max")
+        if 'mean' in stats:
+            result[f"{value}_mean"] = pc.divide(merged.column(f"{value}_sum"),
+                                                pc.if_else(pc.equal(count, 0), None, count))
+        if 'count' in stats:
+            result[f"{value}_count"] = count
+    table = pa.table(result)
+    return table.sort_by([(key, 'ascending') for key in group_keys]) if group_keys else table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the collected parquet dataset")
+    parser.add_argument('--dataset', type=str, default='weather_log/weather_data',
+                        help="Hive-partitioned parquet dataset written by the all-city collectors (default: weather_log/weather_data)")
+    parser.add_argument('--start', type=str, default=None, help="Start time, inclusive, e.g. 2024-05-01T06:00 (default: no limit)")
+    parser.add_argument('--end', type=str, default=None, help="End time, exclusive (default: no limit)")
+    parser.add_argument('--hours', type=float, default=None, help="Only the last N hours, instead of --start (default: no limit)")
+    parser.add_argument('--state', type=str, default=None, help="Comma separated states (default: all)")
+    parser.add_argument('--city', type=str, default=None, help="Comma separated cities (default: all)")
+    parser.add_argument('--station', type=str, default=None, help="Comma separated station names (default: all)")
+    parser.add_argument('--columns', type=str, default='timestamp,state,city,station,temperature_celsius',
+                        help="Columns to read when not aggregating (default: timestamp,state,city,station,temperature_celsius)")
+    parser.add_argument('--aggregate', type=str, default=None,
+                        help="Comma separated value columns to aggregate, e.g. temperature_celsius,humidity")
+    parser.add_argument('--by', type=str, default='state', help="Comma separated group columns for --aggregate (default: state)")
+    parser.add_argument('--bucket', type=str, default='1h', help="Time bucket for --aggregate, e.g. 15m, 1h, 1d; 'none' to disable (default: 1h)")
+    parser.add_argument('--output', type=str, default=None, help="Write the result to this CSV file instead of printing it")
+    args = parser.parse_args()
+
+    start = args.start
+    if args.hours:
+        start = datetime.now() - timedelta(hours=args.hours)
+    filters = dict(start=start, end=args.end, states=args.state, cities=args.city, stations=args.station)
+    if args.aggregate:
+        by = [key for key in args.by.split(',') if key]
+        bucket = None if args.bucket == 'none' else args.bucket
+        table = aggregate(args.dataset, values=args.aggregate.split(','), keys=by, bucket=bucket, **filters)
+    else:
+        table = read(args.dataset, columns=args.columns.split(','), **filters)
+
+    if table is None or table.num_rows == 0:
+        print("No matching rows")
+        return
+    if args.output:
+        import pyarrow.csv as pa_csv
+        pa_csv.write_csv(table, args.output)
+        print(f"Wrote {table.num_rows} rows to {args.output}")
+    else:
+        print(table.to_pandas().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import os
+import glob
+import time
+import shutil
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from weather_query import (aggregate_stats, parse_time, parse_bucket, split_names, scan, partial_aggregate,
+                           merge_partials, finish_aggregate)
+
+# 수집하면서 함께 갱신하는 시간별 / 일별 집계(rollup) 테이블
+# 수집기가 배치를 저장할 때마다 도시 / 주 / 관측소별, 1시간 / 1일 단위의 min / max / sum / count 를 부분 집계해 두었다가
+# flush() 때 그 사이의 변화분(delta)만 작은 파일로 쓴다: {root}/level=state/resolution=1h/date=YYYY-MM-DD/{prefix}-0000.parquet
+# 기존 파일은 다시 쓰지 않으므로 여러 워커 / 실행이 같은 폴더에 써도 되고, 읽을 때 파일들을 다시 합친다 (min 의 min, sum 의 sum ...).
+# 대시보드는 원본 기록 대신 이 작은 데이터셋을 읽는다. compact_weather_log.py 가 변화분 파일들을 하나로 합친다.
+# 버킷은 원본 질의(weather_query.aggregate)와 같게 수집 시각(timestamp) 기준이다.
+
+rollup_levels = {'city': ('state', 'city'), 'state': ('state',), 'station': ('station',)}
+rollup_resolutions = ('1h', '1d')
+rollup_values = ('temperature_celsius', 'humidity', 'wind_speed')
+rollup_partitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+compacted_filename = 'compacted.parquet'
+merging_suffix = '.merging'
+
+
+def partition_path(root, level, resolution, date=None):
+    path = os.path.join(root, f"level={level}", f"resolution={resolution}")
+    return os.path.join(path, f"date={date}") if date else path
+
+
+class RollupStore:
+    def __init__(self, root, prefix, levels=tuple(rollup_levels), resolutions=rollup_resolutions,
+                 values=rollup_values):
+        self.root = root
+        self.prefix = prefix
+        self.levels = tuple(levels)
+        self.resolutions = tuple(resolutions)
+        self.values = list(values)
+        self._pending = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+        # 지표(metrics)
+        self.rows_added = 0
+        self.groups_written = 0
+        self.files_written = 0
+        self.update_seconds = 0.0
+        self.last_flush_seconds = 0.0
+
+    # 저장된 배치(RecordBatch 또는 Table) 하나를 모든 집계 단위에 더하는 함수
+    def update(self, batch):
+        start = time.monotonic()
+        table = pa.Table.from_batches([batch]) if isinstance(batch, pa.RecordBatch) else batch
+        table = table.filter(pc.is_valid(table.column('timestamp')))
+        if table.num_rows == 0:
+            return
+        partials = {}
+        for level in self.levels:
+            keys = list(rollup_levels[level])
+            for resolution in self.resolutions:
+                partials[level, resolution] = partial_aggregate(table, self.values, keys, parse_bucket(resolution))
+        with self._lock:
+            for key, partial in partials.items():
+                pending = self._pending.get(key)
+                self._pending[key] = partial if pending is None else merge_partials(
+                    [pending, partial], self.values, list(rollup_levels[key[0]]) + ['bucket'])
+            self.rows_added += table.num_rows
+            self.update_seconds += time.monotonic() - start
+
+    # 지금까지 더한 변화분을 (집계 단위, 날짜) 별 파일로 쓰는 함수 (root 가 None 이면 메모리에만 둔다)
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if self.root is None or not pending:
+            return
+        start = time.monotonic()
+        for (level, resolution), table in pending.items():
+            for date, part in split_by_date(table):
+                directory = partition_path(self.root, level, resolution, date)
+                os.makedirs(directory, exist_ok=True)
+                with self._lock:
+                    sequence = self._sequence
+                    self._sequence += 1
+                write_atomic(part, os.path.join(directory, f"{self.prefix}-{sequence:04d}.parquet"))
+                with self._lock:
+                    self.groups_written += part.num_rows
+                    self.files_written += 1
+        self.last_flush_seconds = time.monotonic() - start
+
+    # 아직 쓰지 않은 변화분을 (집계 단위, 해상도) 별로 돌려주는 함수 (검증용 메모리 저장소에서 사용)
+    def tables(self):
+        with self._lock:
+            return dict(self._pending)
+
+    # 집계에 더한 행 수와 쓴 파일 수, 배치당 갱신 비용을 출력하고 로그에 남기는 함수
+    def report(self):
+        with self._lock:
+            message = (f"Rollups: {self.rows_added} rows added, {self.groups_written} groups written in "
+                       f"{self.files_written} files, {self.update_seconds * 1000:.0f} ms updating, "
+                       f"last flush {self.last_flush_seconds * 1000:.0f} ms")
+        print(message)
+        logging.info(message)
+
+
+# 부분 집계 테이블을 버킷의 날짜별로 나누는 제너레이터
+def split_by_date(table):
+    dates = pc.strftime(table.column('bucket'), format='%Y-%m-%d')
+    for date in pc.unique(dates).to_pylist():
+        yield date, table.filter(pc.equal(dates, date))
+
+
+# 임시 파일에 쓴 뒤 바꿔치기해서, 읽는 쪽이 쓰다 만 파일을 보지 않게 하는 함수
+# 점(.)으로 시작하는 파일은 pyarrow.dataset 이 읽지 않는다
+def write_atomic(table, path):
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+# 한 집계 단위의 저장된 부분 집계를 읽어 그룹별로 다시 합치는 함수 (없으면 None)
+def read_partials(root, level, resolution, values=None, start=None, end=None, states=None, cities=None,
+                  stations=None):
+    directory = partition_path(root, level, resolution)
+    if not os.path.isdir(directory):
+        return None
+    keys = list(rollup_levels[level])
+    dataset = ds.dataset(directory, format='parquet', partitioning=rollup_partitioning)
+    if values is None:
+        values = [name[:-len('_count')] for name in dataset.schema.names if name.endswith('_count')]
+    columns = keys + ['bucket'] + [f"{value}_{stat}" for value in values for stat in ('min', 'max', 'sum', 'count')]
+
+    start, end = parse_time(start), parse_time(end)
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field('date') >= start.strftime('%Y-%m-%d'))
+        conditions.append(ds.field('bucket') >= pa.scalar(start, pa.timestamp('s')))
+    if end is not None:
+        conditions.append(ds.field('date') <= end.strftime('%Y-%m-%d'))
+        conditions.append(ds.field('bucket') < pa.scalar(end, pa.timestamp('s')))
+    for name, names in (('state', split_names(states, str.upper)), ('city', split_names(cities, str.title)),
+                        ('station', split_names(stations, str))):
+        if not names:
+            continue
+        if name not in keys:
+            raise ValueError(f"The {level} rollup has no {name} column, use a level that includes it")
+        conditions.append(ds.field(name).isin(names))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    if table.num_rows == 0:
+        return None
+    return merge_partials([table], values, keys + ['bucket'])
+
+
+# 대시보드용 질의: 집계 단위(level)와 해상도(resolution)별 min / max / mean / count 를 돌려주는 함수
+# 버킷은 시작 시각으로 고른다 (start <= bucket < end)
+def read_rollup(root, level='state', resolution='1h', values=None, stats=aggregate_stats, start=None, end=None,
+                states=None, cities=None, stations=None):
+    merged = read_partials(root, level, resolution, values, start, end, states, cities, stations)
+    if merged is None:
+        return None
+    if values is None:
+        values = [name[:-len('_count')] for name in merged.column_names if name.endswith('_count')]
+    return finish_aggregate(merged, values, list(rollup_levels[level]) + ['bucket'], stats)
+
+
+# 원본 데이터셋의 날짜 목록 (date=YYYY-MM-DD 폴더 이름)
+def raw_dates(dataset_root, start=None, end=None):
+    dates = sorted(os.path.basename(path)[len('date='):] for path in glob.glob(os.path.join(dataset_root, 'date=*')))
+    return [date for date in dates if (start is None or date >= start) and (end is None or date <= end)]
+
+
+# 원본 기록의 하루치를 읽어 메모리 저장소에 집계하는 함수 (원본에서 다시 만든 정답)
+# row group 이 작으면 배치도 작으므로, chunk_size 행까지 모아 한 번에 더한다
+def rollups_from_raw(dataset_root, date, values=rollup_values, chunk_size=262144):
+    store = RollupStore(None, 'rebuild', values=values)
+    day = datetime.strptime(date, '%Y-%m-%d')
+    columns = sorted({'timestamp', 'state', 'city', 'station', *values})
+    chunk = []
+    chunk_rows = 0
+    for batch in scan(dataset_root, columns=columns, start=day, end=day + timedelta(days=1)):
+        chunk.append(batch)
+        chunk_rows += batch.num_rows
+        if chunk_rows >= chunk_size:
+            store.update(pa.Table.from_batches(chunk))
+            chunk, chunk_rows = [], 0
+    if chunk:
+        store.update(pa.Table.from_batches(chunk))
+    return store
+
+
+# 두 열의 값이 같은지 (둘 다 null 이면 같음, 실수는 상대 오차 tolerance 까지 허용)
+def _same(left, right, tolerance=None):
+    both_null = pc.and_(pc.is_null(left), pc.is_null(right))
+    if tolerance is None:
+        equal = pc.equal(left, right)
+    else:
+        scale = pc.max_element_wise(pc.abs(left), pc.abs(right), pa.scalar(1.0))
+        equal = pc.less_equal(pc.abs(pc.subtract(left, right)), pc.multiply(scale, tolerance))
+    return pc.or_(both_null, pc.fill_null(equal, False))
+
+
+# 원본에서 다시 만든 집계와 저장된 집계를 비교해 (그룹 수, 다른 그룹 수) 를 돌려주는 함수
+def compare(expected, stored, keys, values):
+    if stored is None:
+        return expected.num_rows, expected.num_rows
+    join_keys = keys + ['bucket']
+    # null 키는 join 에서 서로 맞지 않으므로 빈 문자열로 바꿔 둔다
+    expected, stored = [table.select(join_keys + [name for name in table.column_names if name not in join_keys])
+                        for table in (expected, stored)]
+    for key in keys:
+        expected = expected.set_column(expected.schema.get_field_index(key), key,
+                                       pc.fill_null(expected.column(key), ''))
+        stored = stored.set_column(stored.schema.get_field_index(key), key, pc.fill_null(stored.column(key), ''))
+    joined = expected.join(stored, join_keys, join_type='full outer', left_suffix='_raw', right_suffix='_rollup')
+    same = None
+    for value in values:
+        for stat, tolerance in (('count', None), ('min', None), ('max', None), ('sum', 1e-9)):
+            raw = joined.column(f"{value}_{stat}_raw")
+            rollup = joined.column(f"{value}_{stat}_rollup")
+            if stat == 'count':
+                # 한쪽에만 있는 그룹은 count 가 null 이 되어 다르게 잡힌다
+                raw, rollup = pc.fill_null(raw, -1), pc.fill_null(rollup, -1)
+            check = _same(raw, rollup, tolerance)
+            same = check if same is None else pc.and_(same, check)
+    return joined.num_rows, joined.num_rows - pc.sum(same.cast(pa.int64())).as_py()
+
+
+# 원본 기록으로 저장된 집계를 날짜별로 검증하는 함수. 다른 그룹이 하나도 없으면 True
+def verify(dataset_root, root, start=None, end=None, values=rollup_values):
+    ok = True
+    for date in raw_dates(dataset_root, start, end):
+        store = rollups_from_raw(dataset_root, date, values)
+        for (level, resolution), expected in store.tables().items():
+            keys = list(rollup_levels[level])
+            day = datetime.strptime(date, '%Y-%m-%d')
+            stored = read_partials(root, level, resolution, list(values), start=day, end=day + timedelta(days=1))
+            groups, different = compare(expected, stored, keys, list(values))
+            status = 'ok' if different == 0 else f"{different} groups differ"
+            print(f"{date} {level:<7} {resolution:<3} {groups:7d} groups  {status}")
+            if different:
+                ok = False
+                logging.warning(f"Rollup {level}/{resolution} for {date}: {different} of {groups} groups differ from the raw data")
+    return ok
+
+
+# 원본 기록에서 집계를 날짜별로 다시 만들어 저장된 집계를 바꾸는 함수
+# 그 날짜에 아직 쓰고 있는 수집기가 있으면 그 변화분은 이후 다시 더해지므로, 수집기를 멈춘 뒤나 지난 날짜에 사용한다
+def rebuild(dataset_root, root, start=None, end=None, values=rollup_values):
+    for date in raw_dates(dataset_root, start, end):
+        store = rollups_from_raw(dataset_root, date, values)
+        for (level, resolution), table in store.tables().items():
+            directory = partition_path(root, level, resolution, date)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            write_atomic(table, os.path.join(directory, compacted_filename))
+        print(f"Rebuilt rollups for {date} from {store.rows_added} raw rows")
+
+
+# 집계 파티션 하나의 변화분 파일들을 하나로 합치는 함수 (합친 그룹 수 변화를 stats 에 더한다)
+# 원본 파일은 먼저 숨긴(.merging) 이름으로 바꾼 뒤 합치므로, 중간에 멈춰도 같은 값이 두 번 읽히지 않고
+# 다음 실행에서 남은 .merging 파일까지 합친다
+def compact_partition(directory, stats, min_age):
+    now = time.time()
+    sources = [path for path in sorted(glob.glob(os.path.join(directory, '*.parquet')))
+               if os.path.basename(path) == compacted_filename or now - os.path.getmtime(path) >= min_age]
+    if len(sources) < 2 and not glob.glob(os.path.join(directory, f".*{merging_suffix}")):
+        return
+    for path in sources:
+        os.replace(path, os.path.join(directory, f".{os.path.basename(path)}{merging_suffix}"))
+    hidden = sorted(glob.glob(os.path.join(directory, f".*{merging_suffix}")))
+    bytes_in = sum(os.path.getsize(path) for path in hidden)
+    tables = [pq.read_table(path) for path in hidden]
+    table = pa.concat_tables(tables, promote_options='permissive')
+    values = [name[:-len('_count')] for name in table.column_names if name.endswith('_count')]
+    keys = [name for name in table.column_names if name in ('state', 'city', 'station')]
+    merged = merge_partials([table], values, keys + ['bucket']).sort_by(
+        [(name, 'ascending') for name in keys + ['bucket']])
+    path = os.path.join(directory, compacted_filename)
+    write_atomic(merged, path)
+    for source in hidden:
+        os.remove(source)
+    stats.add(len(hidden), table.num_rows, merged.num_rows, bytes_in, os.path.getsize(path))
+
+
+def compact_rollups(root, stats, min_age):
+    directories = sorted({os.path.dirname(path) for path in glob.glob(os.path.join(root, '**', '*.parquet'), recursive=True)}
+                         | {os.path.dirname(path) for path in glob.glob(os.path.join(root, '**', f".*{merging_suffix}"), recursive=True)})
+    for directory in directories:
+        compact_partition(directory, stats, min_age)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read, verify or rebuild the hourly/daily rollups")
+    parser.add_argument('--rollups', type=str, default='weather_log/weather_rollups',
+                        help="Rollup dataset written by the all-city collectors (default: weather_log/weather_rollups)")
+    parser.add_argument('--dataset', type=str, default='weather_log/weather_data',
+                        help="Raw dataset used by --verify and --rebuild (default: weather_log/weather_data)")
+    parser.add_argument('--level', type=str, default='state', choices=list(rollup_levels), help="Group level (default: state)")
+    parser.add_argument('--resolution', type=str, default='1h', choices=list(rollup_resolutions),
+                        help="Time resolution (default: 1h)")
+    parser.add_argument('--values', type=str, default=None, help="Comma separated value columns (default: all)")
+    parser.add_argument('--start', type=str, default=None,
+                        help="Start time, inclusive; for --verify/--rebuild the first date (default: no limit)")
+    parser.add_argument('--end', type=str, default=None,
+                        help="End time, exclusive; for --verify/--rebuild the last date, inclusive (default: no limit)")
+    parser.add_argument('--state', type=str, default=None, help="Comma separated states (default: all)")
+    parser.add_argument('--city', type=str, default=None, help="Comma separated cities, with --level city (default: all)")
+    parser.add_argument('--station', type=str, default=None, help="Comma separated stations, with --level station (default: all)")
+    parser.add_argument('--verify', action='store_true', help="Recompute the rollups from the raw dataset and compare")
+    parser.add_argument('--rebuild', action='store_true', help="Recompute the rollups from the raw dataset and replace them")
+    parser.add_argument('--output', type=str, default=None, help="Write the result to this CSV file instead of printing it")
+    args = parser.parse_args()
+
+    if args.verify or args.rebuild:
+        start = args.start[:10] if args.start else None
+        end = args.end[:10] if args.end else None
+        if args.rebuild:
+            rebuild(args.dataset, args.rollups, start, end)
+        if args.verify and not verify(args.dataset, args.rollups, start, end):
+            raise SystemExit(1)
+        return
+
+    values = args.values.split(',') if args.values else None
+    table = read_rollup(args.rollups, args.level, args.resolution, values, start=args.start, end=args.end,
+                        states=args.state, cities=args.city, stations=args.station)
+    if table is None or table.num_rows == 0:
+        print("No matching rows")
+        return
+    if args.output:
+        import pyarrow.csv as pa_csv
+        pa_csv.write_csv(table, args.output)
+        print(f"Wrote {table.num_rows} rows to {args.output}")
+    else:
+        print(table.to_pandas().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import time
+import math
+import threading
+import logging
+from datetime import datetime
+
+# 벽시계 경계에 맞춰 수집(sweep)을 실행하는 스케줄러
+# - 실행 시각은 interval 의 배수 (예: 5분이면 :00, :05, :10 ...) 로 정해지므로, 수집 시간이 길어져도 시각이 밀리지 않는다
+# - 수집이 interval 보다 오래 걸려 다음 시각을 넘기면 overrun 정책에 따라
+#   'skip': 놓친 시각은 건너뛰고 다음 경계에서 실행, 'coalesce': 놓친 시각들을 한 번으로 합쳐 바로 실행
+# - end_time 이 지나거나 stop() 이 호출되면 진행 중인 수집이 끝난 뒤 멈춘다
+# - 수집마다 지연(lag, 예정 시각 대비 시작이 늦은 시간)과 소요 시간을 로그에 남긴다
+
+overrun_policies = ('skip', 'coalesce')
+
+
+# 간격과 단위를 초로 바꾸는 함수
+def interval_seconds(interval, unit):
+    if unit == "hours":
+        return interval * 3600
+    elif unit == "minutes":
+        return interval * 60
+    elif unit == "seconds":
+        return interval
+    raise ValueError("Invalid unit. Use 'seconds', 'minutes', or 'hours'.")
+
+
+class IntervalScheduler:
+    def __init__(self, job, interval, end_time=None, start_now=True, overrun='skip'):
+        if interval <= 0:
+            raise ValueError("Interval must be positive")
+        if overrun not in overrun_policies:
+            raise ValueError(f"Unknown overrun policy: {overrun}")
+        self.job = job
+        self.interval = interval
+        # end_time 은 datetime (기존 set_schedule 과 같은 형식)
+        self.end_timestamp = end_time.timestamp() if end_time else None
+        self.start_now = start_now
+        self.overrun = overrun
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        # 오래 도는 수집기에서도 메모리가 늘지 않도록 합계와 최대값만 남긴다
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.duration_total = 0.0
+        self.duration_max = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    # 주어진 시각 이후의 첫 경계 시각을 계산하는 함수
+    def _next_boundary(self, now):
+        return (math.floor(now / self.interval) + 1) * self.interval
+
+    def _finished(self, scheduled):
+        return self._stop.is_set() or (self.end_timestamp is not None and scheduled >= self.end_timestamp)
+
+    # 예정 시각까지 기다리는 함수 (stop() 이 호출되면 바로 깨어난다)
+    def _wait_until(self, scheduled):
+        while not self._stop.is_set():
+            remaining = scheduled - time.time()
+            if remaining <= 0:
+                return True
+            # 시스템 시계가 바뀌어도 따라가도록 길게 한 번에 자지 않는다
+            self._stop.wait(min(remaining, 60))
+        return False
+
+    def _run_job(self, scheduled):
+        started = time.time()
+        lag = started - scheduled
+        try:
+            self.job()
+        except Exception as e:
+            self.failures += 1
+            logging.exception(f"Scheduled sweep failed: {e}")
+        duration = time.time() - started
+        self.runs += 1
+        self.lag_total += lag
+        self.lag_max = max(self.lag_max, lag)
+        self.duration_total += duration
+        self.duration_max = max(self.duration_max, duration)
+        message = (f"Sweep {self.runs} scheduled {datetime.fromtimestamp(scheduled):%H:%M:%S}: "
+                   f"lag {lag:.2f}s, took {duration:.2f}s ({duration / self.interval * 100:.0f}% of interval)")
+        print(message)
+        logging.info(message)
+
+    def run(self):
+        now = time.time()
+        scheduled = now if self.start_now else self._next_boundary(now)
+        while not self._finished(scheduled) and self._wait_until(scheduled):
+            self._run_job(scheduled)
+
+            now = time.time()
+            next_scheduled = self._next_boundary(scheduled)
+            if now >= next_scheduled:
+                # 다음 예정 시각을 이미 넘겼다 (overrun)
+                missed = int((now - next_scheduled) // self.interval) + 1
+                if self.overrun == 'coalesce':
+                    # 놓친 시각들을 가장 최근 시각 하나로 합쳐 바로 실행한다
+                    next_scheduled += (missed - 1) * self.interval
+                    self.skipped += missed - 1
+                else:
+                    next_scheduled += missed * self.interval
+                    self.skipped += missed
+                logging.warning(f"Sweep overran the {self.interval}s interval, "
+                                f"{'coalesced' if self.overrun == 'coalesce' else 'skipped'} {missed} run(s)")
+            scheduled = next_scheduled
+        self.report()
+
+    # 백그라운드 쓰레드에서 스케줄러를 시작하는 함수
+    def start(self):
+        self._thread = threading.Thread(target=self.run)
+        self._thread.start()
+        return self
+
+    # 진행 중인 수집이 끝나면 멈추도록 하는 함수
+    def stop(self):
+        self._stop.set()
+
+    # 스케줄러가 끝날 때까지 기다리는 함수 (Ctrl+C 를 받으면 현재 수집을 마치고 멈춘다)
+    def join(self):
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            print("Stopping after the current sweep...")
+            self.stop()
+            self._thread.join()
+
+    def stats(self):
+        return {
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'failures': self.failures,
+            'mean_lag': self.lag_total / self.runs if self.runs else 0.0,
+            'max_lag': self.lag_max,
+            'mean_duration': self.duration_total / self.runs if self.runs else 0.0,
+            'max_duration': self.duration_max,
+        }
+
+    # 실행 횟수, 건너뛴 횟수, 지연과 소요 시간을 출력하고 로그에 남기는 함수
+    def report(self):
+        stats = self.stats()
+        message = (f"Scheduler: {stats['runs']} sweeps, {stats['skipped']} skipped, {stats['failures']} failed, "
+                   f"lag mean {stats['mean_lag']:.2f}s / max {stats['max_lag']:.2f}s, "
+                   f"duration mean {stats['mean_duration']:.2f}s / max {stats['max_duration']:.2f}s "
+                   f"(interval {self.interval}s)")
+        print(message)
+        logging.info(message)
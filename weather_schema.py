@@ -0,0 +1,164 @@
+import threading
+from datetime import datetime
+import pyarrow as pa
+from weather_observation import fahrenheit_to_celsius
+from weather_derive import derive_batch
+
+# 관측 데이터의 고정 Arrow 스키마
+# 배치마다 타입이 바뀌지 않도록 모든 열의 타입을 미리 정해 둔다.
+# 도시/주/관측소/날씨 설명처럼 반복되는 문자열은 dictionary 로 인코딩한다.
+string_dictionary = pa.dictionary(pa.int32(), pa.string())
+
+observation_schema = pa.schema([
+    ('timestamp', pa.timestamp('s')),
+    ('city', string_dictionary),
+    ('state', string_dictionary),
+    ('station', string_dictionary),
+    ('location', pa.list_(pa.float64())),
+    ('temperature_celsius', pa.float32()),
+    ('temperature_fahrenheit', pa.float32()),
+    ('apparent_temperature_celsius', pa.float32()),
+    ('apparent_temperature_fahrenheit', pa.float32()),
+    ('humidity', pa.float32()),
+    ('wind_speed', pa.float32()),
+    ('wind_direction', pa.float32()),
+    ('precipitation', pa.float32()),
+    ('dew_point', pa.float32()),
+    ('weather', string_dictionary),
+    # 관측소가 실제로 관측한 시각 (UTC). timestamp 는 수집한 시각이다
+    ('observation_time', pa.timestamp('s', tz='UTC')),
+])
+
+observation_columns = observation_schema.names
+
+# 단일 위치 수집기(weather_data_collector.py)의 dict 행 스키마
+# 첫 수집에서 값이 모두 None 인 열(weather, alerts 등)의 타입이 정해지지 않도록 미리 정해 둔다.
+# timestamp 는 기존 파일과 같게 'YYYY-MM-DD HH:MM:SS' 문자열로 둔다.
+station_row_schema = pa.schema([
+    ('timestamp', pa.string()),
+    ('station', pa.string()),
+    ('location', pa.list_(pa.float64())),
+    ('temperature', pa.float64()),
+    ('apparent_temperature', pa.float64()),
+    ('humidity', pa.float64()),
+    ('wind_speed', pa.float64()),
+    ('wind_direction', pa.float64()),
+    ('precipitation', pa.float64()),
+    ('probability_of_precipitation', pa.float64()),
+    ('dew_point', pa.float64()),
+    ('pressure', pa.float64()),
+    ('uv_index', pa.float64()),
+    ('visibility', pa.float64()),
+    ('weather', pa.string()),
+    ('alerts', pa.string()),
+])
+
+# 관측소 단위 값 열 (observation_values 가 돌려주는 순서)
+value_columns = observation_columns[5:]
+
+
+# 관측 응답의 ISO 8601 시각 문자열을 datetime 으로 바꾸는 함수 (없거나 잘못되면 None)
+def parse_observation_time(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+# 관측 응답에서 관측소 단위 값(도시와 무관한 열)을 뽑는 함수
+# 반환 순서는 observation_schema 의 temperature_celsius 부터 observation_time 까지와 같다
+# 화씨 온도, 체감 온도, 이슬점은 None 으로 두고 배치를 만들 때 weather_derive 에서 한꺼번에 계산한다
+def observation_values(current_observation):
+    temperature_value = current_observation['temperature']['value']
+    temperature_unit = current_observation['temperature']['unitCode']
+
+    # 섭씨 기준으로 저장
+    if temperature_unit == 'wmoUnit:degF' and temperature_value is not None:
+        temperature_celsius = fahrenheit_to_celsius(temperature_value)
+    else:
+        temperature_celsius = temperature_value
+
+    return (
+        temperature_celsius,
+        None,
+        None,
+        None,
+        current_observation['relativeHumidity']['value'] if 'relativeHumidity' in current_observation else None,
+        current_observation['windSpeed']['value'] if 'windSpeed' in current_observation else None,
+        current_observation['windDirection']['value'] if 'windDirection' in current_observation else None,
+        current_observation.get('precipitationLastHour', {}).get('value'),
+        None,
+        current_observation['textDescription'],
+        parse_observation_time(current_observation.get('timestamp')),
+    )
+
+
+# 한 관측소의 관측값을 여러 도시 행(tuple)으로 만드는 함수
+# 관측값 변환은 관측소마다 한 번만 하고, 도시별로는 앞쪽 열만 바꾼다
+def observation_rows(cities, station_name, station_location, current_observation, timestamp=None):
+    return value_rows(cities, station_name, station_location, observation_values(current_observation), timestamp)
+
+
+# 이미 뽑아 둔 관측소 단위 값으로 도시 행들을 만드는 함수 (parse_pool 에서 값을 받은 경우)
+def value_rows(cities, station_name, station_location, values, timestamp=None):
+    timestamp = timestamp or datetime.now().replace(microsecond=0)
+    return [(timestamp, city.title(), state.upper(), station_name, station_location) + values
+            for city, state in cities]
+
+
+# 열(column) 단위로 값을 모아 RecordBatch 를 만드는 빌더
+# 행 tuple 을 받아 열 리스트에 나눠 담고, build() 에서 pandas 없이 바로 Arrow 배열로 바꾼다
+class RecordBatchBuilder:
+    def __init__(self, schema=observation_schema):
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._columns = [[] for _ in schema]
+
+    def __len__(self):
+        return len(self._columns[0])
+
+    def append(self, row):
+        self.extend([row])
+
+    def extend(self, rows):
+        if not rows:
+            return
+        with self._lock:
+            for column, values in zip(self._columns, zip(*rows)):
+                column.extend(values)
+
+    # 모은 값으로 RecordBatch 를 만들고 빌더를 비우는 함수
+    def build(self):
+        with self._lock:
+            columns = self._columns
+            self._columns = [[] for _ in self.schema]
+        arrays = []
+        for field, values in zip(self.schema, columns):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=field.type.value_type).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type, from_pandas=True))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+# 행 tuple 리스트를 한 번에 RecordBatch 로 바꾸고 파생 지표를 계산하는 함수
+# derive=False 면 행에 이미 파생 값이 채워져 있다고 보고 다시 계산하지 않는다 (parse_pool 경로)
+def rows_to_record_batch(rows, schema=observation_schema, derive=True):
+    builder = RecordBatchBuilder(schema)
+    builder.extend(rows)
+    batch = builder.build()
+    return derive_batch(batch) if derive else batch
+
+
+# CSV 로 쓸 수 있도록 dictionary / list 열을 문자열로 바꾸는 함수
+def to_csv_table(table):
+    for index, field in enumerate(table.schema):
+        column = table.column(index)
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(index, field.name, column.cast(pa.string()))
+        elif pa.types.is_list(field.type):
+            text = pa.array([None if value is None else str(value) for value in column.to_pylist()], type=pa.string())
+            table = table.set_column(index, field.name, text)
+    return table